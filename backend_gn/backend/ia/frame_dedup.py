@@ -0,0 +1,236 @@
+"""Envoi binaire des frames et déduplication par empreinte perceptuelle.
+
+Les endpoints de flux webcam acceptent désormais le corps brut
+(``Content-Type: image/jpeg``, options en query string) ou un multipart, en
+plus du JSON base64 historique : pas de +33 % de taille ni de décodage base64.
+
+Les frames consécutives d'une webcam fixe sont souvent quasi identiques. Pour
+chaque client (utilisateur + ``X-Client-Id``), les dernières empreintes dHash
+64 bits et leurs réponses sont conservées quelques secondes : une frame dont
+l'empreinte est à moins de ``FRAME_DEDUP_MAX_DISTANCE`` bits d'une frame
+récente (mêmes paramètres de requête) reçoit la réponse en cache, avec
+l'en-tête ``X-Frame-Dedup: hit``.
+
+L'empreinte est calculée sur une version réduite décodée en mode « draft »
+JPEG (mise à l'échelle DCT 1/8) : bien moins coûteuse qu'un décodage complet.
+Le cache est propre à chaque processus worker.
+"""
+
+from __future__ import annotations
+
+import base64
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from io import BytesIO
+from typing import Any, Callable, Deque, Dict, Hashable, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image, UnidentifiedImageError
+from rest_framework.parsers import BaseParser, DataAndFiles
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+DEDUP_HEADER = "X-Frame-Dedup"
+CACHEABLE_STATUS = (200, 404)
+
+
+class RawImageParser(BaseParser):
+    """Corps HTTP brut ``image/*`` exposé comme ``request.FILES['image']``.
+
+    Les paramètres (threshold, top_k, ...) sont lus dans la query string.
+    """
+
+    media_type = "image/*"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        request = (parser_context or {}).get("request")
+        body = stream.read() if stream is not None else b""
+        content_type = (media_type or "image/jpeg").split(";")[0].strip()
+        extension = content_type.split("/")[-1] or "jpg"
+        files = {"image": SimpleUploadedFile(f"frame.{extension}", body, content_type=content_type)}
+        data = request.GET.copy() if request is not None else {}
+        return DataAndFiles(data, files)
+
+
+def dhash(image_bytes: bytes, size: int = 8) -> Optional[int]:
+    """Empreinte différentielle 64 bits (dHash) d'une image encodée."""
+
+    try:
+        image = Image.open(BytesIO(image_bytes))
+        # JPEG : décodage directement à l'échelle réduite (DCT), très rapide
+        image.draft("L", (size * 8, size * 8))
+        pixels = list(image.convert("L").resize((size + 1, size), Image.BILINEAR).getdata())
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+
+    value = 0
+    for row in range(size):
+        offset = row * (size + 1)
+        for col in range(size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@dataclass
+class CachedFrameResult:
+    frame_hash: int
+    params: Hashable
+    data: Any
+    status: int
+    stored_at: float
+
+
+class FrameDedupCache:
+    """Dernières réponses par client, retrouvées par distance de Hamming."""
+
+    def __init__(
+        self,
+        *,
+        max_distance: int = 4,
+        ttl_seconds: float = 2.0,
+        history: int = 4,
+        max_clients: int = 512,
+    ) -> None:
+        self.max_distance = max_distance
+        self.ttl_seconds = ttl_seconds
+        self.history = max(1, history)
+        self.max_clients = max(1, max_clients)
+        self._clients: "OrderedDict[str, Deque[CachedFrameResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, client_key: str, frame_hash: int, params: Hashable) -> Optional[CachedFrameResult]:
+        now = time.monotonic()
+        with self._lock:
+            entries = self._clients.get(client_key)
+            if entries:
+                self._clients.move_to_end(client_key)
+                for entry in reversed(entries):
+                    if now - entry.stored_at > self.ttl_seconds:
+                        continue
+                    if entry.params == params and hamming(entry.frame_hash, frame_hash) <= self.max_distance:
+                        self.hits += 1
+                        return entry
+            self.misses += 1
+        return None
+
+    def store(self, client_key: str, frame_hash: int, params: Hashable, data: Any, status_code: int) -> None:
+        entry = CachedFrameResult(frame_hash, params, data, status_code, time.monotonic())
+        with self._lock:
+            entries = self._clients.get(client_key)
+            if entries is None:
+                entries = self._clients[client_key] = deque(maxlen=self.history)
+            else:
+                self._clients.move_to_end(client_key)
+            entries.append(entry)
+            while len(self._clients) > self.max_clients:
+                self._clients.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "clients": len(self._clients),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 3) if total else None,
+        }
+
+
+_CACHE: Optional[FrameDedupCache] = None
+_CACHE_LOCK = threading.Lock()
+
+
+def get_frame_dedup_cache() -> Optional[FrameDedupCache]:
+    """Cache du processus, ou ``None`` si ``FRAME_DEDUP_ENABLED`` est désactivé."""
+
+    global _CACHE
+    if not getattr(settings, "FRAME_DEDUP_ENABLED", True):
+        return None
+    if _CACHE is None:
+        with _CACHE_LOCK:
+            if _CACHE is None:
+                _CACHE = FrameDedupCache(
+                    max_distance=getattr(settings, "FRAME_DEDUP_MAX_DISTANCE", 4),
+                    ttl_seconds=getattr(settings, "FRAME_DEDUP_TTL_SECONDS", 2.0),
+                    history=getattr(settings, "FRAME_DEDUP_HISTORY", 4),
+                    max_clients=getattr(settings, "FRAME_DEDUP_MAX_CLIENTS", 512),
+                )
+    return _CACHE
+
+
+def read_frame_bytes(request, file_fields: Tuple[str, ...] = ("image", "frame"), base64_field: Optional[str] = None) -> Optional[bytes]:
+    """Octets de la frame reçue (fichier multipart/brut ou data URL base64)."""
+
+    for field in file_fields:
+        upload = request.FILES.get(field)
+        if upload is not None:
+            upload.seek(0)
+            data = upload.read()
+            upload.seek(0)
+            return data
+
+    if base64_field:
+        value = request.data.get(base64_field)
+        if isinstance(value, str) and value:
+            encoded = value.split(",", 1)[1] if "," in value else value
+            try:
+                return base64.b64decode(encoded)
+            except (base64.binascii.Error, ValueError):
+                return None
+    return None
+
+
+def client_key(request) -> str:
+    user_id = getattr(getattr(request, "user", None), "pk", None)
+    client_id = request.headers.get("X-Client-Id") or request.query_params.get("client_id") or ""
+    return f"{user_id}:{client_id}"
+
+
+class FrameDedupMixin:
+    """Mixin de vue : réponse en cache pour une frame quasi identique à une récente."""
+
+    frame_file_fields: Tuple[str, ...] = ("image", "frame")
+    frame_base64_field: Optional[str] = None
+    frame_param_fields: Tuple[str, ...] = ("threshold", "top_k", "top_n")
+
+    def frame_params(self, request) -> Hashable:
+        return tuple(str(request.data.get(name, "")) for name in self.frame_param_fields)
+
+    def with_frame_dedup(self, request, handler: Callable[[Any], Response]) -> Response:
+        cache = get_frame_dedup_cache()
+        frame_bytes = read_frame_bytes(request, self.frame_file_fields, self.frame_base64_field) if cache else None
+        frame_hash = dhash(frame_bytes) if frame_bytes else None
+        if frame_hash is None:
+            return handler(request)
+
+        key = client_key(request)
+        params = self.frame_params(request)
+        cached = cache.lookup(key, frame_hash, params)
+        if cached is not None:
+            return Response(cached.data, status=cached.status, headers={DEDUP_HEADER: "hit"})
+
+        response = handler(request)
+        if response.status_code in CACHEABLE_STATUS:
+            cache.store(key, frame_hash, params, response.data, response.status_code)
+        response[DEDUP_HEADER] = "miss"
+        return response
+
+
+__all__ = [
+    "FrameDedupCache",
+    "FrameDedupMixin",
+    "RawImageParser",
+    "dhash",
+    "get_frame_dedup_cache",
+    "read_frame_bytes",
+]
@@ -46,6 +46,15 @@ def decode_base64_image(data_url: str) -> Image.Image:
     except (base64.binascii.Error, ValueError) as exc:  # pragma: no cover - sécurité
         raise InvalidImageError("Veuillez fournir une photo valide contenant un visage humain.") from exc
 
+    return decode_image_bytes(img_bytes)
+
+
+def decode_image_bytes(img_bytes: bytes) -> Image.Image:
+    """Décoder une image binaire (corps ``image/jpeg`` ou fichier multipart)."""
+
+    if not img_bytes:
+        raise InvalidImageError("Veuillez fournir une photo valide contenant un visage humain.")
+
     try:
         image = Image.open(BytesIO(img_bytes))
         return image.convert("RGB")
@@ -134,11 +143,15 @@ def _format_match_payload(
 
 
 def analyze_realtime_capture(
-    image_data: str,
+    image_data: Optional[str] = None,
     *,
+    image_bytes: Optional[bytes] = None,
     threshold: float = 0.7,
 ) -> Dict[str, Any]:
-    """Analyse une capture unique provenant de la webcam."""
+    """Analyse une capture unique provenant de la webcam.
+
+    ``image_bytes`` (frame binaire) évite le décodage base64 de ``image_data``.
+    """
 
     started_at = time.monotonic()
 
@@ -146,7 +159,10 @@ def analyze_realtime_capture(
     service = _get_face_service(threshold)
 
     try:
-        pil_image = decode_base64_image(image_data)
+        if image_bytes is not None:
+            pil_image = decode_image_bytes(image_bytes)
+        else:
+            pil_image = decode_base64_image(image_data)
     except InvalidImageError as exc:
         return {
             "status": "invalid_face",
@@ -174,6 +190,7 @@ def analyze_realtime_capture(
         top_k=1,
         threshold=threshold,
         include_all=True,
+        versioned_query=service._build_versioned_queries(frame, [face])[0],
     )
 
     duration_ms = int((time.monotonic() - started_at) * 1000)
@@ -235,6 +252,7 @@ def analyze_realtime_capture(
 __all__ = [
     "analyze_realtime_capture",
     "decode_base64_image",
+    "decode_image_bytes",
 ]
 
 
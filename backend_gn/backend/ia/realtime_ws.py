@@ -0,0 +1,315 @@
+"""Canal WebSocket (ASGI) pour la reconnaissance faciale en temps réel.
+
+Alternative aux POST par frame vers ``/api/ia/realtime-recognition/`` et
+``/api/ia/reconnaissance-streaming/`` : l'authentification JWT a lieu une
+seule fois à l'ouverture, puis chaque frame est un message binaire (JPEG/PNG)
+qui ne traverse ni les middlewares Django ni DRF.
+
+Protocole (``ws://<hôte>/ws/ia/recognition/``) :
+
+ - authentification : ``?token=<access JWT>`` ou premier message texte
+   ``{"type": "auth", "token": "..."}`` (délai ``REALTIME_WS_AUTH_TIMEOUT``) ;
+ - options (query string ou message ``{"type": "config", ...}``) :
+   ``mode`` (``capture`` = RealtimeRecognitionView, ``stream`` =
+   ReconnaissanceStreamingViewSet), ``threshold``, ``top_k``, ``include`` ;
+ - message binaire = une frame ; réponse ``{"type": "result", "seq",
+   "status_code", "data", "latency_ms", "dropped"}`` avec le même ``data``
+   que l'endpoint HTTP correspondant ;
+ - ``{"type": "ping"}`` -> ``{"type": "pong"}``.
+
+Contre-pression : une seule analyse en cours par connexion. Une frame reçue
+pendant l'analyse remplace la précédente en attente (seule la plus récente
+est analysée) ; les frames écartées sont comptées dans ``dropped``.
+
+Lancement local : ``uvicorn backend_gn.asgi:application`` ou
+``daphne backend_gn.asgi:application``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from biometrie.response_shaping import ResponseShape
+
+from .exceptions import FaceModelUnavailableError
+from .realtime_capture import analyze_realtime_capture
+
+logger = logging.getLogger(__name__)
+
+MODES = ("capture", "stream")
+BLOCKED_STATUTS = ("inactif", "suspendu")
+
+# Codes de fermeture applicatifs (plage 4000-4999)
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_TOO_LARGE = 4413
+
+
+class WebSocketAuthError(Exception):
+    def __init__(self, message: str, code: int = CLOSE_UNAUTHORIZED):
+        super().__init__(message)
+        self.code = code
+
+
+def authenticate_token(raw_token: str):
+    """Utilisateur du jeton d'accès (mêmes règles que l'API REST et UserStatusMiddleware)."""
+
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    from utilisateur.authentication import SGICJWTAuthentication
+
+    close_old_connections()
+    try:
+        authenticator = SGICJWTAuthentication()
+        user = authenticator.get_user(authenticator.get_validated_token(raw_token))
+    except (AuthenticationFailed, InvalidToken, TokenError) as exc:
+        raise WebSocketAuthError(str(exc)) from exc
+    finally:
+        close_old_connections()
+
+    if (getattr(user, "statut", "") or "").strip().lower() in BLOCKED_STATUTS:
+        raise WebSocketAuthError("Compte inactif ou suspendu.", CLOSE_FORBIDDEN)
+    return user
+
+
+def _parse_options(values: Dict[str, Any], current: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    options = dict(current or {"mode": "capture", "threshold": None, "top_k": 3, "include": ""})
+    if values.get("mode") in MODES:
+        options["mode"] = values["mode"]
+    if values.get("threshold") not in (None, ""):
+        try:
+            options["threshold"] = float(values["threshold"])
+        except (TypeError, ValueError):
+            pass
+    if values.get("top_k") not in (None, ""):
+        try:
+            options["top_k"] = max(1, int(values["top_k"]))
+        except (TypeError, ValueError):
+            pass
+    if "include" in values:
+        options["include"] = str(values.get("include") or "")
+    return options
+
+
+def analyze_frame(frame: bytes, options: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    """Analyse une frame ; retourne ``(status_code, data)`` comme l'endpoint HTTP du mode choisi."""
+
+    close_old_connections()
+    try:
+        if options["mode"] == "stream":
+            return _analyze_stream(frame, options)
+        return _analyze_capture(frame, options)
+    finally:
+        close_old_connections()
+
+
+def _analyze_capture(frame: bytes, options: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    threshold = options["threshold"] if options["threshold"] is not None else 0.7
+    try:
+        result = analyze_realtime_capture(image_bytes=frame, threshold=threshold)
+    except FaceModelUnavailableError as exc:
+        return 503, {"status": "model_unavailable", "message": str(exc)}
+
+    status_flag = result.get("status")
+    if status_flag == "invalid_face":
+        return 400, result
+    if status_flag in {"no_match", "success"}:
+        return 200, result
+    return 500, {
+        "status": "error",
+        "message": result.get("message") or "Erreur inattendue lors de la reconnaissance temps réel.",
+    }
+
+
+def _analyze_stream(frame: bytes, options: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+    from intelligence_artificielle import services
+
+    resultats = services.analyser_flux_video(
+        frame,
+        threshold=options["threshold"],
+        top_k=options["top_k"],
+        session_key=options.get("session_key"),
+    )
+    if not resultats.get("success"):
+        return 400, {
+            "status": "error",
+            "success": False,
+            "message": resultats.get("error", "Erreur lors de l'analyse"),
+            "faces_detected": resultats.get("faces_detected", 0),
+            "matches": [],
+        }
+    return 200, {
+        "status": "success",
+        "success": True,
+        "faces_detected": resultats.get("faces_detected", 0),
+        "faces": resultats.get("faces", []),
+        "duration_ms": resultats.get("duration_ms"),
+        "threshold": resultats.get("threshold"),
+        "searches": resultats.get("searches"),
+    }
+
+
+class _LatestFrame:
+    """Emplacement unique : la frame la plus récente non encore analysée."""
+
+    def __init__(self) -> None:
+        self._frame: Optional[Tuple[int, bytes, float]] = None
+        self._event = asyncio.Event()
+        self.dropped = 0
+
+    def put(self, seq: int, frame: bytes) -> None:
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = (seq, frame, time.monotonic())
+        self._event.set()
+
+    async def take(self) -> Tuple[int, bytes, float]:
+        await self._event.wait()
+        self._event.clear()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class RecognitionWebSocket:
+    """Application ASGI du canal ``/ws/ia/recognition/``."""
+
+    def __init__(self) -> None:
+        self.auth_timeout = float(getattr(settings, "REALTIME_WS_AUTH_TIMEOUT", 10.0))
+        self.max_frame_bytes = int(getattr(settings, "REALTIME_WS_MAX_FRAME_BYTES", 5 * 1024 * 1024))
+        # Analyses simultanées pour tout le processus (les connexions se partagent le CPU)
+        self._inflight = asyncio.Semaphore(max(1, int(getattr(settings, "REALTIME_WS_MAX_INFLIGHT", 2))))
+
+    async def __call__(self, scope, receive, send) -> None:
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+
+        query = {key: values[-1] for key, values in parse_qs(scope.get("query_string", b"").decode()).items()}
+        token = query.pop("token", None)
+        user = None
+        if token:
+            try:
+                user = await sync_to_async(authenticate_token, thread_sensitive=False)(token)
+            except WebSocketAuthError as exc:
+                logger.info("WebSocket reconnaissance refusé: %s", exc)
+                await send({"type": "websocket.close", "code": exc.code})
+                return
+
+        await send({"type": "websocket.accept"})
+        send_lock = asyncio.Lock()
+
+        async def send_json(payload: Dict[str, Any]) -> None:
+            async with send_lock:
+                await send({"type": "websocket.send", "text": json.dumps(payload, default=str)})
+
+        if user is None:
+            user = await self._authenticate_first_message(receive, send, send_json)
+            if user is None:
+                return
+
+        options = _parse_options(query)
+        # Mode stream : une session de suivi / vote par connexion (voir stream_sessions)
+        options["session_key"] = f"ws:{user.pk}:{uuid.uuid4().hex}"
+        await send_json({"type": "ready", "user_id": user.pk, "mode": options["mode"]})
+        await self._serve(receive, send, send_json, options)
+
+    async def _authenticate_first_message(self, receive, send, send_json):
+        try:
+            message = await asyncio.wait_for(receive(), timeout=self.auth_timeout)
+        except asyncio.TimeoutError:
+            await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+            return None
+        if message["type"] == "websocket.disconnect":
+            return None
+
+        try:
+            payload = json.loads(message.get("text") or "")
+        except ValueError:
+            payload = {}
+        if payload.get("type") != "auth" or not payload.get("token"):
+            await send_json({"type": "error", "message": "Authentification requise (message auth)."})
+            await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+            return None
+
+        try:
+            return await sync_to_async(authenticate_token, thread_sensitive=False)(payload["token"])
+        except WebSocketAuthError as exc:
+            await send_json({"type": "error", "message": str(exc)})
+            await send({"type": "websocket.close", "code": exc.code})
+            return None
+
+    async def _serve(self, receive, send, send_json: Callable[[Dict[str, Any]], Awaitable[None]], options) -> None:
+        slot = _LatestFrame()
+        state = {"options": options}
+        worker = asyncio.ensure_future(self._process_frames(slot, state, send_json))
+        seq = 0
+        try:
+            while True:
+                message = await receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message["type"] != "websocket.receive":
+                    continue
+
+                frame = message.get("bytes")
+                if frame is not None:
+                    if len(frame) > self.max_frame_bytes:
+                        await send_json({"type": "error", "message": "Frame trop volumineuse."})
+                        await send({"type": "websocket.close", "code": CLOSE_TOO_LARGE})
+                        break
+                    seq += 1
+                    slot.put(seq, frame)
+                    continue
+
+                try:
+                    payload = json.loads(message.get("text") or "")
+                except ValueError:
+                    await send_json({"type": "error", "message": "Message JSON invalide."})
+                    continue
+                if payload.get("type") == "ping":
+                    await send_json({"type": "pong"})
+                elif payload.get("type") == "config":
+                    state["options"] = _parse_options(payload, state["options"])
+                    await send_json({"type": "config", "mode": state["options"]["mode"]})
+        finally:
+            worker.cancel()
+
+    async def _process_frames(self, slot: _LatestFrame, state: Dict[str, Any], send_json) -> None:
+        while True:
+            seq, frame, received_at = await slot.take()
+            options = state["options"]
+            async with self._inflight:
+                try:
+                    status_code, data = await sync_to_async(analyze_frame, thread_sensitive=False)(frame, options)
+                except Exception as exc:  # pragma: no cover - protection runtime
+                    logger.exception("Erreur inattendue lors de l'analyse d'une frame WebSocket")
+                    status_code, data = 500, {"status": "error", "message": str(exc)}
+
+            shape = ResponseShape.from_request(SimpleNamespace(query_params={"include": options["include"]}))
+            await send_json({
+                "type": "result",
+                "seq": seq,
+                "status_code": status_code,
+                "data": shape.shape(data),
+                "latency_ms": int((time.monotonic() - received_at) * 1000),
+                "dropped": slot.dropped,
+            })
+
+
+__all__ = [
+    "RecognitionWebSocket",
+    "analyze_frame",
+    "authenticate_token",
+]
@@ -0,0 +1,209 @@
+"""État par session pour la reconnaissance sur flux (lissage temporel + cache).
+
+Sans état, chaque frame d'un flux webcam relance la recherche complète dans la
+galerie et l'hydratation des fiches, même si le même visage a été identifié
+100 ms plus tôt, et le résultat peut osciller d'une frame à l'autre.
+
+Pour chaque client (utilisateur + ``X-Client-Id``, ou connexion WebSocket) :
+
+ - les visages sont associés d'une frame à l'autre en pistes (recouvrement
+   IoU des boîtes) ;
+ - tant que l'embedding d'une piste reste à moins de
+   ``STREAM_SESSION_EPSILON`` (distance cosinus) de celui de la dernière
+   recherche, et depuis moins de ``STREAM_SESSION_MAX_REUSE_SECONDS``, les
+   correspondances en cache sont renvoyées sans nouvelle recherche ;
+ - l'identité n'est confirmée (``recognized``) que si elle est le meilleur
+   candidat d'au moins ``STREAM_SESSION_VOTE_MIN`` des
+   ``STREAM_SESSION_VOTE_WINDOW`` dernières frames.
+
+Les sessions inactives expirent après ``STREAM_SESSION_TTL_SECONDS``. L'état
+est propre à chaque processus worker.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from django.conf import settings
+
+
+def _iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    if inter <= 0:
+        return 0.0
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+@dataclass
+class StreamTrack:
+    """Visage suivi dans une session : dernière recherche et votes récents."""
+
+    track_id: int
+    bbox: Tuple[float, ...]
+    last_seen: float
+    search_embedding: Optional[np.ndarray] = None
+    searched_at: float = 0.0
+    matches: List[Dict[str, Any]] = field(default_factory=list)
+    votes: Deque[Optional[int]] = field(default_factory=deque)
+    confirmed_id: Optional[int] = None
+
+    def can_reuse(self, embedding: np.ndarray, epsilon: float, max_age: float, now: float) -> bool:
+        if self.search_embedding is None or now - self.searched_at > max_age:
+            return False
+        return 1.0 - float(np.dot(self.search_embedding, embedding)) <= epsilon
+
+    def remember(self, embedding: np.ndarray, matches: List[Dict[str, Any]], now: float) -> None:
+        self.search_embedding = embedding
+        self.searched_at = now
+        self.matches = matches
+
+    def vote(self, candidate_id: Optional[int], window: int, minimum: int) -> Tuple[Optional[int], int]:
+        """Ajoute le vote de la frame ; retourne l'identité confirmée et son nombre de votes."""
+        self.votes.append(candidate_id)
+        while len(self.votes) > window:
+            self.votes.popleft()
+        counts = Counter(self.votes)
+        leader, leader_votes = counts.most_common(1)[0]
+        if leader_votes >= minimum:
+            # Majorité « aucune correspondance » : l'identité précédente est retirée
+            self.confirmed_id = leader
+        return self.confirmed_id, counts.get(self.confirmed_id, 0) if self.confirmed_id is not None else 0
+
+
+class StreamSession:
+    """Pistes d'un client, remises à zéro si les paramètres de recherche changent."""
+
+    def __init__(self, params: Hashable) -> None:
+        self.params = params
+        self.tracks: List[StreamTrack] = []
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+        self._next_id = 1
+
+    def assign(self, bboxes: Sequence[Sequence[float]], now: float, iou_threshold: float, max_gap: float) -> List[StreamTrack]:
+        """Piste de chaque visage (IoU glouton) ; les pistes absentes depuis ``max_gap`` sont oubliées."""
+        self.tracks = [track for track in self.tracks if now - track.last_seen <= max_gap]
+        pairs = sorted(
+            (
+                (_iou(track.bbox, bbox), track_index, face_index)
+                for track_index, track in enumerate(self.tracks)
+                for face_index, bbox in enumerate(bboxes)
+            ),
+            reverse=True,
+        )
+        assigned: Dict[int, StreamTrack] = {}
+        used_tracks = set()
+        for overlap, track_index, face_index in pairs:
+            if overlap < iou_threshold:
+                break
+            if track_index in used_tracks or face_index in assigned:
+                continue
+            used_tracks.add(track_index)
+            assigned[face_index] = self.tracks[track_index]
+
+        result = []
+        for face_index, bbox in enumerate(bboxes):
+            track = assigned.get(face_index)
+            if track is None:
+                track = StreamTrack(self._next_id, tuple(bbox), now)
+                self._next_id += 1
+                self.tracks.append(track)
+            track.bbox = tuple(bbox)
+            track.last_seen = now
+            result.append(track)
+        return result
+
+
+class StreamSessionStore:
+    """Sessions par client (LRU borné, expiration par inactivité)."""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 30.0,
+        max_sessions: int = 512,
+        epsilon: float = 0.05,
+        max_reuse_seconds: float = 5.0,
+        vote_window: int = 5,
+        vote_min: int = 3,
+        iou_threshold: float = 0.3,
+        max_gap_seconds: float = 2.0,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max(1, max_sessions)
+        self.epsilon = epsilon
+        self.max_reuse_seconds = max_reuse_seconds
+        self.vote_window = max(1, vote_window)
+        self.vote_min = max(1, min(vote_min, self.vote_window))
+        self.iou_threshold = iou_threshold
+        self.max_gap_seconds = max_gap_seconds
+        self._sessions: "OrderedDict[str, StreamSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.searches = 0
+        self.reused = 0
+
+    def session(self, key: str, params: Hashable) -> StreamSession:
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or session.params != params or now - session.last_used > self.ttl_seconds:
+                session = self._sessions[key] = StreamSession(params)
+            self._sessions.move_to_end(key)
+            session.last_used = now
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
+
+    def record(self, searched: int, reused: int) -> None:
+        with self._lock:
+            self.searches += searched
+            self.reused += reused
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.searches + self.reused
+        return {
+            "sessions": len(self._sessions),
+            "searches": self.searches,
+            "reused": self.reused,
+            "reuse_ratio": round(self.reused / total, 3) if total else None,
+        }
+
+
+_STORE: Optional[StreamSessionStore] = None
+_STORE_LOCK = threading.Lock()
+
+
+def get_stream_session_store() -> Optional[StreamSessionStore]:
+    """Sessions du processus, ou ``None`` si ``STREAM_SESSION_ENABLED`` est désactivé."""
+
+    global _STORE
+    if not getattr(settings, "STREAM_SESSION_ENABLED", True):
+        return None
+    if _STORE is None:
+        with _STORE_LOCK:
+            if _STORE is None:
+                _STORE = StreamSessionStore(
+                    ttl_seconds=getattr(settings, "STREAM_SESSION_TTL_SECONDS", 30.0),
+                    max_sessions=getattr(settings, "STREAM_SESSION_MAX_SESSIONS", 512),
+                    epsilon=getattr(settings, "STREAM_SESSION_EPSILON", 0.05),
+                    max_reuse_seconds=getattr(settings, "STREAM_SESSION_MAX_REUSE_SECONDS", 5.0),
+                    vote_window=getattr(settings, "STREAM_SESSION_VOTE_WINDOW", 5),
+                    vote_min=getattr(settings, "STREAM_SESSION_VOTE_MIN", 3),
+                )
+    return _STORE
+
+
+__all__ = [
+    "StreamSession",
+    "StreamSessionStore",
+    "StreamTrack",
+    "get_stream_session_store",
+]
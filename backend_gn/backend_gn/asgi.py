@@ -3,6 +3,13 @@ ASGI config for backend_gn project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Les connexions WebSocket vers ``/ws/ia/recognition/`` sont servies par le
+canal de reconnaissance temps réel (backend/ia/realtime_ws.py) ; tout le
+reste est confié à Django. Lancement local :
+
+    uvicorn backend_gn.asgi:application --host 0.0.0.0 --port 8000
+    daphne backend_gn.asgi:application
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -13,4 +20,22 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_gn.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Import après l'initialisation de Django (modèles, settings)
+from backend.ia.realtime_ws import RecognitionWebSocket  # noqa: E402
+
+REALTIME_WS_PATH = '/ws/ia/recognition/'
+recognition_websocket = RecognitionWebSocket()
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        if scope['path'].rstrip('/') + '/' == REALTIME_WS_PATH:
+            return await recognition_websocket(scope, receive, send)
+        # Django ne gère pas les WebSocket : refuser les autres chemins
+        message = await receive()
+        if message['type'] == 'websocket.connect':
+            await send({'type': 'websocket.close'})
+        return
+    return await django_application(scope, receive, send)
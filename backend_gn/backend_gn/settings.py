@@ -429,6 +429,151 @@ UPR_FACE_RECOGNITION_THRESHOLD = float(os.environ.get('UPR_FACE_RECOGNITION_THRE
 # Index de caméra USB par défaut pour la capture UPR
 UPR_CAMERA_INDEX = int(os.environ.get('UPR_CAMERA_INDEX', '0'))
 
+# Alertes multi-caméras : fenêtre (s) pendant laquelle les détections d'un même
+# sujet mettent à jour la notification existante, taille max d'un lot reçu
+UPR_ALERT_COALESCE_SECONDS = int(os.environ.get('UPR_ALERT_COALESCE_SECONDS', '300'))
+UPR_ALERT_BATCH_MAX = int(os.environ.get('UPR_ALERT_BATCH_MAX', '500'))
+# Taille max (Mo) d'un clip vidéo d'alerte envoyé par le service caméra
+UPR_CLIP_MAX_MB = int(os.environ.get('UPR_CLIP_MAX_MB', '50'))
+
+# Flux webcam : réponse réutilisée pour une frame quasi identique (dHash) à une
+# frame récente du même client (voir backend/ia/frame_dedup.py)
+FRAME_DEDUP_ENABLED = os.environ.get('FRAME_DEDUP_ENABLED', 'True') == 'True'
+FRAME_DEDUP_MAX_DISTANCE = int(os.environ.get('FRAME_DEDUP_MAX_DISTANCE', '4'))
+FRAME_DEDUP_TTL_SECONDS = float(os.environ.get('FRAME_DEDUP_TTL_SECONDS', '2.0'))
+FRAME_DEDUP_HISTORY = int(os.environ.get('FRAME_DEDUP_HISTORY', '4'))
+FRAME_DEDUP_MAX_CLIENTS = int(os.environ.get('FRAME_DEDUP_MAX_CLIENTS', '512'))
+
+# Sessions de reconnaissance sur flux (suivi des visages par client) : recherche
+# réutilisée tant que l'embedding reste à moins d'EPSILON (distance cosinus) et
+# depuis moins de MAX_REUSE_SECONDS ; identité confirmée par VOTE_MIN votes sur
+# les VOTE_WINDOW dernières frames (voir backend/ia/stream_sessions.py)
+STREAM_SESSION_ENABLED = os.environ.get('STREAM_SESSION_ENABLED', 'True') == 'True'
+STREAM_SESSION_EPSILON = float(os.environ.get('STREAM_SESSION_EPSILON', '0.05'))
+STREAM_SESSION_MAX_REUSE_SECONDS = float(os.environ.get('STREAM_SESSION_MAX_REUSE_SECONDS', '5.0'))
+STREAM_SESSION_VOTE_WINDOW = int(os.environ.get('STREAM_SESSION_VOTE_WINDOW', '5'))
+STREAM_SESSION_VOTE_MIN = int(os.environ.get('STREAM_SESSION_VOTE_MIN', '3'))
+STREAM_SESSION_TTL_SECONDS = float(os.environ.get('STREAM_SESSION_TTL_SECONDS', '30'))
+STREAM_SESSION_MAX_SESSIONS = int(os.environ.get('STREAM_SESSION_MAX_SESSIONS', '512'))
+
+# Découverte des caméras : tests en parallèle (délai max par scan, threads) et
+# durée de validité de l'inventaire servi par l'API (voir services/camera_discovery.py)
+CAMERA_PROBE_TIMEOUT = float(os.environ.get('CAMERA_PROBE_TIMEOUT', '3.0'))
+CAMERA_DISCOVERY_WORKERS = int(os.environ.get('CAMERA_DISCOVERY_WORKERS', '8'))
+CAMERA_DISCOVERY_TTL = float(os.environ.get('CAMERA_DISCOVERY_TTL', '300'))
+
+# Pool de caméras maintenues ouvertes pour les captures (voir services/camera_pool.py) :
+# libération après inactivité (s), nombre max de caméras ouvertes, âge max d'une frame servie (s)
+CAMERA_POOL_ENABLED = os.environ.get('CAMERA_POOL_ENABLED', 'True') == 'True'
+CAMERA_POOL_IDLE_SECONDS = float(os.environ.get('CAMERA_POOL_IDLE_SECONDS', '60'))
+CAMERA_POOL_MAX_HANDLES = int(os.environ.get('CAMERA_POOL_MAX_HANDLES', '4'))
+CAMERA_POOL_MAX_FRAME_AGE = float(os.environ.get('CAMERA_POOL_MAX_FRAME_AGE', '0.5'))
+
+# Canal WebSocket de reconnaissance temps réel (ws/ia/recognition/, serveur ASGI) :
+# délai d'authentification (s), taille max d'une frame, analyses simultanées par processus
+REALTIME_WS_AUTH_TIMEOUT = float(os.environ.get('REALTIME_WS_AUTH_TIMEOUT', '10'))
+REALTIME_WS_MAX_FRAME_BYTES = int(os.environ.get('REALTIME_WS_MAX_FRAME_BYTES', str(5 * 1024 * 1024)))
+REALTIME_WS_MAX_INFLIGHT = int(os.environ.get('REALTIME_WS_MAX_INFLIGHT', '2'))
+
+# Analyse hors ligne de fichiers vidéo (api/ia/video-analysis/, exécutée par Celery uniquement) : images analysées
+# par seconde de vidéo, seuil d'identification, réduction avant détection, nombre
+# minimal de détections par piste, pas à partir duquel on saute par seek
+VIDEO_ANALYSIS_SAMPLE_FPS = float(os.environ.get('VIDEO_ANALYSIS_SAMPLE_FPS', '2.0'))
+VIDEO_ANALYSIS_THRESHOLD = float(os.environ.get('VIDEO_ANALYSIS_THRESHOLD', '0.5'))
+VIDEO_ANALYSIS_MAX_SIDE = int(os.environ.get('VIDEO_ANALYSIS_MAX_SIDE', '1280'))
+VIDEO_ANALYSIS_MIN_DETECTIONS = int(os.environ.get('VIDEO_ANALYSIS_MIN_DETECTIONS', '2'))
+VIDEO_ANALYSIS_SEEK_MIN_STRIDE = int(os.environ.get('VIDEO_ANALYSIS_SEEK_MIN_STRIDE', '25'))
+VIDEO_ANALYSIS_MAX_UPLOAD_MB = int(os.environ.get('VIDEO_ANALYSIS_MAX_UPLOAD_MB', '2048'))
+
+# Hydratation des fiches des résultats de correspondance (biometrie/hydration.py) :
+# durée de vie (s) et taille du cache par processus, vidé à la modification d'une fiche.
+# Le vidage ne vaut que pour le processus qui enregistre : les autres workers, et tous
+# après un QuerySet.update() (sans signaux), gardent l'ancienne fiche jusqu'au TTL.
+MATCH_HYDRATION_CACHE_TTL = float(os.environ.get('MATCH_HYDRATION_CACHE_TTL', '5'))
+MATCH_HYDRATION_CACHE_SIZE = int(os.environ.get('MATCH_HYDRATION_CACHE_SIZE', '2000'))
+
+# Instantané galerie (api/upr/gallery-snapshot/) : durée de conservation des suppressions
+# renvoyées dans les deltas ; un client plus ancien reçoit un instantané complet
+GALLERY_TOMBSTONE_RETENTION_DAYS = int(os.environ.get('GALLERY_TOMBSTONE_RETENTION_DAYS', '30'))
+
+# ============================================================================
+# CONFIGURATION VERSIONS D'EMBEDDINGS FACIAUX
+# ============================================================================
+# Version (modèle:prétraitement) utilisée tant qu'aucun état n'est enregistré en base.
+# Les changements de modèle passent par `manage.py reembed_gallery --target <version>`.
+FACE_EMBEDDING_VERSION = os.environ.get('FACE_EMBEDDING_VERSION', 'buffalo_l:insightface-v1')
+
+# Taille des lots et pause (secondes) entre lots lors du ré-embedding en arrière-plan
+REEMBEDDING_CHUNK_SIZE = int(os.environ.get('REEMBEDDING_CHUNK_SIZE', '50'))
+REEMBEDDING_PAUSE_SECONDS = float(os.environ.get('REEMBEDDING_PAUSE_SECONDS', '0.5'))
+
+# ============================================================================
+# CONFIGURATION MODÈLES INSIGHTFACE (ONNX)
+# ============================================================================
+# Répertoire racine des packs InsightFace (contient models/<pack>/*.onnx)
+INSIGHTFACE_ROOT = os.environ.get('INSIGHTFACE_ROOT', os.path.expanduser('~/.insightface'))
+
+# Précision des modèles de détection / landmarks : 'fp32' ou 'int8'
+# (pack <modele>_int8 généré par `manage.py quantize_face_models`)
+INSIGHTFACE_MODEL_PRECISION = os.environ.get('INSIGHTFACE_MODEL_PRECISION', 'fp32')
+
+# Budget de threads ONNX Runtime (voir biometrie/onnx_threads.py)
+# Nombre de cœurs partagés par tous les processus d'inférence de l'hôte (défaut: tous)
+ONNX_CPU_BUDGET = int(os.environ['ONNX_CPU_BUDGET']) if os.environ.get('ONNX_CPU_BUDGET') else None
+# Rôle du processus : web, celery, camera (défaut: déduit de la ligne de commande)
+ONNX_PROCESS_ROLE = os.environ.get('ONNX_PROCESS_ROLE') or None
+# Part du budget par rôle et nombre de processus qui se la partagent
+ONNX_ROLE_SHARES = {
+    'web': float(os.environ.get('ONNX_WEB_SHARE', '0.5')),
+    'celery': float(os.environ.get('ONNX_CELERY_SHARE', '0.25')),
+    'camera': float(os.environ.get('ONNX_CAMERA_SHARE', '0.25')),
+}
+ONNX_ROLE_PROCESSES = {
+    'web': int(os.environ.get('WEB_CONCURRENCY', '4')),
+    'celery': int(os.environ.get('CELERY_CONCURRENCY', '2')),
+    'camera': 1,
+}
+# Surcharges explicites par rôle, ex: {'web': {'intra_op_num_threads': 2}}
+ONNX_SESSION_OPTIONS = {}
+# Préchargement gunicorn : True = les workers gardent les sessions mono-thread du maître (poids
+# partagés, budget de threads ignoré), False = sessions rouvertes avec le budget du rôle dans chaque
+# worker (poids privés, RAM x workers). Non défini : partage seulement si ce budget est d'un thread.
+ONNX_PRELOAD_SHARE_SESSIONS = (
+    os.environ['ONNX_PRELOAD_SHARE_SESSIONS'] == 'True' if os.environ.get('ONNX_PRELOAD_SHARE_SESSIONS') else None
+)
+
+# ============================================================================
+# CONFIGURATION EMPREINTES DIGITALES
+# ============================================================================
+# Distance moyenne entre deux crêtes en pixels (images ~500 dpi)
+FINGERPRINT_RIDGE_PERIOD = float(os.environ.get('FINGERPRINT_RIDGE_PERIOD', '9'))
+# Décision : score minimal (2 x minuties appariées / total, 0 à 1) et nombre minimal de minuties appariées.
+# À calibrer avec `manage.py evaluer_empreintes --images <dossier>`
+FINGERPRINT_MATCH_THRESHOLD = float(os.environ.get('FINGERPRINT_MATCH_THRESHOLD', '0.4'))
+FINGERPRINT_MIN_MATCHED = int(os.environ.get('FINGERPRINT_MIN_MATCHED', '10'))
+# Gabarits comparés finement après pré-sélection par l'index de triplets
+FINGERPRINT_SHORTLIST = int(os.environ.get('FINGERPRINT_SHORTLIST', '100'))
+# Rafraîchissement incrémental de l'index en mémoire (s) : empreintes modifiées par les autres processus
+FINGERPRINT_INDEX_REFRESH = float(os.environ.get('FINGERPRINT_INDEX_REFRESH', '60'))
+# Construction de l'index dans le maître gunicorn (partagé par les workers)
+FINGERPRINT_INDEX_PRELOAD = os.environ.get('FINGERPRINT_INDEX_PRELOAD', 'True') == 'True'
+# Import en masse (`manage.py importer_empreintes`) : processus d'extraction (0 = cœurs - 1)
+# et nombre de lignes du manifeste par lot (un bulk_create et un point de reprise par lot)
+FINGERPRINT_IMPORT_WORKERS = int(os.environ.get('FINGERPRINT_IMPORT_WORKERS', '0'))
+FINGERPRINT_IMPORT_CHUNK_SIZE = int(os.environ.get('FINGERPRINT_IMPORT_CHUNK_SIZE', '200'))
+
+# ============================================================================
+# CONFIGURATION PROFILAGE DES PIPELINES BIOMÉTRIQUES
+# ============================================================================
+# Durées par étape (décodage, détection, embedding, BDD...) agrégées en histogrammes
+# par processus, consultables via GET /api/biometrie/profilage/ (voir biometrie/profiling.py)
+BIOMETRIE_PROFILING_ENABLED = os.environ.get('BIOMETRIE_PROFILING_ENABLED', 'True') == 'True'
+# Détail de la requête (?profile=1) accessible à tout utilisateur authentifié, sinon administrateurs seulement
+BIOMETRIE_PROFILING_IN_RESPONSES = os.environ.get('BIOMETRIE_PROFILING_IN_RESPONSES', str(DEBUG)) == 'True'
+# Diagnostic : durée de chaque modèle InsightFace (détection, landmarks, embedding) au lieu
+# d'une seule étape « inference » ; passe par une copie de FaceAnalysis.get, à n'activer que ponctuellement
+BIOMETRIE_PROFILING_PER_MODEL = os.environ.get('BIOMETRIE_PROFILING_PER_MODEL', 'False') == 'True'
+
 # ============================================================================
 # CONFIGURATION HAYSTACK - RECHERCHE AVANCÉE
 # ============================================================================
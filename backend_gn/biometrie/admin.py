@@ -1,5 +1,6 @@
 # pylint: disable=import-error
 from django.contrib import admin
+from django.utils import timezone
 from django.utils.html import format_html
 from .models import Biometrie, BiometriePhoto, BiometrieEmpreinte, BiometriePaume, BiometrieScanResultat, BiometrieHistorique
 
@@ -118,13 +119,14 @@ class BiometriePhotoAdmin(admin.ModelAdmin):
     
     def activer_photos(self, request, queryset):
         """Active les photos sélectionnées"""
-        updated = queryset.update(est_active=True)
+        # update() ne renseigne pas auto_now : horodatage explicite pour les deltas de la galerie
+        updated = queryset.update(est_active=True, date_mise_a_jour=timezone.now())
         self.message_user(request, f'{updated} photo(s) activée(s) avec succès.')
     activer_photos.short_description = "Activer les photos sélectionnées"
     
     def desactiver_photos(self, request, queryset):
         """Désactive les photos sélectionnées"""
-        updated = queryset.update(est_active=False)
+        updated = queryset.update(est_active=False, date_mise_a_jour=timezone.now())
         self.message_user(request, f'{updated} photo(s) désactivée(s) avec succès.')
     desactiver_photos.short_description = "Désactiver les photos sélectionnées"
     
@@ -254,13 +256,14 @@ class BiometrieEmpreinteAdmin(admin.ModelAdmin):
     
     def activer_empreintes(self, request, queryset):
         """Active les empreintes sélectionnées"""
-        updated = queryset.update(est_active=True)
+        # update() ne renseigne pas auto_now : horodatage explicite pour l'index des empreintes
+        updated = queryset.update(est_active=True, date_mise_a_jour=timezone.now())
         self.message_user(request, f'{updated} empreinte(s) activée(s) avec succès.')
     activer_empreintes.short_description = "Activer les empreintes sélectionnées"
     
     def desactiver_empreintes(self, request, queryset):
         """Désactive les empreintes sélectionnées"""
-        updated = queryset.update(est_active=False)
+        updated = queryset.update(est_active=False, date_mise_a_jour=timezone.now())
         self.message_user(request, f'{updated} empreinte(s) désactivée(s) avec succès.')
     desactiver_empreintes.short_description = "Désactiver les empreintes sélectionnées"
 
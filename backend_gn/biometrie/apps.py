@@ -11,7 +11,15 @@ class BiometrieConfig(AppConfig):
         """
         Configuration lors du chargement de l'app
         
-        NOTE: Les signals de reconnaissance faciale ont été supprimés.
+        NOTE: Les signals de reconnaissance faciale ont été supprimés ; seuls
+        restent ceux qui invalident le cache des fiches (biometrie/hydration.py)
+        et ceux qui tracent les suppressions pour les deltas de la galerie
+        (upr/services/gallery_snapshot.py, l'app upr n'a pas d'AppConfig).
         """
-        pass
+        from upr.services.gallery_snapshot import connect_signals as connect_gallery_signals
+
+        from .hydration import connect_signals
+
+        connect_signals()
+        connect_gallery_signals()
 
@@ -25,11 +25,15 @@ from typing import Dict, Iterable, List, Optional, Tuple, Union
 import numpy as np
 from PIL import Image, UnidentifiedImageError
 
+from django.conf import settings
 from django.core.files.base import File
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 from django.db import transaction
 
+from .embedding_versions import active_embedding_version, build_version, parse_version
+from .insightface_loader import create_face_analysis
 from .models import Biometrie, BiometrieHistorique
+from .profiling import current_trace, span
 
 import os
 import warnings
@@ -54,10 +58,21 @@ _GLOBAL_FACE_ANALYSIS_LOCK = threading.Lock()
 _GLOBAL_FACE_ANALYSIS = None
 _GLOBAL_FACE_ANALYSIS_CONFIG: Dict[str, Union[str, Tuple[int, int], int]] = {}
 _GLOBAL_FACE_ANALYSIS_ERROR: Optional[Exception] = None
+# Modèles chargés par nom (plusieurs coexistent pendant une migration d'embeddings)
+_FACE_ANALYSIS_BY_MODEL: Dict[str, object] = {}
 
 _SHARED_SERVICE_LOCK = threading.Lock()
 _SHARED_ARCFACE_SERVICE: Optional["ArcFaceService"] = None
+_SHARED_ARCFACE_SERVICES: Dict[str, "ArcFaceService"] = {}
 _SHARED_ARCFACE_ERROR: Optional[Exception] = None
+# Étape de profilage par tâche InsightFace (FaceAnalysis.models)
+_PROFILING_STAGES = {
+    "detection": "detection",
+    "landmark_2d_106": "landmarks",
+    "landmark_3d_68": "landmarks",
+    "recognition": "embedding",
+    "genderage": "attributs",
+}
 
 
 try:  # pragma: no cover - dépend de l'installation locale
@@ -162,12 +177,20 @@ class ArcFaceService:
     def __init__(
         self,
         *,
-        model_name: str = "buffalo_l",
+        model_name: Optional[str] = None,
+        embedding_version: Optional[str] = None,
         providers: Optional[List[str]] = None,
         ctx_id: int = 0,
         det_size: Tuple[int, int] = (640, 640),
     ) -> None:
+        # Le modèle découle de la version d'embedding active, sauf choix explicite
+        if model_name is None:
+            embedding_version = embedding_version or active_embedding_version()
+            model_name = parse_version(embedding_version)[0]
+        elif embedding_version is None:
+            embedding_version = build_version(model_name)
         self.model_name = model_name
+        self.embedding_version = embedding_version
         self.providers = providers or self._default_providers()
         self.ctx_id = ctx_id
         self.det_size = det_size
@@ -191,32 +214,37 @@ class ArcFaceService:
         if self._model is not None:
             return
 
-        if _GLOBAL_FACE_ANALYSIS is not None:
-            self._model = _GLOBAL_FACE_ANALYSIS
+        cached = _FACE_ANALYSIS_BY_MODEL.get(self.model_name)
+        if cached is not None:
+            self._model = cached
             self._available = True
             self._last_error = None
             return
 
         with _GLOBAL_FACE_ANALYSIS_LOCK:
-            if _GLOBAL_FACE_ANALYSIS is not None:
-                self._model = _GLOBAL_FACE_ANALYSIS
+            cached = _FACE_ANALYSIS_BY_MODEL.get(self.model_name)
+            if cached is not None:
+                self._model = cached
                 self._available = True
                 self._last_error = None
                 return
 
             try:
                 # Force CPU uniquement pour éviter les avertissements CUDA
-                model = FaceAnalysis(name=self.model_name, providers=self.providers)
+                model = create_face_analysis(
+                    self.model_name, providers=self.providers, det_size=self.det_size
+                )
                 ctx_id = -1  # Force CPU (-1) pour éviter tous les avertissements GPU
-                model.prepare(ctx_id=ctx_id, det_size=self.det_size)
-
-                _GLOBAL_FACE_ANALYSIS = model
-                _GLOBAL_FACE_ANALYSIS_CONFIG = {
-                    "model_name": self.model_name,
-                    "providers": tuple(self.providers),
-                    "ctx_id": ctx_id,
-                    "det_size": self.det_size,
-                }
+
+                _FACE_ANALYSIS_BY_MODEL[self.model_name] = model
+                if _GLOBAL_FACE_ANALYSIS is None:
+                    _GLOBAL_FACE_ANALYSIS = model
+                    _GLOBAL_FACE_ANALYSIS_CONFIG = {
+                        "model_name": self.model_name,
+                        "providers": tuple(self.providers),
+                        "ctx_id": ctx_id,
+                        "det_size": self.det_size,
+                    }
                 _GLOBAL_FACE_ANALYSIS_ERROR = None
 
                 logger.info(
@@ -226,15 +254,14 @@ class ArcFaceService:
                     ",".join(self.providers),
                 )
             except Exception as exc:
-                _GLOBAL_FACE_ANALYSIS = None
                 _GLOBAL_FACE_ANALYSIS_ERROR = exc
                 self._model = None
                 self._available = False
                 self._last_error = exc
-                logger.error("Impossible d'initialiser ArcFace : %s", exc)
+                logger.error("Impossible d'initialiser ArcFace (%s) : %s", self.model_name, exc)
                 return
 
-        self._model = _GLOBAL_FACE_ANALYSIS
+        self._model = _FACE_ANALYSIS_BY_MODEL.get(self.model_name)
         self._available = self._model is not None
         if self._available:
             self._last_error = None
@@ -308,12 +335,17 @@ class ArcFaceService:
             reason = self.unavailable_reason or "ArcFace n'est pas disponible. Vérifiez l'installation d'insightface."
             raise RuntimeError(reason)
 
-        frame = self._load_image(image)
+        with span("decodage"):
+            frame = self._load_image(image)
         if frame is None:
             raise ValueError("Impossible de charger l'image fournie.")
 
         try:
-            faces = self._model.get(frame)  # type: ignore[union-attr]
+            if current_trace() is not None and getattr(settings, 'BIOMETRIE_PROFILING_PER_MODEL', False):
+                faces = self._analyse_profiled(frame)
+            else:
+                with span("inference"):
+                    faces = self._model.get(frame)  # type: ignore[union-attr]
         except Exception as exc:  # pragma: no cover - dépend du runtime
             logger.error("Erreur ArcFace lors de la détection des visages: %s", exc)
             self._last_error = exc
@@ -349,6 +381,86 @@ class ArcFaceService:
 
         return results
 
+    def _analyse_profiled(self, frame: np.ndarray) -> list:
+        """Équivalent de ``FaceAnalysis.get`` mesurant chaque modèle séparément.
+
+        Diagnostic uniquement (``BIOMETRIE_PROFILING_PER_MODEL``) : copie du
+        code d'InsightFace, elle ne suit pas ses évolutions.
+        """
+
+        from insightface.app.common import Face
+
+        with span("detection"):
+            bboxes, kpss = self._model.det_model.detect(frame, max_num=0, metric="default")  # type: ignore[union-attr]
+        faces = []
+        for index in range(bboxes.shape[0]):
+            face = Face(
+                bbox=bboxes[index, 0:4],
+                kps=kpss[index] if kpss is not None else None,
+                det_score=bboxes[index, 4],
+            )
+            for taskname, model in self._model.models.items():  # type: ignore[union-attr]
+                if taskname == "detection":
+                    continue
+                with span(_PROFILING_STAGES.get(taskname, taskname)):
+                    model.get(frame, face)
+            faces.append(face)
+        return faces
+
+    def detect_faces(self, frame: np.ndarray) -> List[FaceEncodingResult]:
+        """Détection seule (sans embedding) sur une image BGR.
+
+        Retourne des ``FaceEncodingResult`` dont ``embedding`` est vide et
+        ``landmarks`` contient les 5 points clés utilisés par :meth:`embed_aligned`.
+        """
+
+        if not self.available:
+            raise RuntimeError(self.unavailable_reason or "ArcFace n'est pas disponible.")
+
+        bboxes, kpss = self._model.det_model.detect(frame, max_num=0, metric="default")  # type: ignore[union-attr]
+        results: List[FaceEncodingResult] = []
+        for index in range(bboxes.shape[0]):
+            results.append(
+                FaceEncodingResult(
+                    embedding=np.zeros(0, dtype=np.float32),
+                    bbox=tuple(int(x) for x in bboxes[index, 0:4].tolist()),
+                    confidence=float(bboxes[index, 4]),
+                    landmarks=np.asarray(kpss[index], dtype=np.float32) if kpss is not None else None,
+                )
+            )
+        return results
+
+    def embed_aligned(self, items: Iterable[Tuple[np.ndarray, np.ndarray]], batch_size: int = 32) -> np.ndarray:
+        """Embeddings normalisés de visages déjà détectés, par lots.
+
+        Args:
+            items: Couples ``(image BGR, 5 points clés)`` dans le repère de l'image.
+            batch_size: Visages par inférence du modèle de reconnaissance.
+
+        Returns:
+            Matrice ``(n, dim)`` float32, lignes normalisées L2.
+        """
+
+        from insightface.utils import face_align
+
+        if not self.available:
+            raise RuntimeError(self.unavailable_reason or "ArcFace n'est pas disponible.")
+
+        recognition = self._model.models["recognition"]  # type: ignore[union-attr]
+        size = recognition.input_size[0]
+        aligned = [face_align.norm_crop(image, landmark=kps, image_size=size) for image, kps in items]
+        if not aligned:
+            return np.zeros((0, 512), dtype=np.float32)
+
+        chunks = [
+            np.asarray(recognition.get_feat(aligned[start:start + batch_size]), dtype=np.float32)
+            for start in range(0, len(aligned), batch_size)
+        ]
+        embeddings = np.vstack(chunks)
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+        return embeddings
+
     def save_biometrie_entry(
         self,
         *,
@@ -381,6 +493,7 @@ class ArcFaceService:
                 criminel=criminel,
                 photo=photo,
                 encodage_facial=embedding_list,
+                embedding_version=self.embedding_version,
             )
 
             BiometrieAuditService.enregistrer_action(
@@ -507,27 +620,34 @@ class ArcFaceService:
         return dict(_GLOBAL_FACE_ANALYSIS_CONFIG)
 
 
-def get_shared_arcface_service() -> ArcFaceService:
+def get_shared_arcface_service(embedding_version: Optional[str] = None) -> ArcFaceService:
     """
     Retourne une instance partagée de ``ArcFaceService`` pour éviter de recharger le modèle.
 
+    Args:
+        embedding_version: Version d'embedding dont on veut le modèle
+            (par défaut la version active).
+
     Raises:
         RuntimeError: Si le modèle ne peut pas être initialisé.
     """
 
     global _SHARED_ARCFACE_SERVICE, _SHARED_ARCFACE_ERROR
 
-    if _SHARED_ARCFACE_SERVICE and _SHARED_ARCFACE_SERVICE.available:
-        return _SHARED_ARCFACE_SERVICE
+    version = embedding_version or active_embedding_version()
+    service = _SHARED_ARCFACE_SERVICES.get(version)
+    if service and service.available:
+        return service
 
     with _SHARED_SERVICE_LOCK:
-        if _SHARED_ARCFACE_SERVICE and _SHARED_ARCFACE_SERVICE.available:
-            return _SHARED_ARCFACE_SERVICE
+        service = _SHARED_ARCFACE_SERVICES.get(version)
+        if service and service.available:
+            return service
 
         try:
-            service = ArcFaceService()
+            service = ArcFaceService(embedding_version=version)
         except Exception as exc:  # pragma: no cover - protection runtime
-            _SHARED_ARCFACE_SERVICE = None
+            _SHARED_ARCFACE_SERVICES.pop(version, None)
             _SHARED_ARCFACE_ERROR = exc
             raise
 
@@ -536,11 +656,13 @@ def get_shared_arcface_service() -> ArcFaceService:
                 service.unavailable_reason
                 or "ArcFace n'est pas disponible. Vérifiez l'installation InsightFace."
             )
-            _SHARED_ARCFACE_SERVICE = None
+            _SHARED_ARCFACE_SERVICES.pop(version, None)
             _SHARED_ARCFACE_ERROR = error
             raise error
 
-        _SHARED_ARCFACE_SERVICE = service
+        _SHARED_ARCFACE_SERVICES[version] = service
+        if _SHARED_ARCFACE_SERVICE is None:
+            _SHARED_ARCFACE_SERVICE = service
         _SHARED_ARCFACE_ERROR = None
         return service
 
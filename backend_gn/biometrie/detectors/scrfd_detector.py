@@ -14,6 +14,8 @@ import io
 from django.core.files.base import File
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 
+from ..insightface_loader import create_face_analysis
+
 import os
 import warnings
 
@@ -124,12 +126,7 @@ def _get_scrfd_model() -> Optional[Any]:
                 raise RuntimeError("FaceAnalysis n'est pas disponible")
             
             # SCRFD est intégré dans buffalo_l via le module 'detection'
-            model = FaceAnalysis(
-                name="buffalo_l",
-                allowed_modules=['detection'],
-                providers=['CPUExecutionProvider']
-            )
-            model.prepare(ctx_id=-1, det_size=(640, 640))
+            model = create_face_analysis("buffalo_l", allowed_modules=['detection'])
             
             _SCRFD_MODEL = model
             _SCRFD_ERROR = None
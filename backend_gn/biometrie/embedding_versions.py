@@ -0,0 +1,330 @@
+"""Versionnement des embeddings faciaux.
+
+Chaque vecteur stocké est étiqueté avec la version du modèle et du
+prétraitement qui l'a produit (ex: ``buffalo_l:insightface-v1``). Deux
+embeddings de versions différentes ne sont pas comparables : la recherche ne
+compare donc une ligne qu'avec l'embedding requête calculé par le même modèle.
+
+Pendant une migration (``version_cible`` renseignée), la recherche interroge
+les deux versions et fusionne les résultats ; la bascule finale est atomique
+(voir :func:`cutover_embedding_version`).
+
+Ce module n'importe pas les modèles au chargement : ``biometrie.models`` s'en
+sert comme valeur par défaut des champs ``embedding_version``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+LEGACY_EMBEDDING_VERSION = "buffalo_l:insightface-v1"
+DEFAULT_PREPROCESSING = "insightface-v1"
+# Prétraitements implémentés par l'encodage (arcface_service, embeddings.arcface)
+SUPPORTED_PREPROCESSING = (DEFAULT_PREPROCESSING,)
+
+# Durée pendant laquelle l'état lu en base est réutilisé par le processus
+_STATE_CACHE_TTL_SECONDS = 5.0
+_STATE_CACHE_LOCK = threading.Lock()
+_STATE_CACHE: Dict[str, Any] = {"expires_at": 0.0, "value": None}
+
+
+def build_version(model_name: str, preprocessing: str = DEFAULT_PREPROCESSING) -> str:
+    return f"{model_name}:{preprocessing}"
+
+
+def parse_version(version: str) -> Tuple[str, str]:
+    """Retourne ``(model_name, preprocessing)`` pour une étiquette de version."""
+
+    model_name, _, preprocessing = (version or LEGACY_EMBEDDING_VERSION).partition(":")
+    return model_name or "buffalo_l", preprocessing or DEFAULT_PREPROCESSING
+
+
+def check_target_version(target_version: str, active_version: str) -> None:
+    """Refuse une cible que l'encodage ne distinguerait pas de la version active.
+
+    Seul le modèle est choisi d'après la version : une cible qui ne change que
+    le prétraitement lancerait un ré-embedding et une recherche double-version
+    produisant exactement les mêmes vecteurs.
+    """
+
+    model_name, preprocessing = parse_version(target_version)
+    if preprocessing not in SUPPORTED_PREPROCESSING:
+        raise ValueError(
+            f"Prétraitement {preprocessing} non pris en charge "
+            f"(disponibles: {', '.join(SUPPORTED_PREPROCESSING)})."
+        )
+    if target_version != active_version and model_name == parse_version(active_version)[0]:
+        raise ValueError(
+            f"La version {target_version} ne diffère de {active_version} que par le prétraitement."
+        )
+
+
+def configured_embedding_version() -> str:
+    """Version déclarée dans les settings (utilisée tant qu'aucun état n'existe en base)."""
+
+    try:
+        from django.conf import settings
+
+        return getattr(settings, "FACE_EMBEDDING_VERSION", LEGACY_EMBEDDING_VERSION)
+    except Exception:  # pragma: no cover - settings non configurés
+        return LEGACY_EMBEDDING_VERSION
+
+
+def _load_state() -> Tuple[str, Optional[str]]:
+    from django.db.utils import OperationalError, ProgrammingError
+
+    from .models import EmbeddingVersionState
+
+    try:
+        state = EmbeddingVersionState.objects.filter(pk=1).first()
+    except (ProgrammingError, OperationalError) as exc:
+        logger.debug("État des versions d'embedding indisponible: %s", exc)
+        state = None
+
+    if state is None:
+        return configured_embedding_version(), None
+    return state.version_active, state.version_cible or None
+
+
+def get_version_state(*, refresh: bool = False) -> Tuple[str, Optional[str]]:
+    """Retourne ``(version_active, version_cible)`` avec un cache court par processus."""
+
+    now = time.monotonic()
+    cached = _STATE_CACHE["value"]
+    if not refresh and cached is not None and now < _STATE_CACHE["expires_at"]:
+        return cached
+
+    with _STATE_CACHE_LOCK:
+        cached = _STATE_CACHE["value"]
+        if not refresh and cached is not None and now < _STATE_CACHE["expires_at"]:
+            return cached
+        try:
+            value = _load_state()
+        except Exception as exc:  # pragma: no cover - base indisponible
+            logger.warning("Lecture de l'état des versions d'embedding impossible: %s", exc)
+            value = (configured_embedding_version(), None)
+        _STATE_CACHE["value"] = value
+        _STATE_CACHE["expires_at"] = now + _STATE_CACHE_TTL_SECONDS
+        return value
+
+
+def invalidate_version_cache() -> None:
+    with _STATE_CACHE_LOCK:
+        _STATE_CACHE["value"] = None
+        _STATE_CACHE["expires_at"] = 0.0
+
+
+def active_embedding_version() -> str:
+    """Version utilisée pour les nouveaux embeddings (valeur par défaut des champs)."""
+
+    return get_version_state()[0]
+
+
+def search_embedding_versions() -> Tuple[str, ...]:
+    """Versions à interroger : l'active, plus la cible pendant une migration."""
+
+    active, target = get_version_state()
+    if target and target != active:
+        return (active, target)
+    return (active,)
+
+
+def start_embedding_migration(target_version: str) -> None:
+    """Déclare ``target_version`` comme cible : la recherche devient double-version."""
+
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import EmbeddingVersionState
+
+    with transaction.atomic():
+        state = EmbeddingVersionState.objects.select_for_update().filter(pk=1).first()
+        if state is None:
+            state = EmbeddingVersionState(pk=1, version_active=configured_embedding_version())
+        if state.version_active == target_version:
+            raise ValueError(f"La version {target_version} est déjà active.")
+        check_target_version(target_version, state.version_active)
+        if state.version_cible and state.version_cible != target_version:
+            raise ValueError(
+                f"Une migration vers {state.version_cible} est déjà en cours."
+            )
+        if state.version_cible != target_version:
+            state.version_cible = target_version
+            state.migration_demarree_le = timezone.now()
+            state.progression = {}
+        state.save()
+
+    invalidate_version_cache()
+    logger.info("Migration des embeddings démarrée vers %s", target_version)
+
+
+def record_migration_progress(progression: Dict[str, Any]) -> None:
+    from .models import EmbeddingVersionState
+
+    EmbeddingVersionState.objects.filter(pk=1).update(progression=progression)
+
+
+def cutover_embedding_version(target_version: str, *, remaining: int = 0, force: bool = False) -> None:
+    """Bascule atomiquement la version active vers ``target_version``.
+
+    Refuse la bascule s'il reste des vecteurs non migrés, sauf ``force=True``
+    (ces vecteurs restent étiquetés avec l'ancienne version et ne sont plus
+    interrogés).
+    """
+
+    from django.db import transaction
+    from django.utils import timezone
+
+    from .models import EmbeddingVersionState
+
+    if remaining and not force:
+        raise ValueError(
+            f"{remaining} embedding(s) restent à migrer vers {target_version}."
+        )
+
+    with transaction.atomic():
+        state = EmbeddingVersionState.objects.select_for_update().get(pk=1)
+        if state.version_cible != target_version:
+            raise ValueError(
+                f"Aucune migration en cours vers {target_version} (cible: {state.version_cible or 'aucune'})."
+            )
+        state.version_active = target_version
+        state.version_cible = None
+        state.bascule_le = timezone.now()
+        state.save()
+
+    invalidate_version_cache()
+    logger.info("Bascule des embeddings effectuée vers %s", target_version)
+
+
+def get_arcface_for_version(version: str):
+    """Service ArcFace partagé pour le modèle d'une version donnée."""
+
+    from .arcface_service import get_shared_arcface_service
+
+    return get_shared_arcface_service(embedding_version=version)
+
+
+def _bbox_area(face: Any) -> float:
+    x1, y1, x2, y2 = face.bbox[:4]
+    return max(0.0, x2 - x1) * max(0.0, y2 - y1)
+
+
+def _bbox_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    if inter <= 0:
+        return 0.0
+    area_a = max(0.0, a[2] - a[0]) * max(0.0, a[3] - a[1])
+    area_b = max(0.0, b[2] - b[0]) * max(0.0, b[3] - b[1])
+    return inter / (area_a + area_b - inter + 1e-12)
+
+
+class VersionedQuery:
+    """Embeddings requête d'un même visage, un par version de modèle."""
+
+    def __init__(self, embeddings: Dict[str, Any]) -> None:
+        self._vectors: Dict[str, np.ndarray] = {}
+        for version, embedding in embeddings.items():
+            if embedding is None:
+                continue
+            vector = np.asarray(embedding, dtype=np.float32).reshape(-1)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector = vector / norm
+            self._vectors[version] = vector
+
+    @property
+    def versions(self) -> Tuple[str, ...]:
+        return tuple(self._vectors)
+
+    def covers(self, version: str) -> bool:
+        return version in self._vectors
+
+    def for_version(self, version: str) -> Optional[np.ndarray]:
+        return self._vectors.get(version)
+
+    def similarities(self, matrix: np.ndarray, row_versions: Sequence[str]) -> np.ndarray:
+        """Similarité cosinus de chaque ligne (normalisée) avec la requête de sa version.
+
+        Les lignes dont la version n'est pas couverte valent -1.0 (jamais retenues).
+        """
+
+        result = np.full(matrix.shape[0], -1.0, dtype=np.float32)
+        versions = np.asarray(row_versions)
+        for version, vector in self._vectors.items():
+            mask = versions == version
+            if mask.any() and matrix.shape[1] == vector.shape[0]:
+                result[mask] = matrix[mask] @ vector
+        return result
+
+    @classmethod
+    def build(
+        cls,
+        *,
+        image: Any,
+        primary_version: str,
+        faces: Sequence[Any],
+        versions: Optional[Iterable[str]] = None,
+    ) -> List["VersionedQuery"]:
+        """Construit une requête versionnée par visage déjà encodé.
+
+        ``faces`` sont les ``FaceEncodingResult`` produits par le modèle de
+        ``primary_version``. Pour chaque autre version interrogée, l'image est
+        ré-encodée avec le modèle correspondant et chaque visage est apparié
+        par recouvrement de bbox.
+        """
+
+        queries = [{primary_version: face.embedding} for face in faces]
+        for version in versions or search_embedding_versions():
+            if version == primary_version:
+                continue
+            try:
+                other_faces = get_arcface_for_version(version).encode_faces(image=image)
+            except Exception as exc:
+                logger.warning("Encodage requête impossible pour la version %s: %s", version, exc)
+                continue
+            # Les visages sans bbox ne peuvent pas être appariés : ils sont écartés
+            other_faces = [other for other in other_faces if other.bbox is not None]
+            for query, face in zip(queries, faces):
+                if face.bbox is None:
+                    # Sans bbox de référence, retenir le plus grand visage détecté
+                    best = max(other_faces, key=_bbox_area, default=None)
+                    if best is not None:
+                        query[version] = best.embedding
+                    continue
+                best = max(
+                    other_faces,
+                    key=lambda other: _bbox_iou(face.bbox, other.bbox),
+                    default=None,
+                )
+                if best is not None and _bbox_iou(face.bbox, best.bbox) > 0.3:
+                    query[version] = best.embedding
+        return [cls(query) for query in queries]
+
+
+__all__ = [
+    "LEGACY_EMBEDDING_VERSION",
+    "SUPPORTED_PREPROCESSING",
+    "VersionedQuery",
+    "active_embedding_version",
+    "build_version",
+    "check_target_version",
+    "configured_embedding_version",
+    "cutover_embedding_version",
+    "get_arcface_for_version",
+    "get_version_state",
+    "invalidate_version_cache",
+    "parse_version",
+    "record_migration_progress",
+    "search_embedding_versions",
+    "start_embedding_migration",
+]
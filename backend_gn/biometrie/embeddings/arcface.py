@@ -1,7 +1,8 @@
 """Génération d'embeddings ArcFace (512 dimensions).
 
-Ce module utilise InsightFace (buffalo_l) pour générer des embeddings faciaux
-normalisés de 512 dimensions.
+Ce module utilise InsightFace (buffalo_l par défaut) pour générer des embeddings
+faciaux normalisés de 512 dimensions. Le modèle suit la version d'embedding
+active (voir ``biometrie.embedding_versions``).
 """
 
 import logging
@@ -14,6 +15,9 @@ import io
 from django.core.files.base import File
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 
+from ..embedding_versions import active_embedding_version, parse_version
+from ..insightface_loader import create_face_analysis
+
 import os
 import warnings
 
@@ -28,9 +32,9 @@ logger = logging.getLogger(__name__)
 logging.getLogger("insightface").setLevel(logging.WARNING)
 logging.getLogger("onnxruntime").setLevel(logging.ERROR)
 
-# Variables globales pour le modèle FaceAnalysis
+# Variables globales pour les modèles FaceAnalysis (un par nom de modèle)
 _ARCFACE_LOCK = threading.Lock()
-_ARCFACE_MODEL = None
+_ARCFACE_MODELS: Dict[str, Any] = {}
 _ARCFACE_ERROR: Optional[Exception] = None
 
 try:
@@ -104,12 +108,13 @@ def _load_image(image: UploadedImage) -> Optional[np.ndarray]:
     raise TypeError("Type d'image non supporté pour ArcFace")
 
 
-def _get_arcface_model() -> Optional[Any]:
+def _get_arcface_model(model_name: str = "buffalo_l") -> Optional[Any]:
     """Obtient ou initialise le modèle FaceAnalysis global avec ArcFace."""
-    global _ARCFACE_MODEL, _ARCFACE_ERROR
+    global _ARCFACE_ERROR
 
-    if _ARCFACE_MODEL is not None:
-        return _ARCFACE_MODEL
+    model = _ARCFACE_MODELS.get(model_name)
+    if model is not None:
+        return model
 
     if not _INSIGHTFACE_AVAILABLE:
         _ARCFACE_ERROR = _INSIGHTFACE_IMPORT_ERROR if '_INSIGHTFACE_IMPORT_ERROR' in globals() else None
@@ -117,39 +122,38 @@ def _get_arcface_model() -> Optional[Any]:
         return None
 
     with _ARCFACE_LOCK:
-        if _ARCFACE_MODEL is not None:
-            return _ARCFACE_MODEL
+        model = _ARCFACE_MODELS.get(model_name)
+        if model is not None:
+            return model
 
         try:
             if not _INSIGHTFACE_AVAILABLE or FaceAnalysis is None:
                 raise RuntimeError("FaceAnalysis n'est pas disponible")
             
-            # ArcFace embedding est intégré dans buffalo_l
-            model = FaceAnalysis(
-                name="buffalo_l",
+            # ArcFace embedding est intégré dans le pack InsightFace (buffalo_l par défaut)
+            model = create_face_analysis(
+                model_name,
                 allowed_modules=['detection', 'recognition'],
-                providers=['CPUExecutionProvider']
             )
-            model.prepare(ctx_id=-1, det_size=(640, 640))
             
-            _ARCFACE_MODEL = model
+            _ARCFACE_MODELS[model_name] = model
             _ARCFACE_ERROR = None
             
-            logger.info("Modèle ArcFace (512-d embeddings) initialisé avec succès (CPU)")
+            logger.info("Modèle ArcFace %s (512-d embeddings) initialisé avec succès (CPU)", model_name)
         except Exception as exc:
-            _ARCFACE_MODEL = None
             _ARCFACE_ERROR = exc
             logger.error("Impossible d'initialiser ArcFace: %s", exc)
             return None
 
-    return _ARCFACE_MODEL
+    return model
 
 
-def generate_embedding(image: UploadedImage) -> Dict[str, Any]:
+def generate_embedding(image: UploadedImage, embedding_version: Optional[str] = None) -> Dict[str, Any]:
     """Génère un embedding ArcFace de 512 dimensions.
     
     Args:
         image: Source de l'image (chemin, bytes, UploadedFile, ndarray, etc.).
+        embedding_version: Version d'embedding à produire (défaut: version active).
     
     Returns:
         Dict contenant:
@@ -157,13 +161,15 @@ def generate_embedding(image: UploadedImage) -> Dict[str, Any]:
             - embedding (List[float]): Vecteur d'embedding de 512 dimensions
             - bbox (List[int]): Boîte englobante [x1, y1, x2, y2] (optionnel)
             - confidence (float): Score de confiance de détection (optionnel)
+            - embedding_version (str): Version du modèle ayant produit l'embedding
             - error (str): Message d'erreur si success=False
     
     Raises:
         ValueError: Si l'image ne peut pas être chargée.
         RuntimeError: Si ArcFace n'est pas disponible.
     """
-    model = _get_arcface_model()
+    embedding_version = embedding_version or active_embedding_version()
+    model = _get_arcface_model(parse_version(embedding_version)[0])
     
     if model is None:
         error_msg = "ArcFace n'est pas disponible. Vérifiez l'installation d'insightface."
@@ -223,6 +229,7 @@ def generate_embedding(image: UploadedImage) -> Dict[str, Any]:
         "success": True,
         "embedding": embedding_list,
         "bbox": bbox,
-        "confidence": confidence
+        "confidence": confidence,
+        "embedding_version": embedding_version,
     }
 
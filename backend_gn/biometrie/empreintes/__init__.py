@@ -0,0 +1 @@
+"""Empreintes digitales : extraction des minuties, gabarits, comparaison et index 1:N."""
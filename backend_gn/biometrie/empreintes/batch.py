@@ -0,0 +1,35 @@
+"""
+Extraction de gabarits dans un pool de processus (imports en masse).
+
+Fonctions de niveau module, sans dépendance à Django : elles sont
+sérialisées vers les processus du pool, quel que soit le mode de démarrage.
+"""
+
+import json
+from typing import Any, Dict, Tuple
+
+import cv2
+
+from .extraction import extract_features
+from .template import template_to_text
+
+
+def init_worker() -> None:
+    """Un thread OpenCV par processus : le parallélisme vient du pool."""
+    cv2.setNumThreads(1)
+
+
+def extract_template(task: Tuple[int, bytes, float]) -> Dict[str, Any]:
+    """``(ligne, octets de l'image, période des crêtes)`` → champs du gabarit ou erreur."""
+    row, data, ridge_period = task
+    try:
+        features = extract_features(data, ridge_period=ridge_period)
+    except Exception as exc:
+        return {'ligne': row, 'erreur': str(exc) or exc.__class__.__name__}
+    return {
+        'ligne': row,
+        'encodage_empreinte': template_to_text(features),
+        'minuties': json.dumps(features.to_json()),
+        'nombre_minuties': features.count,
+        'qualite': features.quality,
+    }
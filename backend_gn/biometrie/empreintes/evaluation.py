@@ -0,0 +1,185 @@
+"""
+Banc d'essai de la chaîne empreintes sur un jeu local d'images.
+
+Les fichiers suivent la convention des bases FVC : ``<doigt>_<impression>.<ext>``
+(ex. ``101_1.tif``, ``101_2.tif``). Le banc mesure :
+
+- vérification 1:1 : scores authentiques (impressions d'un même doigt) et
+  imposteurs (premières impressions de doigts différents), EER, taux de
+  fausses acceptations / faux rejets au seuil configuré ;
+- identification 1:N : première impression de chaque doigt enrôlée (plus
+  ``filler`` gabarits aléatoires pour simuler une grande base), les autres
+  impressions servent de sondes : taux de rang 1 et temps de recherche.
+"""
+
+import os
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .extraction import extract_features
+from .index import FingerprintIndex
+from .matching import MatchParams, build_pairs, match_pairs
+
+IMAGE_EXTENSIONS = ('.bmp', '.jpeg', '.jpg', '.png', '.tif', '.tiff')
+
+
+@dataclass
+class FingerprintEvaluation:
+    doigts: int = 0
+    images: int = 0
+    echecs_extraction: int = 0
+    minuties_moyennes: float = 0.0
+    extraction_ms: float = 0.0
+    comparaison_ms: float = 0.0
+    authentiques: int = 0
+    imposteurs: int = 0
+    eer: Optional[float] = None
+    seuil_eer: Optional[float] = None
+    seuil: float = 0.0
+    taux_fausses_acceptations: Optional[float] = None
+    taux_faux_rejets: Optional[float] = None
+    gabarits_indexes: int = 0
+    sondes: int = 0
+    rang1: Optional[float] = None
+    recherche_ms: Dict[str, float] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def load_sample_set(directory: str) -> Dict[str, List[str]]:
+    """Images regroupées par doigt (préfixe avant le dernier ``_``), triées par impression."""
+    if not os.path.isdir(directory):
+        raise ValueError(f"Dossier introuvable: {directory}")
+    groups: Dict[str, List[str]] = defaultdict(list)
+    for name in sorted(os.listdir(directory)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTENSIONS or '_' not in stem:
+            continue
+        groups[stem.rsplit('_', 1)[0]].append(os.path.join(directory, name))
+    return {finger: paths for finger, paths in groups.items() if len(paths) >= 2}
+
+
+def _random_templates(count: int, reference: List[np.ndarray], seed: int):
+    """Gabarits aléatoires de taille et d'étendue comparables aux gabarits réels."""
+    rng = np.random.default_rng(seed)
+    sizes = [len(m) for m in reference if len(m)] or [35]
+    stacked = np.vstack([m for m in reference if len(m)]) if any(len(m) for m in reference) else None
+    low = stacked[:, :2].min(axis=0) if stacked is not None else np.array([40.0, 40.0])
+    high = stacked[:, :2].max(axis=0) if stacked is not None else np.array([360.0, 360.0])
+    for _ in range(count):
+        n = int(rng.choice(sizes))
+        yield np.stack([
+            rng.uniform(low[0], high[0], n),
+            rng.uniform(low[1], high[1], n),
+            rng.uniform(0, 2 * np.pi, n),
+            rng.choice([1, 3], n),
+        ], axis=1).astype(np.float32)
+
+
+def _rates(genuine: np.ndarray, impostor: np.ndarray, threshold: float):
+    false_reject = float((genuine < threshold).mean()) if len(genuine) else None
+    false_accept = float((impostor >= threshold).mean()) if len(impostor) else None
+    return false_accept, false_reject
+
+
+def evaluate_fingerprint_set(
+    directory: str,
+    *,
+    threshold: float,
+    min_matched: int,
+    ridge_period: float = 9.0,
+    filler: int = 0,
+    limit: Optional[int] = None,
+    seed: int = 0,
+) -> FingerprintEvaluation:
+    """
+    Raises:
+        ValueError: Dossier introuvable ou sans doigt ayant au moins deux impressions.
+    """
+    groups = load_sample_set(directory)
+    if limit:
+        groups = dict(list(groups.items())[:limit])
+    if not groups:
+        raise ValueError("Aucun doigt avec au moins deux impressions (<doigt>_<impression>.<ext>)")
+
+    report = FingerprintEvaluation(doigts=len(groups), seuil=threshold)
+    params = MatchParams()
+    templates: Dict[str, List[np.ndarray]] = {}
+    extraction_times = []
+    for finger, paths in groups.items():
+        for path in paths:
+            report.images += 1
+            started = time.perf_counter()
+            try:
+                features = extract_features(path, ridge_period=ridge_period)
+            except ValueError:
+                report.echecs_extraction += 1
+                continue
+            extraction_times.append((time.perf_counter() - started) * 1000)
+            templates.setdefault(finger, []).append(features.minutiae)
+    templates = {finger: items for finger, items in templates.items() if len(items) >= 2}
+    if extraction_times:
+        report.extraction_ms = round(float(np.mean(extraction_times)), 1)
+    all_templates = [m for items in templates.values() for m in items]
+    report.minuties_moyennes = round(float(np.mean([len(m) for m in all_templates])), 1) if all_templates else 0.0
+
+    def score(probe, reference):
+        result = match_pairs(build_pairs(probe, params.neighbours), build_pairs(reference, params.neighbours), params)
+        return result.score if result.matched >= min_matched else 0.0
+
+    started = time.perf_counter()
+    genuine, impostor = [], []
+    for items in templates.values():
+        for i in range(len(items)):
+            for j in range(i + 1, len(items)):
+                genuine.append(score(items[i], items[j]))
+    firsts = [items[0] for items in templates.values()]
+    for i in range(len(firsts)):
+        for j in range(i + 1, len(firsts)):
+            impostor.append(score(firsts[i], firsts[j]))
+    comparisons = len(genuine) + len(impostor)
+    if comparisons:
+        report.comparaison_ms = round((time.perf_counter() - started) * 1000 / comparisons, 2)
+    genuine_arr, impostor_arr = np.array(genuine), np.array(impostor)
+    report.authentiques, report.imposteurs = len(genuine), len(impostor)
+
+    if len(genuine) and len(impostor):
+        grid = np.linspace(0.0, 1.0, 201)
+        rates = np.array([_rates(genuine_arr, impostor_arr, t) for t in grid])
+        best = int(np.argmin(np.abs(rates[:, 0] - rates[:, 1])))
+        report.eer = round(float(rates[best].mean()), 4)
+        report.seuil_eer = round(float(grid[best]), 3)
+    fmr, fnmr = _rates(genuine_arr, impostor_arr, threshold)
+    report.taux_fausses_acceptations = round(fmr, 4) if fmr is not None else None
+    report.taux_faux_rejets = round(fnmr, 4) if fnmr is not None else None
+
+    index = FingerprintIndex(params=params)
+    fingers = list(templates)
+    index.add_many(((i, None, finger, templates[finger][0]) for i, finger in enumerate(fingers)), merge=False)
+    index.add_many(
+        ((len(fingers) + k, None, '', m) for k, m in enumerate(_random_templates(filler, firsts, seed))),
+        merge=False,
+    )
+    index.merge()
+    report.gabarits_indexes = len(index)
+
+    hits_rank1, times = 0, []
+    for i, finger in enumerate(fingers):
+        for probe in templates[finger][1:]:
+            hits, stats = index.search(probe, top_k=1, threshold=threshold, min_matched=min_matched)
+            times.append(stats['total_ms'])
+            hits_rank1 += bool(hits) and hits[0].empreinte_id == i
+    report.sondes = len(times)
+    if times:
+        report.rang1 = round(hits_rank1 / len(times), 4)
+        report.recherche_ms = {
+            'mediane': round(float(np.median(times)), 1),
+            'p95': round(float(np.percentile(times, 95)), 1),
+            'max': round(float(np.max(times)), 1),
+        }
+    return report
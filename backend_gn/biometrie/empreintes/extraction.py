@@ -0,0 +1,225 @@
+"""
+Extraction des minuties d'une empreinte digitale (CPU, OpenCV + scikit-image).
+
+Chaîne de traitement :
+
+1. normalisation (moyenne / variance) et segmentation de la zone utile
+   (écart-type local) ;
+2. champ d'orientation des crêtes (gradients lissés en angle double) ;
+3. renforcement par un banc de filtres de Gabor orientés : chaque pixel
+   garde la réponse du filtre aligné sur l'orientation locale ;
+4. binarisation (signe de la réponse) puis squelettisation ;
+5. minuties par « crossing number » (1 = terminaison, 3 = bifurcation), hors
+   bord de la zone utile ; les minuties trop proches les unes des autres
+   (ponts, crêtes cassées, ébarbures) sont écartées.
+
+La période des crêtes (``ridge_period``, en pixels) suppose des images
+d'environ 500 dpi ; les images beaucoup plus grandes sont réduites.
+"""
+
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, List, Union
+
+import cv2
+import numpy as np
+from skimage.morphology import skeletonize
+
+logger = logging.getLogger(__name__)
+
+TERMINAISON = 1
+BIFURCATION = 3
+TYPE_LABELS = {TERMINAISON: 'terminaison', BIFURCATION: 'bifurcation'}
+
+# Voisins d'un pixel dans l'ordre circulaire (crossing number)
+_NEIGHBOURS = [(-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1)]
+
+
+@dataclass
+class FingerprintFeatures:
+    """Minuties d'une empreinte : tableau (n, 4) float32 ``x, y, angle (rad), type``."""
+
+    minutiae: np.ndarray
+    quality: int
+    width: int
+    height: int
+
+    @property
+    def count(self) -> int:
+        return int(len(self.minutiae))
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        """Minuties lisibles (champ ``minuties`` du modèle)."""
+        return [
+            {
+                'x': int(round(x)),
+                'y': int(round(y)),
+                'angle': round(float(np.degrees(angle)) % 360.0, 1),
+                'type': TYPE_LABELS.get(int(kind), 'inconnu'),
+            }
+            for x, y, angle, kind in self.minutiae.tolist()
+        ]
+
+
+def load_grayscale(source: Union[np.ndarray, bytes, str, Any]) -> np.ndarray:
+    """Image en niveaux de gris depuis un tableau, des octets, un chemin ou un fichier Django."""
+    if isinstance(source, np.ndarray):
+        image = source
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        return image
+    if isinstance(source, str):
+        image = cv2.imread(source, cv2.IMREAD_GRAYSCALE)
+    else:
+        if hasattr(source, 'read'):
+            if hasattr(source, 'seek'):
+                source.seek(0)
+            data = source.read()
+            if hasattr(source, 'seek'):
+                source.seek(0)
+        else:
+            data = source
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError("Image d'empreinte illisible")
+    return image
+
+
+def _normalize(image: np.ndarray) -> np.ndarray:
+    image = image.astype(np.float32)
+    return (image - image.mean()) / (image.std() + 1e-6)
+
+
+def _segment(norm: np.ndarray, block: int, threshold: float) -> np.ndarray:
+    """Zone utile : écart-type local suffisant, lissée morphologiquement."""
+    mean = cv2.blur(norm, (block, block))
+    sq_mean = cv2.blur(norm * norm, (block, block))
+    std = np.sqrt(np.maximum(sq_mean - mean * mean, 0.0))
+    mask = (std > threshold).astype(np.uint8)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (block, block))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    return mask.astype(bool)
+
+
+def _orientation(norm: np.ndarray, sigma: float):
+    """Direction de la normale aux crêtes ([0, π)) et cohérence ([0, 1])."""
+    gx = cv2.Sobel(norm, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(norm, cv2.CV_32F, 0, 1, ksize=3)
+    gxx = cv2.GaussianBlur(gx * gx, (0, 0), sigma)
+    gyy = cv2.GaussianBlur(gy * gy, (0, 0), sigma)
+    gxy = cv2.GaussianBlur(gx * gy, (0, 0), sigma)
+    sin2 = cv2.GaussianBlur(2.0 * gxy, (0, 0), sigma)
+    cos2 = cv2.GaussianBlur(gxx - gyy, (0, 0), sigma)
+    normal = (0.5 * np.arctan2(sin2, cos2)) % np.pi
+    coherence = np.sqrt(sin2 * sin2 + cos2 * cos2) / (gxx + gyy + 1e-6)
+    return normal, np.clip(coherence, 0.0, 1.0)
+
+
+def _gabor_enhance(norm: np.ndarray, normal: np.ndarray, period: float, orientations: int) -> np.ndarray:
+    """Réponse du filtre de Gabor aligné sur l'orientation locale (positive dans les vallées)."""
+    sigma = 0.5 * period
+    ksize = int(2 * np.ceil(3 * sigma) + 1)
+    responses = np.empty((orientations,) + norm.shape, dtype=np.float32)
+    for k in range(orientations):
+        theta = k * np.pi / orientations
+        kernel = cv2.getGaborKernel((ksize, ksize), sigma, theta, period, 1.0, 0, ktype=cv2.CV_32F)
+        kernel -= kernel.mean()
+        responses[k] = cv2.filter2D(norm, cv2.CV_32F, kernel)
+    index = np.rint(normal / (np.pi / orientations)).astype(np.int64) % orientations
+    return np.take_along_axis(responses, index[None], axis=0)[0]
+
+
+def _crossing_number(skeleton: np.ndarray) -> np.ndarray:
+    h, w = skeleton.shape
+    padded = np.pad(skeleton.astype(np.int8), 1)
+    neighbours = [padded[1 + dy:1 + dy + h, 1 + dx:1 + dx + w] for dy, dx in _NEIGHBOURS]
+    total = np.zeros((h, w), dtype=np.int8)
+    for i in range(8):
+        total += np.abs(neighbours[i] - neighbours[(i + 1) % 8])
+    return total // 2
+
+
+def _remove_close(points: np.ndarray, min_distance: float) -> np.ndarray:
+    """Écarte toute minutie ayant une voisine à moins de ``min_distance`` pixels."""
+    if len(points) < 2:
+        return np.ones(len(points), dtype=bool)
+    diff = points[:, None, :] - points[None, :, :]
+    dist = np.sqrt((diff ** 2).sum(axis=-1))
+    np.fill_diagonal(dist, np.inf)
+    return dist.min(axis=1) >= min_distance
+
+
+def extract_features(
+    source: Union[np.ndarray, bytes, str, Any],
+    *,
+    ridge_period: float = 9.0,
+    max_side: int = 800,
+    max_minutiae: int = 80,
+    orientations: int = 16,
+) -> FingerprintFeatures:
+    """
+    Extrait les minuties d'une image d'empreinte.
+
+    Args:
+        source: Image (tableau BGR/gris, octets encodés, chemin ou fichier).
+        ridge_period: Distance moyenne entre deux crêtes (pixels).
+        max_side: Côté maximal ; au-delà l'image est réduite.
+        max_minutiae: Nombre maximal de minuties conservées (les plus fiables).
+
+    Raises:
+        ValueError: Image illisible ou vide.
+    """
+    image = load_grayscale(source)
+    if image.size == 0:
+        raise ValueError("Image d'empreinte vide")
+    scale = max_side / max(image.shape[:2])
+    if scale < 1.0:
+        image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    height, width = image.shape[:2]
+
+    block = max(8, int(round(ridge_period * 1.8)))
+    norm = _normalize(image)
+    mask = _segment(norm, block, threshold=0.3)
+    normal, coherence = _orientation(norm, sigma=ridge_period * 0.7)
+    enhanced = _gabor_enhance(norm, normal, ridge_period, orientations)
+
+    ridges = (enhanced < 0) & mask
+    skeleton = skeletonize(ridges)
+    cn = _crossing_number(skeleton)
+
+    # Bord de la zone utile exclu (fausses terminaisons)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * block + 1, 2 * block + 1))
+    inner = cv2.erode(mask.astype(np.uint8), kernel).astype(bool)
+    candidates = skeleton & inner & ((cn == 1) | (cn == 3))
+    ys, xs = np.nonzero(candidates)
+    if len(xs):
+        keep = _remove_close(np.stack([xs, ys], axis=1).astype(np.float32), ridge_period)
+        xs, ys = xs[keep], ys[keep]
+
+    if len(xs) > max_minutiae:
+        order = np.argsort(-coherence[ys, xs])[:max_minutiae]
+        xs, ys = xs[order], ys[order]
+
+    # Direction : orientation de la crête, orientée vers le barycentre local du squelette
+    window = int(ridge_period) | 1
+    sk = skeleton.astype(np.float32)
+    grid_y, grid_x = np.mgrid[0:height, 0:width].astype(np.float32)
+    count = cv2.boxFilter(sk, -1, (window, window), normalize=False)
+    sum_x = cv2.boxFilter(sk * grid_x, -1, (window, window), normalize=False)
+    sum_y = cv2.boxFilter(sk * grid_y, -1, (window, window), normalize=False)
+    vx = sum_x[ys, xs] / np.maximum(count[ys, xs], 1.0) - xs
+    vy = sum_y[ys, xs] / np.maximum(count[ys, xs], 1.0) - ys
+    ridge_dir = normal[ys, xs] + np.pi / 2
+    flip = (np.cos(ridge_dir) * vx + np.sin(ridge_dir) * vy) < 0
+    angles = (ridge_dir + np.where(flip, np.pi, 0.0)) % (2 * np.pi)
+
+    minutiae = np.stack(
+        [xs.astype(np.float32), ys.astype(np.float32), angles.astype(np.float32), cn[ys, xs].astype(np.float32)],
+        axis=1,
+    ) if len(xs) else np.zeros((0, 4), dtype=np.float32)
+
+    area = float(mask.mean())
+    mean_coherence = float(coherence[mask].mean()) if mask.any() else 0.0
+    quality = int(round(100 * mean_coherence * min(1.0, area / 0.4)))
+    return FingerprintFeatures(minutiae.astype(np.float32), max(0, min(100, quality)), width, height)
@@ -0,0 +1,296 @@
+"""
+Index de pré-sélection des empreintes par hachage de triplets de minuties.
+
+Comparer une sonde à 100 000 gabarits (~2 ms chacun) prendrait plusieurs
+minutes. Chaque gabarit est donc décrit par des triplets (une minutie et deux
+de ses plus proches voisines) hachés en une clé invariante par rotation et
+translation : longueurs triées des côtés et angle de chaque minutie par
+rapport au barycentre du triangle, quantifiés.
+
+Les clés sont rangées dans une table triée (clés, décalages, lignes) :
+une recherche se fait par ``searchsorted`` puis ``bincount`` des lignes
+touchées, en quelques millisecondes. Côté sonde, chaque longueur est aussi
+cherchée dans les cases voisines (déformation de la peau). Seuls les
+``shortlist`` gabarits les plus votés sont ensuite comparés finement
+(``matching.match_pairs``).
+
+Les ajouts récents vont dans une zone tampon fusionnée par lots ; les
+suppressions marquent la ligne inactive.
+"""
+
+import itertools
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .matching import MatchParams, build_pairs, match_pairs
+
+logger = logging.getLogger(__name__)
+
+SIDE_BIN = 10.0
+SIDE_BINS = 20
+ANGLE_BINS = 8
+TRIPLET_NEIGHBOURS = 4
+_SIDE_OFFSETS = np.array(list(itertools.product((-1, 0, 1), repeat=3)), dtype=np.int64)
+
+
+def _triplets(minutiae: np.ndarray, neighbours: int = TRIPLET_NEIGHBOURS) -> np.ndarray:
+    """Indices (t, 3) des triplets : chaque minutie avec deux de ses plus proches voisines."""
+    n = len(minutiae)
+    k = min(neighbours, n - 1)
+    if k < 2:
+        return np.zeros((0, 3), dtype=np.int64)
+    xy = minutiae[:, :2]
+    dist = np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=-1))
+    np.fill_diagonal(dist, np.inf)
+    nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    combos = np.array(list(itertools.combinations(range(k), 2)), dtype=np.int64)
+    triplets = np.concatenate(
+        [np.repeat(np.arange(n), len(combos))[:, None], nearest[:, combos].reshape(-1, 2)], axis=1
+    )
+    return np.unique(np.sort(triplets, axis=1), axis=0)
+
+
+def _triplet_features(minutiae: np.ndarray, triplets: np.ndarray):
+    """Côtés triés quantifiés (t, 3) et angles quantifiés (t, 3), sommets ordonnés par côté opposé."""
+    pts = minutiae[triplets][:, :, :2]
+    angles = minutiae[triplets][:, :, 2]
+    # Côté opposé au sommet i = distance entre les deux autres sommets
+    opposite = np.stack([
+        np.linalg.norm(pts[:, 1] - pts[:, 2], axis=1),
+        np.linalg.norm(pts[:, 0] - pts[:, 2], axis=1),
+        np.linalg.norm(pts[:, 0] - pts[:, 1], axis=1),
+    ], axis=1)
+    order = np.argsort(opposite, axis=1)
+    sides = np.take_along_axis(opposite, order, axis=1)
+    pts = np.take_along_axis(pts, order[:, :, None], axis=1)
+    angles = np.take_along_axis(angles, order, axis=1)
+
+    centre = pts.mean(axis=1, keepdims=True)
+    towards = np.arctan2(centre[..., 1] - pts[..., 1], centre[..., 0] - pts[..., 0])
+    relative = (angles - towards) % (2 * np.pi)
+    angle_bins = (relative / (2 * np.pi / ANGLE_BINS)).astype(np.int64) % ANGLE_BINS
+    return sides / SIDE_BIN, angle_bins
+
+
+def _pack(side_bins: np.ndarray, angle_bins: np.ndarray) -> np.ndarray:
+    key = side_bins[..., 0]
+    key = key * SIDE_BINS + side_bins[..., 1]
+    key = key * SIDE_BINS + side_bins[..., 2]
+    for i in range(3):
+        key = key * ANGLE_BINS + angle_bins[..., i]
+    return key.astype(np.int64)
+
+
+def gallery_keys(minutiae: np.ndarray) -> np.ndarray:
+    """Clés d'un gabarit enrôlé (une par triplet)."""
+    triplets = _triplets(minutiae)
+    if not len(triplets):
+        return np.zeros(0, dtype=np.int32)
+    sides, angle_bins = _triplet_features(minutiae, triplets)
+    side_bins = np.floor(sides).astype(np.int64)
+    valid = side_bins[:, 2] < SIDE_BINS
+    return np.unique(_pack(side_bins[valid], angle_bins[valid])).astype(np.int32)
+
+
+def probe_keys(minutiae: np.ndarray) -> np.ndarray:
+    """Clés d'une sonde, élargies aux cases de longueur voisines."""
+    triplets = _triplets(minutiae)
+    if not len(triplets):
+        return np.zeros(0, dtype=np.int32)
+    sides, angle_bins = _triplet_features(minutiae, triplets)
+    side_bins = np.floor(sides).astype(np.int64)[:, None, :] + _SIDE_OFFSETS[None, :, :]
+    angle_bins = np.broadcast_to(angle_bins[:, None, :], side_bins.shape)
+    valid = ((side_bins >= 0) & (side_bins < SIDE_BINS)).all(axis=2)
+    return np.unique(_pack(side_bins[valid], angle_bins[valid])).astype(np.int32)
+
+
+@dataclass(frozen=True)
+class FingerprintHit:
+    empreinte_id: int
+    criminel_id: Optional[int]
+    doigt: str
+    score: float
+    matched: int
+    votes: int
+
+
+class FingerprintIndex:
+    """Gabarits en mémoire et index de triplets pour l'identification 1:N."""
+
+    def __init__(self, *, shortlist: int = 100, min_votes: int = 2, merge_every: int = 500,
+                 params: Optional[MatchParams] = None) -> None:
+        self.shortlist = shortlist
+        self.min_votes = min_votes
+        self.merge_every = merge_every
+        self.params = params or MatchParams()
+        self._lock = threading.RLock()
+        # Métadonnées par ligne
+        self._empreinte_ids: List[int] = []
+        self._criminel_ids: List[Optional[int]] = []
+        self._doigts: List[str] = []
+        self._minutiae: List[np.ndarray] = []
+        self._active = np.zeros(0, dtype=bool)
+        self._row_of: Dict[int, int] = {}
+        # Table triée des clés fusionnées
+        self._keys = np.zeros(0, dtype=np.int32)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._rows = np.zeros(0, dtype=np.int32)
+        # Ajouts non fusionnés
+        self._pending_keys: List[np.ndarray] = []
+        self._pending_rows: List[np.ndarray] = []
+        self.built_at: Optional[float] = None
+        # Horodatage base du dernier rafraîchissement (``date_mise_a_jour`` des lignes relues)
+        self.synced_at = None
+
+    def __len__(self) -> int:
+        return len(self._row_of)
+
+    def ids(self) -> set:
+        """Identifiants des empreintes présentes dans l'index."""
+        with self._lock:
+            return set(self._row_of)
+
+    def add_many(self, entries: Iterable[Tuple[int, Optional[int], str, np.ndarray]], merge: bool = True) -> int:
+        """
+        Ajoute ou remplace des gabarits ``(empreinte_id, criminel_id, doigt, minuties)``.
+
+        ``merge=False`` pour un chargement en masse, suivi d'un appel à ``merge()``.
+        """
+        added = 0
+        with self._lock:
+            for empreinte_id, criminel_id, doigt, minutiae in entries:
+                self._discard_locked(empreinte_id)
+                keys = gallery_keys(minutiae)
+                row = len(self._empreinte_ids)
+                self._empreinte_ids.append(empreinte_id)
+                self._criminel_ids.append(criminel_id)
+                self._doigts.append(doigt)
+                self._minutiae.append(minutiae)
+                self._row_of[empreinte_id] = row
+                self._pending_keys.append(keys)
+                self._pending_rows.append(np.full(len(keys), row, dtype=np.int32))
+                added += 1
+            self._grow_active_locked()
+            if merge and len(self._pending_keys) >= self.merge_every:
+                self._merge_locked()
+        return added
+
+    def merge(self) -> None:
+        """Fusionne la zone tampon dans la table triée."""
+        with self._lock:
+            self._merge_locked()
+
+    def add(self, empreinte_id: int, criminel_id: Optional[int], doigt: str, minutiae: np.ndarray) -> None:
+        self.add_many([(empreinte_id, criminel_id, doigt, minutiae)])
+
+    def discard(self, empreinte_id: int) -> None:
+        with self._lock:
+            self._discard_locked(empreinte_id)
+
+    def _grow_active_locked(self) -> None:
+        missing = len(self._empreinte_ids) - len(self._active)
+        if missing > 0:
+            self._active = np.concatenate([self._active, np.ones(missing, dtype=bool)])
+
+    def _discard_locked(self, empreinte_id: int) -> None:
+        row = self._row_of.pop(empreinte_id, None)
+        if row is not None:
+            self._grow_active_locked()
+            self._active[row] = False
+            self._minutiae[row] = np.zeros((0, 4), dtype=np.float32)
+
+    def _merge_locked(self) -> None:
+        if not self._pending_keys:
+            return
+        keys = np.concatenate([self._expand_keys()] + self._pending_keys)
+        rows = np.concatenate([self._rows] + self._pending_rows)
+        order = np.argsort(keys, kind='stable')
+        keys, rows = keys[order], rows[order]
+        # Lignes supprimées retirées à la fusion
+        live = self._active[rows]
+        keys, rows = keys[live], rows[live]
+        self._keys, starts = np.unique(keys, return_index=True)
+        self._offsets = np.append(starts, len(keys)).astype(np.int64)
+        self._rows = rows.astype(np.int32)
+        self._pending_keys, self._pending_rows = [], []
+
+    def _expand_keys(self) -> np.ndarray:
+        """Clé de chaque entrée de ``_rows`` (forme développée de la table fusionnée)."""
+        return np.repeat(self._keys, np.diff(self._offsets))
+
+    def _votes(self, keys: np.ndarray) -> np.ndarray:
+        votes = np.zeros(len(self._empreinte_ids), dtype=np.int32)
+        if len(self._keys) and len(keys):
+            pos = np.searchsorted(self._keys, keys)
+            inside = pos < len(self._keys)
+            found = pos[inside][self._keys[pos[inside]] == keys[inside]]
+            starts, ends = self._offsets[found], self._offsets[found + 1]
+            lengths = ends - starts
+            if lengths.sum():
+                index = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+                votes += np.bincount(self._rows[index], minlength=len(votes)).astype(np.int32)
+        for pending_keys, pending_rows in zip(self._pending_keys, self._pending_rows):
+            if not len(pending_keys):
+                continue
+            hits = np.isin(pending_keys, keys)
+            if hits.any():
+                votes[pending_rows[0]] += int(hits.sum())
+        votes[~self._active] = 0
+        return votes
+
+    def search(self, minutiae: np.ndarray, *, top_k: int = 10, threshold: float = 0.0,
+               min_matched: int = 0) -> Tuple[List[FingerprintHit], Dict[str, Any]]:
+        """
+        Identification 1:N.
+
+        Returns:
+            ``(hits, stats)`` : correspondances triées par score décroissant et
+            statistiques (gabarits indexés, candidats comparés, temps en ms).
+        """
+        started = time.perf_counter()
+        keys = probe_keys(minutiae)
+        with self._lock:
+            votes = self._votes(keys)
+            limit = min(self.shortlist, len(votes))
+            if limit:
+                candidates = np.argpartition(-votes, limit - 1)[:limit]
+                candidates = candidates[votes[candidates] >= self.min_votes]
+            else:
+                candidates = np.zeros(0, dtype=np.int64)
+            references = [(int(row), self._minutiae[row]) for row in candidates.tolist()]
+            meta = {row: (self._empreinte_ids[row], self._criminel_ids[row], self._doigts[row]) for row, _ in references}
+            indexed = len(self._row_of)
+        prefilter_ms = (time.perf_counter() - started) * 1000
+
+        probe_pairs = build_pairs(minutiae, self.params.neighbours)
+        hits = []
+        for row, reference in references:
+            result = match_pairs(probe_pairs, build_pairs(reference, self.params.neighbours), self.params)
+            if result.score >= threshold and result.matched >= min_matched:
+                empreinte_id, criminel_id, doigt = meta[row]
+                hits.append(FingerprintHit(empreinte_id, criminel_id, doigt, round(result.score, 4),
+                                           result.matched, int(votes[row])))
+        hits.sort(key=lambda hit: hit.score, reverse=True)
+        stats = {
+            'indexes': indexed,
+            'candidats': len(references),
+            'cles_sonde': int(len(keys)),
+            'preselection_ms': round(prefilter_ms, 1),
+            'total_ms': round((time.perf_counter() - started) * 1000, 1),
+        }
+        return hits[:top_k], stats
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'gabarits': len(self._row_of),
+                'lignes': len(self._empreinte_ids),
+                'cles': int(len(self._rows)) + sum(len(keys) for keys in self._pending_keys),
+                'en_attente': len(self._pending_keys),
+                'construit_il_y_a_s': round(time.monotonic() - self.built_at, 1) if self.built_at else None,
+            }
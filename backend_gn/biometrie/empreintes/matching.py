@@ -0,0 +1,174 @@
+"""
+Comparaison de deux empreintes par paires de minuties (tolérante à la rotation).
+
+1. Chaque minutie est reliée à ses ``neighbours`` plus proches voisines ; une
+   paire est décrite par sa longueur et l'angle de chaque minutie par rapport
+   au segment qui les relie : description invariante par rotation et
+   translation.
+2. Les paires compatibles des deux empreintes votent pour une rotation puis
+   une translation (transformée de Hough grossière).
+3. Pour les meilleures hypothèses, les minuties de la sonde sont alignées et
+   appariées une à une (distance et écart d'angle bornés).
+
+Score : ``2 × appariées / (n_sonde + n_référence)`` dans [0, 1].
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+TWO_PI = 2 * np.pi
+
+
+def _angle_diff(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Écart angulaire absolu dans [0, π]."""
+    d = np.abs(a - b) % TWO_PI
+    return np.minimum(d, TWO_PI - d)
+
+
+@dataclass(frozen=True)
+class MatchParams:
+    neighbours: int = 6
+    pair_distance_tolerance: float = 8.0
+    pair_angle_tolerance: float = np.radians(20)
+    rotation_bins: int = 24
+    translation_bin: float = 16.0
+    hypotheses: int = 3
+    distance_tolerance: float = 15.0
+    angle_tolerance: float = np.radians(25)
+
+
+@dataclass(frozen=True)
+class PairTable:
+    """Paires (minutie, voisine) d'une empreinte, précalculées pour la comparaison."""
+
+    minutiae: np.ndarray
+    first: np.ndarray
+    second: np.ndarray
+    length: np.ndarray
+    line: np.ndarray
+    angle_first: np.ndarray
+    angle_second: np.ndarray
+
+
+@dataclass(frozen=True)
+class MatchResult:
+    score: float
+    matched: int
+    rotation: float = 0.0
+
+
+def build_pairs(minutiae: np.ndarray, neighbours: int = 6) -> PairTable:
+    n = len(minutiae)
+    k = min(neighbours, n - 1)
+    if k <= 0:
+        empty = np.zeros(0, dtype=np.float32)
+        index = np.zeros(0, dtype=np.int64)
+        return PairTable(minutiae, index, index, empty, empty, empty, empty)
+    xy = minutiae[:, :2]
+    dist = np.sqrt(((xy[:, None, :] - xy[None, :, :]) ** 2).sum(axis=-1))
+    np.fill_diagonal(dist, np.inf)
+    nearest = np.argpartition(dist, k - 1, axis=1)[:, :k]
+    first = np.repeat(np.arange(n), k)
+    second = nearest.ravel()
+    delta = xy[second] - xy[first]
+    line = np.arctan2(delta[:, 1], delta[:, 0])
+    return PairTable(
+        minutiae=minutiae,
+        first=first,
+        second=second,
+        length=dist[first, second].astype(np.float32),
+        line=line.astype(np.float32),
+        angle_first=((minutiae[first, 2] - line) % TWO_PI).astype(np.float32),
+        angle_second=((minutiae[second, 2] - line) % TWO_PI).astype(np.float32),
+    )
+
+
+def _rotate(xy: np.ndarray, angle: float) -> np.ndarray:
+    c, s = np.cos(angle), np.sin(angle)
+    return np.stack([c * xy[:, 0] - s * xy[:, 1], s * xy[:, 0] + c * xy[:, 1]], axis=1)
+
+
+def _count_matched(probe: np.ndarray, reference: np.ndarray, rotation: float, translation: np.ndarray,
+                   params: MatchParams) -> int:
+    """Appariement glouton un à un des minuties alignées."""
+    aligned = _rotate(probe[:, :2], rotation) + translation
+    dist = np.sqrt(((aligned[:, None, :] - reference[None, :, :2]) ** 2).sum(axis=-1))
+    angle = _angle_diff((probe[:, 2] + rotation)[:, None], reference[None, :, 2])
+    valid = (dist <= params.distance_tolerance) & (angle <= params.angle_tolerance)
+    rows, cols = np.nonzero(valid)
+    if not len(rows):
+        return 0
+    order = np.argsort(dist[rows, cols], kind='stable')
+    used_rows, used_cols = set(), set()
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+    return len(used_rows)
+
+
+def match_pairs(probe: PairTable, reference: PairTable, params: Optional[MatchParams] = None) -> MatchResult:
+    params = params or MatchParams()
+    n_probe, n_reference = len(probe.minutiae), len(reference.minutiae)
+    if not len(probe.length) or not len(reference.length):
+        return MatchResult(0.0, 0)
+
+    # Longueurs d'abord (filtre le plus sélectif), angles sur les seules paires restantes
+    p_idx, r_idx = np.nonzero(
+        np.abs(probe.length[:, None] - reference.length[None, :]) <= params.pair_distance_tolerance
+    )
+    compatible = (
+        (_angle_diff(probe.angle_first[p_idx], reference.angle_first[r_idx]) <= params.pair_angle_tolerance)
+        & (_angle_diff(probe.angle_second[p_idx], reference.angle_second[r_idx]) <= params.pair_angle_tolerance)
+    )
+    p_idx, r_idx = p_idx[compatible], r_idx[compatible]
+    if not len(p_idx):
+        return MatchResult(0.0, 0)
+
+    rotations = (reference.line[r_idx] - probe.line[p_idx]) % TWO_PI
+    bin_width = TWO_PI / params.rotation_bins
+    rotation_bin = (rotations // bin_width).astype(np.int64) % params.rotation_bins
+    votes = np.bincount(rotation_bin, minlength=params.rotation_bins)
+    # Votes lissés sur les cases voisines (rotation à cheval sur deux cases)
+    smoothed = votes + np.roll(votes, 1) + np.roll(votes, -1)
+
+    best = MatchResult(0.0, 0)
+    tried = []
+    for candidate_bin in np.argsort(-smoothed).tolist():
+        if len(tried) >= params.hypotheses or smoothed[candidate_bin] == 0:
+            break
+        # Les cases voisines d'une hypothèse déjà testée donnent le même alignement
+        if any(min((candidate_bin - other) % params.rotation_bins, (other - candidate_bin) % params.rotation_bins) <= 1
+               for other in tried):
+            continue
+        tried.append(candidate_bin)
+        near = _angle_diff(rotations, (candidate_bin + 0.5) * bin_width) <= 1.5 * bin_width
+        sel_rot = rotations[near]
+        rotation = float(np.arctan2(np.sin(sel_rot).mean(), np.cos(sel_rot).mean()))
+
+        p_first = probe.minutiae[probe.first[p_idx[near]], :2]
+        r_first = reference.minutiae[reference.first[r_idx[near]], :2]
+        shifts = r_first - _rotate(p_first, rotation)
+        cells = np.floor(shifts / params.translation_bin).astype(np.int64)
+        cell_keys = cells[:, 0] * 65536 + cells[:, 1]
+        values, counts = np.unique(cell_keys, return_counts=True)
+        top_cell = cells[np.argmax(cell_keys == values[np.argmax(counts)])]
+        # Translation : moyenne des votes de la case gagnante et de ses voisines
+        neighbourhood = np.abs(cells - top_cell).max(axis=1) <= 1
+        translation = shifts[neighbourhood].mean(axis=0)
+
+        matched = _count_matched(probe.minutiae, reference.minutiae, rotation, translation, params)
+        if matched > best.matched:
+            best = MatchResult(2.0 * matched / (n_probe + n_reference), matched, rotation)
+    return best
+
+
+def match_minutiae(probe: np.ndarray, reference: np.ndarray,
+                   params: Optional[MatchParams] = None) -> MatchResult:
+    """Compare deux tableaux de minuties (voir ``extraction.FingerprintFeatures``)."""
+    params = params or MatchParams()
+    return match_pairs(build_pairs(probe, params.neighbours), build_pairs(reference, params.neighbours), params)
+
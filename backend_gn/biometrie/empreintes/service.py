@@ -0,0 +1,268 @@
+"""
+Enrôlement et identification des empreintes digitales (``BiometrieEmpreinte``).
+
+L'enrôlement extrait les minuties de l'image et remplit ``minuties`` (JSON
+lisible), ``nombre_minuties``, ``qualite`` et ``encodage_empreinte``
+(gabarit binaire en base64, voir ``template``).
+
+L'index d'identification est construit une fois depuis la base (environ
+1 ms par gabarit) : dans le maître gunicorn avant le fork (voir
+``biometrie.warmup``), sinon au premier usage. Il est tenu à jour par les
+enrôlements du processus et, toutes les ``FINGERPRINT_INDEX_REFRESH``
+secondes, rafraîchi en arrière-plan de façon incrémentale : seules les
+empreintes modifiées depuis le rafraîchissement précédent
+(``date_mise_a_jour``) sont relues, et les identifiants encore actifs en base
+permettent de retirer les empreintes supprimées.
+"""
+
+import json
+import logging
+import threading
+import time
+from dataclasses import asdict
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from ..profiling import current_trace, span, traced
+from .extraction import FingerprintFeatures, extract_features
+from .index import FingerprintIndex
+from .matching import MatchParams
+from .template import template_from_text, template_to_text
+
+logger = logging.getLogger(__name__)
+
+_INDEX: Optional[FingerprintIndex] = None
+_INDEX_LOCK = threading.Lock()
+_REFRESHING = False
+# Recouvrement du rafraîchissement incrémental (transactions validées en retard)
+_REFRESH_OVERLAP_SECONDS = 30
+
+
+def match_threshold() -> float:
+    return getattr(settings, 'FINGERPRINT_MATCH_THRESHOLD', 0.4)
+
+
+def min_matched() -> int:
+    return getattr(settings, 'FINGERPRINT_MIN_MATCHED', 10)
+
+
+def extract(source: Any) -> FingerprintFeatures:
+    return extract_features(source, ridge_period=getattr(settings, 'FINGERPRINT_RIDGE_PERIOD', 9.0))
+
+
+def _read_image(empreinte) -> bytes:
+    image = empreinte.image
+    image.open('rb')
+    try:
+        return image.read()
+    finally:
+        image.close()
+
+
+def apply_features(empreinte, features: FingerprintFeatures) -> List[str]:
+    """Renseigne les champs biométriques ; retourne les champs modifiés."""
+    empreinte.minuties = json.dumps(features.to_json())
+    empreinte.nombre_minuties = features.count
+    empreinte.qualite = features.quality
+    empreinte.encodage_empreinte = template_to_text(features)
+    return ['minuties', 'nombre_minuties', 'qualite', 'encodage_empreinte', 'date_mise_a_jour']
+
+
+def enroler_empreinte(empreinte, save: bool = True) -> FingerprintFeatures:
+    """
+    Extrait et enregistre le gabarit d'une empreinte, puis met l'index à jour.
+
+    Raises:
+        ValueError: Image illisible.
+    """
+    features = extract(_read_image(empreinte))
+    fields = apply_features(empreinte, features)
+    if save:
+        empreinte.save(update_fields=fields)
+    synchroniser_index(empreinte, features)
+    return features
+
+
+def synchroniser_index(empreinte, features: Optional[FingerprintFeatures] = None) -> None:
+    """Ajoute (empreinte active avec gabarit) ou retire l'empreinte de l'index du processus."""
+    if not empreinte.est_active or not empreinte.encodage_empreinte:
+        retirer_de_index(empreinte.pk)
+        return
+    if features is None:
+        try:
+            features = template_from_text(empreinte.encodage_empreinte)
+        except ValueError:
+            retirer_de_index(empreinte.pk)
+            return
+    _apply('add', (empreinte.pk, empreinte.criminel_id, empreinte.doigt, features.minutiae))
+
+
+def retirer_de_index(empreinte_id: int) -> None:
+    _apply('discard', (empreinte_id,))
+
+
+def _apply(op: str, args: tuple) -> None:
+    index = _INDEX
+    if index is not None:
+        getattr(index, op)(*args)
+
+
+def _indexable():
+    from biometrie.models import BiometrieEmpreinte
+
+    return (
+        BiometrieEmpreinte.objects.filter(est_active=True, encodage_empreinte__isnull=False)
+        .exclude(encodage_empreinte='')
+    )
+
+
+def build_fingerprint_index() -> FingerprintIndex:
+    """Index complet des empreintes actives enregistrées en base."""
+    started = time.perf_counter()
+    index = FingerprintIndex(
+        shortlist=getattr(settings, 'FINGERPRINT_SHORTLIST', 100),
+        params=MatchParams(),
+    )
+    synced_at = timezone.now()
+    rows = _indexable().values_list('id', 'criminel_id', 'doigt', 'encodage_empreinte')
+    skipped = 0
+
+    def entries():
+        nonlocal skipped
+        for empreinte_id, criminel_id, doigt, text in rows.iterator(chunk_size=2000):
+            try:
+                features = template_from_text(text)
+            except ValueError:
+                skipped += 1
+                continue
+            yield empreinte_id, criminel_id, doigt, features.minutiae
+
+    index.add_many(entries(), merge=False)
+    index.merge()
+    index.built_at = time.monotonic()
+    index.synced_at = synced_at
+    logger.info(
+        f"Index des empreintes construit: {len(index)} gabarit(s), {skipped} ignoré(s), "
+        f"{time.perf_counter() - started:.1f}s"
+    )
+    return index
+
+
+def refresh_fingerprint_index(index: FingerprintIndex) -> Dict[str, int]:
+    """
+    Intègre à ``index`` les modifications faites en base depuis son dernier rafraîchissement.
+
+    Empreintes modifiées (``date_mise_a_jour``) : ajoutées, remplacées ou
+    retirées selon leur état. Empreintes supprimées : retirées d'après la liste
+    des identifiants actifs (une requête sur les seuls identifiants).
+    """
+    from biometrie.models import BiometrieEmpreinte
+
+    started = time.perf_counter()
+    synced_at = timezone.now()
+    changed = BiometrieEmpreinte.objects.all()
+    if index.synced_at is not None:
+        changed = changed.filter(
+            date_mise_a_jour__gte=index.synced_at - timedelta(seconds=_REFRESH_OVERLAP_SECONDS)
+        )
+
+    entries, removed = [], []
+    rows = changed.values_list('id', 'criminel_id', 'doigt', 'encodage_empreinte', 'est_active')
+    for empreinte_id, criminel_id, doigt, text, est_active in rows.iterator(chunk_size=2000):
+        if not est_active or not text:
+            removed.append(empreinte_id)
+            continue
+        try:
+            entries.append((empreinte_id, criminel_id, doigt, template_from_text(text).minutiae))
+        except ValueError:
+            removed.append(empreinte_id)
+
+    active_ids = set(_indexable().values_list('id', flat=True))
+    removed.extend(index.ids() - active_ids)
+    for empreinte_id in removed:
+        index.discard(empreinte_id)
+    index.add_many(entries)
+    index.synced_at = synced_at
+    index.built_at = time.monotonic()
+    if entries or removed:
+        logger.info(
+            f"Index des empreintes rafraîchi: {len(entries)} ajout(s)/mise(s) à jour, "
+            f"{len(removed)} retrait(s), {time.perf_counter() - started:.2f}s"
+        )
+    return {'ajouts': len(entries), 'retraits': len(removed)}
+
+
+def _refresh_in_background(index: FingerprintIndex) -> None:
+    global _REFRESHING
+    try:
+        refresh_fingerprint_index(index)
+    except Exception as e:
+        logger.error(f"Rafraîchissement de l'index des empreintes impossible: {e}", exc_info=True)
+    finally:
+        with _INDEX_LOCK:
+            _REFRESHING = False
+
+
+def get_fingerprint_index() -> FingerprintIndex:
+    """Index du processus : construit au premier appel, rafraîchi en arrière-plan par deltas."""
+    global _INDEX, _REFRESHING
+    index = _INDEX
+    if index is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = build_fingerprint_index()
+            return _INDEX
+
+    interval = getattr(settings, 'FINGERPRINT_INDEX_REFRESH', 60)
+    if interval and index.built_at is not None and time.monotonic() - index.built_at > interval:
+        with _INDEX_LOCK:
+            start = not _REFRESHING
+            _REFRESHING = True
+        if start:
+            threading.Thread(
+                target=_refresh_in_background, args=(index,), name='fingerprint-index', daemon=True
+            ).start()
+    return index
+
+
+@traced('identification_empreinte')
+def identifier_empreinte(source: Any, *, top_k: int = 10, threshold: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Identification 1:N d'une empreinte.
+
+    Returns:
+        Qualité et minuties de la sonde, correspondances (score décroissant)
+        et statistiques de recherche.
+
+    Raises:
+        ValueError: Image illisible.
+    """
+    started = time.perf_counter()
+    with span('extraction'):
+        features = extract(source)
+    extraction_ms = (time.perf_counter() - started) * 1000
+    threshold = match_threshold() if threshold is None else threshold
+    result: Dict[str, Any] = {
+        'qualite': features.quality,
+        'nombre_minuties': features.count,
+        'seuil': threshold,
+        'correspondances': [],
+        'statistiques': {'extraction_ms': round(extraction_ms, 1)},
+    }
+    if features.count < min_matched():
+        result['message'] = "Trop peu de minuties détectées pour une identification fiable"
+        return result
+
+    with span('chargement_index'):
+        index = get_fingerprint_index()
+    hits, stats = index.search(features.minutiae, top_k=top_k, threshold=threshold, min_matched=min_matched())
+    trace = current_trace()
+    if trace is not None:
+        trace.add('preselection', stats['preselection_ms'])
+        trace.add('comparaison', max(stats['total_ms'] - stats['preselection_ms'], 0.0))
+    result['correspondances'] = [asdict(hit) for hit in hits]
+    result['statistiques'].update(stats)
+    return result
@@ -0,0 +1,62 @@
+"""
+Gabarit binaire compact d'une empreinte (champ ``encodage_empreinte``).
+
+Format (petit-boutiste) : en-tête ``FPM1`` + largeur, hauteur (uint16),
+qualité (uint8), nombre de minuties (uint16), puis 6 octets par minutie :
+x, y (uint16), angle sur 256 pas (uint8) et type (uint8). Une empreinte de
+40 minuties tient en 251 octets, stockés en base64 dans le champ texte.
+"""
+
+import base64
+import binascii
+import struct
+
+import numpy as np
+
+from .extraction import FingerprintFeatures
+
+MAGIC = b'FPM1'
+_HEADER = struct.Struct('<4sHHBH')
+_MINUTIA = np.dtype([('x', '<u2'), ('y', '<u2'), ('angle', 'u1'), ('type', 'u1')])
+_ANGLE_STEP = 2 * np.pi / 256
+
+
+def encode_template(features: FingerprintFeatures) -> bytes:
+    minutiae = features.minutiae
+    packed = np.zeros(len(minutiae), dtype=_MINUTIA)
+    if len(minutiae):
+        packed['x'] = np.clip(np.rint(minutiae[:, 0]), 0, 65535)
+        packed['y'] = np.clip(np.rint(minutiae[:, 1]), 0, 65535)
+        packed['angle'] = np.rint(minutiae[:, 2] / _ANGLE_STEP).astype(np.int64) % 256
+        packed['type'] = minutiae[:, 3]
+    header = _HEADER.pack(MAGIC, features.width, features.height, features.quality, len(minutiae))
+    return header + packed.tobytes()
+
+
+def decode_template(data: bytes) -> FingerprintFeatures:
+    """Raises: ValueError si ``data`` n'est pas un gabarit valide."""
+    if len(data) < _HEADER.size:
+        raise ValueError("Gabarit d'empreinte tronqué")
+    magic, width, height, quality, count = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Format de gabarit d'empreinte inconnu")
+    if len(data) != _HEADER.size + count * _MINUTIA.itemsize:
+        raise ValueError("Gabarit d'empreinte tronqué")
+    packed = np.frombuffer(data, dtype=_MINUTIA, count=count, offset=_HEADER.size)
+    minutiae = np.stack(
+        [packed['x'], packed['y'], packed['angle'] * _ANGLE_STEP, packed['type']], axis=1
+    ).astype(np.float32) if count else np.zeros((0, 4), dtype=np.float32)
+    return FingerprintFeatures(minutiae, quality, width, height)
+
+
+def template_to_text(features: FingerprintFeatures) -> str:
+    return base64.b64encode(encode_template(features)).decode('ascii')
+
+
+def template_from_text(text: str) -> FingerprintFeatures:
+    """Raises: ValueError si le texte n'est pas un gabarit encodé par ``template_to_text``."""
+    try:
+        data = base64.b64decode(text, validate=True)
+    except (binascii.Error, ValueError) as exc:
+        raise ValueError("Gabarit d'empreinte illisible") from exc
+    return decode_template(data)
@@ -14,6 +14,8 @@ import io
 from django.core.files.base import File
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 
+from .insightface_loader import create_face_analysis
+
 # Réduit la verbosité d'ONNX Runtime
 import os
 import warnings
@@ -131,12 +133,10 @@ def _get_face_analysis_model() -> Optional[Any]:
                 raise RuntimeError("FaceAnalysis n'est pas disponible")
             
             # Initialiser FaceAnalysis avec buffalo_l pour les 106 landmarks
-            model = FaceAnalysis(  # type: ignore
-                name="buffalo_l",
+            model = create_face_analysis(
+                "buffalo_l",
                 allowed_modules=['detection', 'landmark_2d_106'],
-                providers=['CPUExecutionProvider']
             )
-            model.prepare(ctx_id=-1, det_size=(640, 640))
             
             _FACE_106_MODEL = model
             _FACE_106_ERROR = None
@@ -0,0 +1,197 @@
+"""
+Hydratation groupée des fiches liées aux résultats de correspondance.
+
+Les comparaisons ne manipulent que des identifiants (``criminel_id``) :
+une fois le classement établi, les fiches retenues sont
+chargées en une requête (``in_bulk`` restreint par ``only()`` aux champs
+affichés). Les fiches servies récemment sont gardées dans un petit cache
+TTL par processus (``MATCH_HYDRATION_CACHE_TTL`` secondes,
+``MATCH_HYDRATION_CACHE_SIZE`` entrées), vidé à l'enregistrement ou à la
+suppression d'une fiche (signaux connectés dans ``BiometrieConfig.ready``).
+
+Ce vidage ne touche que le processus où la fiche est modifiée : les autres
+workers gunicorn / Celery peuvent servir l'ancienne version jusqu'à
+expiration du TTL, de même après un ``QuerySet.update()`` ou une écriture
+SQL directe, qui n'émettent pas de signaux. Le TTL par défaut reste donc
+court (quelques secondes).
+
+Les instances renvoyées sont partielles : accéder à un champ absent de
+``CRIMINEL_FIELDS`` déclenche une requête par instance.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Champs affichés dans les résultats (FaceMatch.to_dict, recherche par photo UPR, vues)
+CRIMINEL_FIELDS = (
+    'id', 'numero_fiche', 'nom', 'prenom', 'surnom', 'date_naissance', 'lieu_naissance', 'cin', 'photo',
+)
+
+
+class TTLCache:
+    """Cache LRU borné dont les entrées expirent après ``ttl`` secondes."""
+
+    def __init__(self, ttl: float, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: 'OrderedDict[Any, Tuple[float, Any]]' = OrderedDict()
+
+    def get_many(self, keys: Iterable[Any]) -> Dict[Any, Any]:
+        if self.ttl <= 0:
+            return {}
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                if entry[0] < now:
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[key] = entry[1]
+        return found
+
+    def set_many(self, values: Dict[Any, Any]) -> None:
+        if self.ttl <= 0 or self.max_entries <= 0:
+            return
+        expires = time.monotonic() + self.ttl
+        with self._lock:
+            for key, value in values.items():
+                self._entries[key] = (expires, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def discard(self, key: Any) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class FicheHydrator:
+    """Charge des fiches par identifiant : cache d'abord, puis une requête ``in_bulk``."""
+
+    def __init__(self, model_getter: Callable[[], Any], fields: Sequence[str]):
+        self._model_getter = model_getter
+        self.fields = tuple(fields)
+        self.cache = TTLCache(
+            getattr(settings, 'MATCH_HYDRATION_CACHE_TTL', 5.0),
+            getattr(settings, 'MATCH_HYDRATION_CACHE_SIZE', 2000),
+        )
+
+    @property
+    def model(self):
+        return self._model_getter()
+
+    def hydrate(self, ids: Iterable[Any]) -> Dict[int, Any]:
+        """Fiches existantes indexées par identifiant (les absentes sont omises)."""
+        wanted = {int(pk) for pk in ids if pk is not None}
+        if not wanted:
+            return {}
+        found = self.cache.get_many(wanted)
+        missing = wanted.difference(found)
+        if missing:
+            loaded = self.model.objects.only(*self.fields).in_bulk(missing)
+            self.cache.set_many(loaded)
+            found.update(loaded)
+        return found
+
+    def invalidate(self, sender=None, instance=None, **kwargs) -> None:
+        if instance is not None and instance.pk is not None:
+            self.cache.discard(instance.pk)
+
+
+def _criminel_model():
+    from criminel.models import CriminalFicheCriminelle
+
+    return CriminalFicheCriminelle
+
+
+CRIMINELS = FicheHydrator(_criminel_model, CRIMINEL_FIELDS)
+
+
+def hydrate_criminels(ids: Iterable[Any]) -> Dict[int, Any]:
+    """``{id: CriminalFicheCriminelle}`` partielles (``CRIMINEL_FIELDS``)."""
+    return CRIMINELS.hydrate(ids)
+
+
+def hydrate_ranked(
+    ranked: Sequence[Any],
+    key: Callable[[Any], Optional[int]],
+    limit: Optional[int] = None,
+) -> List[Tuple[Any, Any]]:
+    """Associe leur fiche aux éléments classés, dans l'ordre, jusqu'à ``limit``.
+
+    Les éléments dont la fiche n'existe plus sont sautés : on charge alors
+    la fenêtre suivante, si bien que ``limit`` résultats sont rendus tant
+    qu'il reste des candidats (une requête dans le cas courant).
+    """
+    resolved: List[Tuple[Any, Any]] = []
+    position = 0
+    while position < len(ranked) and (limit is None or len(resolved) < limit):
+        end = len(ranked) if limit is None else position + (limit - len(resolved))
+        window = ranked[position:end]
+        position = end
+        fiches = hydrate_criminels(key(item) for item in window)
+        for item in window:
+            fiche = fiches.get(key(item))
+            if fiche is not None:
+                resolved.append((item, fiche))
+    return resolved
+
+
+def active_photo_names(criminel_ids: Iterable[Any]) -> Dict[int, str]:
+    """Nom de fichier de la première photo biométrique active de chaque fiche (une requête)."""
+    from biometrie.models import BiometriePhoto
+
+    wanted = {int(pk) for pk in criminel_ids if pk is not None}
+    if not wanted:
+        return {}
+    names: Dict[int, str] = {}
+    rows = (
+        BiometriePhoto.objects.filter(criminel_id__in=wanted, est_active=True)
+        .exclude(image='')
+        .order_by('criminel_id', 'pk')
+        .values_list('criminel_id', 'image')
+    )
+    for criminel_id, image in rows:
+        if image:
+            names.setdefault(criminel_id, image)
+    return names
+
+
+def connect_signals() -> None:
+    """Invalide le cache à l'enregistrement ou à la suppression d'une fiche."""
+    from django.db.models.signals import post_delete, post_save
+
+    post_save.connect(CRIMINELS.invalidate, sender=_criminel_model(), dispatch_uid='hydration_criminel_save')
+    post_delete.connect(CRIMINELS.invalidate, sender=_criminel_model(), dispatch_uid='hydration_criminel_delete')
+
+
+__all__ = [
+    'CRIMINEL_FIELDS',
+    'FicheHydrator',
+    'TTLCache',
+    'active_photo_names',
+    'connect_signals',
+    'hydrate_criminels',
+    'hydrate_ranked',
+]
@@ -0,0 +1,173 @@
+"""Chargement centralisé des packs de modèles InsightFace.
+
+Tous les chargeurs (ArcFace, SCRFD, landmarks 106) passent par
+:func:`create_face_analysis`, qui choisit le pack à utiliser selon la
+précision configurée (``INSIGHTFACE_MODEL_PRECISION``).
+
+Un pack quantifié ``<modele>_int8`` est produit par
+``manage.py quantize_face_models``. Son fichier ``quantization.json`` indique
+les modules quantifiés. Si la reconnaissance en fait partie, les embeddings
+diffèrent de ceux du FP32 : le pack n'est alors jamais substitué
+silencieusement et doit être choisi explicitement comme version d'embedding
+(ex: ``buffalo_l_int8:insightface-v1`` via ``reembed_gallery``).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import weakref
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .onnx_threads import apply_session_options
+
+logger = logging.getLogger(__name__)
+
+PRECISION_FP32 = "fp32"
+PRECISION_INT8 = "int8"
+PRECISIONS = (PRECISION_FP32, PRECISION_INT8)
+
+QUANTIZATION_MANIFEST = "quantization.json"
+
+# Instances chargées dans ce processus (préchauffage, réouverture après fork)
+_LOADED_FACE_ANALYSES: "weakref.WeakSet" = weakref.WeakSet()
+
+try:  # pragma: no cover - dépend de l'installation locale
+    from insightface.app import FaceAnalysis
+except Exception:  # pragma: no cover - insightface optionnel
+    FaceAnalysis = None
+
+
+def insightface_root() -> str:
+    try:
+        from django.conf import settings
+
+        root = getattr(settings, "INSIGHTFACE_ROOT", None)
+    except Exception:  # pragma: no cover - settings non configurés
+        root = None
+    return os.path.expanduser(root or "~/.insightface")
+
+
+def configured_precision() -> str:
+    try:
+        from django.conf import settings
+
+        precision = getattr(settings, "INSIGHTFACE_MODEL_PRECISION", PRECISION_FP32)
+    except Exception:  # pragma: no cover - settings non configurés
+        precision = PRECISION_FP32
+    precision = (precision or PRECISION_FP32).lower()
+    if precision not in PRECISIONS:
+        logger.warning("INSIGHTFACE_MODEL_PRECISION=%s inconnue, utilisation de fp32", precision)
+        return PRECISION_FP32
+    return precision
+
+
+def model_pack_dir(pack_name: str, root: Optional[str] = None) -> str:
+    return os.path.join(root or insightface_root(), "models", pack_name)
+
+
+def quantized_pack_name(model_name: str) -> str:
+    return f"{model_name}_{PRECISION_INT8}"
+
+
+def read_quantization_manifest(pack_name: str, root: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    path = os.path.join(model_pack_dir(pack_name, root), QUANTIZATION_MANIFEST)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as handle:
+            return json.load(handle)
+    except (OSError, ValueError) as exc:
+        logger.warning("Manifeste de quantification illisible (%s): %s", path, exc)
+        return None
+
+
+def resolve_model_pack(
+    model_name: str,
+    allowed_modules: Optional[Sequence[str]] = None,
+    precision: Optional[str] = None,
+) -> str:
+    """Nom du pack à charger pour ``model_name`` selon la précision demandée."""
+
+    precision = precision or configured_precision()
+    if precision == PRECISION_FP32:
+        return model_name
+
+    pack_name = quantized_pack_name(model_name)
+    manifest = read_quantization_manifest(pack_name)
+    if manifest is None:
+        logger.warning(
+            "Pack quantifié %s introuvable dans %s, utilisation du FP32. "
+            "Générez-le avec `manage.py quantize_face_models`.",
+            pack_name,
+            model_pack_dir(pack_name),
+        )
+        return model_name
+
+    quantizes_recognition = "recognition" in manifest.get("modules", [])
+    loads_recognition = allowed_modules is None or "recognition" in allowed_modules
+    if quantizes_recognition and loads_recognition:
+        logger.warning(
+            "Le pack %s quantifie la reconnaissance : il n'est pas substitué au FP32 "
+            "(embeddings non comparables). Utilisez la version d'embedding %s:… à la place.",
+            pack_name,
+            pack_name,
+        )
+        return model_name
+
+    return pack_name
+
+
+def create_face_analysis(
+    model_name: str = "buffalo_l",
+    *,
+    allowed_modules: Optional[List[str]] = None,
+    providers: Optional[List[str]] = None,
+    det_size: Tuple[int, int] = (640, 640),
+    precision: Optional[str] = None,
+):
+    """Instancie et prépare un ``FaceAnalysis`` (CPU) pour ``model_name``."""
+
+    if FaceAnalysis is None:
+        raise RuntimeError("FaceAnalysis n'est pas disponible")
+
+    pack_name = resolve_model_pack(model_name, allowed_modules, precision)
+    kwargs: Dict[str, Any] = {
+        "name": pack_name,
+        "root": insightface_root(),
+        "providers": providers or ["CPUExecutionProvider"],
+    }
+    if allowed_modules is not None:
+        kwargs["allowed_modules"] = allowed_modules
+
+    model = FaceAnalysis(**kwargs)
+    # Threads intra/inter-op selon le budget CPU du rôle de ce processus
+    apply_session_options(model, providers=kwargs["providers"])
+    # Force CPU (-1) pour éviter tous les avertissements GPU
+    model.prepare(ctx_id=-1, det_size=det_size)
+    if pack_name != model_name:
+        logger.info("Pack InsightFace %s chargé (précision int8) pour %s", pack_name, model_name)
+    _LOADED_FACE_ANALYSES.add(model)
+    return model
+
+
+def loaded_face_analyses() -> List[Any]:
+    """Instances ``FaceAnalysis`` créées par ce processus et encore référencées."""
+
+    return list(_LOADED_FACE_ANALYSES)
+
+
+__all__ = [
+    "PRECISION_FP32",
+    "PRECISION_INT8",
+    "QUANTIZATION_MANIFEST",
+    "configured_precision",
+    "create_face_analysis",
+    "insightface_root",
+    "loaded_face_analyses",
+    "model_pack_dir",
+    "quantized_pack_name",
+    "read_quantization_manifest",
+    "resolve_model_pack",
+]
@@ -13,6 +13,8 @@ import io
 from django.core.files.base import File
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 
+from ..insightface_loader import create_face_analysis
+
 import os
 os.environ.setdefault("ORT_LOG_SEVERITY_LEVEL", "2")
 
@@ -114,12 +116,10 @@ def _get_landmark_106_model() -> Optional[Any]:
             if not _INSIGHTFACE_AVAILABLE or FaceAnalysis is None:
                 raise RuntimeError("FaceAnalysis n'est pas disponible")
             
-            model = FaceAnalysis(
-                name="buffalo_l",
+            model = create_face_analysis(
+                "buffalo_l",
                 allowed_modules=['detection', 'landmark_2d_106'],
-                providers=['CPUExecutionProvider']
             )
-            model.prepare(ctx_id=-1, det_size=(640, 640))
             
             _LANDMARK_106_MODEL = model
             _LANDMARK_106_ERROR = None
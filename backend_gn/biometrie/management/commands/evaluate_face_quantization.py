@@ -0,0 +1,56 @@
+"""Compare le pack INT8 au FP32 : rappel de détection, points de repère, cosinus, décisions et temps CPU."""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biometrie.quantization import DEFAULT_DECISION_THRESHOLDS, evaluate_quantized_pack
+
+
+class Command(BaseCommand):
+    help = 'Banc de non-régression FP32 / INT8 sur un dossier de visages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', required=True, help='Dossier d\'images de visages')
+        parser.add_argument('--model-name', default='buffalo_l')
+        parser.add_argument('--limit', type=int, default=None)
+        parser.add_argument(
+            '--thresholds', default=','.join(str(t) for t in DEFAULT_DECISION_THRESHOLDS),
+            help='Seuils de similarité à vérifier (séparés par des virgules)',
+        )
+        parser.add_argument('--min-recall', type=float, default=0.99)
+        parser.add_argument('--min-cosine', type=float, default=0.98)
+        parser.add_argument(
+            '--max-landmark-error', type=float, default=0.02,
+            help='Écart p99 des 106 points de repère, en fraction de la taille du visage',
+        )
+
+    def handle(self, *args, **options):
+        thresholds = [float(value) for value in options['thresholds'].split(',') if value.strip()]
+        try:
+            report = evaluate_quantized_pack(
+                options['model_name'],
+                options['images'],
+                thresholds=thresholds,
+                limit=options['limit'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        result = report.to_dict()
+        self.stdout.write(json.dumps(result, indent=2, ensure_ascii=False))
+
+        failures = []
+        if report.rappel_detection < options['min_recall']:
+            failures.append(f"rappel {report.rappel_detection:.4f} < {options['min_recall']}")
+        if result['cosinus_p01'] is not None and result['cosinus_p01'] < options['min_cosine']:
+            failures.append(f"cosinus p01 {result['cosinus_p01']:.4f} < {options['min_cosine']}")
+        landmark_p99 = result['landmarks_erreur_p99']
+        if landmark_p99 is not None and landmark_p99 > options['max_landmark_error']:
+            failures.append(f"points de repère p99 {landmark_p99:.4f} > {options['max_landmark_error']}")
+        flipped = {k: v for k, v in report.decisions_inversees.items() if v}
+        if flipped:
+            failures.append(f'décisions inversées aux seuils {flipped}')
+
+        if failures:
+            raise CommandError('Régression INT8: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Pack INT8 conforme au FP32 sur ce jeu d\'images'))
@@ -0,0 +1,54 @@
+"""Banc d'essai empreintes : EER, taux d'erreur au seuil, rang 1 et temps d'identification 1:N."""
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from biometrie.empreintes.evaluation import evaluate_fingerprint_set
+
+
+class Command(BaseCommand):
+    help = 'Évalue l\'extraction et la comparaison d\'empreintes sur un dossier <doigt>_<impression>.<ext>'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', required=True, help='Dossier d\'images d\'empreintes (convention FVC)')
+        parser.add_argument('--limit', type=int, default=None, help='Nombre maximal de doigts')
+        parser.add_argument(
+            '--filler', type=int, default=0,
+            help='Gabarits aléatoires ajoutés à l\'index (ex. 100000 pour mesurer le 1:N à grande échelle)',
+        )
+        parser.add_argument('--threshold', type=float, default=None)
+        parser.add_argument('--min-matched', type=int, default=None)
+        parser.add_argument('--min-rank1', type=float, default=None, help='Échec si le taux de rang 1 est inférieur')
+        parser.add_argument('--max-search-ms', type=float, default=None, help='Échec si le p95 de recherche dépasse')
+
+    def handle(self, *args, **options):
+        threshold = options['threshold']
+        if threshold is None:
+            threshold = getattr(settings, 'FINGERPRINT_MATCH_THRESHOLD', 0.4)
+        min_matched = options['min_matched']
+        if min_matched is None:
+            min_matched = getattr(settings, 'FINGERPRINT_MIN_MATCHED', 10)
+        try:
+            report = evaluate_fingerprint_set(
+                options['images'],
+                threshold=threshold,
+                min_matched=min_matched,
+                ridge_period=getattr(settings, 'FINGERPRINT_RIDGE_PERIOD', 9.0),
+                filler=options['filler'],
+                limit=options['limit'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(json.dumps(report.to_dict(), indent=2, ensure_ascii=False))
+
+        failures = []
+        if options['min_rank1'] is not None and (report.rang1 or 0.0) < options['min_rank1']:
+            failures.append(f"rang 1 {report.rang1} < {options['min_rank1']}")
+        p95 = report.recherche_ms.get('p95')
+        if options['max_search_ms'] is not None and p95 is not None and p95 > options['max_search_ms']:
+            failures.append(f"recherche p95 {p95} ms > {options['max_search_ms']} ms")
+        if failures:
+            raise CommandError('Banc empreintes: ' + '; '.join(failures))
+        self.stdout.write(self.style.SUCCESS('Banc empreintes terminé'))
@@ -0,0 +1,65 @@
+"""Affiche la mémoire privée/partagée du maître gunicorn et de ses workers."""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biometrie.warmup import child_pids, memory_report
+
+
+def _find_gunicorn_masters():
+    masters = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/cmdline', 'rb') as handle:
+                cmdline = handle.read().replace(b'\0', b' ').decode('utf-8', 'ignore')
+            with open(f'/proc/{entry}/stat', 'r', encoding='utf-8') as handle:
+                ppid = int(handle.read().rsplit(')', 1)[1].split()[1])
+            with open(f'/proc/{ppid}/cmdline', 'rb') as handle:
+                parent_cmdline = handle.read().decode('utf-8', 'ignore')
+        except (OSError, ValueError, IndexError):
+            continue
+        if 'gunicorn' in cmdline and 'gunicorn' not in parent_cmdline:
+            masters.append(int(entry))
+    return masters
+
+
+class Command(BaseCommand):
+    help = (
+        "Mémoire privée et partagée (smaps_rollup) du maître gunicorn et de chaque worker, "
+        "pour vérifier le partage copy-on-write des modèles faciaux."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pid', type=int, default=None, help='PID du maître gunicorn')
+        parser.add_argument('--json', action='store_true', help='Sortie JSON')
+
+    def handle(self, *args, **options):
+        masters = [options['pid']] if options['pid'] else _find_gunicorn_masters()
+        if not masters:
+            raise CommandError('Aucun maître gunicorn trouvé, précisez --pid')
+
+        reports = []
+        for master in masters:
+            reports.append({
+                'maitre': memory_report(master),
+                'workers': [memory_report(pid) for pid in child_pids(master)],
+            })
+
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2, ensure_ascii=False))
+            return
+
+        for report in reports:
+            rows = [('maître', report['maitre'])] + [('worker', w) for w in report['workers']]
+            for label, row in rows:
+                if 'erreur' in row:
+                    self.stdout.write(f"{label:7} pid={row['pid']}: {row['erreur']}")
+                    continue
+                self.stdout.write(
+                    f"{label:7} pid={row['pid']:<7} rss={row['rss_mo']:>8} Mo  "
+                    f"pss={row['pss_mo']:>8} Mo  partagé={row['partage_mo']:>8} Mo  "
+                    f"privé={row['prive_mo']:>8} Mo"
+                )
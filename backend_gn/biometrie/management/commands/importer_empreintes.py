@@ -0,0 +1,66 @@
+"""Import en masse d'empreintes depuis un dossier ou une archive accompagné d'un manifeste CSV."""
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from biometrie.services.import_empreintes import DEFAULT_MANIFEST, FingerprintImportJob
+
+
+class Command(BaseCommand):
+    help = (
+        "Importe des empreintes (fichier, numero_fiche ou criminel_id, doigt) avec extraction "
+        "des gabarits en parallèle. Une relance reprend au dernier lot enregistré."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', required=True, help='Dossier ou archive (.zip, .tar, .tar.gz)')
+        parser.add_argument(
+            '--manifest', default=DEFAULT_MANIFEST,
+            help='Manifeste CSV, dans la source ou chemin sur le disque',
+        )
+        parser.add_argument('--checkpoint', default=None, help='Fichier de point de reprise (JSON)')
+        parser.add_argument('--workers', type=int, default=None, help='Processus d\'extraction')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Lignes par lot')
+        parser.add_argument('--user', default=None, help='Nom d\'utilisateur enregistré comme auteur')
+        parser.add_argument('--restart', action='store_true', help='Ignorer le point de reprise existant')
+        parser.add_argument('--async', dest='run_async', action='store_true', help='Lancer via Celery')
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"Utilisateur inconnu: {options['user']}")
+            user_id = user.pk
+
+        params = {
+            'manifest': options['manifest'],
+            'checkpoint': options['checkpoint'],
+            'workers': options['workers'],
+            'chunk_size': options['chunk_size'],
+            'enregistre_par_id': user_id,
+        }
+        if options['run_async']:
+            from biometrie.tasks import importer_empreintes
+            if not hasattr(importer_empreintes, 'delay'):
+                raise CommandError('Celery n\'est pas disponible, relancez sans --async')
+            importer_empreintes.delay(options['source'], restart=options['restart'], **params)
+            self.stdout.write(self.style.SUCCESS(f"Import de {options['source']} planifié"))
+            return
+
+        source = options['source']
+        manifest = params.pop('manifest')
+        try:
+            summary = FingerprintImportJob(source, manifest, **params).run(restart=options['restart'])
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(json.dumps(summary, indent=2, ensure_ascii=False))
+        if summary['echecs']:
+            self.stdout.write(self.style.WARNING(
+                f"{summary['echecs']} ligne(s) en erreur, voir {summary['rapport_erreurs']}"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"{summary['importes']} empreinte(s) importée(s) ({summary['debit_par_heure']}/h)"
+        ))
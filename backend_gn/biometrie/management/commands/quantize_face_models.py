@@ -0,0 +1,50 @@
+"""Produit un pack InsightFace quantifié en INT8 (pack <modele>_int8)."""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biometrie.quantization import QUANTIZATION_MODES, quantize_model_pack
+
+
+class Command(BaseCommand):
+    help = (
+        "Quantifie en INT8 les modèles SCRFD et 2d106det (et optionnellement ArcFace) "
+        "avec les outils d'onnxruntime. Activer ensuite INSIGHTFACE_MODEL_PRECISION=int8."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--model-name', default='buffalo_l', help='Pack InsightFace source')
+        parser.add_argument('--mode', choices=QUANTIZATION_MODES, default='static')
+        parser.add_argument(
+            '--calibration-dir',
+            help='Dossier d\'images de visages pour la calibration (mode static)',
+        )
+        parser.add_argument('--calibration-limit', type=int, default=200)
+        parser.add_argument(
+            '--include-recognition', action='store_true',
+            help='Quantifier aussi ArcFace (nécessite un ré-embedding de la galerie)',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            manifest = quantize_model_pack(
+                options['model_name'],
+                mode=options['mode'],
+                calibration_dir=options['calibration_dir'],
+                include_recognition=options['include_recognition'],
+                calibration_limit=options['calibration_limit'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        self.stdout.write(json.dumps(manifest, indent=2, ensure_ascii=False))
+        self.stdout.write(self.style.SUCCESS(
+            f"Pack {options['model_name']}_int8 généré. Vérifiez-le avec "
+            "`manage.py evaluate_face_quantization --images <dossier>`."
+        ))
+        if options['include_recognition']:
+            self.stdout.write(self.style.WARNING(
+                'La reconnaissance est quantifiée : ce pack ne remplace pas le FP32 '
+                'automatiquement. Migrez la galerie avec '
+                f"`manage.py reembed_gallery --target {options['model_name']}_int8:insightface-v1`."
+            ))
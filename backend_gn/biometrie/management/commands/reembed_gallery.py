@@ -0,0 +1,83 @@
+"""Ré-encode la galerie faciale avec un nouveau modèle puis bascule la version active."""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from biometrie.embedding_versions import check_target_version, get_version_state
+from biometrie.services.reembedding import GalleryReembeddingJob, get_reembedding_status
+
+
+class Command(BaseCommand):
+    help = (
+        "Migre les embeddings faciaux vers une nouvelle version (modèle:prétraitement). "
+        "La recherche interroge les deux versions pendant la migration."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--target', help='Version cible, ex: antelopev2:insightface-v1')
+        parser.add_argument('--chunk-size', type=int, default=None, help='Nombre de lignes par lot')
+        parser.add_argument('--pause', type=float, default=None, help='Pause (secondes) entre deux lots')
+        parser.add_argument(
+            '--no-cutover', action='store_true',
+            help='Ne pas basculer la version active à la fin (recherche double-version maintenue)',
+        )
+        parser.add_argument(
+            '--force-cutover', action='store_true',
+            help='Basculer même si des lignes n\'ont pas pu être ré-encodées',
+        )
+        parser.add_argument('--async', dest='run_async', action='store_true', help='Lancer via Celery')
+        parser.add_argument('--status', action='store_true', help='Afficher l\'état du versionnement')
+
+    def handle(self, *args, **options):
+        if options['status']:
+            self.stdout.write(json.dumps(get_reembedding_status(), indent=2, ensure_ascii=False))
+            return
+
+        target = options.get('target')
+        if not target or ':' not in target:
+            raise CommandError('--target est requis au format modele:pretraitement')
+
+        if options['run_async']:
+            from biometrie.tasks import reembed_gallery
+            try:
+                # Le worker lèverait la même erreur sans que personne ne la voie
+                check_target_version(target, get_version_state(refresh=True)[0])
+            except ValueError as exc:
+                raise CommandError(str(exc)) from exc
+            if not hasattr(reembed_gallery, 'delay'):
+                raise CommandError('Celery n\'est pas disponible, relancez sans --async')
+            reembed_gallery.delay(
+                target,
+                chunk_size=options['chunk_size'],
+                pause_seconds=options['pause'],
+                cutover=not options['no_cutover'],
+                force_cutover=options['force_cutover'],
+            )
+            self.stdout.write(self.style.SUCCESS(f'Ré-embedding vers {target} planifié'))
+            return
+
+        job = GalleryReembeddingJob(
+            target,
+            chunk_size=options['chunk_size'],
+            pause_seconds=options['pause'],
+        )
+        try:
+            summary = job.run(
+                cutover=not options['no_cutover'],
+                force_cutover=options['force_cutover'],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc)) from exc
+
+        for nom, progress in summary['sources'].items():
+            self.stdout.write(
+                f"  {nom}: {progress['traites']} ré-encodé(s), {progress['echecs']} échec(s), "
+                f"{progress['restants']} restant(s)"
+            )
+        if summary['bascule']:
+            self.stdout.write(self.style.SUCCESS(f'Version active: {target}'))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f"Bascule différée: {summary['restants']} ligne(s) restante(s). "
+                'Relancez la commande ou utilisez --force-cutover.'
+            ))
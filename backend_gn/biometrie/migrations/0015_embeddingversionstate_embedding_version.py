@@ -0,0 +1,55 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+import biometrie.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrie', '0014_alter_biometrieempreinte_doigt'),
+    ]
+
+    # Les vecteurs existants viennent du modèle historique : ils sont étiquetés
+    # LEGACY_EMBEDDING_VERSION, quelle que soit la version configurée au migrate.
+    operations = [
+        migrations.CreateModel(
+            name='EmbeddingVersionState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version_active', models.CharField(max_length=64, verbose_name='Version active')),
+                ('version_cible', models.CharField(blank=True, help_text='Version en cours de migration (ré-embedding en arrière-plan)', max_length=64, null=True, verbose_name='Version cible')),
+                ('migration_demarree_le', models.DateTimeField(blank=True, null=True, verbose_name='Migration démarrée le')),
+                ('bascule_le', models.DateTimeField(blank=True, null=True, verbose_name='Bascule effectuée le')),
+                ('progression', models.JSONField(blank=True, default=dict, help_text='Compteurs de ré-embedding par source (traités, restants, échecs)', verbose_name='Progression')),
+                ('mis_a_jour_le', models.DateTimeField(auto_now=True, verbose_name='Mis à jour le')),
+            ],
+            options={
+                'verbose_name': "Version d'embedding",
+                'verbose_name_plural': "Versions d'embedding",
+                'db_table': 'biometrie_embedding_version',
+            },
+        ),
+        migrations.AddField(
+            model_name='biometrie',
+            name='embedding_version',
+            field=models.CharField(db_index=True, default='buffalo_l:insightface-v1', help_text="Modèle et prétraitement ayant produit l'encodage (ex: buffalo_l:insightface-v1)", max_length=64, verbose_name="Version d'embedding"),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='biometriephoto',
+            name='embedding_version',
+            field=models.CharField(db_index=True, default='buffalo_l:insightface-v1', help_text="Modèle et prétraitement ayant produit l'embedding (ex: buffalo_l:insightface-v1)", max_length=64, verbose_name="Version d'embedding"),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='biometrie',
+            name='embedding_version',
+            field=models.CharField(db_index=True, default=biometrie.models.default_embedding_version, help_text="Modèle et prétraitement ayant produit l'encodage (ex: buffalo_l:insightface-v1)", max_length=64, verbose_name="Version d'embedding"),
+        ),
+        migrations.AlterField(
+            model_name='biometriephoto',
+            name='embedding_version',
+            field=models.CharField(db_index=True, default=biometrie.models.default_embedding_version, help_text="Modèle et prétraitement ayant produit l'embedding (ex: buffalo_l:insightface-v1)", max_length=64, verbose_name="Version d'embedding"),
+        ),
+    ]
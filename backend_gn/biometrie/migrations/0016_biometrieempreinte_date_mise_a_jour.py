@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 15:05
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrie', '0015_embeddingversionstate_embedding_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='biometrieempreinte',
+            name='date_mise_a_jour',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now, help_text="Rafraîchissement incrémental de l'index des empreintes", verbose_name='Dernière mise à jour'),
+            preserve_default=False,
+        ),
+    ]
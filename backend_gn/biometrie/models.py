@@ -24,6 +24,12 @@ def validate_image_file(value):
         raise ValidationError('La taille du fichier ne doit pas dépasser 10 MB')
 
 
+def default_embedding_version():
+    """Version d'embedding active, utilisée pour étiqueter les nouveaux vecteurs."""
+    from .embedding_versions import active_embedding_version
+    return active_embedding_version()
+
+
 def _table_exists(table_name):
     try:
         return table_name in connection.introspection.table_names()
@@ -89,6 +95,13 @@ class Biometrie(models.Model):
         verbose_name='Encodage facial',
         help_text='Vecteur d\'encodage facial généré par ArcFace'
     )
+    embedding_version = models.CharField(
+        max_length=64,
+        default=default_embedding_version,
+        db_index=True,
+        verbose_name='Version d\'embedding',
+        help_text='Modèle et prétraitement ayant produit l\'encodage (ex: buffalo_l:insightface-v1)'
+    )
     date_enregistrement = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Date d\'enregistrement'
@@ -156,6 +169,13 @@ class BiometriePhoto(models.Model):
         verbose_name='Embedding ArcFace 512-d',
         help_text='Vecteur d\'embedding ArcFace de 512 dimensions (format JSON array)'
     )
+    embedding_version = models.CharField(
+        max_length=64,
+        default=default_embedding_version,
+        db_index=True,
+        verbose_name='Version d\'embedding',
+        help_text='Modèle et prétraitement ayant produit l\'embedding (ex: buffalo_l:insightface-v1)'
+    )
     landmarks_106 = models.JSONField(
         blank=True,
         null=True,
@@ -364,6 +384,12 @@ class BiometrieEmpreinte(models.Model):
         verbose_name='Active',
         help_text='Indique si cette empreinte est utilisable pour la reconnaissance'
     )
+    date_mise_a_jour = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Dernière mise à jour',
+        help_text='Rafraîchissement incrémental de l\'index des empreintes'
+    )
 
     class Meta:
         db_table = 'biometrie_empreinte'
@@ -718,4 +744,57 @@ class BiometrieHistorique(models.Model):
         date_str = d.strftime('%Y-%m-%d %H:%M') if d else ''  # type: ignore[union-attr]
         return f"{self.action} - {self.type_objet} #{self.objet_id} - {date_str}"
 
-    objects = OptionalTableManager()
\ No newline at end of file
+    objects = OptionalTableManager()
+
+
+class EmbeddingVersionState(models.Model):
+    """
+    État global du versionnement des embeddings faciaux (ligne unique, pk=1).
+
+    ``version_active`` est la version utilisée pour les nouveaux vecteurs ;
+    ``version_cible`` est renseignée pendant une ré-indexation, la recherche
+    interroge alors les deux versions jusqu'à la bascule.
+    """
+    version_active = models.CharField(
+        max_length=64,
+        verbose_name='Version active'
+    )
+    version_cible = models.CharField(
+        max_length=64,
+        blank=True,
+        null=True,
+        verbose_name='Version cible',
+        help_text='Version en cours de migration (ré-embedding en arrière-plan)'
+    )
+    migration_demarree_le = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Migration démarrée le'
+    )
+    bascule_le = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Bascule effectuée le'
+    )
+    progression = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Progression',
+        help_text='Compteurs de ré-embedding par source (traités, restants, échecs)'
+    )
+    mis_a_jour_le = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Mis à jour le'
+    )
+
+    class Meta:
+        db_table = 'biometrie_embedding_version'
+        verbose_name = 'Version d\'embedding'
+        verbose_name_plural = 'Versions d\'embedding'
+
+    def __str__(self):
+        if self.version_cible:
+            return f"{self.version_active} -> {self.version_cible}"
+        return self.version_active
+
+    objects = OptionalTableManager()
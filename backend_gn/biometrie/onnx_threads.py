@@ -0,0 +1,244 @@
+"""Budget de threads ONNX Runtime par rôle de processus.
+
+Par défaut chaque session onnxruntime crée un thread intra-op par cœur. Avec
+plusieurs workers gunicorn, des workers Celery et le service multi-caméras sur
+le même hôte, le CPU est sur-souscrit et la latence de queue explose.
+
+Ce module répartit un budget de cœurs entre les rôles (``web``, ``celery``,
+``camera``) puis entre les processus de chaque rôle, et construit les
+``SessionOptions`` correspondantes (threads intra/inter-op, mode d'exécution,
+niveau d'optimisation du graphe, arène mémoire, attente active).
+
+Rôle du processus : variable ``ONNX_PROCESS_ROLE``, sinon déduit de la ligne
+de commande (gunicorn -> web, celery -> celery), sinon ``default``.
+
+En mode préchargement (maître gunicorn avant fork, voir ``biometrie.warmup``),
+les sessions sont créées sans pool de threads : un pool de threads ne survit
+pas au fork, alors qu'une session mono-thread peut être héritée telle quelle
+par les workers (pages partagées en copy-on-write).
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import os
+import sys
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ROLE_WEB = "web"
+ROLE_CELERY = "celery"
+ROLE_CAMERA = "camera"
+ROLE_DEFAULT = "default"
+
+# Part du budget CPU attribuée à chaque rôle
+DEFAULT_ROLE_SHARES: Dict[str, float] = {
+    ROLE_WEB: 0.5,
+    ROLE_CELERY: 0.25,
+    ROLE_CAMERA: 0.25,
+}
+
+# Nombre de processus par rôle qui se partagent la part du rôle
+DEFAULT_ROLE_PROCESSES: Dict[str, int] = {
+    ROLE_WEB: 4,
+    ROLE_CELERY: 2,
+    ROLE_CAMERA: 1,
+}
+
+_GRAPH_OPTIMIZATION_LEVELS = {
+    "disable": "ORT_DISABLE_ALL",
+    "basic": "ORT_ENABLE_BASIC",
+    "extended": "ORT_ENABLE_EXTENDED",
+    "all": "ORT_ENABLE_ALL",
+}
+
+
+@dataclass(frozen=True)
+class SessionThreadConfig:
+    role: str
+    intra_op_num_threads: int
+    inter_op_num_threads: int = 1
+    execution_mode: str = "sequential"
+    graph_optimization_level: str = "all"
+    enable_cpu_mem_arena: bool = True
+    enable_mem_pattern: bool = True
+    allow_spinning: bool = False
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def _setting(name: str, default: Any) -> Any:
+    try:
+        from django.conf import settings
+
+        return getattr(settings, name, default)
+    except Exception:  # pragma: no cover - hors Django (service caméras, scripts)
+        return default
+
+
+def detect_process_role() -> str:
+    role = os.environ.get("ONNX_PROCESS_ROLE") or _setting("ONNX_PROCESS_ROLE", None)
+    if role:
+        return role.lower()
+
+    command = " ".join(os.path.basename(arg) for arg in sys.argv[:2]).lower()
+    if "gunicorn" in command or "uvicorn" in command or "daphne" in command:
+        return ROLE_WEB
+    if "celery" in command:
+        return ROLE_CELERY
+    return ROLE_DEFAULT
+
+
+def cpu_budget() -> int:
+    budget = os.environ.get("ONNX_CPU_BUDGET") or _setting("ONNX_CPU_BUDGET", None)
+    if budget:
+        return max(1, int(budget))
+    try:
+        return max(1, len(os.sched_getaffinity(0)))
+    except (AttributeError, OSError):  # pragma: no cover - non Linux
+        return max(1, os.cpu_count() or 1)
+
+
+def compute_thread_config(role: Optional[str] = None) -> SessionThreadConfig:
+    """Calcule la configuration de threads du processus courant."""
+
+    role = role or detect_process_role()
+    shares = {**DEFAULT_ROLE_SHARES, **(_setting("ONNX_ROLE_SHARES", None) or {})}
+    processes = {**DEFAULT_ROLE_PROCESSES, **(_setting("ONNX_ROLE_PROCESSES", None) or {})}
+    budget = cpu_budget()
+
+    if role in shares:
+        role_cores = budget * shares[role]
+        intra = max(1, math.floor(role_cores / max(1, processes.get(role, 1))))
+    else:
+        # Processus ponctuel (runserver, commandes) : tout le budget
+        intra = budget
+
+    overrides = (_setting("ONNX_SESSION_OPTIONS", None) or {}).get(role, {})
+    config = SessionThreadConfig(role=role, intra_op_num_threads=intra)
+    if overrides:
+        config = SessionThreadConfig(**{**config.to_dict(), **overrides, "role": role})
+    return config
+
+
+def build_session_options(config: Optional[SessionThreadConfig] = None):
+    """Construit les ``onnxruntime.SessionOptions`` pour la configuration donnée."""
+
+    import onnxruntime as ort
+
+    config = config or get_thread_config()
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = config.intra_op_num_threads
+    options.inter_op_num_threads = config.inter_op_num_threads
+    options.execution_mode = (
+        ort.ExecutionMode.ORT_PARALLEL
+        if config.execution_mode == "parallel"
+        else ort.ExecutionMode.ORT_SEQUENTIAL
+    )
+    level_name = _GRAPH_OPTIMIZATION_LEVELS.get(config.graph_optimization_level, "ORT_ENABLE_ALL")
+    options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, level_name)
+    options.enable_cpu_mem_arena = config.enable_cpu_mem_arena
+    options.enable_mem_pattern = config.enable_mem_pattern
+    # Sans attente active, un thread inoccupé rend le cœur aux autres processus
+    spinning = "1" if config.allow_spinning else "0"
+    options.add_session_config_entry("session.intra_op.allow_spinning", spinning)
+    options.add_session_config_entry("session.inter_op.allow_spinning", spinning)
+    return options
+
+
+_THREAD_CONFIG: Optional[SessionThreadConfig] = None
+_PRELOAD_MODE = False
+
+
+def begin_preload() -> None:
+    """Passe en mode préchargement : sessions sans pool de threads (fork-safe)."""
+
+    global _PRELOAD_MODE, _THREAD_CONFIG
+    _PRELOAD_MODE = True
+    _THREAD_CONFIG = None
+
+
+def end_preload() -> SessionThreadConfig:
+    """Quitte le mode préchargement (dans le worker) et recalcule la configuration."""
+
+    global _PRELOAD_MODE, _THREAD_CONFIG
+    _PRELOAD_MODE = False
+    _THREAD_CONFIG = None
+    return get_thread_config()
+
+
+def in_preload_mode() -> bool:
+    return _PRELOAD_MODE
+
+
+def get_thread_config() -> SessionThreadConfig:
+    global _THREAD_CONFIG
+    if _THREAD_CONFIG is None and _PRELOAD_MODE:
+        # intra=1 et exécution séquentielle : onnxruntime ne crée aucun thread
+        _THREAD_CONFIG = SessionThreadConfig(role=detect_process_role(), intra_op_num_threads=1)
+        logger.info("Budget ONNX Runtime: préchargement avant fork, sessions mono-thread")
+    if _THREAD_CONFIG is None:
+        _THREAD_CONFIG = compute_thread_config()
+        logger.info(
+            "Budget ONNX Runtime: rôle=%s, intra_op=%s, inter_op=%s (budget=%s cœurs)",
+            _THREAD_CONFIG.role,
+            _THREAD_CONFIG.intra_op_num_threads,
+            _THREAD_CONFIG.inter_op_num_threads,
+            cpu_budget(),
+        )
+    return _THREAD_CONFIG
+
+
+def apply_session_options(
+    face_analysis,
+    providers=None,
+    config: Optional[SessionThreadConfig] = None,
+) -> None:
+    """Recrée les sessions d'un ``FaceAnalysis`` avec les options du budget.
+
+    ``insightface.model_zoo.get_model`` ne transmet pas de ``SessionOptions``
+    aux sessions qu'il crée : chaque modèle chargé est donc rouvert avec les
+    options calculées (mêmes entrées/sorties, seul le runtime change).
+    """
+
+    import onnxruntime as ort
+
+    config = config or get_thread_config()
+    options = build_session_options(config)
+    providers = providers or ["CPUExecutionProvider"]
+    for model in getattr(face_analysis, "models", {}).values():
+        model_file = getattr(model, "model_file", None)
+        if not model_file or not hasattr(model, "session"):
+            continue
+        model.session = ort.InferenceSession(model_file, sess_options=options, providers=providers)
+    # Configuration effective des sessions (comparée après fork, voir biometrie.warmup)
+    face_analysis.onnx_thread_config = config
+
+
+def session_thread_config(face_analysis) -> Optional[SessionThreadConfig]:
+    """Configuration avec laquelle les sessions d'un ``FaceAnalysis`` ont été créées."""
+
+    return getattr(face_analysis, "onnx_thread_config", None)
+
+
+__all__ = [
+    "ROLE_CAMERA",
+    "ROLE_CELERY",
+    "ROLE_DEFAULT",
+    "ROLE_WEB",
+    "SessionThreadConfig",
+    "apply_session_options",
+    "begin_preload",
+    "build_session_options",
+    "compute_thread_config",
+    "cpu_budget",
+    "detect_process_role",
+    "end_preload",
+    "get_thread_config",
+    "in_preload_mode",
+    "session_thread_config",
+]
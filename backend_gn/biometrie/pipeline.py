@@ -23,9 +23,11 @@ from .detectors.scrfd_detector import detect_face
 from .detectors.scrfd_detector import UploadedImage
 from .landmarks.landmark106 import detect_106_landmarks
 from .embeddings.arcface import generate_embedding
+from .embedding_versions import active_embedding_version
 from .facemesh.facemesh468 import detect_facemesh468
 from .facemodels.morphable_3d import extract_3dmm
 from .models import BiometriePhoto, Biometrie
+from .profiling import span, traced
 
 logger = logging.getLogger(__name__)
 
@@ -81,6 +83,7 @@ def _align_face(image: np.ndarray, landmarks: List[List[float]],
         return None
 
 
+@traced("enrolement")
 def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
     """Pipeline complet d'enrôlement biométrique SGIC.
     
@@ -115,7 +118,8 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
     try:
         # 1. Détection de visage avec SCRFD
         logger.info("Étape 1: Détection SCRFD...")
-        detection_result = detect_face(image)
+        with span("detection"):
+            detection_result = detect_face(image)
         
         if not detection_result.get("success", False):
             result["error"] = detection_result.get("error", "Aucun visage détecté")
@@ -139,11 +143,12 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
         try:
             import base64
             from io import BytesIO
-            face_crop_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(face_crop_rgb)
-            buffer = BytesIO()
-            pil_image.save(buffer, format='JPEG')
-            face_crop_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+            with span("serialisation"):
+                face_crop_rgb = cv2.cvtColor(face_crop, cv2.COLOR_BGR2RGB)
+                pil_image = Image.fromarray(face_crop_rgb)
+                buffer = BytesIO()
+                pil_image.save(buffer, format='JPEG')
+                face_crop_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
             result["face_crop"] = f"data:image/jpeg;base64,{face_crop_base64}"
         except Exception as exc:
             logger.warning("Impossible d'encoder le face crop en base64: %s", exc)
@@ -151,7 +156,8 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
         
         # 2. Détection des 106 landmarks
         logger.info("Étape 2: Détection 106 landmarks...")
-        landmarks_result = detect_106_landmarks(image)
+        with span("landmarks"):
+            landmarks_result = detect_106_landmarks(image)
         
         if not landmarks_result.get("success", False):
             result["error"] = landmarks_result.get("error", "Impossible de détecter les landmarks")
@@ -170,16 +176,19 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
                     full_image = image
                 else:
                     from .detectors.scrfd_detector import _load_image
-                    full_image = _load_image(image)
+                    with span("decodage"):
+                        full_image = _load_image(image)
                 
                 if full_image is not None:
-                    _align_face(full_image, landmarks106)
+                    with span("alignement"):
+                        _align_face(full_image, landmarks106)
             except Exception as exc:
                 logger.warning("Erreur lors de l'alignement: %s", exc)
                 warnings.append("Alignement du visage échoué")
         
         logger.info("Étape 3: Génération embedding ArcFace...")
-        embedding_result = generate_embedding(image)
+        with span("embedding"):
+            embedding_result = generate_embedding(image)
         
         if not embedding_result.get("success", False):
             result["error"] = embedding_result.get("error", "Impossible de générer l'embedding")
@@ -187,6 +196,7 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
         
         embedding512 = embedding_result.get("embedding", [])
         result["embedding512"] = embedding512
+        result["embedding_version"] = embedding_result.get("embedding_version")
         
         if len(embedding512) != 512:
             warnings.append(f"Dimension d'embedding inattendue: {len(embedding512)} au lieu de 512")
@@ -197,10 +207,12 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
                 facemesh_image = image
             else:
                 from .detectors.scrfd_detector import _load_image
-                facemesh_image = _load_image(image)
+                with span("decodage"):
+                    facemesh_image = _load_image(image)
             
             if facemesh_image is not None:
-                facemesh_result = detect_facemesh468(facemesh_image)
+                with span("facemesh"):
+                    facemesh_result = detect_facemesh468(facemesh_image)
                 if facemesh_result.get("success", False):
                     result["facemesh468"] = facemesh_result.get("landmarks", [])
                 else:
@@ -215,10 +227,12 @@ def enrollement_pipeline(image: UploadedImage) -> Dict[str, Any]:
                 morphable_image = image
             else:
                 from .detectors.scrfd_detector import _load_image
-                morphable_image = _load_image(image)
+                with span("decodage"):
+                    morphable_image = _load_image(image)
             
             if morphable_image is not None:
-                morphable_result = extract_3dmm(morphable_image, landmarks106)
+                with span("3dmm"):
+                    morphable_result = extract_3dmm(morphable_image, landmarks106)
                 result["morphable3d"] = {
                     "vertices": morphable_result.get("vertices", []),
                     "shape_params": morphable_result.get("shape_params", []),
@@ -262,12 +276,15 @@ def save_enrollement_to_biometrie_photo(
     if not pipeline_result.get("success", False):
         raise ValueError(f"Le pipeline n'a pas réussi: {pipeline_result.get('error', 'Erreur inconnue')}")
     
-    with transaction.atomic():
+    with span("ecriture_bdd"), transaction.atomic():
         embedding512 = pipeline_result.get("embedding512", [])
         if embedding512 and len(embedding512) == 512:
             photo.embedding_512 = embedding512
             # Garder aussi l'ancien format pour compatibilité
             photo.encodage_facial = json.dumps(embedding512)
+            photo.embedding_version = (
+                pipeline_result.get("embedding_version") or active_embedding_version()
+            )
         
         if save_all:
             # Sauvegarder les landmarks 106
@@ -289,6 +306,7 @@ def save_enrollement_to_biometrie_photo(
     return photo
 
 
+@traced("enrolement")
 def save_enrollement_to_biometrie(
     criminel,
     image: UploadedImage,
@@ -320,12 +338,13 @@ def save_enrollement_to_biometrie(
         logger.warning(f"Embedding invalide pour criminel #{criminel.pk}")
         return None
     
-    with transaction.atomic():
+    with span("ecriture_bdd"), transaction.atomic():
         # Créer l'entrée Biometrie
         biometrie = Biometrie.objects.create(
             criminel=criminel,
             photo=image,
-            encodage_facial=embedding512
+            encodage_facial=embedding512,
+            embedding_version=pipeline_result.get("embedding_version") or active_embedding_version(),
         )
         
         logger.info(f"Encodage facial sauvegardé dans Biometrie #{biometrie.pk} pour criminel #{criminel.pk}")
@@ -0,0 +1,381 @@
+"""
+Profilage par étape des pipelines biométriques.
+
+Une *trace* couvre une opération (enrôlement, recherche par photo, requête
+HTTP...) ; les *étapes* mesurées à l'intérieur s'y cumulent :
+
+    with trace('recherche_photo'):
+        with span('decodage'):
+            frame = load(image)
+        with span('detection'):
+            ...
+
+À la fin de la trace, la durée cumulée de chaque étape (et le total) est
+ajoutée à un histogramme en mémoire, par processus, indexé par
+``(pipeline, étape)`` ; ``autre`` regroupe le temps hors étapes mesurées.
+Les étapes sont des feuilles : deux ``span`` imbriqués compteraient deux fois
+le même temps.
+
+Les traces imbriquées se fondent dans la trace englobante : une vue qui
+profile la requête entière (``BiometricProfilingMixin``) récupère les étapes
+des services qu'elle appelle, sous le nom de pipeline de la vue.
+
+Hors trace (ou si ``BIOMETRIE_PROFILING_ENABLED`` est faux), ``span`` ne
+coûte qu'une lecture de ``ContextVar``. Dans une trace : deux
+``perf_counter`` et une addition ; l'enregistrement final est un ``bisect``
+par étape sous verrou.
+
+Consultation : ``GET /api/biometrie/profilage/`` (administrateurs, p50/p95/p99)
+et ``?profile=1`` (ou en-tête ``X-Biometrie-Profile: 1``) sur les vues
+profilées pour recevoir le détail de la requête dans ``profilage``.
+"""
+
+from __future__ import annotations
+
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Bornes supérieures des buckets (ms), dernier bucket = +Inf
+DEFAULT_BUCKETS_MS = (
+    0.5, 1, 2, 3, 5, 7.5, 10, 15, 20, 30, 50, 75, 100, 150, 200, 300, 500,
+    750, 1000, 1500, 2000, 3000, 5000, 10000, 30000,
+)
+
+TOTAL = 'total'
+OTHER = 'autre'
+RENDER = 'rendu'
+
+_CURRENT: ContextVar[Optional['Trace']] = ContextVar('biometrie_profiling_trace', default=None)
+
+
+def profiling_enabled() -> bool:
+    from django.conf import settings
+
+    return getattr(settings, 'BIOMETRIE_PROFILING_ENABLED', True)
+
+
+class Histogram:
+    """Histogramme cumulable à buckets fixes (millisecondes)."""
+
+    __slots__ = ('bounds', 'counts', 'count', 'total', 'max')
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile approché, interpolé linéairement dans le bucket concerné."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if count and seen + count >= rank:
+                lower = self.bounds[index - 1] if index else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                value = lower + (upper - lower) * (rank - seen) / count
+                return round(min(value, self.max), 2)
+            seen += count
+        return round(self.max, 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'count': self.count,
+            'avg_ms': round(self.total / self.count, 2) if self.count else None,
+            'p50_ms': self.quantile(0.5),
+            'p95_ms': self.quantile(0.95),
+            'p99_ms': self.quantile(0.99),
+            'max_ms': round(self.max, 2) if self.count else None,
+        }
+
+
+class ProfileRegistry:
+    """Histogrammes du processus, indexés par ``(pipeline, étape)``."""
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self._lock = threading.Lock()
+        self._histograms: Dict[Tuple[str, str], Histogram] = {}
+        self.started_at = time.time()
+
+    def observe_many(self, pipeline: str, values: Dict[str, float]) -> None:
+        with self._lock:
+            for stage, value_ms in values.items():
+                histogram = self._histograms.get((pipeline, stage))
+                if histogram is None:
+                    histogram = self._histograms[(pipeline, stage)] = Histogram(self.bounds)
+                histogram.observe(value_ms)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """``{pipeline: {étape: {count, avg_ms, p50_ms, p95_ms, p99_ms, max_ms, part}}}``.
+
+        ``part`` : fraction du temps total du pipeline passée dans l'étape.
+        """
+        with self._lock:
+            items = [(key, histogram.snapshot(), histogram.total) for key, histogram in self._histograms.items()]
+        pipelines: Dict[str, Dict[str, Any]] = {}
+        totals = {pipeline: total for (pipeline, stage), _, total in items if stage == TOTAL}
+        for (pipeline, stage), summary, total in sorted(items, key=lambda item: (item[0][0], -item[2])):
+            pipeline_total = totals.get(pipeline)
+            if stage != TOTAL and pipeline_total:
+                summary['part'] = round(total / pipeline_total, 3)
+            pipelines.setdefault(pipeline, {})[stage] = summary
+        return {
+            'pid': os.getpid(),
+            'depuis': self.started_at,
+            'pipelines': pipelines,
+        }
+
+
+REGISTRY = ProfileRegistry()
+
+
+class Trace:
+    """Durées cumulées par étape pour une opération en cours."""
+
+    __slots__ = ('pipeline', 'stages', 'started')
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.stages: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    def add(self, stage: str, value_ms: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + value_ms
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def values(self) -> Dict[str, float]:
+        """Étapes, ``autre`` (temps non attribué) et ``total``, en millisecondes."""
+        total = self.elapsed_ms()
+        values = dict(self.stages)
+        values[OTHER] = max(total - sum(self.stages.values()), 0.0)
+        values[TOTAL] = total
+        return values
+
+    def summary(self) -> Dict[str, Any]:
+        values = self.values()
+        total = values.pop(TOTAL)
+        return {
+            'pipeline': self.pipeline,
+            'total_ms': round(total, 2),
+            'etapes': {stage: round(value, 2) for stage, value in values.items()},
+        }
+
+    def record(self, registry: Optional[ProfileRegistry] = None) -> None:
+        (registry or REGISTRY).observe_many(self.pipeline, self.values())
+
+
+class _Span:
+    __slots__ = ('trace', 'stage', 'started')
+
+    def __init__(self, trace: Trace, stage: str):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.trace.add(self.stage, (time.perf_counter() - self.started) * 1000.0)
+        return False
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """Mesure une étape de la trace courante (sans effet hors trace)."""
+    current = _CURRENT.get()
+    if current is None:
+        return _NO_SPAN
+    return _Span(current, stage)
+
+
+def current_trace() -> Optional[Trace]:
+    return _CURRENT.get()
+
+
+class trace:
+    """Ouvre une trace pour ``pipeline`` si aucune n'est en cours.
+
+    Utilisable en gestionnaire de contexte ou via ``start()`` / ``finish()``
+    (début et fin dans des méthodes différentes, cf. mixin DRF).
+    """
+
+    __slots__ = ('pipeline', 'trace', '_token')
+
+    def __init__(self, pipeline: str):
+        self.pipeline = pipeline
+        self.trace: Optional[Trace] = None
+        self._token = None
+
+    def start(self) -> Optional[Trace]:
+        current = _CURRENT.get()
+        if current is not None:
+            return current
+        if not profiling_enabled():
+            return None
+        self.trace = Trace(self.pipeline)
+        self._token = _CURRENT.set(self.trace)
+        return self.trace
+
+    def detach(self) -> Optional[Trace]:
+        """Quitte le contexte sans enregistrer ; retourne la trace ouverte par ce bloc."""
+        if self._token is not None:
+            _CURRENT.reset(self._token)
+            self._token = None
+        return self.trace
+
+    def finish(self) -> None:
+        opened = self.detach()
+        if opened is not None:
+            self.trace = None
+            try:
+                opened.record()
+            except Exception as exc:  # pragma: no cover - protection runtime
+                logger.debug("Enregistrement du profil %s impossible: %s", opened.pipeline, exc)
+
+    def __enter__(self) -> Optional[Trace]:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.finish()
+        return False
+
+
+def traced(pipeline: str):
+    """Décorateur : exécute la fonction dans ``trace(pipeline)``."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace(pipeline):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def profile_requested(request) -> bool:
+    """``?profile=1`` ou ``X-Biometrie-Profile: 1``, réservé aux administrateurs
+    sauf si ``BIOMETRIE_PROFILING_IN_RESPONSES`` est actif."""
+    from django.conf import settings
+
+    params = getattr(request, 'query_params', None) or getattr(request, 'GET', {})
+    flag = params.get('profile') or request.META.get('HTTP_X_BIOMETRIE_PROFILE') or ''
+    if flag.strip().lower() not in ('1', 'true', 'yes', 'oui'):
+        return False
+    if getattr(settings, 'BIOMETRIE_PROFILING_IN_RESPONSES', False):
+        return True
+    from utilisateur.permissions import user_is_app_admin
+
+    return user_is_app_admin(getattr(request, 'user', None))
+
+
+class BiometricProfilingMixin:
+    """Mixin DRF : profile la requête entière sous ``profiling_pipeline``.
+
+    Les étapes des services appelés (détection, embedding, lecture BDD...)
+    se cumulent dans la trace de la vue ; ``mise_en_forme`` couvre la
+    finalisation de la réponse et ``rendu`` la sérialisation JSON (mesurée
+    après coup, absente du détail renvoyé au client).
+    """
+
+    profiling_pipeline: Optional[str] = None
+
+    def dispatch(self, request, *args, **kwargs):
+        scope = self._profiling_scope = trace(self.profiling_pipeline or self.__class__.__name__)
+        scope.start()
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            # Exception non gérée : finalize_response n'a pas été appelé
+            self._profiling_scope = None
+            scope.detach()
+
+    def initial(self, request, *args, **kwargs):
+        scope = getattr(self, '_profiling_scope', None)
+        action = getattr(self, 'action', None)
+        if scope is not None and scope.trace is not None and action and not self.profiling_pipeline:
+            scope.trace.pipeline = f'{scope.trace.pipeline}.{action}'
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        scope = getattr(self, '_profiling_scope', None)
+        with span('mise_en_forme'):
+            response = super().finalize_response(request, response, *args, **kwargs)
+        if scope is None:
+            return response
+        opened = scope.detach()
+        if opened is None:
+            return response
+
+        if isinstance(response, Response) and isinstance(response.data, dict) and profile_requested(request):
+            # Copie : ``response.data`` peut être partagé (cache de frames)
+            response.data = {**response.data, 'profilage': opened.summary()}
+
+        if hasattr(response, 'add_post_render_callback') and not getattr(response, 'is_rendered', True):
+            render_started = time.perf_counter()
+
+            def _record_render(rendered):
+                opened.add(RENDER, (time.perf_counter() - render_started) * 1000.0)
+                opened.record()
+
+            response.add_post_render_callback(_record_render)
+        else:
+            opened.record()
+        return response
+
+
+__all__ = [
+    'BiometricProfilingMixin',
+    'Histogram',
+    'ProfileRegistry',
+    'REGISTRY',
+    'Trace',
+    'current_trace',
+    'profile_requested',
+    'profiling_enabled',
+    'span',
+    'trace',
+    'traced',
+]
@@ -0,0 +1,427 @@
+"""Quantification INT8 des modèles InsightFace et banc de non-régression.
+
+Les serveurs n'ont pas de GPU : les modèles SCRFD (det_10g), 2d106det et
+w600k_r50 tournent en FP32 sur ``CPUExecutionProvider``. Ce module produit un
+pack ``<modele>_int8`` à côté du pack d'origine, avec l'outillage de
+quantification d'onnxruntime :
+
+- ``static`` (recommandé pour ces réseaux convolutifs) : format QDQ,
+  activations uint8, poids int8 par canal, calibrés sur un dossier de visages ;
+- ``dynamic`` : poids uint8, activations quantifiées à la volée (aucune donnée
+  de calibration nécessaire, gain moindre sur les convolutions).
+
+Par défaut la reconnaissance reste en FP32 (copiée telle quelle) afin que les
+embeddings stockés restent comparables. :func:`evaluate_quantized_pack` compare
+le pack quantifié au FP32 (rappel de détection, écart des 106 points de repère,
+accord cosinus des embeddings, décisions aux seuils utilisés et temps CPU).
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+from django.utils import timezone
+
+from .insightface_loader import (
+    PRECISION_FP32,
+    QUANTIZATION_MANIFEST,
+    create_face_analysis,
+    model_pack_dir,
+    quantized_pack_name,
+    read_quantization_manifest,
+)
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("static", "dynamic")
+LANDMARK_TASK = "landmark_2d_106"
+QUANTIZABLE_TASKS = ("detection", LANDMARK_TASK)
+RECOGNITION_TASK = "recognition"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Seuils de similarité cosinus utilisés par les recherches de l'application
+DEFAULT_DECISION_THRESHOLDS = (0.35, 0.6, 0.7, 0.75)
+
+
+def iter_sample_images(image_dir: str, limit: Optional[int] = None) -> Iterator[tuple]:
+    """Itère ``(nom, image BGR)`` sur les images d'un dossier."""
+
+    import cv2
+
+    count = 0
+    for name in sorted(os.listdir(image_dir)):
+        if not name.lower().endswith(IMAGE_EXTENSIONS):
+            continue
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is None:
+            logger.warning("Image ignorée (illisible): %s", name)
+            continue
+        yield name, image
+        count += 1
+        if limit is not None and count >= limit:
+            return
+
+
+class _BlobCalibrationReader:
+    """``CalibrationDataReader`` onnxruntime alimenté par des blobs pré-calculés."""
+
+    def __init__(self, input_name: str, blobs: Sequence[np.ndarray]) -> None:
+        self.input_name = input_name
+        self._iterator = iter(blobs)
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        blob = next(self._iterator, None)
+        if blob is None:
+            return None
+        return {self.input_name: blob}
+
+
+def _detection_blob(model, image: np.ndarray) -> np.ndarray:
+    """Reproduit le prétraitement SCRFD (letterbox sur ``input_size``)."""
+
+    import cv2
+
+    width, height = model.input_size
+    im_ratio = float(image.shape[0]) / image.shape[1]
+    if im_ratio > float(height) / width:
+        new_height = height
+        new_width = int(new_height / im_ratio)
+    else:
+        new_width = width
+        new_height = int(new_width * im_ratio)
+    resized = cv2.resize(image, (new_width, new_height))
+    det_img = np.zeros((height, width, 3), dtype=np.uint8)
+    det_img[:new_height, :new_width, :] = resized
+    return cv2.dnn.blobFromImage(
+        det_img, 1.0 / model.input_std, (width, height),
+        (model.input_mean,) * 3, swapRB=True,
+    )
+
+
+def _landmark_blob(model, image: np.ndarray, face) -> np.ndarray:
+    """Reproduit le prétraitement 2d106det (recadrage centré 1.5x la bbox)."""
+
+    import cv2
+    from insightface.utils import face_align
+
+    bbox = face.bbox
+    w, h = bbox[2] - bbox[0], bbox[3] - bbox[1]
+    center = ((bbox[2] + bbox[0]) / 2, (bbox[3] + bbox[1]) / 2)
+    size = model.input_size[0]
+    scale = size / (max(w, h) * 1.5)
+    aimg, _ = face_align.transform(image, center, size, scale, 0)
+    return cv2.dnn.blobFromImage(
+        aimg, 1.0 / model.input_std, tuple(model.input_size),
+        (model.input_mean,) * 3, swapRB=True,
+    )
+
+
+def _recognition_blob(model, image: np.ndarray, face) -> np.ndarray:
+    """Reproduit le prétraitement ArcFace (alignement 5 points, 112x112)."""
+
+    import cv2
+    from insightface.utils import face_align
+
+    aimg = face_align.norm_crop(image, landmark=face.kps, image_size=model.input_size[0])
+    return cv2.dnn.blobFromImage(
+        aimg, 1.0 / model.input_std, tuple(model.input_size),
+        (model.input_mean,) * 3, swapRB=True,
+    )
+
+
+def build_calibration_blobs(
+    model_name: str,
+    image_dir: str,
+    tasks: Iterable[str],
+    limit: Optional[int] = None,
+) -> Dict[str, List[np.ndarray]]:
+    """Calcule les entrées de calibration de chaque module à partir du FP32."""
+
+    tasks = list(tasks)
+    app = create_face_analysis(model_name, precision=PRECISION_FP32)
+    blobs: Dict[str, List[np.ndarray]] = {task: [] for task in tasks}
+    needs_faces = any(task != "detection" for task in tasks)
+
+    for _, image in iter_sample_images(image_dir, limit):
+        if "detection" in blobs:
+            blobs["detection"].append(_detection_blob(app.det_model, image))
+        faces = app.get(image) if needs_faces else []
+        for face in faces:
+            if LANDMARK_TASK in blobs:
+                blobs[LANDMARK_TASK].append(_landmark_blob(app.models[LANDMARK_TASK], image, face))
+            if RECOGNITION_TASK in blobs:
+                blobs[RECOGNITION_TASK].append(_recognition_blob(app.models[RECOGNITION_TASK], image, face))
+
+    for task, task_blobs in blobs.items():
+        logger.info("Calibration %s: %s échantillon(s)", task, len(task_blobs))
+        if not task_blobs:
+            raise ValueError(f"Aucun échantillon de calibration pour {task} dans {image_dir}")
+    return blobs
+
+
+def _quantize_static(source: str, target: str, blobs: Sequence[np.ndarray]) -> None:
+    import onnxruntime as ort
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+
+    input_name = ort.InferenceSession(source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        model_input = source
+        try:
+            from onnxruntime.quantization.shape_inference import quant_pre_process
+
+            model_input = os.path.join(tmp_dir, "preprocessed.onnx")
+            quant_pre_process(source, model_input)
+        except Exception as exc:  # pragma: no cover - dépend de la version d'onnxruntime
+            logger.debug("Pré-traitement de quantification ignoré pour %s: %s", source, exc)
+            model_input = source
+
+        quantize_static(
+            model_input,
+            target,
+            _BlobCalibrationReader(input_name, blobs),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+
+
+def _quantize_dynamic(source: str, target: str) -> None:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    # ConvInteger n'accepte que des poids uint8 sur CPU
+    quantize_dynamic(source, target, weight_type=QuantType.QUInt8)
+
+
+def quantize_model_pack(
+    model_name: str = "buffalo_l",
+    *,
+    mode: str = "static",
+    calibration_dir: Optional[str] = None,
+    include_recognition: bool = False,
+    calibration_limit: Optional[int] = 200,
+) -> Dict[str, Any]:
+    """Produit le pack ``<model_name>_int8`` et son manifeste.
+
+    Les modules non quantifiés (reconnaissance par défaut, genderage, 1k3d68)
+    sont copiés à l'identique pour que ``FaceAnalysis`` trouve un pack complet.
+    """
+
+    from insightface.model_zoo import get_model
+
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Mode de quantification inconnu: {mode}")
+    if mode == "static" and not calibration_dir:
+        raise ValueError("La quantification statique nécessite un dossier de calibration.")
+
+    source_dir = model_pack_dir(model_name)
+    if not os.path.isdir(source_dir):
+        raise ValueError(f"Pack InsightFace introuvable: {source_dir}")
+    target_dir = model_pack_dir(quantized_pack_name(model_name))
+    os.makedirs(target_dir, exist_ok=True)
+
+    tasks_to_quantize = list(QUANTIZABLE_TASKS)
+    if include_recognition:
+        tasks_to_quantize.append(RECOGNITION_TASK)
+
+    blobs: Dict[str, List[np.ndarray]] = {}
+    if mode == "static":
+        blobs = build_calibration_blobs(model_name, calibration_dir, tasks_to_quantize, calibration_limit)
+
+    quantized: Dict[str, str] = {}
+    for filename in sorted(os.listdir(source_dir)):
+        if not filename.endswith(".onnx"):
+            continue
+        source = os.path.join(source_dir, filename)
+        target = os.path.join(target_dir, filename)
+        task = getattr(get_model(source, providers=["CPUExecutionProvider"]), "taskname", None)
+
+        if task not in tasks_to_quantize:
+            shutil.copy2(source, target)
+            logger.info("%s (%s) copié en FP32", filename, task)
+            continue
+
+        started = time.monotonic()
+        if mode == "static":
+            _quantize_static(source, target, blobs[task])
+        else:
+            _quantize_dynamic(source, target)
+        quantized[task] = filename
+        logger.info(
+            "%s (%s) quantifié en INT8 %s en %.1fs",
+            filename, task, mode, time.monotonic() - started,
+        )
+
+    try:
+        import onnxruntime as ort
+
+        ort_version = ort.__version__
+    except Exception:  # pragma: no cover - onnxruntime absent
+        ort_version = None
+
+    manifest = {
+        "source": model_name,
+        "mode": mode,
+        "modules": sorted(quantized),
+        "fichiers": quantized,
+        "echantillons_calibration": {task: len(task_blobs) for task, task_blobs in blobs.items()},
+        "onnxruntime": ort_version,
+        "cree_le": timezone.now().isoformat(),
+    }
+    with open(os.path.join(target_dir, QUANTIZATION_MANIFEST), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2, ensure_ascii=False)
+    return manifest
+
+
+def _bbox_iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+def _landmark_error(face_fp32, face_int8) -> Optional[float]:
+    """Écart quadratique moyen des 106 points, rapporté à la taille du visage FP32."""
+
+    points_fp32 = getattr(face_fp32, LANDMARK_TASK, None)
+    points_int8 = getattr(face_int8, LANDMARK_TASK, None)
+    if points_fp32 is None or points_int8 is None:
+        return None
+    x1, y1, x2, y2 = face_fp32.bbox[:4]
+    size = float(np.sqrt(max(1.0, (x2 - x1) * (y2 - y1))))
+    diff = np.asarray(points_fp32, dtype=np.float32) - np.asarray(points_int8, dtype=np.float32)
+    return float(np.sqrt((diff ** 2).sum(axis=1).mean())) / size
+
+
+@dataclass
+class QuantizationReport:
+    """Résultat de la comparaison FP32 / INT8 sur un jeu d'images."""
+
+    images: int = 0
+    visages_fp32: int = 0
+    visages_apparies: int = 0
+    cosinus: List[float] = field(default_factory=list)
+    erreurs_landmarks: List[float] = field(default_factory=list)
+    cpu_fp32_s: float = 0.0
+    cpu_int8_s: float = 0.0
+    accord_decisions: Dict[str, float] = field(default_factory=dict)
+    decisions_inversees: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def rappel_detection(self) -> float:
+        return self.visages_apparies / self.visages_fp32 if self.visages_fp32 else 1.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        cosinus = np.asarray(self.cosinus, dtype=np.float32)
+        landmarks = np.asarray(self.erreurs_landmarks, dtype=np.float32)
+        return {
+            "images": self.images,
+            "visages_fp32": self.visages_fp32,
+            "visages_apparies": self.visages_apparies,
+            "rappel_detection": round(self.rappel_detection, 4),
+            "cosinus_moyen": float(cosinus.mean()) if cosinus.size else None,
+            "cosinus_min": float(cosinus.min()) if cosinus.size else None,
+            "cosinus_p01": float(np.percentile(cosinus, 1)) if cosinus.size else None,
+            "landmarks_erreur_moyenne": float(landmarks.mean()) if landmarks.size else None,
+            "landmarks_erreur_p99": float(np.percentile(landmarks, 99)) if landmarks.size else None,
+            "cpu_fp32_ms_par_image": 1000.0 * self.cpu_fp32_s / self.images if self.images else None,
+            "cpu_int8_ms_par_image": 1000.0 * self.cpu_int8_s / self.images if self.images else None,
+            "acceleration_cpu": self.cpu_fp32_s / self.cpu_int8_s if self.cpu_int8_s else None,
+            "accord_decisions": self.accord_decisions,
+            "decisions_inversees": self.decisions_inversees,
+        }
+
+
+def evaluate_quantized_pack(
+    model_name: str,
+    image_dir: str,
+    *,
+    thresholds: Sequence[float] = DEFAULT_DECISION_THRESHOLDS,
+    limit: Optional[int] = None,
+    iou_threshold: float = 0.5,
+) -> QuantizationReport:
+    """Compare le pack ``<model_name>_int8`` au FP32 sur un dossier de visages.
+
+    Les décisions de correspondance sont comparées sur toutes les paires de
+    visages appariés : une paire est « inversée » si elle passe un seuil en
+    FP32 et pas en INT8 (ou l'inverse). Si le pack quantifie les 106 points de
+    repère, leur écart au FP32 est mesuré sur les mêmes visages (erreur
+    quadratique moyenne rapportée à la taille du visage).
+    """
+
+    pack_name = quantized_pack_name(model_name)
+    manifest = read_quantization_manifest(pack_name)
+    if manifest is None:
+        raise ValueError(f"Pack quantifié introuvable: {model_pack_dir(pack_name)}")
+
+    modules = ["detection", RECOGNITION_TASK]
+    if LANDMARK_TASK in manifest.get("modules", ()):
+        modules.append(LANDMARK_TASK)
+    fp32 = create_face_analysis(model_name, allowed_modules=modules, precision=PRECISION_FP32)
+    # Chargement direct du pack (même s'il quantifie la reconnaissance)
+    int8 = create_face_analysis(pack_name, allowed_modules=modules, precision=PRECISION_FP32)
+
+    report = QuantizationReport()
+    embeddings_fp32: List[np.ndarray] = []
+    embeddings_int8: List[np.ndarray] = []
+
+    for name, image in iter_sample_images(image_dir, limit):
+        started = time.process_time()
+        faces_fp32 = fp32.get(image)
+        report.cpu_fp32_s += time.process_time() - started
+
+        started = time.process_time()
+        faces_int8 = int8.get(image)
+        report.cpu_int8_s += time.process_time() - started
+
+        report.images += 1
+        report.visages_fp32 += len(faces_fp32)
+
+        for face in faces_fp32:
+            best = max(faces_int8, key=lambda other: _bbox_iou(face.bbox, other.bbox), default=None)
+            if best is None or _bbox_iou(face.bbox, best.bbox) < iou_threshold:
+                logger.info("%s: visage FP32 non retrouvé en INT8", name)
+                continue
+            report.visages_apparies += 1
+            landmark_error = _landmark_error(face, best)
+            if landmark_error is not None:
+                report.erreurs_landmarks.append(landmark_error)
+            emb_fp32 = np.asarray(face.normed_embedding, dtype=np.float32)
+            emb_int8 = np.asarray(best.normed_embedding, dtype=np.float32)
+            report.cosinus.append(float(emb_fp32 @ emb_int8))
+            embeddings_fp32.append(emb_fp32)
+            embeddings_int8.append(emb_int8)
+
+    if len(embeddings_fp32) >= 2:
+        sims_fp32 = np.stack(embeddings_fp32) @ np.stack(embeddings_fp32).T
+        sims_int8 = np.stack(embeddings_int8) @ np.stack(embeddings_int8).T
+        upper = np.triu_indices(len(embeddings_fp32), k=1)
+        sims_fp32, sims_int8 = sims_fp32[upper], sims_int8[upper]
+        for threshold in thresholds:
+            same = (sims_fp32 >= threshold) == (sims_int8 >= threshold)
+            key = f"{threshold:.2f}"
+            report.accord_decisions[key] = float(same.mean())
+            report.decisions_inversees[key] = int((~same).sum())
+
+    return report
+
+
+__all__ = [
+    "DEFAULT_DECISION_THRESHOLDS",
+    "QUANTIZATION_MODES",
+    "QuantizationReport",
+    "build_calibration_blobs",
+    "evaluate_quantized_pack",
+    "iter_sample_images",
+    "quantize_model_pack",
+]
@@ -0,0 +1,175 @@
+"""Mise en forme compacte des réponses biométriques.
+
+Les réponses d'enrôlement et de recherche embarquaient systématiquement le
+face crop en base64, l'embedding 512-d, les 106 landmarks et parfois le
+FaceMesh. Ce module retire ces champs lourds par défaut : seuls les
+identifiants, scores et URLs sont renvoyés. Le client demande explicitement
+les champs supplémentaires via ``?include=embedding,landmarks,crop`` et peut
+recevoir les embeddings en float16 encodé base64 via ``?embedding_format=f16``.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple
+
+import numpy as np
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+# Groupes de champs lourds : nom du groupe (valeur de ?include=) -> clés JSON
+HEAVY_FIELD_GROUPS: Dict[str, Tuple[str, ...]] = {
+    "embedding": (
+        "embedding",
+        "embedding512",
+        "embedding_512",
+        "encodage_facial",
+        "query_embedding",
+        "face_embedding",
+    ),
+    "landmarks": ("landmarks", "landmarks106", "landmarks_106"),
+    "crop": ("face_crop",),
+    "facemesh": ("facemesh468", "facemesh_468"),
+    "morphable": ("morphable3d", "morphable_3d"),
+}
+
+EMBEDDING_FORMAT_LIST = "list"
+EMBEDDING_FORMAT_F16 = "f16"
+EMBEDDING_FORMATS = (EMBEDDING_FORMAT_LIST, EMBEDDING_FORMAT_F16)
+
+_FIELD_TO_GROUP: Dict[str, str] = {
+    field: group for group, fields in HEAVY_FIELD_GROUPS.items() for field in fields
+}
+
+
+def encode_embedding_f16(vector: Any) -> Optional[Dict[str, Any]]:
+    """Encode un embedding en float16 little-endian base64.
+
+    Retourne ``None`` si la valeur n'est pas un vecteur numérique exploitable.
+    """
+
+    if isinstance(vector, str):
+        try:
+            vector = json.loads(vector)
+        except ValueError:
+            return None
+
+    try:
+        array = np.asarray(vector, dtype="<f2").reshape(-1)
+    except (TypeError, ValueError):
+        return None
+
+    if array.size == 0:
+        return None
+
+    return {
+        "dtype": "float16",
+        "dim": int(array.size),
+        "b64": base64.b64encode(array.tobytes()).decode("ascii"),
+    }
+
+
+def decode_embedding_f16(payload: Dict[str, Any]) -> np.ndarray:
+    """Inverse de :func:`encode_embedding_f16` (float32 en sortie)."""
+
+    raw = base64.b64decode(payload["b64"])
+    return np.frombuffer(raw, dtype="<f2").astype(np.float32)
+
+
+@dataclass(frozen=True)
+class ResponseShape:
+    """Options de mise en forme demandées par le client."""
+
+    include: FrozenSet[str] = frozenset()
+    embedding_format: str = EMBEDDING_FORMAT_LIST
+
+    @classmethod
+    def from_request(cls, request) -> "ResponseShape":
+        params = getattr(request, "query_params", None) or getattr(request, "GET", {})
+        raw_include = params.get("include", "") or ""
+        include = cls._parse_include(raw_include.split(","))
+
+        embedding_format = (params.get("embedding_format") or EMBEDDING_FORMAT_LIST).lower()
+        if embedding_format not in EMBEDDING_FORMATS:
+            embedding_format = EMBEDDING_FORMAT_LIST
+
+        return cls(include=include, embedding_format=embedding_format)
+
+    @staticmethod
+    def _parse_include(values: Iterable[str]) -> FrozenSet[str]:
+        include = set()
+        for value in values:
+            name = value.strip().lower()
+            if not name:
+                continue
+            if name == "all":
+                return frozenset(HEAVY_FIELD_GROUPS)
+            if name in HEAVY_FIELD_GROUPS:
+                include.add(name)
+        return frozenset(include)
+
+    def keeps(self, key: str) -> bool:
+        group = _FIELD_TO_GROUP.get(key)
+        return group is None or group in self.include
+
+    def shape(self, payload: Any) -> Any:
+        """Retire récursivement les champs lourds non demandés."""
+
+        if isinstance(payload, dict):
+            shaped = {}
+            for key, value in payload.items():
+                group = _FIELD_TO_GROUP.get(key)
+                if group is None:
+                    shaped[key] = self.shape(value)
+                    continue
+                if group not in self.include:
+                    continue
+                if group == "embedding" and self.embedding_format == EMBEDDING_FORMAT_F16:
+                    encoded = encode_embedding_f16(value)
+                    shaped[key] = encoded if encoded is not None else value
+                else:
+                    shaped[key] = value
+            return shaped
+
+        if isinstance(payload, (list, tuple)):
+            return [self.shape(item) for item in payload]
+
+        return payload
+
+
+def shape_biometric_payload(payload: Any, request=None) -> Any:
+    """Applique la mise en forme compacte à un payload déjà construit."""
+
+    shape = ResponseShape.from_request(request) if request is not None else ResponseShape()
+    return shape.shape(payload)
+
+
+class BiometricResponseShapingMixin:
+    """Mixin DRF : compacte ``response.data`` avant le rendu JSON.
+
+    Le filtrage intervient dans ``finalize_response``, donc avant que le
+    renderer ne sérialise les flottants : les champs retirés ne coûtent rien.
+    """
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if isinstance(response, Response) and isinstance(response.data, (dict, list)):
+            try:
+                response.data = shape_biometric_payload(response.data, request)
+            except Exception as exc:  # pragma: no cover - protection runtime
+                logger.warning("Mise en forme de la réponse biométrique impossible: %s", exc)
+        return response
+
+
+__all__ = [
+    "BiometricResponseShapingMixin",
+    "HEAVY_FIELD_GROUPS",
+    "ResponseShape",
+    "decode_embedding_f16",
+    "encode_embedding_f16",
+    "shape_biometric_payload",
+]
@@ -64,9 +64,11 @@ def check_existing_criminal_photo(
             return None
         
         # Récupérer toutes les photos biométriques actives avec embeddings
+        # produits par le même modèle que la requête
         photos_query = BiometriePhoto.objects.filter(
             est_active=True,
-            embedding_512__isnull=False
+            embedding_512__isnull=False,
+            embedding_version=arcface_service.embedding_version,
         ).select_related('criminel')
         
         # Exclure le criminel spécifié si fourni
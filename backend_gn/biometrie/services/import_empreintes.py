@@ -0,0 +1,369 @@
+"""
+Import en masse d'empreintes digitales (fiches décadactylaires numérisées).
+
+La source est un dossier ou une archive (.zip, .tar, .tar.gz) contenant les
+images et un manifeste CSV (``manifest.csv`` par défaut, séparateur ``,``
+ou ``;``) avec les colonnes :
+
+- ``fichier`` : chemin de l'image relatif à la source ;
+- ``numero_fiche`` ou ``criminel_id`` : fiche criminelle ;
+- ``doigt`` : valeur de ``BiometrieEmpreinte.DOIGT_CHOICES``.
+
+Les lignes sont traitées par lots de ``FINGERPRINT_IMPORT_CHUNK_SIZE`` :
+les gabarits sont extraits dans un pool de processus pendant que le lot
+précédent est écrit en base (un ``bulk_create`` par lot, mise à jour si
+l'empreinte (criminel, doigt) existe déjà). Après chaque lot, un point de
+reprise JSON est écrit : une relance reprend à la première ligne non traitée.
+Les lignes en erreur sont ajoutées à un rapport CSV à côté du point de reprise.
+
+Les enregistrements en masse ne déclenchent pas les signaux ``post_save`` :
+les workers web intègrent les nouvelles empreintes au rafraîchissement
+incrémental suivant de leur index (``FINGERPRINT_INDEX_REFRESH``).
+"""
+
+import csv
+import hashlib
+import io
+import json
+import logging
+import multiprocessing
+import os
+import tarfile
+import time
+import zipfile
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+
+from biometrie.empreintes.batch import extract_template, init_worker
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MANIFEST = 'manifest.csv'
+_UPDATE_FIELDS = [
+    'image', 'taille_fichier', 'qualite', 'minuties', 'nombre_minuties',
+    'encodage_empreinte', 'est_active', 'enregistre_par', 'date_mise_a_jour',
+]
+
+
+class ImportSource:
+    """Lecture des fichiers d'un dossier ou d'une archive."""
+
+    def __init__(self, path: str) -> None:
+        self.path = os.path.abspath(path)
+        self._zip: Optional[zipfile.ZipFile] = None
+        self._tar: Optional[tarfile.TarFile] = None
+        if os.path.isdir(self.path):
+            return
+        if not os.path.isfile(self.path):
+            raise ValueError(f"Source introuvable: {path}")
+        if zipfile.is_zipfile(self.path):
+            self._zip = zipfile.ZipFile(self.path)
+        elif tarfile.is_tarfile(self.path):
+            self._tar = tarfile.open(self.path)
+        else:
+            raise ValueError(f"Format de source non supporté (dossier, .zip ou .tar attendu): {path}")
+
+    def read(self, name: str) -> bytes:
+        """Raises: FileNotFoundError si le fichier est absent de la source."""
+        name = name.strip().replace('\\', '/').lstrip('/')
+        if self._zip is not None:
+            try:
+                return self._zip.read(name)
+            except KeyError:
+                raise FileNotFoundError(name) from None
+        if self._tar is not None:
+            try:
+                member = self._tar.extractfile(name)
+            except KeyError:
+                member = None
+            if member is None:
+                raise FileNotFoundError(name)
+            return member.read()
+        full_path = os.path.normpath(os.path.join(self.path, name))
+        if os.path.commonpath([full_path, self.path]) != self.path:
+            raise FileNotFoundError(name)
+        with open(full_path, 'rb') as handle:
+            return handle.read()
+
+    def close(self) -> None:
+        for archive in (self._zip, self._tar):
+            if archive is not None:
+                archive.close()
+
+
+def parse_manifest(data: bytes) -> List[Dict[str, str]]:
+    """Lignes du manifeste (en-têtes en minuscules), dans l'ordre du fichier."""
+    text = data.decode('utf-8-sig')
+    try:
+        dialect = csv.Sniffer().sniff(text[:4096], delimiters=',;\t')
+    except csv.Error:
+        dialect = csv.excel
+    reader = csv.DictReader(io.StringIO(text), dialect=dialect)
+    headers = {(name or '').strip().lower() for name in reader.fieldnames or []}
+    if 'fichier' not in headers or 'doigt' not in headers or not headers & {'numero_fiche', 'criminel_id'}:
+        raise ValueError("Manifeste invalide: colonnes fichier, doigt et numero_fiche ou criminel_id requises")
+    return [
+        {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        for row in reader
+    ]
+
+
+@dataclass
+class _PendingRow:
+    ligne: int
+    row: Dict[str, str]
+    data: bytes = b''
+    future: Optional[Future] = None
+    erreur: Optional[str] = None
+
+
+class FingerprintImportJob:
+    """Import d'un manifeste d'empreintes avec reprise sur point de contrôle."""
+
+    def __init__(
+        self,
+        source: str,
+        manifest: Optional[str] = None,
+        *,
+        checkpoint: Optional[str] = None,
+        workers: Optional[int] = None,
+        chunk_size: Optional[int] = None,
+        enregistre_par_id: Optional[int] = None,
+    ) -> None:
+        self.source_path = source
+        self.manifest = manifest or DEFAULT_MANIFEST
+        self.workers = workers or getattr(settings, 'FINGERPRINT_IMPORT_WORKERS', 0) or max(1, (os.cpu_count() or 2) - 1)
+        self.chunk_size = chunk_size or getattr(settings, 'FINGERPRINT_IMPORT_CHUNK_SIZE', 200)
+        self.enregistre_par_id = enregistre_par_id
+        self.ridge_period = getattr(settings, 'FINGERPRINT_RIDGE_PERIOD', 9.0)
+        base = os.path.abspath(source)
+        if checkpoint:
+            self.checkpoint_path = checkpoint
+        elif os.path.isdir(base):
+            self.checkpoint_path = os.path.join(base, '.import_empreintes.json')
+        else:
+            self.checkpoint_path = base + '.import.json'
+        self.error_report_path = os.path.splitext(self.checkpoint_path)[0] + '.erreurs.csv'
+
+    # ------------------------------------------------------------------
+    # Point de reprise et rapport d'erreurs
+    # ------------------------------------------------------------------
+
+    def _load_checkpoint(self, manifest_hash: str, total: int, restart: bool) -> Dict[str, Any]:
+        fresh = {
+            'source': os.path.abspath(self.source_path),
+            'manifeste_sha1': manifest_hash,
+            'total': total,
+            'prochaine_ligne': 0,
+            'importes': 0,
+            'echecs': 0,
+            'demarre_le': timezone.now().isoformat(),
+        }
+        if restart or not os.path.exists(self.checkpoint_path):
+            if os.path.exists(self.error_report_path):
+                os.remove(self.error_report_path)
+            return fresh
+        with open(self.checkpoint_path, 'r', encoding='utf-8') as handle:
+            state = json.load(handle)
+        if state.get('manifeste_sha1') != manifest_hash:
+            raise ValueError(
+                "Le manifeste a changé depuis le point de reprise "
+                f"({self.checkpoint_path}) : relancez avec restart"
+            )
+        return state
+
+    def _save_checkpoint(self, state: Dict[str, Any]) -> None:
+        state['mis_a_jour_le'] = timezone.now().isoformat()
+        tmp_path = self.checkpoint_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as handle:
+            json.dump(state, handle, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def _report_errors(self, errors: List[Tuple[int, str, str]]) -> None:
+        if not errors:
+            return
+        new_file = not os.path.exists(self.error_report_path)
+        with open(self.error_report_path, 'a', encoding='utf-8', newline='') as handle:
+            writer = csv.writer(handle)
+            if new_file:
+                writer.writerow(['ligne', 'fichier', 'erreur'])
+            writer.writerows(errors)
+
+    # ------------------------------------------------------------------
+    # Exécution
+    # ------------------------------------------------------------------
+
+    def _make_pool(self) -> Executor:
+        if multiprocessing.current_process().daemon:
+            # Worker Celery prefork : un processus démon ne peut pas créer de processus
+            logger.warning("Import d'empreintes depuis un processus démon : extraction par threads")
+            return ThreadPoolExecutor(max_workers=self.workers, initializer=init_worker)
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker)
+
+    def run(self, *, restart: bool = False) -> Dict[str, Any]:
+        """
+        Importe les lignes restantes du manifeste.
+
+        Raises:
+            ValueError: Source ou manifeste invalide, manifeste modifié depuis le point de reprise.
+        """
+        source = ImportSource(self.source_path)
+        try:
+            # Manifeste cherché dans la source, sinon sur le disque
+            try:
+                manifest_data = source.read(self.manifest)
+            except (FileNotFoundError, OSError):
+                if not os.path.isfile(self.manifest):
+                    raise ValueError(f"Manifeste introuvable: {self.manifest}") from None
+                with open(self.manifest, 'rb') as handle:
+                    manifest_data = handle.read()
+            rows = parse_manifest(manifest_data)
+            state = self._load_checkpoint(hashlib.sha1(manifest_data).hexdigest(), len(rows), restart)
+            return self._run_chunks(source, rows, state)
+        finally:
+            source.close()
+
+    def _run_chunks(self, source: ImportSource, rows: List[Dict[str, str]], state: Dict[str, Any]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        start_row = state['prochaine_ligne']
+        processed = 0
+        pool = self._make_pool()
+        try:
+            pending: Optional[List[_PendingRow]] = None
+            for offset in range(start_row, len(rows), self.chunk_size):
+                # Extraction du lot suivant pendant l'écriture du lot courant
+                submitted = self._submit(pool, source, rows, offset)
+                if pending is not None:
+                    processed += self._finish(pending, state)
+                pending = submitted
+            if pending is not None:
+                processed += self._finish(pending, state)
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        state['termine_le'] = timezone.now().isoformat()
+        self._save_checkpoint(state)
+        summary = dict(state)
+        summary.update({
+            'lignes_traitees': processed,
+            'duree_s': round(elapsed, 1),
+            'debit_par_heure': int(processed / elapsed * 3600) if elapsed > 0 else None,
+            'point_de_reprise': self.checkpoint_path,
+            'rapport_erreurs': self.error_report_path if state['echecs'] else None,
+        })
+        return summary
+
+    def _submit(self, pool: Executor, source: ImportSource, rows: List[Dict[str, str]], offset: int) -> List[_PendingRow]:
+        chunk = []
+        for ligne in range(offset, min(offset + self.chunk_size, len(rows))):
+            item = _PendingRow(ligne=ligne + 1, row=rows[ligne])
+            fichier = item.row.get('fichier', '')
+            if not fichier:
+                item.erreur = 'fichier manquant'
+            else:
+                try:
+                    item.data = source.read(fichier)
+                except (FileNotFoundError, OSError) as exc:
+                    item.erreur = f'fichier illisible: {exc}'
+            if item.erreur is None:
+                item.future = pool.submit(extract_template, (item.ligne, item.data, self.ridge_period))
+            chunk.append(item)
+        return chunk
+
+    def _resolve_criminals(self, chunk: List[_PendingRow]) -> Dict[Tuple[str, str], int]:
+        from criminel.models import CriminalFicheCriminelle
+
+        numeros = {item.row.get('numero_fiche') for item in chunk if item.row.get('numero_fiche')}
+        ids = {item.row.get('criminel_id') for item in chunk if item.row.get('criminel_id', '').isdigit()}
+        resolved: Dict[Tuple[str, str], int] = {}
+        if numeros:
+            for numero, pk in CriminalFicheCriminelle.objects.filter(numero_fiche__in=numeros).values_list('numero_fiche', 'id'):
+                resolved[('numero_fiche', numero)] = pk
+        if ids:
+            for pk in CriminalFicheCriminelle.objects.filter(id__in=[int(i) for i in ids]).values_list('id', flat=True):
+                resolved[('criminel_id', str(pk))] = pk
+        return resolved
+
+    def _finish(self, chunk: List[_PendingRow], state: Dict[str, Any]) -> int:
+        from biometrie.models import BiometrieEmpreinte
+
+        doigts_valides = {choice[0] for choice in BiometrieEmpreinte.DOIGT_CHOICES}
+        criminals = self._resolve_criminals(chunk)
+        image_field = BiometrieEmpreinte._meta.get_field('image')
+        errors: List[Tuple[int, str, str]] = []
+        objects: Dict[Tuple[int, str], BiometrieEmpreinte] = {}
+        stored: List[str] = []
+
+        for item in chunk:
+            row = item.row
+            fichier = row.get('fichier', '')
+            if item.erreur is None:
+                if row.get('numero_fiche'):
+                    criminel_id = criminals.get(('numero_fiche', row['numero_fiche']))
+                else:
+                    criminel_id = criminals.get(('criminel_id', row.get('criminel_id', '')))
+                if criminel_id is None:
+                    item.erreur = 'fiche criminelle introuvable'
+                elif row.get('doigt') not in doigts_valides:
+                    item.erreur = f"doigt inconnu: {row.get('doigt')}"
+            result = item.future.result() if item.future is not None else {}
+            if item.erreur is None and result.get('erreur'):
+                item.erreur = f"extraction impossible: {result['erreur']}"
+            if item.erreur is not None:
+                errors.append((item.ligne, fichier, item.erreur))
+                continue
+
+            name = image_field.generate_filename(None, os.path.basename(fichier))
+            name = image_field.storage.save(name, ContentFile(item.data))
+            stored.append(name)
+            # Une même empreinte (criminel, doigt) présente deux fois dans le lot : la dernière l'emporte
+            objects[(criminel_id, row['doigt'])] = BiometrieEmpreinte(
+                criminel_id=criminel_id,
+                doigt=row['doigt'],
+                image=name,
+                taille_fichier=len(item.data),
+                qualite=result['qualite'],
+                minuties=result['minuties'],
+                nombre_minuties=result['nombre_minuties'],
+                encodage_empreinte=result['encodage_empreinte'],
+                est_active=True,
+                enregistre_par_id=self.enregistre_par_id,
+            )
+
+        if objects:
+            try:
+                with transaction.atomic():
+                    BiometrieEmpreinte.objects.bulk_create(
+                        list(objects.values()),
+                        update_conflicts=True,
+                        unique_fields=['criminel', 'doigt'],
+                        update_fields=_UPDATE_FIELDS,
+                    )
+            except Exception:
+                # Lot non écrit : images retirées, le point de reprise reste sur le lot précédent
+                for name in stored:
+                    image_field.storage.delete(name)
+                raise
+
+        self._report_errors(errors)
+        state['importes'] += len(objects)
+        state['echecs'] += len(errors)
+        state['prochaine_ligne'] = chunk[-1].ligne
+        self._save_checkpoint(state)
+        logger.info(
+            "Import empreintes: lignes %s-%s, %s importée(s), %s erreur(s) (total %s/%s)",
+            chunk[0].ligne,
+            chunk[-1].ligne,
+            len(objects),
+            len(errors),
+            state['prochaine_ligne'],
+            state['total'],
+        )
+        return len(chunk)
@@ -0,0 +1,266 @@
+"""
+Ré-embedding en arrière-plan de la galerie faciale lors d'un changement de modèle.
+
+Le job parcourt chaque source d'embeddings par lots (pagination sur la clé
+primaire), ré-encode l'image d'origine avec le modèle de la version cible puis
+met à jour la ligne de façon conditionnelle (seulement si elle porte encore
+l'ancienne version). Une pause entre les lots limite la charge sur le serveur.
+Pendant toute la durée du job, la recherche interroge les deux versions ; la
+bascule n'a lieu qu'une fois toutes les lignes migrées.
+"""
+
+import json
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.utils import timezone
+
+from biometrie.embedding_versions import (
+    cutover_embedding_version,
+    get_arcface_for_version,
+    get_version_state,
+    record_migration_progress,
+    start_embedding_migration,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _biometrie_queryset():
+    from biometrie.models import Biometrie
+    return Biometrie.objects.filter(encodage_facial__isnull=False)
+
+
+def _biometrie_photo_queryset():
+    from biometrie.models import BiometriePhoto
+    return BiometriePhoto.objects.filter(embedding_512__isnull=False)
+
+
+def _ia_embedding_queryset():
+    from intelligence_artificielle.models import IAFaceEmbedding
+    return IAFaceEmbedding.objects.filter(actif=True, embedding_vector__isnull=False)
+
+
+def _upr_queryset():
+    from upr.models import UnidentifiedPerson
+    return UnidentifiedPerson.objects.filter(face_embedding__isnull=False)
+
+
+@dataclass(frozen=True)
+class ReembeddingSource:
+    """Table contenant des embeddings à régénérer depuis une image stockée.
+
+    ``build_update`` renseigne aussi l'horodatage ``auto_now`` de la table :
+    ``QuerySet.update()`` ne le met pas à jour, et les deltas de l'instantané
+    galerie s'appuient dessus.
+    """
+
+    nom: str
+    queryset: Callable[[], Any]
+    image_field: str
+    build_update: Callable[[List[float]], Dict[str, Any]]
+
+
+REEMBEDDING_SOURCES = (
+    ReembeddingSource(
+        nom='biometrie',
+        queryset=_biometrie_queryset,
+        image_field='photo',
+        build_update=lambda embedding: {'encodage_facial': embedding},
+    ),
+    ReembeddingSource(
+        nom='biometrie_photo',
+        queryset=_biometrie_photo_queryset,
+        image_field='image',
+        build_update=lambda embedding: {
+            'embedding_512': embedding,
+            'encodage_facial': json.dumps(embedding),
+            'date_mise_a_jour': timezone.now(),
+        },
+    ),
+    ReembeddingSource(
+        nom='ia_face_embedding',
+        queryset=_ia_embedding_queryset,
+        image_field='image_capture',
+        build_update=lambda embedding: {'embedding_vector': embedding, 'mis_a_jour_le': timezone.now()},
+    ),
+    ReembeddingSource(
+        nom='upr',
+        queryset=_upr_queryset,
+        image_field='profil_face',
+        build_update=lambda embedding: {'face_embedding': embedding, 'updated_at': timezone.now()},
+    ),
+)
+
+
+@dataclass
+class SourceProgress:
+    traites: int = 0
+    echecs: int = 0
+    restants: int = 0
+    echecs_ids: List[int] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'traites': self.traites,
+            'echecs': self.echecs,
+            'restants': self.restants,
+            # Limiter la taille du JSON de progression
+            'echecs_ids': self.echecs_ids[:100],
+        }
+
+
+class GalleryReembeddingJob:
+    """Migre tous les embeddings vers ``target_version`` puis bascule."""
+
+    def __init__(
+        self,
+        target_version: str,
+        *,
+        chunk_size: Optional[int] = None,
+        pause_seconds: Optional[float] = None,
+        arcface_service=None,
+    ) -> None:
+        self.target_version = target_version
+        self.chunk_size = chunk_size or getattr(settings, 'REEMBEDDING_CHUNK_SIZE', 50)
+        self.pause_seconds = (
+            pause_seconds if pause_seconds is not None
+            else getattr(settings, 'REEMBEDDING_PAUSE_SECONDS', 0.5)
+        )
+        self._arcface = arcface_service
+        self.progress: Dict[str, SourceProgress] = {
+            source.nom: SourceProgress() for source in REEMBEDDING_SOURCES
+        }
+
+    @property
+    def arcface(self):
+        if self._arcface is None:
+            self._arcface = get_arcface_for_version(self.target_version)
+        return self._arcface
+
+    def run(self, *, cutover: bool = True, force_cutover: bool = False) -> Dict[str, Any]:
+        """Exécute la migration complète. Retourne la progression finale."""
+
+        start_embedding_migration(self.target_version)
+        started_at = timezone.now()
+
+        for source in REEMBEDDING_SOURCES:
+            self._migrate_source(source)
+
+        remaining = self.count_remaining()
+        summary = {
+            'version_cible': self.target_version,
+            'demarre_le': started_at.isoformat(),
+            'termine_le': timezone.now().isoformat(),
+            'restants': remaining,
+            'sources': {nom: progress.to_dict() for nom, progress in self.progress.items()},
+        }
+        record_migration_progress(summary)
+
+        if cutover and (remaining == 0 or force_cutover):
+            cutover_embedding_version(
+                self.target_version, remaining=remaining, force=force_cutover
+            )
+            summary['bascule'] = True
+        else:
+            summary['bascule'] = False
+            if remaining:
+                logger.warning(
+                    "Ré-embedding vers %s incomplet: %s ligne(s) restante(s), bascule différée",
+                    self.target_version,
+                    remaining,
+                )
+        return summary
+
+    def count_remaining(self) -> int:
+        total = 0
+        for source in REEMBEDDING_SOURCES:
+            count = source.queryset().exclude(embedding_version=self.target_version).count()
+            self.progress[source.nom].restants = count
+            total += count
+        return total
+
+    def _migrate_source(self, source: ReembeddingSource) -> None:
+        progress = self.progress[source.nom]
+        last_pk = 0
+
+        while True:
+            chunk = list(
+                source.queryset()
+                .exclude(embedding_version=self.target_version)
+                .filter(pk__gt=last_pk)
+                .order_by('pk')
+                .only('pk', 'embedding_version', source.image_field)[:self.chunk_size]
+            )
+            if not chunk:
+                break
+
+            for instance in chunk:
+                last_pk = instance.pk
+                if self._reembed_instance(source, instance):
+                    progress.traites += 1
+                else:
+                    progress.echecs += 1
+                    progress.echecs_ids.append(instance.pk)
+
+            record_migration_progress({
+                'version_cible': self.target_version,
+                'source_en_cours': source.nom,
+                'sources': {nom: p.to_dict() for nom, p in self.progress.items()},
+            })
+            logger.info(
+                "Ré-embedding %s: %s traité(s), %s échec(s) (dernier id=%s)",
+                source.nom,
+                progress.traites,
+                progress.echecs,
+                last_pk,
+            )
+            if self.pause_seconds:
+                time.sleep(self.pause_seconds)
+
+    def _reembed_instance(self, source: ReembeddingSource, instance) -> bool:
+        image_file = getattr(instance, source.image_field, None)
+        if not image_file or not getattr(image_file, 'name', None):
+            logger.debug("%s #%s: aucune image source, ré-embedding impossible", source.nom, instance.pk)
+            return False
+
+        try:
+            with image_file.open('rb') as handle:
+                data = handle.read()
+            embedding = self.arcface.encode_image(data)
+        except Exception as exc:
+            logger.warning("%s #%s: ré-encodage impossible: %s", source.nom, instance.pk, exc)
+            return False
+
+        if embedding is None:
+            logger.debug("%s #%s: aucun visage détecté avec %s", source.nom, instance.pk, self.target_version)
+            return False
+
+        embedding_list = self.arcface.serialize_embedding(embedding)
+        updated = type(instance).objects.filter(
+            pk=instance.pk,
+            embedding_version=instance.embedding_version,
+        ).update(
+            embedding_version=self.target_version,
+            **source.build_update(embedding_list),
+        )
+        return bool(updated)
+
+
+def get_reembedding_status() -> Dict[str, Any]:
+    """Résumé de l'état du versionnement pour l'administration."""
+
+    from biometrie.models import EmbeddingVersionState
+
+    active, target = get_version_state(refresh=True)
+    state = EmbeddingVersionState.objects.filter(pk=1).first()
+    return {
+        'version_active': active,
+        'version_cible': target,
+        'migration_demarree_le': state.migration_demarree_le.isoformat() if state and state.migration_demarree_le else None,
+        'bascule_le': state.bascule_le.isoformat() if state and state.bascule_le else None,
+        'progression': state.progression if state else {},
+    }
@@ -0,0 +1,66 @@
+import logging
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from typing import Any, Callable
+    def shared_task(*args: Any, **kwargs: Any) -> Callable[[Callable], Callable]:
+        def decorator(func: Callable) -> Callable:
+            return func
+        return decorator
+else:
+    try:
+        from celery import shared_task  # type: ignore[import-untyped]
+        CELERY_AVAILABLE = True
+    except ImportError:
+        CELERY_AVAILABLE = False
+        def shared_task(*args, **kwargs):  # type: ignore[misc]
+            def decorator(func):
+                return func
+            return decorator
+
+
+@shared_task
+def reembed_gallery(target_version, chunk_size=None, pause_seconds=None, cutover=True, force_cutover=False):
+    """Ré-embedding de la galerie vers ``target_version`` (voir biometrie.services.reembedding)."""
+    from .services.reembedding import GalleryReembeddingJob
+
+    job = GalleryReembeddingJob(
+        target_version,
+        chunk_size=chunk_size,
+        pause_seconds=pause_seconds,
+    )
+    summary = job.run(cutover=cutover, force_cutover=force_cutover)
+    logger.info(
+        "Ré-embedding vers %s terminé (restants=%s, bascule=%s)",
+        target_version,
+        summary.get('restants'),
+        summary.get('bascule'),
+    )
+    return summary
+
+
+@shared_task
+def importer_empreintes(source, manifest=None, checkpoint=None, workers=None, chunk_size=None,
+                        enregistre_par_id=None, restart=False):
+    """Import en masse d'empreintes (voir biometrie.services.import_empreintes)."""
+    from .services.import_empreintes import FingerprintImportJob
+
+    job = FingerprintImportJob(
+        source,
+        manifest,
+        checkpoint=checkpoint,
+        workers=workers,
+        chunk_size=chunk_size,
+        enregistre_par_id=enregistre_par_id,
+    )
+    summary = job.run(restart=restart)
+    logger.info(
+        "Import d'empreintes %s terminé (importées=%s, erreurs=%s, débit=%s/h)",
+        source,
+        summary.get('importes'),
+        summary.get('echecs'),
+        summary.get('debit_par_heure'),
+    )
+    return summary
@@ -14,6 +14,7 @@ from .views import (
     BiometriePaumeViewSet,
     BiometrieScanResultatViewSet,
     BiometrieHistoriqueViewSet,
+    BiometrieProfilageAPIView,
 )
 
 # Router DRF pour les ViewSets
@@ -31,4 +32,5 @@ urlpatterns = [
     path('landmarks106/', Landmarks106APIView.as_view(), name='biometrie-landmarks106'),
     path('analyse/', AnalyseBiometriqueAPIView.as_view(), name='biometrie-analyse'),
     path('encoder/', EncodeVisageAPIView.as_view(), name='biometrie-encoder'),
+    path('profilage/', BiometrieProfilageAPIView.as_view(), name='biometrie-profilage'),
 ]
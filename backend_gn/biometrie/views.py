@@ -36,9 +36,14 @@ from .serializers import (
 from .arcface_service import ReconnaissanceFacialeService, BiometrieAuditService
 from .services.criminal_photo_verification import check_existing_criminal_photo
 from .face_recognition_service import ArcFaceRecognitionService
+from .embedding_versions import active_embedding_version
 from .face_106 import detect_106_landmarks
 from .pipeline import enrollement_pipeline, save_enrollement_to_biometrie, save_enrollement_to_biometrie_photo
+from .response_shaping import BiometricResponseShapingMixin
+from .profiling import REGISTRY as PROFILING_REGISTRY, BiometricProfilingMixin
+from .empreintes.service import enroler_empreinte, identifier_empreinte, retirer_de_index, synchroniser_index
 from criminel.models import CriminalFicheCriminelle
+from utilisateur.permissions import IsAdminUserRole
 import json
 import base64
 
@@ -48,10 +53,15 @@ logger = logging.getLogger(__name__)
 _arcface_service_instance = None
 
 def get_arcface_service():
-    """Retourne l'instance ArcFace (lazy loading - initialisé seulement à la première utilisation)."""
+    """Retourne l'instance ArcFace (lazy loading - initialisé seulement à la première utilisation).
+
+    L'instance est reconstruite quand la version d'embedding active change
+    (bascule ``reembed_gallery``), pour ne pas encoder avec l'ancien modèle.
+    """
     global _arcface_service_instance
-    if _arcface_service_instance is None:
-        _arcface_service_instance = ArcFaceRecognitionService()
+    version = active_embedding_version()
+    if _arcface_service_instance is None or _arcface_service_instance.embedding_version != version:
+        _arcface_service_instance = ArcFaceRecognitionService(embedding_version=version)
     return _arcface_service_instance
 
 # Pour compatibilité avec le code existant, créer un objet proxy
@@ -63,7 +73,7 @@ class ArcFaceServiceProxy:
 arcface_service = ArcFaceServiceProxy()
 
 
-class BiometrieEnregistrementAPIView(APIView):
+class BiometrieEnregistrementAPIView(BiometricProfilingMixin, APIView):
     """Enregistre une photo et son encodage facial."""
 
     parser_classes = [MultiPartParser, FormParser]
@@ -112,7 +122,7 @@ class BiometrieEnregistrementAPIView(APIView):
         return Response(response_serializer.data, status=status.HTTP_201_CREATED)
 
 
-class BiometrieReconnaissanceAPIView(APIView):
+class BiometrieReconnaissanceAPIView(BiometricProfilingMixin, APIView):
     """Compare un visage avec les encodages stockés."""
 
     parser_classes = [MultiPartParser, FormParser]
@@ -222,9 +232,11 @@ class BiometrieReconnaissanceAPIView(APIView):
         )
 
 
-class BiometriePhotoViewSet(viewsets.ModelViewSet):
+class BiometriePhotoViewSet(BiometricProfilingMixin, BiometricResponseShapingMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les photos biométriques
+
+    L'encodage facial n'est renvoyé qu'avec ``?include=embedding``.
     """
     queryset = BiometriePhoto.objects.all()
     permission_classes = [IsAuthenticated]  # Simplified for now - TODO: Add role-based permissions
@@ -587,7 +599,7 @@ class BiometriePhotoViewSet(viewsets.ModelViewSet):
         return Response(serializer.data)
 
 
-class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
+class BiometrieEmpreinteViewSet(BiometricProfilingMixin, viewsets.ModelViewSet):
     """
     ViewSet pour gérer les empreintes digitales
     """
@@ -618,7 +630,27 @@ class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
         return queryset
     
     def perform_create(self, serializer):
-        serializer.save(enregistre_par=self.request.user)
+        empreinte = serializer.save(enregistre_par=self.request.user)
+        self._enroler(empreinte)
+
+    def perform_update(self, serializer):
+        empreinte = serializer.save()
+        if 'image' in serializer.validated_data:
+            self._enroler(empreinte)
+        else:
+            synchroniser_index(empreinte)
+
+    def perform_destroy(self, instance):
+        empreinte_id = instance.pk
+        instance.delete()
+        retirer_de_index(empreinte_id)
+
+    def _enroler(self, empreinte):
+        """Extraction des minuties ; un échec n'empêche pas l'enregistrement de l'image."""
+        try:
+            enroler_empreinte(empreinte)
+        except Exception as exc:
+            logger.warning("Extraction des minuties impossible pour l'empreinte %s: %s", empreinte.pk, exc)
 
     @action(detail=False, methods=['post'], url_path='upload-lot')
     def upload_lot(self, request):
@@ -669,7 +701,13 @@ class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
                             'qualite': int(request.data.get('qualite', 85)),
                         },
                     )
-                    crees.append({'type': 'empreinte', 'id': obj.id, 'doigt': doigt})
+                    self._enroler(obj)
+                    crees.append({
+                        'type': 'empreinte',
+                        'id': obj.id,
+                        'doigt': doigt,
+                        'nombre_minuties': obj.nombre_minuties,
+                    })
             except Exception as exc:
                 erreurs.append({key: str(exc)})
 
@@ -727,7 +765,7 @@ class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
     def supprimer(self, request, pk=None):
         """Supprimer une empreinte digitale"""
         empreinte = self.get_object()
-        empreinte.delete()
+        self.perform_destroy(empreinte)
         return Response({'status': 'Empreinte supprimée avec succès'}, status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post'])
@@ -736,6 +774,7 @@ class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
         empreinte = self.get_object()
         empreinte.est_active = True
         empreinte.save()
+        synchroniser_index(empreinte)
 
         serializer = self.get_serializer(empreinte)
         return Response({
@@ -749,6 +788,7 @@ class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
         empreinte = self.get_object()
         empreinte.est_active = False
         empreinte.save()
+        synchroniser_index(empreinte)
 
         serializer = self.get_serializer(empreinte)
         return Response({
@@ -756,6 +796,58 @@ class BiometrieEmpreinteViewSet(viewsets.ModelViewSet):
             'data': serializer.data
         })
 
+    @action(detail=False, methods=['post'])
+    def identifier(self, request):
+        """
+        Identification 1:N d'une empreinte.
+        Endpoint: POST /api/biometrie/empreintes/identifier/
+        Champs : image (fichier), top_k (défaut 10), seuil (défaut FINGERPRINT_MATCH_THRESHOLD)
+        """
+        image = request.FILES.get('image')
+        if not image:
+            return Response({'erreur': 'image requise'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            top_k = max(1, min(int(request.data.get('top_k', 10)), 50))
+            seuil = request.data.get('seuil')
+            seuil = float(seuil) if seuil not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({'erreur': 'top_k ou seuil invalide'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            resultat = identifier_empreinte(image, top_k=top_k, threshold=seuil)
+        except ValueError as exc:
+            return Response({'erreur': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        correspondances = resultat['correspondances']
+        criminels = CriminalFicheCriminelle.objects.in_bulk(
+            {c['criminel_id'] for c in correspondances if c['criminel_id'] is not None}
+        )
+        for correspondance in correspondances:
+            criminel = criminels.get(correspondance['criminel_id'])
+            correspondance['criminel'] = {
+                'id': criminel.id,
+                'numero_fiche': criminel.numero_fiche,
+                'nom': criminel.nom,
+                'prenom': criminel.prenom,
+            } if criminel else None
+
+        meilleure = correspondances[0] if correspondances else None
+        statistiques = resultat['statistiques']
+        scan = BiometrieScanResultat.objects.create(
+            type_scan='empreinte',
+            image_source=image,
+            criminel_correspondant=criminels.get(meilleure['criminel_id']) if meilleure else None,
+            score_correspondance=meilleure['score'] if meilleure else 0.0,
+            seuil_confiance=resultat['seuil'],
+            resultats_json=json.dumps(resultat, ensure_ascii=False),
+            nombre_comparaisons=statistiques.get('candidats', 0),
+            temps_execution=(statistiques.get('extraction_ms', 0.0) + statistiques.get('total_ms', 0.0)) / 1000,
+            statut='termine',
+            execute_par=request.user,
+        )
+        resultat['scan_id'] = scan.id
+        return Response(resultat)
+
     @action(detail=False, methods=['get'])
     def statistiques_main(self, request):
         """Statistiques par main (droite/gauche)"""
@@ -1043,7 +1135,7 @@ class BiometrieStatistiquesViewSet(viewsets.ViewSet):
         return self.list(request)
 
 
-class ReconnaissanceFacialeViewSet(viewsets.ViewSet):
+class ReconnaissanceFacialeViewSet(BiometricProfilingMixin, viewsets.ViewSet):
     """
     ViewSet pour la reconnaissance faciale
     """
@@ -1419,7 +1511,7 @@ class BiometrieHistoriqueViewSet(viewsets.ReadOnlyModelViewSet):
         })
 
 
-class AnalyseBiometriqueAPIView(APIView):
+class AnalyseBiometriqueAPIView(BiometricProfilingMixin, APIView):
     """API pour l'analyse biométrique complète (pipeline d'enrôlement)."""
     
     parser_classes = [MultiPartParser, FormParser]
@@ -1554,7 +1646,7 @@ class AnalyseBiometriqueAPIView(APIView):
             )
 
 
-class EncodeVisageAPIView(APIView):
+class EncodeVisageAPIView(BiometricProfilingMixin, APIView):
     """API pour encoder et sauvegarder un visage avec le pipeline complet."""
     
     parser_classes = [MultiPartParser, FormParser]
@@ -1683,3 +1775,20 @@ class EncodeVisageAPIView(APIView):
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+
+class BiometrieProfilageAPIView(APIView):
+    """
+    Latences par étape des pipelines biométriques (processus courant).
+
+    GET    : p50/p95/p99 par pipeline et par étape (voir biometrie/profiling.py)
+    DELETE : remise à zéro des histogrammes
+    """
+
+    permission_classes = [IsAdminUserRole]
+
+    def get(self, request):
+        return Response(PROFILING_REGISTRY.snapshot())
+
+    def delete(self, request):
+        PROFILING_REGISTRY.reset()
+        return Response(status=status.HTTP_204_NO_CONTENT)
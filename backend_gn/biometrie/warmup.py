@@ -0,0 +1,258 @@
+"""Préchargement des modèles faciaux avant le fork des workers gunicorn.
+
+Avec ``preload_app`` (voir ``gunicorn.conf.py``), le maître charge l'application
+puis appelle :func:`warm_face_models` : les modèles partagés sont instanciés et
+une inférence factice matérialise chaque session ONNX. :func:`prepare_for_fork`
+ferme ensuite les connexions base de données et gèle le ramasse-miettes pour
+que les workers héritent des pages en copy-on-write. Dans chaque worker,
+:func:`reinitialize_after_fork` rouvre les sessions héritées (mono-thread)
+avec le budget de threads du rôle quand celui-ci dépasse un thread, au prix de
+poids privés à chaque worker ; ``ONNX_PRELOAD_SHARE_SESSIONS`` force l'un ou
+l'autre comportement.
+
+La galerie n'est pas gardée en mémoire : elle est relue en base à chaque
+recherche, seul l'état de version des embeddings est préchargé.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .insightface_loader import loaded_face_analyses
+from .onnx_threads import apply_session_options, end_preload, in_preload_mode, session_thread_config
+
+logger = logging.getLogger(__name__)
+
+_SMAPS_FIELDS = (
+    "Rss",
+    "Pss",
+    "Shared_Clean",
+    "Shared_Dirty",
+    "Private_Clean",
+    "Private_Dirty",
+    "Swap",
+)
+
+
+def _load_shared_services() -> List[str]:
+    """Instancie les services faciaux utilisés par les vues de recherche."""
+
+    from biometrie.arcface_service import get_shared_arcface_service
+    from biometrie.embedding_versions import search_embedding_versions
+
+    versions = list(search_embedding_versions())
+    for version in versions:
+        get_shared_arcface_service(version)
+
+    from intelligence_artificielle.services import _get_face_service
+    from upr.services.face_processing import get_arcface_service
+
+    _get_face_service()
+    get_arcface_service()
+    return versions
+
+
+def _dummy_input(model) -> Optional[np.ndarray]:
+    inputs = model.session.get_inputs()
+    if not inputs:
+        return None
+    width, height = getattr(model, "input_size", None) or (112, 112)
+    dims = []
+    for index, dim in enumerate(inputs[0].shape):
+        if isinstance(dim, int) and dim > 0:
+            dims.append(dim)
+        elif index == 0:
+            dims.append(1)
+        elif index == 2:
+            dims.append(height)
+        elif index == 3:
+            dims.append(width)
+        else:
+            dims.append(3)
+    return np.zeros(dims, dtype=np.float32)
+
+
+def run_dummy_inference(face_analysis) -> int:
+    """Exécute une inférence par modèle pour allouer arène et plans mémoire."""
+
+    count = 0
+    for name, model in getattr(face_analysis, "models", {}).items():
+        session = getattr(model, "session", None)
+        if session is None:
+            continue
+        try:
+            blob = _dummy_input(model)
+            if blob is None:
+                continue
+            session.run(None, {session.get_inputs()[0].name: blob})
+            count += 1
+        except Exception as exc:  # pragma: no cover - dépend du modèle
+            logger.warning("Inférence de préchauffage impossible pour %s: %s", name, exc)
+    return count
+
+
+def warm_face_models() -> Dict[str, Any]:
+    """Charge les modèles partagés et matérialise leurs sessions."""
+
+    started = time.perf_counter()
+    try:
+        versions = _load_shared_services()
+    except Exception as exc:  # pragma: no cover - protection démarrage
+        logger.error("Préchargement des modèles faciaux impossible: %s", exc)
+        return {"charge": False, "erreur": str(exc)}
+
+    sessions = sum(run_dummy_inference(model) for model in loaded_face_analyses())
+    summary = {
+        "charge": True,
+        "versions": versions,
+        "modeles": len(loaded_face_analyses()),
+        "sessions": sessions,
+        "duree_s": round(time.perf_counter() - started, 2),
+    }
+    logger.info(
+        "Modèles faciaux préchargés: %s instance(s), %s session(s) en %.2fs",
+        summary["modeles"],
+        sessions,
+        summary["duree_s"],
+    )
+    return summary
+
+
+def warm_fingerprint_index() -> Dict[str, Any]:
+    """Construit l'index des empreintes (hérité par les workers en copy-on-write)."""
+
+    from django.conf import settings
+
+    if not getattr(settings, "FINGERPRINT_INDEX_PRELOAD", True):
+        return {"charge": False}
+    started = time.perf_counter()
+    try:
+        from biometrie.empreintes.service import get_fingerprint_index
+
+        index = get_fingerprint_index()
+    except Exception as exc:  # pragma: no cover - protection démarrage
+        logger.error("Préchargement de l'index des empreintes impossible: %s", exc)
+        return {"charge": False, "erreur": str(exc)}
+    return {"charge": True, "gabarits": len(index), "duree_s": round(time.perf_counter() - started, 2)}
+
+
+def prepare_for_fork() -> None:
+    """À appeler dans le maître juste avant le fork des workers."""
+
+    from django.db import connections
+
+    # Une connexion héritée serait partagée par tous les workers
+    connections.close_all()
+    gc.collect()
+    # Objets existants exclus du GC : il ne réécrit plus leurs en-têtes après fork
+    gc.freeze()
+
+
+def reinitialize_after_fork() -> None:
+    """À appeler dans chaque worker juste après le fork.
+
+    Les sessions créées dans le maître sont mono-thread : un pool de threads
+    ONNX ne survit pas au fork, il est impossible d'y appliquer le budget du
+    rôle avant. Si le budget du worker diffère, elles sont rouvertes avec ce
+    budget (poids privés au worker), sauf si ``ONNX_PRELOAD_SHARE_SESSIONS``
+    demande de les garder partagées (copy-on-write). Non défini, le partage
+    n'est retenu que si le budget du worker est lui-même d'un thread intra-op.
+    """
+
+    from django.conf import settings
+
+    if not in_preload_mode():
+        return
+
+    config = end_preload()
+    stale = [
+        face_analysis
+        for face_analysis in loaded_face_analyses()
+        if session_thread_config(face_analysis) != config
+    ]
+    if not stale:
+        return
+
+    share = getattr(settings, "ONNX_PRELOAD_SHARE_SESSIONS", None)
+    if share is None:
+        share = config.intra_op_num_threads <= 1
+    if share:
+        log = logger.warning if config.intra_op_num_threads > 1 else logger.info
+        log(
+            "Worker %s: sessions ONNX héritées conservées (1 thread intra-op au lieu de %s, poids partagés, "
+            "ONNX_PRELOAD_SHARE_SESSIONS)",
+            os.getpid(),
+            config.intra_op_num_threads,
+        )
+        return
+
+    # Budget du rôle supérieur à un thread : rouvrir les sessions (poids privés au worker)
+    for face_analysis in stale:
+        apply_session_options(face_analysis, config=config)
+        run_dummy_inference(face_analysis)
+    logger.info(
+        "Worker %s: %s modèle(s) rouvert(s) avec %s thread(s) intra-op, partage copy-on-write abandonné",
+        os.getpid(),
+        len(stale),
+        config.intra_op_num_threads,
+    )
+
+
+def memory_report(pid: Optional[int] = None) -> Dict[str, Any]:
+    """Mémoire privée/partagée d'un processus (Mo), d'après ``/proc/<pid>/smaps_rollup``."""
+
+    pid = pid or os.getpid()
+    values = {field: 0 for field in _SMAPS_FIELDS}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r", encoding="utf-8") as handle:
+            for line in handle:
+                key, _, rest = line.partition(":")
+                if key in values:
+                    values[key] += int(rest.split()[0])
+    except (OSError, ValueError, IndexError) as exc:
+        return {"pid": pid, "erreur": str(exc)}
+
+    shared = values["Shared_Clean"] + values["Shared_Dirty"]
+    private = values["Private_Clean"] + values["Private_Dirty"]
+    return {
+        "pid": pid,
+        "rss_mo": round(values["Rss"] / 1024, 1),
+        "pss_mo": round(values["Pss"] / 1024, 1),
+        "partage_mo": round(shared / 1024, 1),
+        "prive_mo": round(private / 1024, 1),
+        "swap_mo": round(values["Swap"] / 1024, 1),
+    }
+
+
+def child_pids(pid: int) -> List[int]:
+    """PID des processus enfants directs (workers d'un maître gunicorn)."""
+
+    children: List[int] = []
+    task_dir = f"/proc/{pid}/task"
+    try:
+        tasks = os.listdir(task_dir)
+    except OSError:
+        return children
+    for task in tasks:
+        try:
+            with open(os.path.join(task_dir, task, "children"), "r", encoding="utf-8") as handle:
+                children.extend(int(value) for value in handle.read().split())
+        except (OSError, ValueError):
+            continue
+    return sorted(set(children))
+
+
+__all__ = [
+    "child_pids",
+    "memory_report",
+    "prepare_for_fork",
+    "reinitialize_after_fork",
+    "run_dummy_inference",
+    "warm_face_models",
+]
@@ -0,0 +1,58 @@
+"""
+Configuration gunicorn du backend.
+
+Les modèles faciaux sont chargés une seule fois dans le maître (``preload_app``)
+puis hérités par les workers en copy-on-write : pas de RAM modèle x N workers
+ni de première requête lente par worker. L'index des empreintes digitales est
+construit au même moment (voir ``biometrie.empreintes.service``). Désactiver avec GUNICORN_PRELOAD=false
+(les modèles sont alors préchauffés dans chaque worker au démarrage).
+
+Mémoire privée/partagée par worker : ``python manage.py face_memory_report``.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+os.environ.setdefault('ONNX_PROCESS_ROLE', 'web')
+
+if preload_app:
+    from biometrie.onnx_threads import begin_preload
+
+    # Sessions créées sans pool de threads dans le maître (fork-safe)
+    begin_preload()
+
+
+def when_ready(server):
+    """Maître : application chargée, workers pas encore forkés."""
+    if not preload_app:
+        return
+    from biometrie.warmup import memory_report, prepare_for_fork, warm_face_models, warm_fingerprint_index
+
+    summary = warm_face_models()
+    fingerprints = warm_fingerprint_index()
+    prepare_for_fork()
+    server.log.info("Préchargement des modèles faciaux: %s", summary)
+    server.log.info("Préchargement de l'index des empreintes: %s", fingerprints)
+    server.log.info("Mémoire maître: %s", memory_report())
+
+
+def post_fork(server, worker):
+    from biometrie.warmup import reinitialize_after_fork
+
+    reinitialize_after_fork()
+
+
+def post_worker_init(worker):
+    from biometrie.warmup import memory_report, warm_face_models, warm_fingerprint_index
+
+    if not preload_app:
+        warm_face_models()
+        warm_fingerprint_index()
+    worker.log.info("Mémoire worker: %s", memory_report())
@@ -7,6 +7,7 @@ from .models import (
     IAPrediction,
     IAPattern,
     IACorrelation,
+    IAVideoAnalysis,
 )
 @admin.register(IAFaceEmbedding)
 class IAFaceEmbeddingAdmin(admin.ModelAdmin):
@@ -83,3 +84,13 @@ class IACorrelationAdmin(admin.ModelAdmin):
     readonly_fields = ('uuid', 'date_detection')
     filter_horizontal = ('criminels', 'infractions')
     ordering = ('-date_detection',)
+
+
+@admin.register(IAVideoAnalysis)
+class IAVideoAnalysisAdmin(admin.ModelAdmin):
+    list_display = ('uuid', 'nom_fichier', 'statut', 'progression',
+                    'frames_analysees', 'date_creation', 'cree_par')
+    list_filter = ('statut', 'date_creation')
+    search_fields = ('nom_fichier',)
+    readonly_fields = ('uuid', 'date_creation', 'date_debut', 'date_fin')
+    ordering = ('-date_creation',)
@@ -15,7 +15,7 @@ from __future__ import annotations
 import logging
 import time
 from dataclasses import dataclass
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
 import numpy as np
 from django.db import transaction
@@ -28,11 +28,17 @@ from biometrie.arcface_service import (
     get_shared_arcface_error,
     get_shared_arcface_service,
 )
+from biometrie.embedding_versions import VersionedQuery, search_embedding_versions
+from biometrie.hydration import hydrate_ranked
 from biometrie.models import Biometrie
+from biometrie.profiling import span, traced
 from criminel.models import CriminalFicheCriminelle
 
 from .models import IAReconnaissanceFaciale, IAFaceEmbedding
 
+if TYPE_CHECKING:  # pragma: no cover - backend.ia importe ce module
+    from backend.ia.stream_sessions import StreamSessionStore
+
 logger = logging.getLogger(__name__)
 
 
@@ -84,6 +90,9 @@ class FaceRecognitionIAService:
         Seuil minimal de similarité (cosinus) pour considérer une correspondance valide.
     arcface_service : ArcFaceService, optional
         Instance partagée du moteur ArcFace (permet d'éviter de recharger le modèle).
+        Sans instance explicite, le service partagé de la version d'embedding
+        active est résolu à chaque usage, si bien qu'un service conservé par le
+        processus suit les bascules de ``reembed_gallery``.
     """
 
     def __init__(
@@ -93,27 +102,32 @@ class FaceRecognitionIAService:
         arcface_service: Optional[ArcFaceService] = None,
     ) -> None:
         self.threshold = threshold
-        if arcface_service is not None:
-            self.arcface = arcface_service
-        else:
-            try:
-                self.arcface = get_shared_arcface_service()
-            except Exception as exc:  # pragma: no cover - protection runtime
-                reason = str(exc) or "ArcFace n'est pas disponible. Vérifiez l'installation InsightFace."
-                logger.error("ArcFace indisponible lors de l'initialisation du service IA: %s", reason)
-                raise FaceRecognitionUnavailable(reason) from exc
+        self._arcface = arcface_service
+        arcface = self.arcface
 
-        if not self.arcface.available:
+        if not arcface.available:
             reason = (
-                self.arcface.unavailable_reason
+                arcface.unavailable_reason
                 or str(get_shared_arcface_error() or "")
                 or "ArcFace n'est pas disponible. Vérifiez l'installation InsightFace."
             )
             logger.error("Le service ArcFace n'a pas pu être initialisé: %s", reason)
             raise FaceRecognitionUnavailable(reason)
 
+    @property
+    def arcface(self) -> ArcFaceService:
+        if self._arcface is not None:
+            return self._arcface
+        try:
+            return get_shared_arcface_service()
+        except Exception as exc:  # pragma: no cover - protection runtime
+            reason = str(exc) or "ArcFace n'est pas disponible. Vérifiez l'installation InsightFace."
+            logger.error("ArcFace indisponible pour le service IA: %s", reason)
+            raise FaceRecognitionUnavailable(reason) from exc
+
     # Pipelines publics
   
+    @traced("recherche_photo")
     def search_by_photo(
         self,
         *,
@@ -138,7 +152,8 @@ class FaceRecognitionIAService:
 
         criminel_obj = criminel
         if criminel_obj is None and criminel_id is not None:
-            criminel_obj = CriminalFicheCriminelle.objects.filter(id=criminel_id).first()
+            with span("lecture_bdd"):
+                criminel_obj = CriminalFicheCriminelle.objects.filter(id=criminel_id).first()
 
         try:
             faces: List[FaceEncodingResult] = self.arcface.encode_faces(image=image, limit=1)
@@ -207,12 +222,13 @@ class FaceRecognitionIAService:
         query_embedding = query_face.embedding
         serialized_query = ArcFaceService.serialize_embedding(query_embedding)
 
-        # 2) Comparaison avec toutes les fiches
+        # 2) Comparaison avec toutes les fiches (chaque version d'embedding avec sa requête)
         comparisons = self.score_embeddings(
             query_embedding,
             top_k=top_k,
             threshold=threshold,
             include_all=True,
+            versioned_query=self._build_versioned_queries(image, faces)[0],
         )
         unique_matches: List[FaceMatch] = []
         seen_ids = set()
@@ -231,29 +247,32 @@ class FaceRecognitionIAService:
 
         saved_embedding_id: Optional[int] = None
         if save_embedding and criminel_obj is not None:
-            saved_embedding = self._store_embedding(
-                criminel=criminel_obj,
-                embedding=query_embedding,
-                source="photo",
-                metadata=result_metadata,
-                image=image if isinstance(image, File) else None,
-            )
+            with span("ecriture_bdd"):
+                saved_embedding = self._store_embedding(
+                    criminel=criminel_obj,
+                    embedding=query_embedding,
+                    source="photo",
+                    metadata=result_metadata,
+                    image=image if isinstance(image, File) else None,
+                )
             saved_embedding_id = saved_embedding.id if saved_embedding else None
 
         # 4) Journalisation dans IAReconnaissanceFaciale
         analyse_instance = None
         if persist_result:
-            analyse_instance = self._log_analyse_result(
-                image=image if isinstance(image, File) else None,
-                best_match=best_match,
-                utilisateur=utilisateur,
-                confidence=query_face.confidence,
-            )
+            with span("ecriture_bdd"):
+                analyse_instance = self._log_analyse_result(
+                    image=image if isinstance(image, File) else None,
+                    best_match=best_match,
+                    utilisateur=utilisateur,
+                    confidence=query_face.confidence,
+                )
 
         duration_ms = int((time.monotonic() - started_at) * 1000)
 
-        matches_payload = [match.to_dict() for match in matches_above_threshold[:top_k]]
-        candidates_payload = [match.to_dict() for match in unique_matches[:top_k]]
+        with span("serialisation"):
+            matches_payload = [match.to_dict() for match in matches_above_threshold[:top_k]]
+            candidates_payload = [match.to_dict() for match in unique_matches[:top_k]]
 
         message = (
             "Correspondance trouvée"
@@ -281,17 +300,24 @@ class FaceRecognitionIAService:
             "alert_level": alert_level,
         }
 
+    @traced("flux_video")
     def process_stream_frame(
         self,
         *,
         frame: Any,
         threshold: Optional[float] = None,
         top_k: int = 3,
+        session_key: Optional[str] = None,
     ) -> Dict[str, Any]:
         """Analyse un frame vidéo en temps réel.
 
         Chaque visage détecté est encodé puis comparé à l'ensemble des embeddings connus.
         Le service retourne, par visage, la meilleure correspondance ainsi que le détail des scores.
+
+        Avec ``session_key`` (un client / un flux), les visages sont suivis d'une
+        frame à l'autre : la recherche est sautée tant que l'embedding d'une piste
+        reste proche de celui de la dernière recherche, et ``recognized`` n'est
+        vrai qu'une fois l'identité confirmée par vote (voir backend.ia.stream_sessions).
         """
 
         started_at = time.monotonic()
@@ -306,15 +332,27 @@ class FaceRecognitionIAService:
                 "message": "Aucun visage détecté sur le frame.",
             }
 
-        frame_results = []
         threshold_value = threshold or self.threshold
+        store = None
+        if session_key:
+            from backend.ia.stream_sessions import get_stream_session_store
+
+            store = get_stream_session_store()
+        if store is not None:
+            return self._process_stream_session(
+                store, session_key, frame, faces, threshold_value, top_k, started_at
+            )
 
-        for face in faces:
+        frame_results = []
+        versioned_queries = self._build_versioned_queries(frame, faces)
+
+        for face, versioned_query in zip(faces, versioned_queries):
             matches = self.score_embeddings(
                 face.embedding,
                 top_k=top_k,
                 threshold=threshold_value,
                 include_all=True,
+                versioned_query=versioned_query,
             )
 
             best_match = matches[0] if matches else None
@@ -341,7 +379,106 @@ class FaceRecognitionIAService:
             "threshold": threshold_value,
         }
 
+    def _process_stream_session(
+        self,
+        store: StreamSessionStore,
+        session_key: str,
+        frame: Any,
+        faces: List[FaceEncodingResult],
+        threshold_value: float,
+        top_k: int,
+        started_at: float,
+    ) -> Dict[str, Any]:
+        """``process_stream_frame`` avec suivi des visages, cache des recherches et vote."""
+
+        now = time.monotonic()
+        session = store.session(session_key, (threshold_value, top_k, self.arcface.embedding_version))
+        embeddings = []
+        for face in faces:
+            vector = np.asarray(face.embedding, dtype=np.float32).reshape(-1)
+            norm = float(np.linalg.norm(vector))
+            embeddings.append(vector / norm if norm > 0 else vector)
+
+        with session.lock:
+            tracks = session.assign(
+                [face.bbox for face in faces], now, store.iou_threshold, store.max_gap_seconds
+            )
+            to_search = [
+                index
+                for index, (track, embedding) in enumerate(zip(tracks, embeddings))
+                if not track.can_reuse(embedding, store.epsilon, store.max_reuse_seconds, now)
+            ]
+
+            # Requêtes multi-versions (ré-encodage) seulement pour les visages recherchés
+            versioned_queries = self._build_versioned_queries(frame, [faces[index] for index in to_search])
+            for index, versioned_query in zip(to_search, versioned_queries):
+                matches = self.score_embeddings(
+                    faces[index].embedding,
+                    top_k=top_k,
+                    threshold=threshold_value,
+                    include_all=True,
+                    versioned_query=versioned_query,
+                )
+                tracks[index].remember(embeddings[index], [match.to_dict() for match in matches[:top_k]], now)
+            store.record(len(to_search), len(faces) - len(to_search))
+
+            frame_results = []
+            for index, (face, track) in enumerate(zip(faces, tracks)):
+                best_match = track.matches[0] if track.matches else None
+                candidate_id = (
+                    best_match["criminel_id"]
+                    if best_match and best_match["similarite"] >= threshold_value
+                    else None
+                )
+                confirmed_id, votes = track.vote(candidate_id, store.vote_window, store.vote_min)
+                confirmed_match = next(
+                    (match for match in track.matches if match["criminel_id"] == confirmed_id), None
+                ) if confirmed_id is not None else None
+                frame_results.append(
+                    {
+                        "bbox": face.bbox,
+                        "confidence": float(face.confidence),
+                        "matches": track.matches,
+                        "best_match": confirmed_match or best_match,
+                        "recognized": confirmed_match is not None,
+                        "threshold_used": threshold_value,
+                        "track_id": track.track_id,
+                        "votes": votes,
+                        "from_cache": index not in to_search,
+                    }
+                )
+
+        return {
+            "success": True,
+            "faces_detected": len(frame_results),
+            "faces": frame_results,
+            "duration_ms": int((time.monotonic() - started_at) * 1000),
+            "threshold": threshold_value,
+            "searches": len(to_search),
+        }
+
     # Calculs & utilitaires internes
+    def _build_versioned_queries(
+        self, image: Any, faces: Sequence[FaceEncodingResult]
+    ) -> List[VersionedQuery]:
+        """Associe à chaque visage son embedding pour chaque version interrogée.
+
+        Hors migration, seule la version du moteur courant est utilisée ; pendant
+        une migration, l'image est aussi encodée avec le modèle de l'autre version.
+        """
+
+        versions = search_embedding_versions()
+        primary_version = self.arcface.embedding_version
+        if versions == (primary_version,):
+            return [VersionedQuery({primary_version: face.embedding}) for face in faces]
+        return VersionedQuery.build(
+            image=image,
+            primary_version=primary_version,
+            faces=faces,
+            versions=versions,
+        )
+
+    @traced("comparaison_embeddings")
     def score_embeddings(
         self,
         query_embedding: np.ndarray,
@@ -349,106 +486,136 @@ class FaceRecognitionIAService:
         top_k: Optional[int] = None,
         threshold: Optional[float] = None,
         include_all: bool = False,
+        versioned_query: Optional[VersionedQuery] = None,
     ) -> List[FaceMatch]:
-        """Calcule la similarité cosinus entre la requête et tous les embeddings connus."""
+        """Calcule la similarité cosinus entre la requête et tous les embeddings connus.
 
-        stored_embeddings = list(self._iter_known_embeddings())
-        if not stored_embeddings:
-            return []
-
-        threshold_value = threshold if threshold is not None else self.threshold
+        Chaque embedding stocké n'est comparé qu'à la requête calculée par le même
+        modèle (``versioned_query``) ; par défaut ``query_embedding`` est rattaché
+        à la version du moteur courant.
 
-        # Normaliser une seule fois l'embedding requête
-        query_vector = np.asarray(query_embedding, dtype=np.float32)
-        query_norm = np.linalg.norm(query_vector)
-        if query_norm > 0:
-            query_vector = query_vector / query_norm
-        expected_dim = query_vector.shape[0]
-
-        candidate_vectors: List[np.ndarray] = []
-        candidate_meta: List[Tuple[Optional[CriminalFicheCriminelle], str, Optional[int], Dict[str, Any]]] = []
-
-        for candidate_embedding, criminel, source, embedding_id, metadata in stored_embeddings:
-            vector = np.asarray(candidate_embedding, dtype=np.float32).reshape(-1)
-
-            if vector.size != expected_dim:
-                logger.debug(
-                    "Embedding ignoré (dimension %s != %s) pour criminel #%s",
-                    vector.size,
-                    expected_dim,
-                    getattr(criminel, "id", None),
-                )
-                continue
-
-            if not np.isfinite(vector).all():
-                logger.debug(
-                    "Embedding contenant des valeurs non finies ignoré pour criminel #%s",
-                    getattr(criminel, "id", None),
-                )
-                continue
+        Le classement ne porte que sur des identifiants : seules les fiches des
+        correspondances retenues sont chargées, en une requête (voir
+        ``biometrie.hydration``).
+        """
 
-            candidate_vectors.append(vector)
-            candidate_meta.append((criminel, source, embedding_id, metadata))
+        if versioned_query is None:
+            versioned_query = VersionedQuery({self.arcface.embedding_version: query_embedding})
 
-        if not candidate_vectors:
+        with span("lecture_bdd"):
+            stored_embeddings = list(self._iter_known_embeddings(versions=versioned_query.versions))
+        if not stored_embeddings:
             return []
 
-        matrix = np.stack(candidate_vectors, axis=0)
-        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
-        np.divide(matrix, norms, out=matrix, where=norms > 0)
+        threshold_value = threshold if threshold is not None else self.threshold
 
-        similarities = matrix @ query_vector
+        with span("similarite"):
+            # Regrouper les candidats par version d'embedding
+            candidate_groups: Dict[
+                str,
+                Tuple[List[np.ndarray], List[Tuple[Optional[int], str, Optional[int], Dict[str, Any]]]],
+            ] = {}
+
+            for candidate_embedding, criminel_id, source, embedding_id, metadata in stored_embeddings:
+                version = metadata.get("embedding_version")
+                query_vector = versioned_query.for_version(version)
+                if query_vector is None:
+                    continue
+                expected_dim = query_vector.shape[0]
 
-        matches: List[FaceMatch] = []
-        for similarity, (criminel, source, embedding_id, metadata) in zip(similarities, candidate_meta):
-            sim_float = float(similarity)
+                vector = np.asarray(candidate_embedding, dtype=np.float32).reshape(-1)
 
-            criminel_obj = criminel
-            if criminel_obj is None:
-                criminel_id = metadata.get("criminel_id")
-                if criminel_id is not None:
-                    criminel_obj = CriminalFicheCriminelle.objects.filter(id=criminel_id).first()
-                if criminel_obj is None:
+                if vector.size != expected_dim:
                     logger.debug(
-                        "Correspondance ignorée faute de criminel lié (embedding_id=%s, source=%s)",
-                        embedding_id,
-                        source,
+                        "Embedding ignoré (dimension %s != %s) pour criminel #%s",
+                        vector.size,
+                        expected_dim,
+                        criminel_id,
                     )
                     continue
 
-            match = FaceMatch(
-                criminel=criminel_obj,
-                similarity=sim_float,
-                distance=float(1.0 - sim_float),
-                source=source,
-                embedding_id=embedding_id,
-                metadata=metadata,
-            )
-            matches.append(match)
-
-        matches.sort(key=lambda item: item.similarity, reverse=True)
-
-        if include_all:
-            if top_k is not None:
-                return matches[:top_k]
-            return matches
+                if not np.isfinite(vector).all():
+                    logger.debug(
+                        "Embedding contenant des valeurs non finies ignoré pour criminel #%s",
+                        criminel_id,
+                    )
+                    continue
 
-        filtered = [match for match in matches if match.similarity >= threshold_value]
-        if filtered:
-            return filtered[:top_k] if top_k is not None else filtered
+                vectors, metas = candidate_groups.setdefault(version, ([], []))
+                vectors.append(vector)
+                metas.append((criminel_id, source, embedding_id, metadata))
+
+            if not candidate_groups:
+                return []
+
+            similarity_chunks: List[np.ndarray] = []
+            candidates: List[Tuple[Optional[int], str, Optional[int], Dict[str, Any]]] = []
+            for version, (candidate_vectors, candidate_meta) in candidate_groups.items():
+                matrix = np.stack(candidate_vectors, axis=0)
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                np.divide(matrix, norms, out=matrix, where=norms > 0)
+
+                similarity_chunks.append(matrix @ versioned_query.for_version(version))
+                candidates.extend(candidate_meta)
+
+            similarities = np.concatenate(similarity_chunks)
+            # Tri stable : à score égal, l'ordre de lecture est conservé
+            order = np.argsort(-similarities, kind="stable")
+
+        with span("hydratation"):
+            selected = order
+            if not include_all:
+                above = order[similarities[order] >= threshold_value]
+                if len(above):
+                    selected = above
+
+            def criminel_key(index):
+                return candidates[index][0]
+
+            resolved = hydrate_ranked(selected, criminel_key, limit=top_k)
+            if not resolved and len(selected) < len(order):
+                # Fiches des correspondances au-dessus du seuil introuvables : meilleurs candidats
+                resolved = hydrate_ranked(order, criminel_key, limit=top_k)
+
+            matches: List[FaceMatch] = []
+            for index, criminel_obj in resolved:
+                _, source, embedding_id, metadata = candidates[index]
+                metadata["numero_fiche"] = criminel_obj.numero_fiche
+                if metadata.get("photo_path"):
+                    metadata["photo_url"] = self._biometrie_photo_url(metadata["photo_path"])
+                sim_float = float(similarities[index])
+                matches.append(
+                    FaceMatch(
+                        criminel=criminel_obj,
+                        similarity=sim_float,
+                        distance=float(1.0 - sim_float),
+                        source=source,
+                        embedding_id=embedding_id,
+                        metadata=metadata,
+                    )
+                )
 
-        return matches[:top_k] if top_k is not None else matches
+        return matches
 
     def _iter_known_embeddings(
         self,
-    ) -> Iterable[Tuple[np.ndarray, CriminalFicheCriminelle, str, Optional[int], Dict[str, Any]]]:
-        """Rassemble les embeddings IA + biométrie pour la comparaison."""
+        versions: Optional[Sequence[str]] = None,
+    ) -> Iterable[Tuple[np.ndarray, Optional[int], str, Optional[int], Dict[str, Any]]]:
+        """Rassemble les embeddings IA + biométrie pour la comparaison.
+
+        Seuls les embeddings des ``versions`` indiquées (par défaut les versions
+        interrogées) sont retournés ; la version figure dans les métadonnées.
+        Les fiches ne sont pas jointes : chaque entrée porte son ``criminel_id``,
+        ``numero_fiche`` et ``photo_url`` sont renseignés à l'hydratation.
+        """
+
+        versions = list(versions or search_embedding_versions())
 
         # Embeddings IA enregistrés explicitement
         try:
             ia_embeddings = (
-                IAFaceEmbedding.objects.select_related("criminel")
-                .filter(actif=True)
+                IAFaceEmbedding.objects.filter(actif=True, embedding_version__in=versions)
+                .only("id", "criminel", "embedding_vector", "source_type", "cree_le", "embedding_version")
                 .iterator()
             )
         except (ProgrammingError, OperationalError) as exc:
@@ -470,14 +637,20 @@ class FaceRecognitionIAService:
 
             metadata = {
                 "source_type": entry.source_type,
-                "numero_fiche": entry.criminel.numero_fiche,
+                "numero_fiche": None,
                 "cree_le": entry.cree_le.isoformat(),
                 "criminel_id": entry.criminel_id,
+                "embedding_version": entry.embedding_version,
             }
 
-            yield vector, entry.criminel, "ia_face_embedding", entry.pk, metadata
+            yield vector, entry.criminel_id, "ia_face_embedding", entry.pk, metadata
 
-        for entry in Biometrie.objects.select_related("criminel").iterator():
+        biometrie_entries = (
+            Biometrie.objects.filter(embedding_version__in=versions)
+            .only("id", "criminel", "encodage_facial", "photo", "embedding_version")
+            .iterator()
+        )
+        for entry in biometrie_entries:
             raw_embedding = entry.encodage_facial
             if not raw_embedding:
                 continue
@@ -488,24 +661,23 @@ class FaceRecognitionIAService:
                 logger.debug("Embedding biométrie invalide (#%s): %s", entry.pk, exc)
                 continue
 
-            photo_path = None
-            photo_url = None
-            if entry.photo:
-                photo_path = entry.photo.name
-                try:
-                    photo_url = entry.photo.url  # type: ignore[attr-defined]
-                except Exception:
-                    photo_url = None
-
             metadata = {
                 "source_type": "biometrie",
-                "numero_fiche": entry.criminel.numero_fiche,
-                "photo_path": photo_path,
-                "photo_url": photo_url,
+                "numero_fiche": None,
+                "photo_path": entry.photo.name if entry.photo else None,
+                "photo_url": None,
                 "criminel_id": entry.criminel_id,
+                "embedding_version": entry.embedding_version,
             }
 
-            yield vector, entry.criminel, "biometrie", entry.pk, metadata
+            yield vector, entry.criminel_id, "biometrie", entry.pk, metadata
+
+    @staticmethod
+    def _biometrie_photo_url(path: str) -> Optional[str]:
+        try:
+            return Biometrie._meta.get_field("photo").storage.url(path)
+        except Exception:
+            return None
 
     def _deserialize_embedding(self, data: Sequence[float]) -> np.ndarray:
         array = np.asarray(data, dtype=np.float32)
@@ -537,6 +709,7 @@ class FaceRecognitionIAService:
             source_type=source,
             image_capture=image,
             metadata=metadata or {},
+            embedding_version=self.arcface.embedding_version,
         )
 
         logger.info(
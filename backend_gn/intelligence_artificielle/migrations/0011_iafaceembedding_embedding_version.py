@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:12
+
+import biometrie.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('biometrie', '0015_embeddingversionstate_embedding_version'),
+        ('intelligence_artificielle', '0010_remove_pattern_recognition_choice'),
+    ]
+
+    # Les vecteurs existants viennent du modèle historique : ils sont étiquetés
+    # LEGACY_EMBEDDING_VERSION, quelle que soit la version configurée au migrate.
+    operations = [
+        migrations.AddField(
+            model_name='iafaceembedding',
+            name='embedding_version',
+            field=models.CharField(db_index=True, default='buffalo_l:insightface-v1', help_text='Modèle et prétraitement ayant produit le vecteur (ex: buffalo_l:insightface-v1)', max_length=64, verbose_name="Version d'embedding"),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name='iafaceembedding',
+            name='embedding_version',
+            field=models.CharField(db_index=True, default=biometrie.models.default_embedding_version, help_text='Modèle et prétraitement ayant produit le vecteur (ex: buffalo_l:insightface-v1)', max_length=64, verbose_name="Version d'embedding"),
+        ),
+    ]
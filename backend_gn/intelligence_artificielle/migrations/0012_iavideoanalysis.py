@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-19 08:40
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('intelligence_artificielle', '0011_iafaceembedding_embedding_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IAVideoAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uuid', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('fichier_video', models.FileField(upload_to='ia/videos/%Y/%m/', verbose_name='Fichier vidéo')),
+                ('nom_fichier', models.CharField(blank=True, max_length=255, verbose_name="Nom du fichier d'origine")),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('erreur', 'Erreur')], default='en_attente', max_length=50, verbose_name='Statut')),
+                ('progression', models.FloatField(default=0.0, verbose_name='Progression (0-100)')),
+                ('parametres', models.JSONField(blank=True, default=dict, help_text='Échantillonnage (images/s), seuil de correspondance, etc.', verbose_name="Paramètres d'analyse")),
+                ('duree_video', models.FloatField(blank=True, null=True, verbose_name='Durée de la vidéo (s)')),
+                ('frames_analysees', models.IntegerField(default=0, verbose_name='Images analysées')),
+                ('resultats', models.JSONField(blank=True, default=dict, help_text='Chronologie des apparitions et synthèse par identité', verbose_name='Résultats')),
+                ('erreur', models.TextField(blank=True, null=True, verbose_name='Erreur')),
+                ('date_creation', models.DateTimeField(auto_now_add=True, verbose_name='Date de création')),
+                ('date_debut', models.DateTimeField(blank=True, null=True, verbose_name='Date de début')),
+                ('date_fin', models.DateTimeField(blank=True, null=True, verbose_name='Date de fin')),
+                ('cree_par', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ia_video_analyses', to=settings.AUTH_USER_MODEL, verbose_name='Créé par')),
+            ],
+            options={
+                'verbose_name': 'Analyse vidéo IA',
+                'verbose_name_plural': 'Analyses vidéo IA',
+                'db_table': 'ia_video_analysis',
+                'ordering': ['-date_creation'],
+                'indexes': [models.Index(fields=['cree_par', '-date_creation'], name='ia_video_an_cree_pa_4f1c2e_idx'), models.Index(fields=['statut'], name='ia_video_an_statut_8d3a71_idx')],
+            },
+        ),
+    ]
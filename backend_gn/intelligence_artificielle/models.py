@@ -3,6 +3,8 @@ from django.db import models
 from django.conf import settings
 import uuid
 
+from biometrie.models import default_embedding_version
+
 
 class IAReconnaissanceFaciale(models.Model):
     """
@@ -67,6 +69,13 @@ class IAFaceEmbedding(models.Model):
         verbose_name='Vecteur d\'encodage',
         help_text="Embedding facial normalisé (liste de 512 floats)"
     )
+    embedding_version = models.CharField(
+        max_length=64,
+        default=default_embedding_version,
+        db_index=True,
+        verbose_name='Version d\'embedding',
+        help_text="Modèle et prétraitement ayant produit le vecteur (ex: buffalo_l:insightface-v1)"
+    )
     source_type = models.CharField(
         max_length=20,
         choices=SourceType.choices,
@@ -545,4 +554,89 @@ class IAModelTraining(models.Model):
         ]
     
     def __str__(self):
-        return f"{self.nom_modele} - {self.type_modele} ({self.version})"
\ No newline at end of file
+        return f"{self.nom_modele} - {self.type_modele} ({self.version})"
+
+
+class IAVideoAnalysis(models.Model):
+    """
+    Analyse hors ligne d'un fichier vidéo (export de vidéosurveillance).
+    Produit une chronologie des personnes apparues (pistes de visages
+    identifiées ou non, avec horodatages et vignettes).
+    """
+    uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True)
+    fichier_video = models.FileField(
+        upload_to='ia/videos/%Y/%m/',
+        verbose_name='Fichier vidéo'
+    )
+    nom_fichier = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Nom du fichier d\'origine'
+    )
+    
+    statut = models.CharField(
+        max_length=50,
+        choices=[
+            ('en_attente', 'En attente'),
+            ('en_cours', 'En cours'),
+            ('termine', 'Terminé'),
+            ('erreur', 'Erreur'),
+        ],
+        default='en_attente',
+        verbose_name='Statut'
+    )
+    progression = models.FloatField(
+        default=0.0,
+        verbose_name='Progression (0-100)'
+    )
+    
+    # Paramètres et métriques
+    parametres = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Paramètres d\'analyse',
+        help_text='Échantillonnage (images/s), seuil de correspondance, etc.'
+    )
+    duree_video = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Durée de la vidéo (s)'
+    )
+    frames_analysees = models.IntegerField(
+        default=0,
+        verbose_name='Images analysées'
+    )
+    
+    # Résultats
+    resultats = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name='Résultats',
+        help_text='Chronologie des apparitions et synthèse par identité'
+    )
+    erreur = models.TextField(blank=True, null=True, verbose_name='Erreur')
+    
+    date_creation = models.DateTimeField(auto_now_add=True, verbose_name='Date de création')
+    date_debut = models.DateTimeField(null=True, blank=True, verbose_name='Date de début')
+    date_fin = models.DateTimeField(null=True, blank=True, verbose_name='Date de fin')
+    cree_par = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='ia_video_analyses',
+        verbose_name='Créé par'
+    )
+    
+    class Meta:
+        db_table = 'ia_video_analysis'
+        verbose_name = 'Analyse vidéo IA'
+        verbose_name_plural = 'Analyses vidéo IA'
+        ordering = ['-date_creation']
+        indexes = [
+            models.Index(fields=['cree_par', '-date_creation']),
+            models.Index(fields=['statut']),
+        ]
+    
+    def __str__(self):
+        return f"Analyse vidéo {self.nom_fichier or self.uuid} ({self.statut})"
@@ -2,7 +2,7 @@
 from rest_framework import serializers
 from .models import (
     IAReconnaissanceFaciale, IAAnalyseStatistique, IAMatchBiometrique, 
-    IAPrediction, IAPattern, IACorrelation
+    IAPrediction, IAPattern, IACorrelation, IAVideoAnalysis
 )
 from criminel.serializers import CriminalFicheCriminelleSerializer, CriminalInfractionSerializer
 from utilisateur.serializers import UtilisateurReadSerializer
@@ -205,3 +205,17 @@ class IACorrelationCreateSerializer(serializers.ModelSerializer):
             'criminels', 'infractions', 'pattern_associe', 'type_correlation',
             'degre_correlation', 'resume', 'analyse_par'
         ]
+
+
+class IAVideoAnalysisSerializer(serializers.ModelSerializer):
+    """Serializer pour les analyses vidéo hors ligne"""
+    cree_par_details = UtilisateurReadSerializer(source='cree_par', read_only=True)
+
+    class Meta:
+        model = IAVideoAnalysis
+        fields = [
+            'id', 'uuid', 'nom_fichier', 'statut', 'progression', 'parametres',
+            'duree_video', 'frames_analysees', 'resultats', 'erreur',
+            'date_creation', 'date_debut', 'date_fin', 'cree_par', 'cree_par_details'
+        ]
+        read_only_fields = fields
@@ -115,8 +115,12 @@ def analyser_visage(
     )
 
 
-def analyser_flux_video(frame, threshold: Optional[float] = None, top_k: int = 3):
-    """Analyse un frame vidéo pour la reconnaissance faciale en direct."""
+def analyser_flux_video(frame, threshold: Optional[float] = None, top_k: int = 3, session_key: Optional[str] = None):
+    """Analyse un frame vidéo pour la reconnaissance faciale en direct.
+
+    ``session_key`` identifie le flux (client) : suivi des visages, cache des
+    recherches et confirmation des identités par vote.
+    """
 
     face_service = _get_face_service()
     if face_service is None:
@@ -131,7 +135,7 @@ def analyser_flux_video(frame, threshold: Optional[float] = None, top_k: int = 3
             'error': 'Frame vidéo manquant',
         }
 
-    return face_service.process_stream_frame(frame=frame, threshold=threshold, top_k=top_k)
+    return face_service.process_stream_frame(frame=frame, threshold=threshold, top_k=top_k, session_key=session_key)
 
 
 def predire_risque(criminel_id, type_prediction='recidive'):
@@ -0,0 +1,36 @@
+import logging
+from typing import TYPE_CHECKING
+
+logger = logging.getLogger(__name__)
+
+if TYPE_CHECKING:
+    from typing import Any, Callable
+    def shared_task(*args: Any, **kwargs: Any) -> Callable[[Callable], Callable]:
+        def decorator(func: Callable) -> Callable:
+            return func
+        return decorator
+else:
+    try:
+        from celery import shared_task  # type: ignore[import-untyped]
+        CELERY_AVAILABLE = True
+    except ImportError:
+        CELERY_AVAILABLE = False
+        def shared_task(*args, **kwargs):  # type: ignore[misc]
+            def decorator(func):
+                return func
+            return decorator
+
+
+@shared_task
+def analyser_video(analysis_id):
+    """Analyse hors ligne d'une vidéo (voir intelligence_artificielle.video_analysis)."""
+    from .models import IAVideoAnalysis
+    from .video_analysis import VideoAnalysisJob
+
+    analysis = IAVideoAnalysis.objects.filter(pk=analysis_id).first()
+    if analysis is None:
+        logger.warning("Analyse vidéo %s introuvable", analysis_id)
+        return None
+    resultats = VideoAnalysisJob(analysis).run()
+    logger.info("Analyse vidéo %s terminée (%s piste(s))", analysis.uuid, resultats.get('pistes'))
+    return {'uuid': str(analysis.uuid), 'pistes': resultats.get('pistes')}
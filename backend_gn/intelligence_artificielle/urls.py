@@ -31,6 +31,10 @@ from .views_pattern_recognition import (
     CaseAnalysisAPIView,
     ModelTrainingAPIView
 )
+from .views_video import (
+    VideoAnalysisView,
+    VideoAnalysisDetailView
+)
 
 router = DefaultRouter()
 
@@ -70,4 +74,8 @@ urlpatterns = [
     path('case-analysis/list/', CaseAnalysisAPIView.as_view(), name='case-analysis-list'),  # GET pour lister
     path('model-training/train/', ModelTrainingAPIView.as_view(), name='model-training-train'),
     path('model-training/', ModelTrainingAPIView.as_view(), name='model-training-list'),
+    
+    #ANALYSE VIDÉO HORS LIGNE
+    path('video-analysis/', VideoAnalysisView.as_view(), name='ia-video-analysis'),
+    path('video-analysis/<uuid:uuid>/', VideoAnalysisDetailView.as_view(), name='ia-video-analysis-detail'),
 ]
@@ -19,6 +19,8 @@ except ImportError:
     FaceAnalysis = None
     get_model = None
 
+from biometrie.insightface_loader import create_face_analysis
+
 logger = logging.getLogger(__name__)
 
 
@@ -47,12 +49,8 @@ class ArcFaceRecognition:
     def _initialize_model(self):
         """Initialise le modèle FaceAnalysis"""
         try:
-            # Initialiser FaceAnalysis avec CPU uniquement
-            self.app = FaceAnalysis(
-                name=self.model_name,
-                providers=['CPUExecutionProvider']  # Force l'utilisation du CPU
-            )
-            self.app.prepare(ctx_id=-1, det_size=self.det_size)  # ctx_id=-1 pour CPU
+            # Initialiser FaceAnalysis avec CPU uniquement (ctx_id=-1)
+            self.app = create_face_analysis(self.model_name, det_size=self.det_size)
             logger.info(f"Modèle ArcFace '{self.model_name}' initialisé avec succès (CPU)")
         except Exception as e:
             logger.error(f"Erreur lors de l'initialisation du modèle ArcFace: {str(e)}")
@@ -0,0 +1,380 @@
+"""
+Analyse hors ligne de fichiers vidéo (exports de vidéosurveillance).
+
+Chaîne de traitement d'une ``IAVideoAnalysis`` :
+
+1. Décodage échantillonné : une image toutes les ``stride`` images
+   (``sample_fps`` images analysées par seconde de vidéo). Les images
+   intermédiaires sont sautées par ``grab()`` (pas de conversion couleur) ou,
+   pour un pas important, par positionnement direct (seek).
+2. Détection seule (SCRFD) sur chaque image échantillonnée, image réduite à
+   ``max_side`` pixels.
+3. Suivi des visages par recouvrement (IoU) : une piste par personne tant
+   qu'elle reste visible ; seule la meilleure vue de chaque piste (score de
+   détection x taille) est conservée, sous forme de recadrage.
+4. À la fermeture d'une piste : vignette enregistrée, puis embedding ArcFace
+   de la meilleure vue par lots de ``embed_batch_size`` pistes ; le recadrage
+   est alors libéré (la mémoire ne croît pas avec la durée de la vidéo).
+5. En fin de vidéo : comparaison matricielle des embeddings avec la galerie
+   (UPR + photos criminelles de la version d'embedding active).
+
+Le résultat est une chronologie des apparitions (début, fin, identité, score,
+vignette) et une synthèse par identité. La progression est enregistrée
+toutes les ``PROGRESS_INTERVAL`` secondes.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_INTERVAL = 2.0
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv')
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = max(0, int(seconds))
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+def _iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    if inter == 0:
+        return 0.0
+    union = (a[2] - a[0]) * (a[3] - a[1]) + (b[2] - b[0]) * (b[3] - b[1]) - inter
+    return inter / union if union > 0 else 0.0
+
+
+@dataclass
+class VideoTrack:
+    """Piste d'un visage et sa meilleure vue."""
+
+    track_id: int
+    first_seen: float
+    last_seen: float
+    bbox: Tuple[int, int, int, int]
+    detections: int = 0
+    best_quality: float = -1.0
+    best_timestamp: float = 0.0
+    best_crop: Optional[np.ndarray] = None
+    best_kps: Optional[np.ndarray] = None
+    best_bbox: Tuple[int, int, int, int] = (0, 0, 0, 0)
+    embedding: Optional[np.ndarray] = None
+    thumbnail: Optional[str] = None
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    def observe(self, frame: np.ndarray, face, timestamp: float) -> None:
+        self.bbox = face.bbox
+        self.last_seen = timestamp
+        self.detections += 1
+        x1, y1, x2, y2 = face.bbox
+        quality = face.confidence * float(np.sqrt(max(1, (x2 - x1) * (y2 - y1))))
+        if quality <= self.best_quality or face.landmarks is None:
+            return
+        # Recadrage avec marge : l'alignement ArcFace se fait plus tard sur ce recadrage
+        margin_x, margin_y = (x2 - x1) // 2, (y2 - y1) // 2
+        height, width = frame.shape[:2]
+        cx1, cy1 = max(0, x1 - margin_x), max(0, y1 - margin_y)
+        cx2, cy2 = min(width, x2 + margin_x), min(height, y2 + margin_y)
+        if cx2 <= cx1 or cy2 <= cy1:
+            return
+        self.best_quality = quality
+        self.best_timestamp = timestamp
+        self.best_crop = frame[cy1:cy2, cx1:cx2].copy()
+        self.best_kps = face.landmarks - np.array([cx1, cy1], dtype=np.float32)
+        self.best_bbox = (x1 - cx1, y1 - cy1, x2 - cx1, y2 - cy1)
+
+
+class IoUTracker:
+    """Association glouton par IoU entre détections et pistes ouvertes."""
+
+    def __init__(
+        self,
+        iou_threshold: float = 0.3,
+        max_gap: float = 1.5,
+        on_finish: Optional[Callable[[VideoTrack], None]] = None,
+    ):
+        self.iou_threshold = iou_threshold
+        self.max_gap = max_gap
+        self.on_finish = on_finish
+        self.active: List[VideoTrack] = []
+        self.finished: List[VideoTrack] = []
+        self._next_id = 1
+
+    def update(self, frame: np.ndarray, faces: List[Any], timestamp: float) -> None:
+        pairs = sorted(
+            (
+                (_iou(track.bbox, face.bbox), track_index, face_index)
+                for track_index, track in enumerate(self.active)
+                for face_index, face in enumerate(faces)
+            ),
+            reverse=True,
+        )
+        used_tracks, used_faces = set(), set()
+        for overlap, track_index, face_index in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if track_index in used_tracks or face_index in used_faces:
+                continue
+            used_tracks.add(track_index)
+            used_faces.add(face_index)
+            self.active[track_index].observe(frame, faces[face_index], timestamp)
+
+        for face_index, face in enumerate(faces):
+            if face_index not in used_faces:
+                track = VideoTrack(self._next_id, timestamp, timestamp, face.bbox)
+                self._next_id += 1
+                track.observe(frame, face, timestamp)
+                self.active.append(track)
+
+        still_active = []
+        for track in self.active:
+            if timestamp - track.last_seen > self.max_gap:
+                self._finish(track)
+            else:
+                still_active.append(track)
+        self.active = still_active
+
+    def _finish(self, track: VideoTrack) -> None:
+        self.finished.append(track)
+        if self.on_finish is not None:
+            self.on_finish(track)
+
+    def close(self) -> List[VideoTrack]:
+        for track in self.active:
+            self._finish(track)
+        self.active = []
+        return sorted(self.finished, key=lambda track: track.first_seen)
+
+
+def sample_frames(capture, frame_count: int, stride: int, seek_min_stride: int) -> Iterator[Tuple[int, np.ndarray]]:
+    """Images d'indice 0, stride, 2*stride... (grab pour les petits pas, seek au-delà)."""
+    index = 0
+    seek = stride >= seek_min_stride
+    while frame_count <= 0 or index < frame_count:
+        if seek and index:
+            capture.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ok, frame = capture.read()
+        if not ok or frame is None:
+            return
+        yield index, frame
+        if not seek:
+            for _ in range(stride - 1):
+                if not capture.grab():
+                    return
+        index += stride
+
+
+class VideoAnalysisJob:
+    """Exécute une ``IAVideoAnalysis`` et enregistre progression et résultats."""
+
+    def __init__(
+        self,
+        analysis,
+        *,
+        sample_fps: Optional[float] = None,
+        threshold: Optional[float] = None,
+        max_side: Optional[int] = None,
+        min_detections: Optional[int] = None,
+        embed_batch_size: int = 32,
+    ) -> None:
+        params = analysis.parametres or {}
+        self.analysis = analysis
+        self.sample_fps = float(sample_fps or params.get('sample_fps') or getattr(settings, 'VIDEO_ANALYSIS_SAMPLE_FPS', 2.0))
+        self.threshold = float(threshold or params.get('threshold') or getattr(settings, 'VIDEO_ANALYSIS_THRESHOLD', 0.5))
+        self.max_side = int(max_side or getattr(settings, 'VIDEO_ANALYSIS_MAX_SIDE', 1280))
+        self.min_detections = int(min_detections or getattr(settings, 'VIDEO_ANALYSIS_MIN_DETECTIONS', 2))
+        self.seek_min_stride = int(getattr(settings, 'VIDEO_ANALYSIS_SEEK_MIN_STRIDE', 25))
+        self.embed_batch_size = embed_batch_size
+        self._last_progress = 0.0
+        self._to_embed: List[VideoTrack] = []
+
+    def _save(self, **fields) -> None:
+        type(self.analysis).objects.filter(pk=self.analysis.pk).update(**fields)
+        for name, value in fields.items():
+            setattr(self.analysis, name, value)
+
+    def _report_progress(self, progression: float, frames: int, force: bool = False) -> None:
+        now = time.monotonic()
+        if force or now - self._last_progress >= PROGRESS_INTERVAL:
+            self._last_progress = now
+            self._save(progression=round(min(progression, 99.0), 1), frames_analysees=frames)
+
+    def run(self) -> Dict[str, Any]:
+        from biometrie.arcface_service import get_shared_arcface_service
+
+        started = time.monotonic()
+        self._save(statut='en_cours', date_debut=timezone.now(), progression=0.0, erreur=None)
+        try:
+            arcface = get_shared_arcface_service()
+            tracks, frames, duration = self._detect_and_track(arcface)
+            self._report_progress(95.0, frames, force=True)
+            timeline = self._identify(arcface, tracks)
+        except Exception as exc:
+            logger.error(f"Analyse vidéo {self.analysis.uuid} en échec: {exc}", exc_info=True)
+            self._save(statut='erreur', erreur=str(exc), date_fin=timezone.now())
+            raise
+
+        elapsed = time.monotonic() - started
+        resultats = {
+            'chronologie': timeline,
+            'identites': self._summarize(timeline),
+            'pistes': len(timeline),
+            'temps_traitement_s': round(elapsed, 1),
+            'vitesse': round(duration / elapsed, 1) if elapsed > 0 and duration else None,
+            'embedding_version': arcface.embedding_version,
+        }
+        self._save(
+            statut='termine',
+            progression=100.0,
+            resultats=resultats,
+            duree_video=duration,
+            frames_analysees=frames,
+            date_fin=timezone.now(),
+        )
+        logger.info(
+            f"Analyse vidéo {self.analysis.uuid}: {len(timeline)} piste(s), {frames} image(s) "
+            f"en {elapsed:.0f}s (x{resultats['vitesse']} temps réel)"
+        )
+        return resultats
+
+    def _detect_and_track(self, arcface) -> Tuple[List[VideoTrack], int, float]:
+        capture = cv2.VideoCapture(self.analysis.fichier_video.path)
+        if not capture.isOpened():
+            raise ValueError("Fichier vidéo illisible ou format non supporté.")
+        try:
+            fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+            frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT) or 0)
+            duration = frame_count / fps if frame_count > 0 else 0.0
+            stride = max(1, int(round(fps / self.sample_fps)))
+            self._save(duree_video=duration or None)
+
+            tracker = IoUTracker(
+                max_gap=max(1.5, 2.5 * stride / fps),
+                on_finish=lambda track: self._close_track(arcface, track),
+            )
+            frames = 0
+            for index, frame in sample_frames(capture, frame_count, stride, self.seek_min_stride):
+                scale = self.max_side / max(frame.shape[:2])
+                if scale < 1.0:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                tracker.update(frame, arcface.detect_faces(frame), index / fps)
+                frames += 1
+                if frame_count > 0:
+                    self._report_progress(90.0 * index / frame_count, frames)
+            return tracker.close(), frames, duration
+        finally:
+            capture.release()
+
+    def _close_track(self, arcface, track: VideoTrack) -> None:
+        """Piste fermée : vignette enregistrée, embedding calculé par lots, recadrage libéré."""
+        if track.best_crop is None or track.detections < self.min_detections:
+            track.best_crop = track.best_kps = None
+            return
+        track.thumbnail = self._store_thumbnail(track)
+        self._to_embed.append(track)
+        if len(self._to_embed) >= self.embed_batch_size:
+            self._embed_closed(arcface)
+
+    def _embed_closed(self, arcface) -> None:
+        tracks, self._to_embed = self._to_embed, []
+        if not tracks:
+            return
+        embeddings = arcface.embed_aligned(
+            ((track.best_crop, track.best_kps) for track in tracks),
+            batch_size=self.embed_batch_size,
+        )
+        for track, embedding in zip(tracks, embeddings):
+            track.embedding = embedding
+            track.best_crop = track.best_kps = None
+
+    def _identify(self, arcface, tracks: List[VideoTrack]) -> List[Dict[str, Any]]:
+        from upr.services.gallery_snapshot import load_gallery
+
+        self._embed_closed(arcface)
+        tracks = [track for track in tracks if track.embedding is not None]
+        if not tracks:
+            return []
+
+        embeddings = np.vstack([track.embedding for track in tracks])
+        entries, gallery = load_gallery(arcface.embedding_version)
+        if len(entries) and gallery.shape[1] == embeddings.shape[1]:
+            similarities = embeddings @ gallery.T
+            best_indexes = similarities.argmax(axis=1)
+            best_scores = similarities[np.arange(len(tracks)), best_indexes]
+        else:
+            best_indexes = best_scores = None
+
+        timeline = []
+        for position, track in enumerate(tracks):
+            identity, score = None, None
+            if best_scores is not None:
+                score = float(best_scores[position])
+                if score >= self.threshold:
+                    identity = entries[int(best_indexes[position])]
+            timeline.append({
+                'piste': track.track_id,
+                'debut': round(track.first_seen, 2),
+                'fin': round(track.last_seen, 2),
+                'debut_hms': format_timestamp(track.first_seen),
+                'fin_hms': format_timestamp(track.last_seen),
+                'meilleure_vue': round(track.best_timestamp, 2),
+                'detections': track.detections,
+                'identite': identity,
+                'score': round(score, 4) if score is not None else None,
+                'vignette': track.thumbnail,
+            })
+        return timeline
+
+    def _store_thumbnail(self, track: VideoTrack) -> Optional[str]:
+        x1, y1, x2, y2 = track.best_bbox
+        crop = track.best_crop[max(0, y1):y2, max(0, x1):x2]
+        if crop.size == 0:
+            return None
+        ok, encoded = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, 85])
+        if not ok:
+            return None
+        try:
+            path = default_storage.save(
+                f'ia/videos/vignettes/{self.analysis.uuid}/piste_{track.track_id}.jpg',
+                ContentFile(encoded.tobytes()),
+            )
+            return default_storage.url(path)
+        except Exception as e:
+            logger.warning(f"Vignette de la piste {track.track_id} non enregistrée: {e}")
+            return None
+
+    @staticmethod
+    def _summarize(timeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Synthèse par identité reconnue : apparitions, première/dernière, meilleur score."""
+        identities: Dict[str, Dict[str, Any]] = {}
+        for appearance in timeline:
+            identity = appearance['identite']
+            if identity is None:
+                continue
+            summary = identities.setdefault(identity['key'], {
+                'identite': identity,
+                'apparitions': 0,
+                'premiere': appearance['debut'],
+                'derniere': appearance['fin'],
+                'meilleur_score': appearance['score'],
+                'vignette': appearance['vignette'],
+            })
+            summary['apparitions'] += 1
+            summary['premiere'] = min(summary['premiere'], appearance['debut'])
+            summary['derniere'] = max(summary['derniere'], appearance['fin'])
+            if appearance['score'] > summary['meilleur_score']:
+                summary['meilleur_score'] = appearance['score']
+                summary['vignette'] = appearance['vignette']
+        return sorted(identities.values(), key=lambda summary: summary['premiere'])
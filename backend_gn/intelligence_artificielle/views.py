@@ -23,10 +23,14 @@ from backend.ia.exceptions import (
     NoFaceDetectedError,
     NoMatchFoundError,
 )
+from backend.ia.frame_dedup import FrameDedupMixin, RawImageParser, client_key
 from backend.ia.photo_search import search_criminal_by_photo
 from backend.ia.realtime_capture import analyze_realtime_capture
 from biometrie.arcface_service import ArcFaceService
+from biometrie.hydration import hydrate_criminels
 from biometrie.models import Biometrie
+from biometrie.profiling import BiometricProfilingMixin
+from biometrie.response_shaping import BiometricResponseShapingMixin
 from criminel.models import CriminalFicheCriminelle
 
 from .models import (
@@ -641,7 +645,7 @@ class ReconnaissanceViewSet(APIView):
         return Response(response_payload, status=status.HTTP_200_OK)
 
 
-class RecherchePhotoAPIView(APIView):
+class RecherchePhotoAPIView(BiometricProfilingMixin, APIView):
     """
     Endpoint simplifié : compare une photo importée avec les encodages stockés en base.
     Renvoie les criminels correspondants triés par similarité décroissante.
@@ -932,16 +936,18 @@ class RecherchePhotoAPIView(APIView):
         )
 
 
-class RecherchePhotoStreamAPIView(APIView):
+class RecherchePhotoStreamAPIView(BiometricProfilingMixin, FrameDedupMixin, BiometricResponseShapingMixin, APIView):
     """
     Endpoint temps réel pour la reconnaissance par flux vidéo.
 
-    Accepte un embedding pré-calculé ou un crop d'image contenant un visage et
-    retourne les correspondances dépassant le seuil de similarité.
+    Accepte un embedding pré-calculé ou un crop d'image contenant un visage
+    (multipart ou corps ``image/jpeg`` brut) et retourne les correspondances
+    dépassant le seuil de similarité. Les frames quasi identiques à une frame
+    récente du même client reçoivent la réponse en cache.
     """
 
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser, RawImageParser]
     DEFAULT_THRESHOLD = 0.7
     DEFAULT_TOP = 3
 
@@ -1012,6 +1018,9 @@ class RecherchePhotoStreamAPIView(APIView):
         return sorted(filtered.values(), key=lambda item: item['similarite'], reverse=True)[:top_k]
 
     def post(self, request):
+        return self.with_frame_dedup(request, self._analyze)
+
+    def _analyze(self, request):
         started_at = time.perf_counter()
 
         try:
@@ -1147,6 +1156,7 @@ class RecherchePhotoStreamAPIView(APIView):
             frame=frame_image,
             threshold=threshold,
             top_k=top_k,
+            session_key=client_key(request),
         )
 
         elapsed = time.perf_counter() - started_at
@@ -1219,7 +1229,7 @@ class RecherchePhotoStreamAPIView(APIView):
         )
 
 
-class ReconnaissanceStreamingViewSet(APIView):
+class ReconnaissanceStreamingViewSet(BiometricProfilingMixin, FrameDedupMixin, BiometricResponseShapingMixin, APIView):
     """
     Endpoint pour la reconnaissance faciale en temps réel (streaming)
     POST /api/ia/reconnaissance-streaming/ - Analyser un frame de vidéo en temps réel
@@ -1227,16 +1237,20 @@ class ReconnaissanceStreamingViewSet(APIView):
     CORRIGÉ COMPLÈTEMENT : Gestion robuste des erreurs 500
     """
     permission_classes = [IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser, JSONParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser, RawImageParser]
+    frame_file_fields = ('image',)
     
     def post(self, request):
+        return self.with_frame_dedup(request, self._analyze)
+    
+    def _analyze(self, request):
         """
         Analyse un frame vidéo pour identification en temps réel
         
         Utilise ArcFace pour la reconnaissance faciale en temps réel.
         
         Paramètres acceptés:
-            - image: Fichier image (multipart/form-data)
+            - image: Fichier image (multipart/form-data) ou corps image/jpeg brut
         """
         from datetime import datetime
         
@@ -1268,7 +1282,12 @@ class ReconnaissanceStreamingViewSet(APIView):
             except (TypeError, ValueError):
                 top_k = 3
 
-            resultats = services.analyser_flux_video(image, threshold=threshold_value, top_k=top_k)
+            resultats = services.analyser_flux_video(
+                image,
+                threshold=threshold_value,
+                top_k=top_k,
+                session_key=client_key(request),
+            )
 
             if not resultats.get('success'):
                 return Response({
@@ -1288,6 +1307,7 @@ class ReconnaissanceStreamingViewSet(APIView):
                 'faces': resultats.get('faces', []),
                 'duration_ms': resultats.get('duration_ms'),
                 'threshold': resultats.get('threshold'),
+                'searches': resultats.get('searches'),
             }, status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
@@ -1300,18 +1320,29 @@ class ReconnaissanceStreamingViewSet(APIView):
 #FIN DE ReconnaissanceStreamingViewSet
 
 
-class RealtimeRecognitionView(APIView):
+class RealtimeRecognitionView(BiometricProfilingMixin, FrameDedupMixin, BiometricResponseShapingMixin, APIView):
     """
     Endpoint simplifié pour la reconnaissance faciale sur capture unique (webcam).
     POST /api/ia/realtime-recognition/
+
+    Image en data URL base64 (JSON), en multipart (champ ``image``) ou en
+    corps ``image/jpeg`` brut. Les landmarks ne sont renvoyés qu'avec
+    ``?include=landmarks``.
     """
 
     permission_classes = [IsAuthenticated]
-    parser_classes = [JSONParser]
+    parser_classes = [JSONParser, MultiPartParser, FormParser, RawImageParser]
+    frame_file_fields = ("image",)
+    frame_base64_field = "image"
+    frame_param_fields = ("threshold",)
 
     def post(self, request):
-        image_data = request.data.get("image")
-        if not image_data:
+        return self.with_frame_dedup(request, self._analyze)
+
+    def _analyze(self, request):
+        image_file = request.FILES.get("image")
+        image_data = None if image_file is not None else request.data.get("image")
+        if image_file is None and not image_data:
             return Response(
                 {
                     "status": "invalid_payload",
@@ -1329,6 +1360,7 @@ class RealtimeRecognitionView(APIView):
         try:
             result = analyze_realtime_capture(
                 image_data=image_data,
+                image_bytes=image_file.read() if image_file is not None else None,
                 threshold=threshold_value,
             )
         except FaceModelUnavailableError as exc:
@@ -1505,7 +1537,7 @@ class StatistiquesIAViewSet(APIView):
 
 #RECONNAISSANCE FACIALE ARCFACE
 
-class FaceRecognitionView(APIView):
+class FaceRecognitionView(BiometricProfilingMixin, APIView):
     """
     API pour la reconnaissance faciale avec ArcFace
     POST: Envoyer une image pour identifier un criminel
@@ -1528,12 +1560,13 @@ class FaceRecognitionView(APIView):
         except Exception:
             return url
 
-    def _serialize_criminel(self, request, match_dict: dict) -> Optional[dict]:
+    def _serialize_criminel(self, request, match_dict: dict, fiches: dict) -> Optional[dict]:
+        """``fiches`` : fiches hydratées en une requête (voir ``hydrate_criminels``)."""
         criminel_id = match_dict.get('criminel_id')
         if criminel_id is None:
             return None
 
-        criminel_obj = CriminalFicheCriminelle.objects.filter(id=criminel_id).first()
+        criminel_obj = fiches.get(criminel_id)
         metadata = match_dict.get('metadata') or {}
         confidence_value = float(match_dict.get('confidence', match_dict.get('similarite', 0.0)) or 0.0)
         confidence_percent = max(
@@ -1679,12 +1712,15 @@ class FaceRecognitionView(APIView):
                 )
 
             best_match_raw = result.get('best_match') or {}
+            fiches = hydrate_criminels(
+                candidate.get('criminel_id') for candidate in [best_match_raw, *result.get('matches', [])]
+            )
             criminel_payload = (
-                self._serialize_criminel(request, best_match_raw) if best_match_raw else None
+                self._serialize_criminel(request, best_match_raw, fiches) if best_match_raw else None
             )
 
             formatted_matches = [
-                self._serialize_criminel(request, candidate)
+                self._serialize_criminel(request, candidate, fiches)
                 for candidate in result.get('matches', [])
             ]
             formatted_matches = [match for match in formatted_matches if match is not None]
@@ -0,0 +1,134 @@
+"""
+Vues pour l'analyse hors ligne de fichiers vidéo
+Téléversement d'un export de vidéosurveillance puis suivi de l'analyse
+"""
+import logging
+import os
+
+from django.conf import settings
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .models import IAVideoAnalysis
+from .serializers import IAVideoAnalysisSerializer
+from .video_analysis import VIDEO_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+
+def file_de_taches_disponible():
+    from .tasks import analyser_video
+
+    return getattr(settings, 'CELERY_ENABLED', False) and hasattr(analyser_video, 'delay')
+
+
+def lancer_analyse_video(analysis):
+    """
+    Confie l'analyse à Celery ; False si la file est injoignable (analyse marquée en erreur).
+
+    Une analyse peut durer une heure : elle n'est jamais exécutée dans un worker
+    gunicorn, dont le recyclage ou le timeout la laisserait « en cours » sans fin.
+    """
+    from .tasks import analyser_video
+
+    try:
+        analyser_video.delay(analysis.pk)
+        return True
+    except Exception as e:
+        logger.error(f"File de tâches injoignable, analyse vidéo {analysis.uuid} non planifiée: {e}")
+        IAVideoAnalysis.objects.filter(pk=analysis.pk).update(
+            statut='erreur',
+            erreur="File de tâches (Celery) injoignable, analyse non planifiée.",
+            date_fin=timezone.now(),
+        )
+        return False
+
+
+class VideoAnalysisView(APIView):
+    """
+    Analyse hors ligne de fichiers vidéo
+    POST /api/ia/video-analysis/  (multipart : video, sample_fps, threshold)
+    GET  /api/ia/video-analysis/  (analyses de l'utilisateur, les plus récentes d'abord)
+
+    Le POST répond 202 immédiatement ; la progression se suit sur
+    GET /api/ia/video-analysis/<uuid>/
+    """
+    permission_classes = [IsAuthenticated]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def get(self, request):
+        analyses = IAVideoAnalysis.objects.filter(cree_par=request.user).order_by('-date_creation')[:50]
+        serializer = IAVideoAnalysisSerializer(analyses, many=True)
+        return Response(serializer.data)
+
+    def post(self, request):
+        if not file_de_taches_disponible():
+            return Response(
+                {'error': "L'analyse vidéo nécessite la file de tâches (Celery), désactivée sur ce serveur."},
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+
+        video = request.FILES.get('video')
+        if video is None:
+            return Response(
+                {'error': 'Aucun fichier vidéo transmis (champ "video").'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        extension = os.path.splitext(video.name)[1].lower()
+        if extension not in VIDEO_EXTENSIONS:
+            return Response(
+                {'error': f"Format non supporté ({extension or 'inconnu'}). Formats acceptés : {', '.join(VIDEO_EXTENSIONS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        max_mb = getattr(settings, 'VIDEO_ANALYSIS_MAX_UPLOAD_MB', 2048)
+        if video.size > max_mb * 1024 * 1024:
+            return Response(
+                {'error': f'Fichier trop volumineux (maximum {max_mb} Mo).'},
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+            )
+
+        parametres = {}
+        try:
+            if request.data.get('sample_fps') not in (None, ''):
+                parametres['sample_fps'] = min(max(float(request.data['sample_fps']), 0.1), 30.0)
+            if request.data.get('threshold') not in (None, ''):
+                parametres['threshold'] = min(max(float(request.data['threshold']), 0.0), 1.0)
+        except (TypeError, ValueError):
+            return Response(
+                {'error': 'Paramètres sample_fps / threshold invalides.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        analysis = IAVideoAnalysis.objects.create(
+            fichier_video=video,
+            nom_fichier=video.name[:255],
+            parametres=parametres,
+            cree_par=request.user,
+        )
+        if not lancer_analyse_video(analysis):
+            analysis.refresh_from_db()
+            return Response(IAVideoAnalysisSerializer(analysis).data, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+        logger.info(f"Analyse vidéo {analysis.uuid} ({video.name}, {video.size} octets) planifiée")
+
+        return Response(IAVideoAnalysisSerializer(analysis).data, status=status.HTTP_202_ACCEPTED)
+
+
+class VideoAnalysisDetailView(APIView):
+    """
+    Suivi d'une analyse vidéo
+    GET /api/ia/video-analysis/<uuid>/  (statut, progression, chronologie)
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, uuid):
+        analysis = get_object_or_404(IAVideoAnalysis, uuid=uuid)
+        if analysis.cree_par_id != request.user.pk and not request.user.is_staff:
+            return Response({'error': 'Accès refusé.'}, status=status.HTTP_403_FORBIDDEN)
+        return Response(IAVideoAnalysisSerializer(analysis).data)
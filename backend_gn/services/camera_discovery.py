@@ -0,0 +1,293 @@
+"""
+Découverte des caméras en parallèle et inventaire en cache.
+
+Tester une caméra (``cv2.VideoCapture`` + lecture d'une frame) peut prendre
+plusieurs secondes, surtout pour un flux RTSP injoignable. Les tests sont
+donc lancés en parallèle dans un pool de threads (OpenCV libère le GIL) avec
+un délai maximal commun : un scan de N candidats dure environ un délai, pas N.
+
+Le résultat est conservé dans un inventaire (``CameraInventory``) valable
+``CAMERA_DISCOVERY_TTL`` secondes : l'API le lit instantanément et, s'il est
+périmé, déclenche un rafraîchissement en arrière-plan (un seul à la fois).
+L'inventaire est propre à chaque processus worker.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CameraCandidate:
+    """Source à tester : index USB ou URL IP/RTSP."""
+
+    camera_id: str
+    source: Union[int, str]
+    camera_type: str
+
+
+def configured_candidates() -> List[CameraCandidate]:
+    """Candidats issus de CAMERAS_USB_MAX et CAMERAS_IPS (identifiants usb_<n> / ip_<n>)."""
+    usb_max = int(os.getenv('CAMERAS_USB_MAX', '6'))
+    candidates = [CameraCandidate(f'usb_{idx}', idx, 'usb') for idx in range(usb_max)]
+    urls = [url.strip() for url in os.getenv('CAMERAS_IPS', '').split(',') if url.strip()]
+    candidates.extend(CameraCandidate(f'ip_{idx}', url, 'ip') for idx, url in enumerate(urls))
+    return candidates
+
+
+def _open_capture(source: Union[int, str], timeout: float):
+    import cv2
+
+    timeout_ms = int(timeout * 1000)
+    params = []
+    # Délais d'ouverture / lecture (OpenCV >= 4.5.2), ignorés par les backends qui ne les gèrent pas
+    for name in ('CAP_PROP_OPEN_TIMEOUT_MSEC', 'CAP_PROP_READ_TIMEOUT_MSEC'):
+        prop = getattr(cv2, name, None)
+        if prop is not None:
+            params.extend([prop, timeout_ms])
+    if params:
+        try:
+            return cv2.VideoCapture(source, cv2.CAP_ANY, params)
+        except (TypeError, cv2.error):
+            pass
+    return cv2.VideoCapture(source)
+
+
+def probe_camera(source: Union[int, str], timeout: float = 3.0) -> Dict[str, Any]:
+    """
+    Teste une source : ouverture puis lecture d'une frame.
+
+    Returns:
+        ``{'available': bool, 'resolution': {...} | None, 'error': str | None, 'probe_ms': float}``
+    """
+    started = time.perf_counter()
+    result: Dict[str, Any] = {'available': False, 'resolution': None, 'error': None}
+    from services.camera_pool import get_camera_pool
+
+    pool = get_camera_pool()
+    if pool is not None and pool.holds(source):
+        # Caméra maintenue ouverte par le pool : disponible, inutile de la rouvrir
+        result['available'] = True
+        result['probe_ms'] = 0.0
+        return result
+    cap = None
+    try:
+        cap = _open_capture(source, timeout)
+        if cap.isOpened():
+            ret, frame = cap.read()
+            if ret and frame is not None:
+                result['available'] = True
+                result['resolution'] = {'width': int(frame.shape[1]), 'height': int(frame.shape[0])}
+            else:
+                result['error'] = 'Aucune frame lue'
+        else:
+            result['error'] = 'Ouverture impossible'
+    except Exception as e:
+        result['error'] = str(e)
+    finally:
+        if cap is not None:
+            try:
+                cap.release()
+            except Exception:
+                pass
+    result['probe_ms'] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
+
+def probe_in_parallel(
+    items: Sequence[Any],
+    probe: Callable[[Any], Dict[str, Any]],
+    *,
+    timeout: float,
+    max_workers: int = 8,
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Applique ``probe`` à chaque élément en parallèle, ``timeout`` secondes par test.
+
+    Le délai de chaque test court à partir de son démarrage effectif (les tests
+    en file derrière les ``max_workers`` premiers ne sont pas pénalisés). Le scan
+    est borné à ``timeout`` par vague de ``max_workers`` tests : ceux qui n'ont
+    pas pu démarrer d'ici là (threads occupés par des tests bloqués) sont annulés.
+
+    Returns:
+        Résultats dans l'ordre de ``items`` ; ``None`` pour un test sans réponse
+        dans le délai (il se termine en arrière-plan, son résultat est ignoré)
+        ou non démarré.
+    """
+    if not items:
+        return []
+    workers = max(1, min(max_workers, len(items)))
+    started_at: Dict[int, float] = {}
+
+    def run(index: int, item: Any) -> Dict[str, Any]:
+        started_at[index] = time.monotonic()
+        return probe(item)
+
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='camera-probe')
+    futures = [executor.submit(run, index, item) for index, item in enumerate(items)]
+    scan_deadline = time.monotonic() + timeout * -(-len(items) // workers)
+    pending = set(range(len(futures)))
+    while pending:
+        now = time.monotonic()
+        if now >= scan_deadline:
+            break
+        # Tests démarrés mais hors délai : abandonnés (leur thread reste occupé)
+        pending = {
+            index for index in pending
+            if not futures[index].done()
+            and (index not in started_at or now - started_at[index] < timeout)
+        }
+        if not pending:
+            break
+        next_deadline = min(
+            [started_at[index] + timeout for index in pending if index in started_at] + [scan_deadline]
+        )
+        wait([futures[index] for index in pending], timeout=max(0.0, next_deadline - now) + 0.01,
+             return_when=FIRST_COMPLETED)
+    executor.shutdown(wait=False, cancel_futures=True)
+
+    results: List[Optional[Dict[str, Any]]] = []
+    for index, (item, future) in enumerate(zip(items, futures)):
+        if not future.done() or future.cancelled():
+            if index in started_at:
+                logger.warning(f"Test caméra {item}: pas de réponse en {timeout:.1f}s")
+            else:
+                logger.warning(f"Test caméra {item}: non démarré (tests précédents bloqués)")
+            results.append(None)
+            continue
+        try:
+            results.append(future.result())
+        except Exception as e:
+            logger.debug(f"Test caméra {item} en erreur: {e}")
+            results.append(None)
+    return results
+
+
+class CameraInventory:
+    """Dernier résultat de découverte, rafraîchi au plus un scan à la fois."""
+
+    def __init__(
+        self,
+        *,
+        ttl_seconds: float = 300.0,
+        probe_timeout: float = 3.0,
+        max_workers: int = 8,
+        candidates: Callable[[], List[CameraCandidate]] = configured_candidates,
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.probe_timeout = probe_timeout
+        self.max_workers = max_workers
+        self.candidates = candidates
+        self._cameras: List[Dict[str, Any]] = []
+        self._scanned_at: Optional[float] = None
+        self._scan_ms: Optional[float] = None
+        self._lock = threading.Lock()
+        self._scan_done = threading.Event()
+        self._scan_done.set()
+
+    @property
+    def refreshing(self) -> bool:
+        return not self._scan_done.is_set()
+
+    def is_stale(self) -> bool:
+        return self._scanned_at is None or time.time() - self._scanned_at > self.ttl_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Inventaire courant (lecture instantanée, aucun test de caméra)."""
+        with self._lock:
+            cameras = list(self._cameras)
+            scanned_at = self._scanned_at
+            scan_ms = self._scan_ms
+        return {
+            'cameras': cameras,
+            'scanned_at': scanned_at,
+            'age_seconds': round(time.time() - scanned_at, 1) if scanned_at else None,
+            'scan_ms': scan_ms,
+            'stale': self.is_stale(),
+            'refreshing': self.refreshing,
+        }
+
+    def refresh(self, wait_for_result: bool = False) -> bool:
+        """
+        Lance un scan en arrière-plan (sauf s'il y en a déjà un en cours).
+
+        Args:
+            wait_for_result: Attendre la fin du scan (environ ``probe_timeout``).
+
+        Returns:
+            True si un nouveau scan a été lancé.
+        """
+        with self._lock:
+            started = self._scan_done.is_set()
+            if started:
+                self._scan_done.clear()
+                threading.Thread(target=self._scan, name='camera-discovery', daemon=True).start()
+        if wait_for_result:
+            self._scan_done.wait(self.probe_timeout + 2.0)
+        return started
+
+    def get(self, refresh_if_stale: bool = True) -> Dict[str, Any]:
+        """Inventaire courant ; un inventaire périmé déclenche un rafraîchissement."""
+        if refresh_if_stale and self.is_stale():
+            # Premier appel : rien à servir, on attend le scan (borné par probe_timeout)
+            self.refresh(wait_for_result=self._scanned_at is None)
+        return self.snapshot()
+
+    def _scan(self) -> None:
+        started = time.perf_counter()
+        try:
+            candidates = self.candidates()
+            results = probe_in_parallel(
+                candidates,
+                lambda candidate: probe_camera(candidate.source, self.probe_timeout),
+                timeout=self.probe_timeout,
+                max_workers=self.max_workers,
+            )
+            cameras = []
+            for candidate, result in zip(candidates, results):
+                result = result or {'available': False, 'resolution': None, 'error': 'Délai dépassé', 'probe_ms': None}
+                cameras.append({
+                    'camera_id': candidate.camera_id,
+                    'source': str(candidate.source),
+                    'camera_type': candidate.camera_type,
+                    **result,
+                })
+            scan_ms = round((time.perf_counter() - started) * 1000, 1)
+            with self._lock:
+                self._cameras = cameras
+                self._scanned_at = time.time()
+                self._scan_ms = scan_ms
+            logger.info(
+                f"Découverte caméras: {sum(c['available'] for c in cameras)}/{len(cameras)} disponible(s) en {scan_ms:.0f} ms"
+            )
+        except Exception as e:
+            logger.error(f"Erreur découverte caméras: {e}", exc_info=True)
+        finally:
+            self._scan_done.set()
+
+
+_INVENTORY: Optional[CameraInventory] = None
+_INVENTORY_LOCK = threading.Lock()
+
+
+def get_camera_inventory() -> CameraInventory:
+    """Inventaire du processus, configuré par les paramètres CAMERA_DISCOVERY_*."""
+
+    global _INVENTORY
+    if _INVENTORY is None:
+        with _INVENTORY_LOCK:
+            if _INVENTORY is None:
+                _INVENTORY = CameraInventory(
+                    ttl_seconds=getattr(settings, 'CAMERA_DISCOVERY_TTL', 300.0),
+                    probe_timeout=getattr(settings, 'CAMERA_PROBE_TIMEOUT', 3.0),
+                    max_workers=getattr(settings, 'CAMERA_DISCOVERY_WORKERS', 8),
+                )
+    return _INVENTORY
@@ -0,0 +1,343 @@
+"""
+Pool de caméras maintenues ouvertes (« à chaud ») pour les captures.
+
+Ouvrir une caméra USB ou un flux RTSP coûte de quelques centaines de ms à
+plusieurs secondes, et l'auto-exposition repart de zéro à chaque ouverture.
+Le pool garde donc chaque caméra utilisée ouverte :
+
+- un thread de lecture par caméra lit les frames en continu et ne conserve
+  que la plus récente : une capture renvoie une copie de cette frame en
+  quelques millisecondes ;
+- contrôle de santé : après ``max_failures`` lectures en échec consécutives,
+  la caméra est rouverte (délai croissant entre deux tentatives) ;
+- une caméra inutilisée depuis ``CAMERA_POOL_IDLE_SECONDS`` est libérée
+  (le périphérique redevient disponible pour d'autres applications) ;
+- au plus ``CAMERA_POOL_MAX_HANDLES`` caméras ouvertes, la moins récemment
+  utilisée est libérée au-delà.
+
+Le pool est propre à chaque processus worker : un périphérique USB ouvert
+par un worker peut être refusé aux autres.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+CameraSource = Union[int, str]
+
+
+class WarmCamera:
+    """Caméra ouverte et lue en continu par un thread dédié."""
+
+    def __init__(
+        self,
+        source: CameraSource,
+        *,
+        width: int = 1280,
+        height: int = 720,
+        warmup_frames: int = 5,
+        max_failures: int = 10,
+        reopen_backoff_max: float = 30.0,
+    ) -> None:
+        self.source = source
+        self.width = width
+        self.height = height
+        self.warmup_frames = warmup_frames
+        self.max_failures = max_failures
+        self.reopen_backoff_max = reopen_backoff_max
+        self._cap: Optional[cv2.VideoCapture] = None
+        self._frame: Optional[np.ndarray] = None
+        self._frame_at = 0.0
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.opened_at: Optional[float] = None
+        self.last_access = time.monotonic()
+        self.reopens = 0
+        self.read_failures = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and not self._stop_event.is_set()
+
+    def _open(self) -> bool:
+        cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            cap.release()
+            self.last_error = "Ouverture impossible"
+            return False
+        if isinstance(self.source, int):
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # Quelques frames pour laisser l'exposition / la balance des blancs se stabiliser
+        for _ in range(self.warmup_frames):
+            cap.read()
+        ok, frame = cap.read()
+        if not ok or frame is None:
+            cap.release()
+            self.last_error = "Aucune frame lue"
+            return False
+        self._cap = cap
+        self._publish(frame)
+        self.opened_at = time.monotonic()
+        self.last_error = None
+        return True
+
+    def start(self) -> bool:
+        """Ouvre la caméra (synchrone) puis lance la lecture continue ; False si l'ouverture échoue."""
+        if not self._open():
+            return False
+        self._thread = threading.Thread(target=self._grab_loop, name=f"camera-pool-{self.source}", daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            if self._thread is not threading.current_thread():
+                self._thread.join(timeout=2.0)
+            if self._thread.is_alive():
+                # Lecture encore en cours (read() bloquant) : libérer la capture depuis un
+                # autre thread peut planter le code natif, le thread la libère en sortant
+                logger.debug(f"Caméra {self.source}: libération laissée au thread de lecture")
+                return
+        self._release()
+
+    def _release(self) -> None:
+        cap, self._cap = self._cap, None
+        if cap is not None:
+            try:
+                cap.release()
+            except Exception:
+                pass
+
+    def _publish(self, frame: np.ndarray) -> None:
+        with self._cond:
+            self._frame = frame
+            self._frame_at = time.monotonic()
+            self._seq += 1
+            self._cond.notify_all()
+
+    def _grab_loop(self) -> None:
+        failures = 0
+        backoff = 1.0
+        while not self._stop_event.is_set():
+            cap = self._cap
+            if cap is None:
+                # Santé : réouverture après une série d'échecs
+                if self._stop_event.wait(backoff):
+                    break
+                if self._open():
+                    self.reopens += 1
+                    failures = 0
+                    backoff = 1.0
+                    logger.info(f"Caméra {self.source} rouverte")
+                else:
+                    backoff = min(backoff * 2, self.reopen_backoff_max)
+                continue
+
+            ok, frame = cap.read()
+            if ok and frame is not None:
+                failures = 0
+                self._publish(frame)
+                continue
+
+            failures += 1
+            self.read_failures += 1
+            if failures >= self.max_failures:
+                self.last_error = f"{failures} lectures en échec"
+                logger.warning(f"Caméra {self.source}: {failures} lectures en échec, réouverture")
+                self._release()
+            else:
+                time.sleep(0.05)
+        self._release()
+
+    def latest(self, max_age: float, timeout: float) -> Optional[Tuple[np.ndarray, float]]:
+        """
+        Copie de la frame la plus récente et son âge (s).
+
+        Si la frame en mémoire a plus de ``max_age`` secondes, attend une
+        nouvelle frame jusqu'à ``timeout`` secondes.
+        """
+        self.last_access = time.monotonic()
+        deadline = self.last_access + timeout
+        with self._cond:
+            seq = self._seq
+            while self._frame is None or time.monotonic() - self._frame_at > max_age:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._stop_event.is_set():
+                    break
+                self._cond.wait(remaining)
+                if self._seq != seq:
+                    break
+            if self._frame is None:
+                return None
+            age = time.monotonic() - self._frame_at
+            if age > max(max_age, timeout):
+                return None
+            return self._frame.copy(), age
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'source': str(self.source),
+            'alive': self.alive,
+            'connected': self._cap is not None,
+            'frames': self._seq,
+            'frame_age_s': round(now - self._frame_at, 3) if self._frame is not None else None,
+            'idle_s': round(now - self.last_access, 1),
+            'uptime_s': round(now - self.opened_at, 1) if self.opened_at else None,
+            'reopens': self.reopens,
+            'read_failures': self.read_failures,
+            'last_error': self.last_error,
+        }
+
+
+class CameraPool:
+    """Caméras ouvertes à la demande, libérées après inactivité."""
+
+    def __init__(
+        self,
+        *,
+        idle_seconds: float = 60.0,
+        max_handles: int = 4,
+        max_frame_age: float = 0.5,
+        camera_options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.idle_seconds = idle_seconds
+        self.max_handles = max(1, max_handles)
+        self.max_frame_age = max_frame_age
+        self.camera_options = camera_options or {}
+        self._cameras: "OrderedDict[CameraSource, WarmCamera]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._janitor: Optional[threading.Thread] = None
+
+    def holds(self, source: CameraSource) -> bool:
+        """True si la caméra est déjà ouverte par le pool (inutile / impossible de la rouvrir)."""
+        with self._lock:
+            camera = self._cameras.get(source)
+            return camera is not None and camera.alive
+
+    def _get_or_open(self, source: CameraSource) -> Optional[WarmCamera]:
+        with self._lock:
+            camera = self._cameras.get(source)
+            if camera is not None and camera.alive:
+                self._cameras.move_to_end(source)
+                return camera
+            if camera is not None:
+                self._cameras.pop(source)
+
+        # Ouverture hors verrou : les autres caméras restent accessibles pendant ce temps
+        camera = WarmCamera(source, **self.camera_options)
+        started = time.perf_counter()
+        if not camera.start():
+            logger.warning(f"Caméra {source} indisponible pour le pool: {camera.last_error}")
+            return None
+        logger.info(f"Caméra {source} ouverte dans le pool en {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        evicted = []
+        with self._lock:
+            existing = self._cameras.get(source)
+            if existing is not None and existing.alive:
+                # Ouverte entre-temps par une autre requête
+                evicted.append(camera)
+                camera = existing
+            else:
+                self._cameras[source] = camera
+            self._cameras.move_to_end(source)
+            while len(self._cameras) > self.max_handles:
+                _, oldest = self._cameras.popitem(last=False)
+                evicted.append(oldest)
+        for other in evicted:
+            other.stop()
+        self._ensure_janitor()
+        return camera
+
+    def capture(self, source: CameraSource, timeout: float = 5.0) -> Optional[Tuple[np.ndarray, float]]:
+        """Frame courante de ``source`` et son âge (s), ou None si la caméra est indisponible."""
+        camera = self._get_or_open(source)
+        if camera is None:
+            return None
+        return camera.latest(self.max_frame_age, timeout)
+
+    def release(self, source: CameraSource) -> None:
+        with self._lock:
+            camera = self._cameras.pop(source, None)
+        if camera is not None:
+            camera.stop()
+
+    def close_all(self) -> None:
+        with self._lock:
+            cameras = list(self._cameras.values())
+            self._cameras.clear()
+        for camera in cameras:
+            camera.stop()
+
+    def _ensure_janitor(self) -> None:
+        with self._lock:
+            if self._janitor is None or not self._janitor.is_alive():
+                self._janitor = threading.Thread(target=self._janitor_loop, name="camera-pool-janitor", daemon=True)
+                self._janitor.start()
+
+    def _janitor_loop(self) -> None:
+        while True:
+            time.sleep(min(5.0, max(0.5, self.idle_seconds / 4)))
+            now = time.monotonic()
+            with self._lock:
+                idle = [
+                    source for source, camera in self._cameras.items()
+                    if now - camera.last_access > self.idle_seconds or not camera.alive
+                ]
+                cameras = [self._cameras.pop(source) for source in idle]
+                remaining = len(self._cameras)
+            for camera in cameras:
+                logger.info(f"Caméra {camera.source} libérée (inactive depuis {now - camera.last_access:.0f}s)")
+                camera.stop()
+            if not remaining:
+                with self._lock:
+                    if not self._cameras:
+                        self._janitor = None
+                        return
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            cameras = list(self._cameras.values())
+        return {
+            'handles': len(cameras),
+            'max_handles': self.max_handles,
+            'idle_seconds': self.idle_seconds,
+            'cameras': [camera.stats() for camera in cameras],
+        }
+
+
+_POOL: Optional[CameraPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_camera_pool() -> Optional[CameraPool]:
+    """Pool du processus, configuré par les paramètres CAMERA_POOL_* (None si désactivé)."""
+
+    global _POOL
+    if not getattr(settings, 'CAMERA_POOL_ENABLED', True):
+        return None
+    if _POOL is None:
+        with _POOL_LOCK:
+            if _POOL is None:
+                _POOL = CameraPool(
+                    idle_seconds=getattr(settings, 'CAMERA_POOL_IDLE_SECONDS', 60.0),
+                    max_handles=getattr(settings, 'CAMERA_POOL_MAX_HANDLES', 4),
+                    max_frame_age=getattr(settings, 'CAMERA_POOL_MAX_FRAME_AGE', 0.5),
+                )
+    return _POOL
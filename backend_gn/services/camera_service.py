@@ -6,6 +6,7 @@ Ce service gère :
 - La capture d'images depuis une caméra spécifique
 - La gestion des erreurs (caméra non disponible, non branchée)
 - La libération des ressources
+- Le maintien à chaud des caméras utilisées (voir services.camera_pool)
 
 Intégré au système SGIC pour supporter les caméras intégrées et USB externes.
 """
@@ -17,8 +18,12 @@ from typing import Optional, Tuple, Dict, Any
 from io import BytesIO
 from PIL import Image
 from django.core.files.uploadedfile import InMemoryUploadedFile
+from django.conf import settings
 from django.utils import timezone
 
+from services.camera_discovery import probe_in_parallel
+from services.camera_pool import get_camera_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -74,11 +79,14 @@ class CameraService:
         available_cameras = []
         
         try:
-            # Tester les indices de 0 à max_test_index
-            for idx in range(self._max_test_index):
-                camera_info = self._test_camera_index(idx)
-                if camera_info['available']:
-                    available_cameras.append(camera_info)
+            # Tester les indices de 0 à max_test_index en parallèle
+            results = probe_in_parallel(
+                list(range(self._max_test_index)),
+                self._test_camera_index,
+                timeout=getattr(settings, 'CAMERA_PROBE_TIMEOUT', 3.0),
+                max_workers=getattr(settings, 'CAMERA_DISCOVERY_WORKERS', 8),
+            )
+            available_cameras = [info for info in results if info and info['available']]
         except Exception as e:
             logger.error(f"Erreur lors de la détection des caméras: {e}", exc_info=True)
         
@@ -101,6 +109,13 @@ class CameraService:
             'available': False
         }
         
+        pool = get_camera_pool()
+        if pool is not None and pool.holds(index):
+            # Déjà ouverte par le pool : une seconde ouverture échouerait sur la plupart des pilotes
+            camera_info['available'] = True
+            camera_info['warm'] = True
+            return camera_info
+        
         try:
             cap = cv2.VideoCapture(index)
             if cap.isOpened():
@@ -130,10 +145,14 @@ class CameraService:
             camera_index: Index de la caméra (0 = intégrée, 1+ = USB)
             timeout: Timeout en secondes pour la capture
             
+        Avec le pool actif (CAMERA_POOL_ENABLED), la première capture ouvre la
+        caméra et la garde ouverte ; les suivantes renvoient la frame courante.
+            
         Returns:
             Tuple (image_array, metadata) où :
             - image_array: Tableau numpy de l'image capturée (format BGR)
-            - metadata: Dictionnaire avec métadonnées (résolution, timestamp, etc.)
+            - metadata: Dictionnaire avec métadonnées (résolution, timestamp,
+              warm, frame_age_ms, etc.)
             
         Raises:
             CameraUnavailableError: Si la caméra n'est pas disponible
@@ -142,6 +161,49 @@ class CameraService:
         if camera_index < 0:
             raise CameraUnavailableError(f"Index de caméra invalide: {camera_index}")
         
+        pool = get_camera_pool()
+        try:
+            if pool is not None:
+                # Caméra maintenue ouverte : la frame courante est disponible immédiatement
+                captured = pool.capture(camera_index, timeout=timeout)
+                if captured is None:
+                    raise CameraUnavailableError(
+                        f"Impossible d'obtenir une image de la caméra à l'index {camera_index}. "
+                        f"Vérifiez que la caméra est branchée et disponible."
+                    )
+                frame, frame_age = captured
+            else:
+                frame, frame_age = self._capture_cold(camera_index), 0.0
+            
+            # Extraire les métadonnées
+            height, width = frame.shape[:2]
+            metadata = {
+                'camera_index': camera_index,
+                'camera_type': 'integree' if camera_index == 0 else 'usb',
+                'resolution': {'width': int(width), 'height': int(height)},
+                'timestamp': timezone.now().isoformat(),
+                'channels': int(frame.shape[2]) if len(frame.shape) > 2 else 1,
+                'warm': pool is not None,
+                'frame_age_ms': round(frame_age * 1000, 1),
+            }
+            
+            logger.info(
+                f"Capture réussie depuis la caméra index {camera_index} "
+                f"({metadata['resolution']['width']}x{metadata['resolution']['height']})"
+            )
+            
+            return frame, metadata
+            
+        except CameraUnavailableError:
+            raise
+        except CameraCaptureError:
+            raise
+        except Exception as e:
+            logger.error(f"Erreur inattendue lors de la capture: {e}", exc_info=True)
+            raise CameraCaptureError(f"Erreur lors de la capture: {str(e)}")
+    
+    def _capture_cold(self, camera_index: int) -> np.ndarray:
+        """Ouvre la caméra, lit une frame puis la libère (pool désactivé)."""
         cap = None
         try:
             # Ouvrir la caméra
@@ -169,31 +231,7 @@ class CameraService:
                     f"Impossible de lire une image depuis la caméra à l'index {camera_index}. "
                     f"La caméra peut être occupée ou défectueuse."
                 )
-            
-            # Extraire les métadonnées
-            height, width = frame.shape[:2]
-            metadata = {
-                'camera_index': camera_index,
-                'camera_type': 'integree' if camera_index == 0 else 'usb',
-                'resolution': {'width': int(width), 'height': int(height)},
-                'timestamp': timezone.now().isoformat(),
-                'channels': int(frame.shape[2]) if len(frame.shape) > 2 else 1,
-            }
-            
-            logger.info(
-                f"Capture réussie depuis la caméra index {camera_index} "
-                f"({metadata['resolution']['width']}x{metadata['resolution']['height']})"
-            )
-            
-            return frame, metadata
-            
-        except CameraUnavailableError:
-            raise
-        except CameraCaptureError:
-            raise
-        except Exception as e:
-            logger.error(f"Erreur inattendue lors de la capture: {e}", exc_info=True)
-            raise CameraCaptureError(f"Erreur lors de la capture: {str(e)}")
+            return frame
         finally:
             # Toujours libérer la caméra
             if cap is not None:
@@ -288,19 +326,18 @@ class CameraService:
         Raises:
             CameraUnavailableError: Si aucune caméra USB n'est trouvée
         """
-        for index in range(1, max_index + 1):
-            try:
-                cap = cv2.VideoCapture(index)
-                if cap.isOpened():
-                    # Tester si on peut vraiment lire une frame
-                    ret, _ = cap.read()
-                    cap.release()
-                    if ret:
-                        logger.info(f"Caméra USB trouvée à l'index {index}")
-                        return index
-            except Exception as e:
-                logger.debug(f"Erreur test index {index}: {e}")
-                continue
+        # Tous les index testés en parallèle, le plus petit disponible est retenu
+        indexes = list(range(1, max_index + 1))
+        results = probe_in_parallel(
+            indexes,
+            CameraService()._test_camera_index,
+            timeout=getattr(settings, 'CAMERA_PROBE_TIMEOUT', 3.0),
+            max_workers=getattr(settings, 'CAMERA_DISCOVERY_WORKERS', 8),
+        )
+        for index, info in zip(indexes, results):
+            if info and info['available']:
+                logger.info(f"Caméra USB trouvée à l'index {index}")
+                return index
         
         raise CameraUnavailableError(
             f"Aucune webcam USB détectée (testé les index 1 à {max_index}). "
@@ -330,8 +367,14 @@ class CameraService:
         service = CameraService()
         return service.capture_image_as_file(camera_index)
     
-    def cleanup(self):
-        """Libère toutes les ressources caméra (nettoyage)."""
+    def cleanup(self, release_pool: bool = False):
+        """
+        Libère toutes les ressources caméra (nettoyage).
+        
+        Args:
+            release_pool: Ferme aussi les caméras maintenues ouvertes par le pool
+                (partagé par tout le processus)
+        """
         for index, cap in self._camera_cache.items():
             try:
                 if cap.isOpened():
@@ -339,4 +382,8 @@ class CameraService:
             except Exception:
                 pass
         self._camera_cache.clear()
+        if release_pool:
+            pool = get_camera_pool()
+            if pool is not None:
+                pool.close_all()
         logger.debug("Ressources caméra libérées")
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upr', '0011_unidentifiedperson_embedding_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='camera',
+            name='metrics',
+            field=models.JSONField(blank=True, default=dict, help_text='Dernier instantané des métriques de performance envoyé par le service caméra', verbose_name='Métriques'),
+        ),
+        migrations.AddField(
+            model_name='camera',
+            name='metrics_updated_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Métriques mises à jour le'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-19 09:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upr', '0012_camera_metrics'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uprlog',
+            name='alert_id',
+            field=models.CharField(blank=True, db_index=True, help_text="Identifiant de l'alerte attribué par le service caméra (rattachement du clip)", max_length=64, null=True, verbose_name='ID Alerte'),
+        ),
+        migrations.AddField(
+            model_name='uprlog',
+            name='clip',
+            field=models.FileField(blank=True, help_text="Clip couvrant les secondes avant et après l'alerte", null=True, upload_to='upr/clips/%Y/%m/%d/', verbose_name='Clip vidéo'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 4.2.7 on 2026-10-19 14:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upr', '0013_uprlog_alert_clip'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GalleryTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(help_text="Clé de l'entrée supprimée (upr:<id> ou photo:<id>)", max_length=64, verbose_name='Clé galerie')),
+                ('deleted_at', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Date de suppression')),
+            ],
+            options={
+                'verbose_name': 'Suppression galerie',
+                'verbose_name_plural': 'Suppressions galerie',
+                'db_table': 'sgic_upr_gallery_tombstone',
+                'ordering': ['-deleted_at'],
+            },
+        ),
+    ]
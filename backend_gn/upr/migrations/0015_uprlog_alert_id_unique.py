@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-19 16:05
+
+from django.db import migrations, models
+
+
+def release_duplicate_alert_ids(apps, schema_editor):
+    """Libère l'alert_id des doublons existants (la plus ancienne ligne le garde)."""
+    UPRLog = apps.get_model('upr', 'UPRLog')
+    UPRLog.objects.filter(alert_id='').update(alert_id=None)
+    seen = set()
+    duplicates = []
+    rows = UPRLog.objects.filter(alert_id__isnull=False).order_by('alert_id', 'created_at', 'pk')
+    for pk, alert_id in rows.values_list('pk', 'alert_id').iterator():
+        if alert_id in seen:
+            duplicates.append(pk)
+        seen.add(alert_id)
+    if duplicates:
+        UPRLog.objects.filter(pk__in=duplicates).update(alert_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('upr', '0014_gallerytombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(release_duplicate_alert_ids, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='uprlog',
+            constraint=models.UniqueConstraint(condition=models.Q(('alert_id__isnull', False)), fields=('alert_id',), name='sgic_uprlog_alert_id_unique'),
+        ),
+    ]
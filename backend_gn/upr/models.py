@@ -9,6 +9,8 @@ from django.db import models
 from django.core.validators import FileExtensionValidator
 from django.conf import settings
 
+from biometrie.models import default_embedding_version
+
 
 def generate_upr_code():
     """
@@ -104,6 +106,14 @@ class UnidentifiedPerson(models.Model):
         help_text="Vecteur d'embedding ArcFace de 512 dimensions (format JSON array de floats)"
     )
     
+    embedding_version = models.CharField(
+        max_length=64,
+        default=default_embedding_version,
+        db_index=True,
+        verbose_name="Version d'embedding",
+        help_text="Modèle et prétraitement ayant produit face_embedding (ex: buffalo_l:insightface-v1)"
+    )
+    
     face_encoding = models.JSONField(
         null=True,
         blank=True,
@@ -437,6 +447,19 @@ class Camera(models.Model):
         help_text="Nombre total de détections effectuées"
     )
     
+    metrics = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name="Métriques",
+        help_text="Dernier instantané des métriques de performance envoyé par le service caméra"
+    )
+    
+    metrics_updated_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Métriques mises à jour le"
+    )
+    
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -534,6 +557,23 @@ class UPRLog(models.Model):
         help_text="URL signée vers l'image de détection (si stockée)"
     )
     
+    alert_id = models.CharField(
+        max_length=64,
+        null=True,
+        blank=True,
+        db_index=True,
+        verbose_name="ID Alerte",
+        help_text="Identifiant de l'alerte attribué par le service caméra (rattachement du clip)"
+    )
+    
+    clip = models.FileField(
+        upload_to='upr/clips/%Y/%m/%d/',
+        null=True,
+        blank=True,
+        verbose_name="Clip vidéo",
+        help_text="Clip couvrant les secondes avant et après l'alerte"
+    )
+    
     # Métadonnées
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -550,12 +590,51 @@ class UPRLog(models.Model):
             models.Index(fields=['criminal_id']),
             models.Index(fields=['upr_id']),
         ]
+        constraints = [
+            # Un lot réémis pendant que la première livraison est en cours ne doit pas doubler l'alerte
+            models.UniqueConstraint(
+                fields=['alert_id'],
+                condition=models.Q(alert_id__isnull=False),
+                name='sgic_uprlog_alert_id_unique',
+            ),
+        ]
     
     def __str__(self):
         camera_name = self.camera.name if self.camera else "N/A"
         return f"{self.action} - {camera_name} - {self.created_at}"
 
 
+class GalleryTombstone(models.Model):
+    """
+    Trace de la suppression physique d'une entrée de la galerie faciale.
+    
+    Les deltas de l'instantané galerie (``upr.services.gallery_snapshot``) ne
+    voient que les lignes existantes : les suppressions sont relevées ici par
+    ``post_delete`` et renvoyées dans ``removed``.
+    """
+    
+    key = models.CharField(
+        max_length=64,
+        verbose_name="Clé galerie",
+        help_text="Clé de l'entrée supprimée (upr:<id> ou photo:<id>)"
+    )
+    
+    deleted_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name="Date de suppression"
+    )
+    
+    class Meta:
+        db_table = 'sgic_upr_gallery_tombstone'
+        verbose_name = "Suppression galerie"
+        verbose_name_plural = "Suppressions galerie"
+        ordering = ['-deleted_at']
+    
+    def __str__(self):
+        return f"{self.key} supprimé le {self.deleted_at}"
+
+
 class CameraCapture(models.Model):
     """
     Modèle pour stocker les captures d'images depuis les caméras (intégrée ou USB).
@@ -3,6 +3,7 @@ Serializers complets pour le module UPR avec nested objects.
 """
 
 from rest_framework import serializers
+from django.conf import settings
 from .models import UnidentifiedPerson, UPRMatchLog, CriminelMatchLog, Camera, UPRLog, CameraCapture
 import logging
 
@@ -313,6 +314,7 @@ class UPRLogSerializer(serializers.ModelSerializer):
     
     user_username = serializers.CharField(source='user.username', read_only=True, allow_null=True)
     camera_name = serializers.CharField(source='camera.name', read_only=True, allow_null=True)
+    clip_url = serializers.SerializerMethodField()
     
     class Meta:
         model = UPRLog
@@ -328,12 +330,22 @@ class UPRLogSerializer(serializers.ModelSerializer):
             'upr_id',
             'match_score',
             'frame_url',
+            'alert_id',
+            'clip_url',
             'created_at'
         ]
         read_only_fields = [
             'id',
+            'alert_id',
             'created_at'
         ]
+    
+    def get_clip_url(self, obj):
+        """URL du clip vidéo de l'alerte (None si aucun clip)."""
+        if not obj.clip:
+            return None
+        request = self.context.get('request')
+        return request.build_absolute_uri(obj.clip.url) if request else obj.clip.url
 
 
 class AlertDetectionSerializer(serializers.Serializer):
@@ -350,6 +362,43 @@ class AlertDetectionSerializer(serializers.Serializer):
     detection_info = serializers.DictField(required=False, default=dict)
 
 
+class AlertDetectionBatchSerializer(serializers.Serializer):
+    """Serializer pour un lot d'alertes de détection (envoi groupé)."""
+    
+    detections = AlertDetectionSerializer(many=True, required=True)
+    camera_frames = serializers.DictField(
+        child=serializers.IntegerField(min_value=0),
+        required=False,
+        default=dict,
+        help_text="Frames analysées par caméra depuis le lot précédent"
+    )
+    
+    def validate_detections(self, value):
+        max_batch = getattr(settings, 'UPR_ALERT_BATCH_MAX', 500)
+        if len(value) > max_batch:
+            raise serializers.ValidationError(f"Lot limité à {max_batch} détections")
+        return value
+
+
+class AlertClipSerializer(serializers.Serializer):
+    """Serializer pour le clip vidéo d'une alerte (envoyé après l'alerte)."""
+    
+    alert_id = serializers.CharField(max_length=64, required=True)
+    clip = serializers.FileField(required=True)
+    frame = serializers.FileField(required=False)
+    event_at = serializers.FloatField(required=False)
+    started_at = serializers.FloatField(required=False)
+    ended_at = serializers.FloatField(required=False)
+    frames = serializers.IntegerField(required=False, min_value=0)
+    fps = serializers.FloatField(required=False)
+    
+    def validate_clip(self, value):
+        max_mb = getattr(settings, 'UPR_CLIP_MAX_MB', 50)
+        if value.size > max_mb * 1024 * 1024:
+            raise serializers.ValidationError(f"Clip limité à {max_mb} Mo")
+        return value
+
+
 class CompareEmbeddingSerializer(serializers.Serializer):
     """Serializer pour la comparaison d'embedding avec UPR."""
     
@@ -0,0 +1,299 @@
+"""
+Ingestion des alertes de détection envoyées par le service multi-caméras.
+
+Traite un lot de détections en un nombre constant de requêtes :
+ - ``detection_info.alert_id`` sert de clé d'idempotence (contrainte
+   d'unicité sur ``UPRLog.alert_id``) : le service caméra réémet un lot dont
+   la réponse s'est perdue (livraison « au moins une fois »), les détections
+   déjà enregistrées sont alors ignorées, ni comptées ni notifiées ;
+ - compteurs des caméras incrémentés avec ``F()`` (pas de course entre
+   alertes concurrentes, pas de ``save()`` complet) ;
+ - ``UPRLog`` insérés par ``bulk_create`` ;
+ - notifications regroupées par sujet (fiche criminelle) : une seule par
+   sujet et par lot, et pendant ``UPR_ALERT_COALESCE_SECONDS`` les nouvelles
+   détections mettent à jour la notification existante au lieu d'en créer.
+
+Le clip vidéo d'une alerte (secondes avant / après, envoyé séparément par le
+service caméra) est rattaché à son ``UPRLog`` par ``alert_id`` : voir
+``attach_alert_clip``.
+"""
+
+import base64
+import logging
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+NOTIFIED_ROLES = ['administrateur', 'admin', 'Enquêteur Principal', 'Enquêteur']
+
+
+def detection_action(detection_info: Dict[str, Any]) -> str:
+    match_type = (detection_info or {}).get('match_type', 'detection')
+    if match_type == 'certain':
+        return 'match_certain'
+    if match_type == 'probable':
+        return 'match_probable'
+    return 'detection'
+
+
+def _store_frame(camera_id: str, frame_base64: str) -> Optional[str]:
+    if not frame_base64 or not settings.DEBUG:  # En production, utiliser S3
+        return None
+    try:
+        frame_data = base64.b64decode(frame_base64)
+        frame_file = ContentFile(frame_data, name=f'detection_{camera_id}_{datetime.now().strftime("%Y%m%d_%H%M%S_%f")}.jpg')
+        frame_path = default_storage.save(f'upr/detections/{frame_file.name}', frame_file)
+        return default_storage.url(frame_path)
+    except Exception as e:
+        logger.warning(f"Impossible de sauvegarder la frame: {e}")
+        return None
+
+
+def _get_cameras(camera_ids: Iterable[str]) -> Dict[str, Any]:
+    from upr.models import Camera
+
+    camera_ids = set(camera_ids)
+    cameras = {camera.camera_id: camera for camera in Camera.objects.filter(camera_id__in=camera_ids)}
+    for camera_id in camera_ids - set(cameras):
+        camera, _ = Camera.objects.get_or_create(
+            camera_id=camera_id,
+            defaults={
+                'name': f'Caméra {camera_id}',
+                'source': camera_id,
+                'camera_type': 'usb' if camera_id.startswith('usb_') else 'ip'
+            }
+        )
+        cameras[camera_id] = camera
+    return cameras
+
+
+def ingest_detections(detections: List[Dict[str, Any]], camera_frames: Optional[Dict[str, int]] = None) -> List[int]:
+    """
+    Enregistre un lot de détections validées (``AlertDetectionSerializer``).
+
+    Args:
+        detections: Détections dans l'ordre d'émission.
+        camera_frames: Frames analysées par caméra depuis le lot précédent.
+
+    Returns:
+        Identifiants des ``UPRLog``, dans l'ordre des détections. Une détection
+        dont l'``alert_id`` est déjà enregistré renvoie l'identifiant existant
+        et n'est ni réinsérée ni recomptée.
+    """
+    from upr.models import UPRLog
+
+    camera_frames = camera_frames or {}
+    now = timezone.now()
+    cameras = _get_cameras([d['camera_id'] for d in detections] + list(camera_frames))
+
+    with transaction.atomic():
+        alert_ids = {d.get('detection_info', {}).get('alert_id') for d in detections} - {None, ''}
+        known = dict(
+            UPRLog.objects.filter(alert_id__in=alert_ids).values_list('alert_id', 'id')
+        ) if alert_ids else {}
+
+        new_indexes = []
+        for index, data in enumerate(detections):
+            alert_id = data.get('detection_info', {}).get('alert_id')
+            if alert_id and alert_id in known:
+                continue
+            if alert_id:
+                known[alert_id] = None  # Doublon dans le même lot
+            new_indexes.append(index)
+
+        created = _insert_detections({index: detections[index] for index in new_indexes}, cameras, known)
+        if len(created) < len(detections):
+            logger.info(f"{len(detections) - len(created)} détection(s) déjà enregistrée(s) ignorée(s)")
+        inserted = [detections[index] for index in created]
+        _update_cameras(cameras, inserted, _fresh_frames(camera_frames, detections, inserted), now)
+
+    notify_matches(list(created.values()))
+    return [
+        created[index].id if index in created else known[data['detection_info']['alert_id']]
+        for index, data in enumerate(detections)
+    ]
+
+
+def _insert_detections(detections: Dict[int, Dict[str, Any]], cameras, known: Dict[str, Any]) -> Dict[int, Any]:
+    """Insère les ``UPRLog`` (dans la transaction appelante).
+
+    Les détections avec ``alert_id`` passent par ``ignore_conflicts`` : un même
+    lot livré deux fois en parallèle franchit la lecture préalable dans les deux
+    requêtes, la contrainte d'unicité n'en laisse passer qu'une. Les lignes
+    sont relues ensuite et seules celles portant le jeton de cette requête
+    sont considérées comme créées ; ``known`` reçoit l'identifiant des autres.
+
+    Returns:
+        ``{indice de la détection: UPRLog}`` des lignes réellement insérées.
+    """
+    from upr.models import UPRLog
+
+    token = uuid.uuid4().hex
+    logs = {}
+    for index, data in detections.items():
+        best_match = data.get('best_match') or {}
+        detection_info = data.get('detection_info', {})
+        camera_id = data['camera_id']
+        timestamp = data['timestamp']
+        logs[index] = UPRLog(
+            user=None,  # Auto-détection
+            camera=cameras[camera_id],
+            action=detection_action(detection_info),
+            details={
+                'matches': data.get('matches', []),
+                'best_match': data.get('best_match'),
+                'detection_info': detection_info,
+                'timestamp': timestamp.isoformat() if hasattr(timestamp, 'isoformat') else timestamp,
+                'ingest_batch': token,
+            },
+            criminal_id=best_match.get('criminal_id'),
+            upr_id=best_match.get('upr_id'),
+            match_score=best_match.get('score', 0.0) if best_match else None,
+            frame_url=_store_frame(camera_id, data.get('frame_base64', '')),
+            alert_id=detection_info.get('alert_id') or None,
+        )
+
+    keyed = {log.alert_id: index for index, log in logs.items() if log.alert_id}
+    created = {index: log for index, log in logs.items() if not log.alert_id}
+    UPRLog.objects.bulk_create(list(created.values()))
+    if keyed:
+        UPRLog.objects.bulk_create([logs[index] for index in keyed.values()], ignore_conflicts=True)
+        for log in UPRLog.objects.select_related('camera').filter(alert_id__in=keyed):
+            known[log.alert_id] = log.id
+            if (log.details or {}).get('ingest_batch') == token:
+                created[keyed[log.alert_id]] = log
+    return dict(sorted(created.items()))
+
+
+def _fresh_frames(camera_frames: Dict[str, int], detections, inserted) -> Dict[str, int]:
+    """Frames à compter pour ce lot.
+
+    Le service caméra joint à un lot réémis les frames de l'envoi perdu : quand
+    une partie des détections était déjà enregistrée, seules les frames de la
+    part nouvelle (au prorata, par caméra) sont comptées.
+    """
+    if len(inserted) == len(detections):
+        return camera_frames
+    sent = Counter(d['camera_id'] for d in detections)
+    fresh = Counter(d['camera_id'] for d in inserted)
+    batch_ratio = len(inserted) / len(detections)
+    return {
+        camera_id: round(count * (fresh[camera_id] / sent[camera_id] if sent[camera_id] else batch_ratio))
+        for camera_id, count in camera_frames.items()
+    }
+
+
+def _update_cameras(cameras, detections, camera_frames, now) -> None:
+    """Compteurs et présence des caméras (dans la transaction appelante)."""
+    from upr.models import Camera
+
+    detection_counts = Counter(d['camera_id'] for d in detections)
+    for camera_id, camera in cameras.items():
+        Camera.objects.filter(pk=camera.pk).update(
+            detection_count=F('detection_count') + detection_counts.get(camera_id, 0),
+            frame_count=F('frame_count') + int(camera_frames.get(camera_id, 0)),
+            last_seen=now,
+            active=True,
+            updated_at=now,
+        )
+
+
+def attach_alert_clip(alert_id: str, clip_file, frame_file=None, clip_info: Optional[Dict[str, Any]] = None):
+    """
+    Range le clip d'une alerte dans le stockage média et le rattache à son ``UPRLog``.
+
+    Args:
+        alert_id: Identifiant de l'alerte (``detection_info.alert_id``).
+        clip_file: Fichier vidéo envoyé par le service caméra.
+        frame_file: Image de l'instant de l'alerte (optionnelle).
+        clip_info: Bornes du clip, nombre de frames, etc. (ajoutés aux détails).
+
+    Returns:
+        Le ``UPRLog`` mis à jour, ou None si l'alerte n'est pas (encore) enregistrée.
+    """
+    from upr.models import UPRLog
+
+    log = UPRLog.objects.filter(alert_id=alert_id).order_by('-created_at').first()
+    if log is None:
+        return None
+
+    if log.clip:
+        # Renvoi après un timeout côté service caméra : le clip est déjà rangé
+        return log
+
+    prefix = f'{log.camera.camera_id if log.camera else "camera"}_{alert_id}'
+    log.clip.save(f'{prefix}.mp4', clip_file, save=False)
+    update_fields = ['clip', 'details']
+    if frame_file is not None and not log.frame_url:
+        try:
+            frame_path = default_storage.save(f'upr/detections/{prefix}.jpg', frame_file)
+            log.frame_url = default_storage.url(frame_path)
+            update_fields.append('frame_url')
+        except Exception as e:
+            logger.warning(f"Impossible de sauvegarder la frame de l'alerte {alert_id}: {e}")
+    log.details = {**(log.details or {}), 'clip': clip_info or {}}
+    log.save(update_fields=update_fields)
+    return log
+
+
+def notify_matches(logs: List[Any]) -> int:
+    """Notifie les correspondances certaines, regroupées par fiche criminelle."""
+    from notifications.models import Notification
+    from utilisateur.models import UtilisateurModel
+
+    subjects: "OrderedDict[int, List[Any]]" = OrderedDict()
+    for log in logs:
+        if log.action == 'match_certain' and log.criminal_id:
+            subjects.setdefault(log.criminal_id, []).append(log)
+    if not subjects:
+        return 0
+
+    window = timedelta(seconds=getattr(settings, 'UPR_ALERT_COALESCE_SECONDS', 300))
+    try:
+        users = list(UtilisateurModel.objects.filter(role__in=NOTIFIED_ROLES).filter(statut='actif'))
+        to_create = []
+        for criminal_id, subject_logs in subjects.items():
+            best = max(subject_logs, key=lambda log: log.match_score or 0.0)
+            cameras = sorted({log.camera.name for log in subject_logs if log.camera})
+            lien = f'/criminels/{criminal_id}'
+            recent = Notification.objects.filter(
+                lien=lien,
+                type='error',
+                date_creation__gte=timezone.now() - window,
+            )
+            message = f'Correspondance détectée (score: {best.match_score or 0.0:.2f}). Criminel ID: {criminal_id}'
+            if len(subject_logs) > 1:
+                message += f' — {len(subject_logs)} détections'
+
+            if recent.exists():
+                # Même sujet dans la fenêtre : mise à jour au lieu d'une nouvelle notification
+                recent.update(
+                    message=f'{message} (dernière: {", ".join(cameras)})',
+                    lue=False,
+                    date_lecture=None,
+                )
+                continue
+
+            for user in users:
+                to_create.append(Notification(
+                    utilisateur=user,
+                    type='error',  # Utiliser 'error' pour les alertes critiques
+                    titre=f'🚨 Détection faciale - Caméra {", ".join(cameras)}'[:200],
+                    message=message,
+                    lien=lien,
+                ))
+        Notification.objects.bulk_create(to_create)
+        return len(to_create)
+    except Exception as e:
+        logger.warning(f"Impossible de créer notification: {e}")
+        return 0
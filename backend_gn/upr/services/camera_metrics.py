@@ -0,0 +1,95 @@
+"""
+Persistance et export des métriques de performance des caméras.
+
+Le service multi-caméras envoie périodiquement (``METRICS_PUSH_INTERVAL``) un
+instantané par caméra :
+
+    {
+        "latency":  {"detect": {"count", "avg_ms", "p50_ms", "p95_ms", "max_ms"}, ...},
+        "counters": {"frames_gated": 120, "alerts_sent": 3, ...},
+        "pipeline": {"capture_fps": 9.8, "dropped_stale": 12, "queue_depth": 1, ...}
+    }
+
+Seul le dernier instantané est conservé (``Camera.metrics``) : une requête
+``UPDATE`` par caméra et par envoi, sans historique à purger.
+"""
+
+import logging
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, Iterable, Optional
+
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+METRIC_SECTIONS = ('latency', 'counters', 'pipeline')
+
+
+def store_camera_metrics(cameras: Dict[str, Dict[str, Any]], reported_at: Optional[float] = None) -> int:
+    """
+    Enregistre l'instantané envoyé par le service caméra.
+
+    Args:
+        cameras: Métriques indexées par ``camera_id``.
+        reported_at: Horodatage Unix de l'instantané (défaut: maintenant).
+
+    Returns:
+        Nombre de caméras mises à jour (les caméras inconnues sont ignorées).
+    """
+    from upr.models import Camera
+
+    updated_at = timezone.now()
+    if reported_at:
+        updated_at = datetime.fromtimestamp(float(reported_at), tz=dt_timezone.utc)
+
+    updated = 0
+    for camera_id, values in cameras.items():
+        if not isinstance(values, dict):
+            continue
+        metrics = {section: values[section] for section in METRIC_SECTIONS if isinstance(values.get(section), dict)}
+        updated += Camera.objects.filter(camera_id=camera_id).update(
+            metrics=metrics,
+            metrics_updated_at=updated_at,
+        )
+    return updated
+
+
+def _label(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(cameras: Iterable[Any]) -> str:
+    """Dernières métriques persistées au format texte Prometheus (jauges)."""
+    lines = [
+        '# HELP upr_camera_stage_ms Latence par étape et par caméra (ms, dernier instantané)',
+        '# TYPE upr_camera_stage_ms gauge',
+    ]
+    counters, pipeline, ages = [], [], []
+    now = timezone.now()
+    for camera in cameras:
+        metrics = camera.metrics or {}
+        camera_label = _label(camera.camera_id)
+        for stage, summary in sorted((metrics.get('latency') or {}).items()):
+            for stat in ('avg_ms', 'p50_ms', 'p95_ms', 'max_ms'):
+                value = (summary or {}).get(stat)
+                if isinstance(value, (int, float)):
+                    lines.append(
+                        f'upr_camera_stage_ms{{camera="{camera_label}",stage="{_label(stage)}",stat="{stat[:-3]}"}} {value}'
+                    )
+        for name, value in sorted((metrics.get('counters') or {}).items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                counters.append(f'upr_camera_events_total{{camera="{camera_label}",event="{_label(name)}"}} {value}')
+        for name, value in sorted((metrics.get('pipeline') or {}).items()):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                pipeline.append(f'upr_camera_pipeline{{camera="{camera_label}",metric="{_label(name)}"}} {value}')
+        if camera.metrics_updated_at:
+            age = (now - camera.metrics_updated_at).total_seconds()
+            ages.append(f'upr_camera_metrics_age_seconds{{camera="{camera_label}"}} {age:.1f}')
+
+    lines.append('# TYPE upr_camera_events_total counter')
+    lines.extend(counters)
+    lines.append('# TYPE upr_camera_pipeline gauge')
+    lines.extend(pipeline)
+    lines.append('# TYPE upr_camera_metrics_age_seconds gauge')
+    lines.extend(ages)
+    return '\n'.join(lines) + '\n'
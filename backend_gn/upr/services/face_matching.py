@@ -57,6 +57,9 @@ def find_matches_for_upr(upr: UnidentifiedPerson) -> Dict[str, Any]:
     - Tous les autres UPR existants (non résolus)
     - Toutes les fiches criminelles avec embeddings
     
+    Seuls les embeddings de la même version (``upr.embedding_version``) sont
+    comparés : des vecteurs issus de modèles différents ne sont pas comparables.
+    
     Args:
         upr: Instance UnidentifiedPerson avec embedding
     
@@ -87,7 +90,8 @@ def find_matches_for_upr(upr: UnidentifiedPerson) -> Dict[str, Any]:
             ~Q(id=upr.id),
             face_embedding__isnull=False,
             is_resolved=False,
-            is_archived=False
+            is_archived=False,
+            embedding_version=upr.embedding_version,
         ).exclude(face_embedding=None)
         
         upr_count = 0
@@ -142,7 +146,8 @@ def find_matches_for_upr(upr: UnidentifiedPerson) -> Dict[str, Any]:
         from biometrie.models import Biometrie
         
         biometries = Biometrie.objects.filter(
-            encodage_facial__isnull=False
+            encodage_facial__isnull=False,
+            embedding_version=upr.embedding_version,
         ).select_related('criminel').exclude(encodage_facial=None)
         
         criminel_count = 0
@@ -18,25 +18,19 @@ import io
 from django.core.files.uploadedfile import InMemoryUploadedFile, TemporaryUploadedFile
 
 # Import des services existants
-from biometrie.arcface_service import ArcFaceService
+from biometrie.arcface_service import ArcFaceService, get_shared_arcface_service
 from biometrie.face_106 import detect_106_landmarks
 
 logger = logging.getLogger(__name__)
 
-# Instance globale du service ArcFace
-_arcface_service = None
-
 
 def get_arcface_service() -> Optional[ArcFaceService]:
-    """Obtient ou initialise le service ArcFace."""
-    global _arcface_service
-    if _arcface_service is None:
-        try:
-            _arcface_service = ArcFaceService()
-        except Exception as e:
-            logger.error(f"Erreur lors de l'initialisation d'ArcFaceService: {e}")
-            return None
-    return _arcface_service
+    """Service ArcFace partagé de la version d'embedding active (suit les bascules)."""
+    try:
+        return get_shared_arcface_service()
+    except Exception as e:
+        logger.error(f"Erreur lors de l'initialisation d'ArcFaceService: {e}")
+        return None
 
 
 UploadedImage = Union[
@@ -104,6 +98,7 @@ def extract_face_data(image: UploadedImage) -> Dict[str, Any]:
             - embedding (List[float]): Embedding ArcFace 512D
             - bbox (List[int]): Boîte englobante [x1, y1, x2, y2]
             - confidence (float): Score de confiance
+            - embedding_version (str): Version du modèle ayant produit l'embedding
             - error (str): Message d'erreur si success=False
     
     Raises:
@@ -116,6 +111,7 @@ def extract_face_data(image: UploadedImage) -> Dict[str, Any]:
         "embedding": None,
         "bbox": None,
         "confidence": None,
+        "embedding_version": None,
         "error": None
     }
     
@@ -128,6 +124,8 @@ def extract_face_data(image: UploadedImage) -> Dict[str, Any]:
             logger.error(result["error"])
             return result
 
+        result["embedding_version"] = arcface_service.embedding_version
+
         # 1. Extraction ArcFace en priorité (plus fiable que landmarks 106 seuls)
         logger.info("Extraction embedding ArcFace (prioritaire)...")
         faces = arcface_service.encode_faces(image=prepared, limit=1)
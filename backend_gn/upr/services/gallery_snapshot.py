@@ -0,0 +1,253 @@
+"""
+Instantané compact de la galerie faciale pour les services caméra (edge).
+
+Le service multi-caméras télécharge les vecteurs (UPR actifs + photos
+criminelles actives) d'une version d'embedding donnée, compare localement,
+puis se synchronise par deltas :
+
+ - ``watermark`` : horodatage serveur du début de la requête, à renvoyer dans
+   ``since`` à la synchronisation suivante. Les lignes modifiées depuis
+   ``since - SNAPSHOT_OVERLAP_SECONDS`` sont renvoyées (les doublons sont
+   idempotents côté client, le recouvrement couvre les transactions lentes).
+ - ``removed`` : clés modifiées devenues inéligibles (UPR résolu/archivé,
+   photo désactivée, embedding supprimé ou passé à une autre version) et
+   clés des lignes supprimées (``GalleryTombstone``, alimenté par
+   ``post_delete``). Les modifications par ``QuerySet.update()`` doivent
+   renseigner elles-mêmes ``updated_at`` / ``date_mise_a_jour``.
+ - un ``since`` plus ancien que la rétention des suppressions
+   (``GALLERY_TOMBSTONE_RETENTION_DAYS``) donne un instantané complet.
+ - ``total`` : nombre de lignes éligibles ; si le client n'obtient pas le même
+   compte après application du delta (suppression physique), il repart d'un
+   instantané complet.
+
+Vecteurs normalisés L2, encodés en base64 :
+ - ``float32`` : matrice (n, dim) little-endian ;
+ - ``int8`` : matrice quantifiée par ligne + ``scales`` float32 (v ≈ q * scale).
+"""
+
+import base64
+import logging
+from collections import Counter
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_OVERLAP_SECONDS = 30
+SNAPSHOT_FORMATS = ('float32', 'int8')
+
+
+def _tombstone_retention() -> timedelta:
+    return timedelta(days=getattr(settings, 'GALLERY_TOMBSTONE_RETENTION_DAYS', 30))
+
+
+def _deleted_keys(since) -> List[str]:
+    from upr.models import GalleryTombstone
+
+    return list(GalleryTombstone.objects.filter(deleted_at__gte=since).values_list('key', flat=True).distinct())
+
+
+def record_deletion(sender, instance, **kwargs) -> None:
+    """``post_delete`` : note la clé galerie de la ligne supprimée (et purge les anciennes)."""
+    from upr.models import GalleryTombstone, UnidentifiedPerson
+
+    prefix = 'upr' if issubclass(sender, UnidentifiedPerson) else 'photo'
+    try:
+        GalleryTombstone.objects.create(key=f'{prefix}:{instance.pk}')
+        GalleryTombstone.objects.filter(deleted_at__lt=timezone.now() - _tombstone_retention()).delete()
+    except Exception as e:
+        logger.warning(f"Suppression galerie {prefix}:{instance.pk} non tracée: {e}")
+
+
+def connect_signals() -> None:
+    """Trace les suppressions d'UPR et de photos criminelles pour les deltas."""
+    from django.db.models.signals import post_delete
+
+    from biometrie.models import BiometriePhoto
+    from upr.models import UnidentifiedPerson
+
+    post_delete.connect(record_deletion, sender=UnidentifiedPerson, dispatch_uid='gallery_tombstone_upr')
+    post_delete.connect(record_deletion, sender=BiometriePhoto, dispatch_uid='gallery_tombstone_photo')
+
+
+def _normalized(vector) -> Optional[np.ndarray]:
+    if not vector:
+        return None
+    array = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(array))
+    if not np.isfinite(norm) or norm <= 0:
+        return None
+    return array / norm
+
+
+def _upr_rows(version: str, since) -> Tuple[List[Tuple[Dict[str, Any], Any]], List[str], int]:
+    from upr.models import UnidentifiedPerson
+
+    eligible = UnidentifiedPerson.objects.filter(
+        face_embedding__isnull=False,
+        embedding_version=version,
+        is_resolved=False,
+        is_archived=False,
+    ).exclude(face_embedding=[])
+    changed = UnidentifiedPerson.objects.all()
+    if since is not None:
+        changed = changed.filter(updated_at__gte=since)
+
+    eligible_ids = set()
+    rows = []
+    candidates = eligible.filter(updated_at__gte=since) if since is not None else eligible
+    for upr in candidates.only('id', 'code_upr', 'nom_temporaire', 'face_embedding'):
+        vector = _normalized(upr.face_embedding)
+        if vector is None:
+            continue
+        eligible_ids.add(upr.id)
+        rows.append(({
+            'key': f'upr:{upr.id}',
+            'type': 'UPR',
+            'id': upr.id,
+            'upr_id': upr.id,
+            'code_upr': upr.code_upr,
+            'nom_temporaire': upr.nom_temporaire,
+        }, vector))
+
+    removed = []
+    if since is not None:
+        removed = [
+            f'upr:{pk}' for pk in changed.values_list('id', flat=True)
+            if pk not in eligible_ids
+        ]
+    return rows, removed, eligible.count()
+
+
+def _criminal_rows(version: str, since) -> Tuple[List[Tuple[Dict[str, Any], Any]], List[str], int]:
+    from biometrie.models import BiometriePhoto
+
+    eligible = BiometriePhoto.objects.filter(
+        embedding_512__isnull=False,
+        embedding_version=version,
+        est_active=True,
+        criminel__isnull=False,
+    ).exclude(embedding_512=[])
+    changed = BiometriePhoto.objects.all()
+    if since is not None:
+        changed = changed.filter(date_mise_a_jour__gte=since)
+
+    eligible_ids = set()
+    rows = []
+    candidates = eligible.filter(date_mise_a_jour__gte=since) if since is not None else eligible
+    candidates = candidates.select_related('criminel').only(
+        'id', 'embedding_512', 'criminel__id', 'criminel__numero_fiche', 'criminel__nom', 'criminel__prenom'
+    )
+    for photo in candidates:
+        vector = _normalized(photo.embedding_512)
+        if vector is None:
+            continue
+        eligible_ids.add(photo.id)
+        fiche = photo.criminel
+        rows.append(({
+            'key': f'photo:{photo.id}',
+            'type': 'CRIMINEL',
+            'id': fiche.id,
+            'criminal_id': fiche.id,
+            'photo_id': photo.id,
+            'numero_fiche': fiche.numero_fiche,
+            'nom': fiche.nom or '',
+            'prenom': fiche.prenom or '',
+        }, vector))
+
+    removed = []
+    if since is not None:
+        removed = [
+            f'photo:{pk}' for pk in changed.values_list('id', flat=True)
+            if pk not in eligible_ids
+        ]
+    return rows, removed, eligible.count()
+
+
+def encode_vectors(vectors: List[np.ndarray], dim: int, fmt: str) -> Dict[str, Any]:
+    """Encode les vecteurs normalisés au format demandé."""
+    matrix = np.vstack(vectors).astype(np.float32) if vectors else np.zeros((0, dim), dtype=np.float32)
+    if fmt == 'int8':
+        max_abs = np.abs(matrix).max(axis=1) if len(matrix) else np.zeros(0, dtype=np.float32)
+        scales = np.where(max_abs > 0, max_abs / 127.0, 1.0).astype('<f4')
+        quantized = np.clip(np.rint(matrix / scales[:, None]), -127, 127).astype(np.int8)
+        return {
+            'vectors': base64.b64encode(quantized.tobytes()).decode('ascii'),
+            'scales': base64.b64encode(scales.tobytes()).decode('ascii'),
+        }
+    return {'vectors': base64.b64encode(matrix.astype('<f4').tobytes()).decode('ascii')}
+
+
+def load_gallery(version: str) -> Tuple[List[Dict[str, Any]], np.ndarray]:
+    """
+    Galerie complète en mémoire (comparaisons par lots côté serveur).
+
+    Returns:
+        ``(entries, matrix)`` : métadonnées et matrice (n, dim) float32 normalisée.
+    """
+    rows, _, _ = _upr_rows(version, None)
+    try:
+        rows += _criminal_rows(version, None)[0]
+    except Exception as e:
+        logger.warning(f"Photos criminelles exclues de la galerie: {e}")
+    dims = Counter(len(vector) for _, vector in rows)
+    if len(dims) > 1:
+        dim = dims.most_common(1)[0][0]
+        rows = [row for row in rows if len(row[1]) == dim]
+    if not rows:
+        return [], np.zeros((0, 512), dtype=np.float32)
+    return [entry for entry, _ in rows], np.vstack([vector for _, vector in rows]).astype(np.float32)
+
+
+def build_gallery_snapshot(*, version: str, since=None, fmt: str = 'float32') -> Dict[str, Any]:
+    """
+    Construit l'instantané (complet si ``since`` est None, sinon delta).
+
+    Args:
+        version: Version d'embedding servie (les autres versions sont exclues).
+        since: Watermark renvoyé par la synchronisation précédente.
+        fmt: ``float32`` ou ``int8``.
+    """
+    if fmt not in SNAPSHOT_FORMATS:
+        raise ValueError(f"Format inconnu: {fmt} (attendu: {', '.join(SNAPSHOT_FORMATS)})")
+
+    watermark = timezone.now()
+    if since is not None and since < watermark - _tombstone_retention():
+        # Suppressions antérieures déjà purgées : le delta serait incomplet
+        since = None
+    query_since = since - timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS) if since is not None else None
+
+    upr_rows, upr_removed, upr_total = _upr_rows(version, query_since)
+    try:
+        criminal_rows, criminal_removed, criminal_total = _criminal_rows(version, query_since)
+    except Exception as e:
+        logger.warning(f"Photos criminelles exclues de l'instantané: {e}")
+        criminal_rows, criminal_removed, criminal_total = [], [], 0
+
+    deleted = _deleted_keys(query_since) if query_since is not None else []
+
+    rows = upr_rows + criminal_rows
+    dims = Counter(len(vector) for _, vector in rows)
+    dim = dims.most_common(1)[0][0] if dims else 512
+    if len(dims) > 1:
+        # Dimensions incohérentes pour une même version : on garde la majoritaire
+        logger.warning(f"Instantané galerie {version}: dimensions mixtes {sorted(dims)}, {dim} retenue")
+        rows = [row for row in rows if len(row[1]) == dim]
+
+    snapshot = {
+        'version': version,
+        'full': since is None,
+        'watermark': watermark.isoformat(),
+        'format': fmt,
+        'dim': dim,
+        'count': len(rows),
+        'total': upr_total + criminal_total,
+        'entries': [entry for entry, _ in rows],
+        'removed': upr_removed + criminal_removed + deleted,
+    }
+    snapshot.update(encode_vectors([vector for _, vector in rows], dim, fmt))
+    return snapshot
@@ -7,12 +7,14 @@ Compare automatiquement les nouvelles photos avec les existantes via ArcFace.
 
 import logging
 import numpy as np
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from django.core.files.uploadedfile import UploadedFile
 from django.db.models import Q
 
 from upr.models import UnidentifiedPerson
-from biometrie.arcface_service import get_shared_arcface_service, ArcFaceService
+from biometrie.arcface_service import get_shared_arcface_service, ArcFaceService, FaceEncodingResult
+from biometrie.embedding_versions import VersionedQuery, active_embedding_version
+from biometrie.hydration import active_photo_names, hydrate_ranked
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +72,9 @@ def check_existing_upr_photo(
                 return None
             
             query_embedding = faces[0].embedding
+            versioned_query = _build_versioned_query(
+                prepared_upload, faces[0], arcface_service.embedding_version
+            )
             
         except Exception as e:
             logger.error(f"Erreur lors de la génération de l'embedding: {e}", exc_info=True)
@@ -95,9 +100,14 @@ def check_existing_upr_photo(
                 if stored_embedding is None:
                     continue
                 
+                # Ne comparer qu'avec la requête calculée par le même modèle
+                query_for_version = versioned_query.for_version(upr.embedding_version)
+                if query_for_version is None:
+                    continue
+                
                 # Comparer les embeddings
                 similarity_score = ArcFaceService.compare_embeddings(
-                    query_embedding,
+                    query_for_version,
                     stored_embedding
                 )
                 
@@ -191,7 +201,8 @@ def _get_or_create_upr_embedding(upr: UnidentifiedPerson, save: bool = True) ->
                 if face_data.get('landmarks'):
                     upr.landmarks_106 = face_data['landmarks']
                 upr.face_embedding = embedding_list
-                fields = ['face_embedding']
+                upr.embedding_version = face_data.get('embedding_version') or active_embedding_version()
+                fields = ['face_embedding', 'embedding_version']
                 if face_data.get('landmarks'):
                     fields.append('landmarks_106')
                 upr.save(update_fields=fields)
@@ -209,6 +220,11 @@ def _get_or_create_upr_embedding(upr: UnidentifiedPerson, save: bool = True) ->
         return None
 
 
+def _build_versioned_query(image, face: FaceEncodingResult, primary_version: str) -> VersionedQuery:
+    """Embedding requête pour chaque version d'embedding interrogée."""
+    return VersionedQuery.build(image=image, primary_version=primary_version, faces=[face])[0]
+
+
 def _upr_profil_face_url(upr: UnidentifiedPerson) -> Optional[str]:
     """Construit l'URL relative de la photo de profil UPR."""
     if not upr.profil_face or not upr.profil_face.name or upr.profil_face.name == '1':
@@ -227,10 +243,13 @@ def _search_upr_matches(
     query_embedding_norm: np.ndarray,
     threshold: float,
     top_k: int,
+    versioned_query: Optional[VersionedQuery] = None,
 ) -> list:
     """
     Recherche des correspondances dans les UPR existants (visages identiques / doublons).
     """
+    if versioned_query is None:
+        versioned_query = VersionedQuery({active_embedding_version(): query_embedding_norm})
     upr_matches = []
     try:
         upr_entries = (
@@ -241,7 +260,7 @@ def _search_upr_matches(
             )
             .exclude(profil_face='1')
             .only(
-                'id', 'code_upr', 'nom_temporaire', 'face_embedding', 'profil_face',
+                'id', 'code_upr', 'nom_temporaire', 'face_embedding', 'embedding_version', 'profil_face',
                 'discovered_date', 'date_enregistrement', 'created_at',
             )
         )
@@ -263,7 +282,9 @@ def _search_upr_matches(
         embeddings_array = np.array([item[1] for item in upr_data], dtype=np.float32)
         norms = np.linalg.norm(embeddings_array, axis=1, keepdims=True) + 1e-12
         embeddings_norm = embeddings_array / norms
-        similarities = np.dot(embeddings_norm, query_embedding_norm)
+        similarities = versioned_query.similarities(
+            embeddings_norm, [upr.embedding_version for upr, _ in upr_data]
+        )
 
         best_by_upr: dict = {}
         for i, (upr, _) in enumerate(upr_data):
@@ -316,6 +337,50 @@ def _pick_best_person_match(upr_matches: list, criminal_matches: list) -> Option
     return max(candidates, key=lambda m: m.get('similarity_score', 0))
 
 
+def _biometrie_photo_url(name: Optional[str]) -> Optional[str]:
+    if not name:
+        return None
+    if name.startswith('biometrie/'):
+        return f"/media/{name}"
+    return f"/media/biometrie/photos/{name.split('/')[-1]}"
+
+
+def _criminal_match(criminel_id: int, similarity_score: float, photo_url: Optional[str], **extra) -> Dict[str, Any]:
+    """Correspondance criminelle sans les champs de la fiche (ajoutés par ``_hydrate_criminal_matches``)."""
+    return {
+        'type': 'CRIMINEL',
+        'id': criminel_id,
+        'similarity_score': similarity_score,
+        'photo_url': photo_url,
+        'photo_profil': photo_url,
+        'photo': photo_url,
+        **extra,
+    }
+
+
+def _hydrate_criminal_matches(matches: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """Complète les ``top_k`` premières correspondances (triées) avec leur fiche, en une requête."""
+    hydrated = []
+    for match, criminel in hydrate_ranked(matches, lambda item: item['id'], limit=top_k):
+        nom_complet = f"{criminel.nom or ''} {criminel.prenom or ''}".strip()
+        if not nom_complet:
+            nom_complet = f"Fiche #{criminel.numero_fiche}"
+        entry = {
+            'type': 'CRIMINEL',
+            'id': criminel.id,
+            'numero_fiche': criminel.numero_fiche or '',
+            'nom': criminel.nom or '',
+            'prenom': criminel.prenom or '',
+            'nom_complet': nom_complet,
+            'surnom': criminel.surnom or '',
+            'date_naissance': criminel.date_naissance.isoformat() if criminel.date_naissance else None,
+            'lieu_naissance': criminel.lieu_naissance or '',
+        }
+        entry.update((key, value) for key, value in match.items() if key not in entry)
+        hydrated.append(entry)
+    return hydrated
+
+
 def search_by_photo(
     uploaded_image: UploadedFile,
     threshold: float = SIMILARITY_THRESHOLD,
@@ -363,6 +428,8 @@ def search_by_photo(
         
         # Générer l'embedding et extraire les landmarks de la nouvelle image
         query_embedding = None
+        query_bbox = None
+        query_version = arcface_service.embedding_version
         landmarks = None
         confidence = None
         
@@ -374,6 +441,8 @@ def search_by_photo(
             
             if face_data.get("success", False):
                 query_embedding = np.array(face_data.get("embedding"), dtype=np.float32)
+                query_bbox = face_data.get("bbox")
+                query_version = face_data.get("embedding_version") or query_version
                 landmarks = face_data.get("landmarks")
                 confidence = face_data.get("confidence")
                 logger.info("[OK] [search_by_photo] Extraction réussie via extract_face_data")
@@ -389,6 +458,7 @@ def search_by_photo(
                 faces = arcface_service.encode_faces(image=prepared, limit=1)
                 if faces and len(faces) > 0:
                     query_embedding = faces[0].embedding
+                    query_bbox = faces[0].bbox
                     logger.info("Extraction réussie via encode_faces")
                     # Si landmarks non extraits, essayer de les obtenir
                     if not landmarks:
@@ -436,8 +506,23 @@ def search_by_photo(
         # Normaliser l'embedding de requête une seule fois
         query_embedding_norm = query_embedding / (np.linalg.norm(query_embedding) + 1e-12)
 
+        # Pendant une migration d'embeddings, la requête est aussi encodée avec
+        # le modèle de l'autre version : chaque ligne est comparée à sa version.
+        versioned_query = _build_versioned_query(
+            prepared,
+            FaceEncodingResult(
+                embedding=query_embedding,
+                bbox=query_bbox,
+                confidence=float(confidence or 0.0),
+            ),
+            query_version,
+        )
+        search_versions = list(versioned_query.versions)
+
         # 0. Rechercher dans les UPR (doublons / personne déjà enregistrée)
-        upr_matches = _search_upr_matches(query_embedding, query_embedding_norm, threshold, top_k)
+        upr_matches = _search_upr_matches(
+            query_embedding, query_embedding_norm, threshold, top_k, versioned_query
+        )
         
         # 1. Rechercher dans les tables biométriques reliées aux fiches criminelles
         # Utiliser plusieurs sources d'embeddings pour maximiser les résultats
@@ -453,11 +538,10 @@ def search_by_photo(
             logger.info(f"   - Total entrées avec encodage_facial: {total_biometrie}")
             
             biometrie_entries = Biometrie.objects.filter(
-                encodage_facial__isnull=False
-            ).select_related('criminel').exclude(encodage_facial=None).only(
-                'id', 'encodage_facial', 'photo', 'criminel__id', 'criminel__nom',
-                'criminel__prenom', 'criminel__numero_fiche', 'criminel__surnom',
-                'criminel__date_naissance', 'criminel__lieu_naissance'
+                encodage_facial__isnull=False,
+                embedding_version__in=search_versions,
+            ).exclude(encodage_facial=None).only(
+                'id', 'encodage_facial', 'embedding_version', 'photo', 'criminel'
             )
             
             logger.info(f"[search_by_photo] Recherche dans {biometrie_entries.count()} entrées Biometrie avec encodage_facial")
@@ -500,8 +584,10 @@ def search_by_photo(
                 norms = np.linalg.norm(embeddings_array, axis=1, keepdims=True) + 1e-12
                 embeddings_norm = embeddings_array / norms
                 
-                # Calculer toutes les similarités en une seule opération vectorielle
-                similarities = np.dot(embeddings_norm, query_embedding_norm)
+                # Calculer toutes les similarités (chaque ligne avec la requête de sa version)
+                similarities = versioned_query.similarities(
+                    embeddings_norm, [item['biometrie'].embedding_version for item in biometrie_data]
+                )
                 logger.info(f"[search_by_photo] Similarités Biometrie: min={float(np.min(similarities)):.4f}, max={float(np.max(similarities)):.4f}, mean={float(np.mean(similarities)):.4f}")
                 
                 # Dictionnaire pour garder la meilleure correspondance par fiche criminelle
@@ -515,47 +601,20 @@ def search_by_photo(
                     # Log pour les meilleures correspondances même si sous le seuil
                     if i < 5:  # Log les 5 premières pour diagnostic
                         biometrie = item['biometrie']
-                        logger.debug(f"[search_by_photo] Biometrie #{biometrie.id} (Criminel #{biometrie.criminel.id}): similarity={similarity_score:.4f}, threshold={threshold}")
+                        logger.debug(f"[search_by_photo] Biometrie #{biometrie.id} (Criminel #{biometrie.criminel_id}): similarity={similarity_score:.4f}, threshold={threshold}")
                     
                     if similarity_score >= threshold:
                         matches_found_biometrie += 1
                         biometrie = item['biometrie']
-                        criminel_id = biometrie.criminel.id
+                        criminel_id = biometrie.criminel_id
                         
                         # Garder seulement la meilleure correspondance par fiche
                         if criminel_id not in best_matches_by_criminel or \
                            similarity_score > best_matches_by_criminel[criminel_id]['similarity_score']:
-                            
-                            photo_url = None
-                            if biometrie.photo and biometrie.photo.name:
-                                try:
-                                    if biometrie.photo.name.startswith('biometrie/'):
-                                        photo_url = f"/media/{biometrie.photo.name}"
-                                    else:
-                                        photo_url = f"/media/biometrie/photos/{biometrie.photo.name.split('/')[-1]}"
-                                except Exception:
-                                    pass
-                            
-                            nom_complet = f"{biometrie.criminel.nom or ''} {biometrie.criminel.prenom or ''}".strip()
-                            if not nom_complet:
-                                nom_complet = f"Fiche #{biometrie.criminel.numero_fiche}"
-                            
-                            best_matches_by_criminel[criminel_id] = {
-                                'type': 'CRIMINEL',
-                                'id': biometrie.criminel.id,
-                                'numero_fiche': biometrie.criminel.numero_fiche or '',
-                                'nom': biometrie.criminel.nom or '',
-                                'prenom': biometrie.criminel.prenom or '',
-                                'nom_complet': nom_complet,
-                                'surnom': biometrie.criminel.surnom or '',
-                                'date_naissance': biometrie.criminel.date_naissance.isoformat() if biometrie.criminel.date_naissance else None,
-                                'lieu_naissance': biometrie.criminel.lieu_naissance or '',
-                                'similarity_score': similarity_score,
-                                'photo_url': photo_url,
-                                'photo_profil': photo_url,
-                                'photo': photo_url,
-                                'source': 'Biometrie'
-                            }
+                            photo_url = _biometrie_photo_url(biometrie.photo.name if biometrie.photo else None)
+                            best_matches_by_criminel[criminel_id] = _criminal_match(
+                                criminel_id, similarity_score, photo_url, source='Biometrie'
+                            )
                 
                 # Ajouter toutes les meilleures correspondances
                 criminal_matches.extend(best_matches_by_criminel.values())
@@ -569,7 +628,7 @@ def search_by_photo(
                     for idx in top_5_indices:
                         biometrie = biometrie_data[idx]['biometrie']
                         score = float(similarities[idx])
-                        logger.warning(f"   - Biometrie #{biometrie.id} (Criminel #{biometrie.criminel.id}): {score:.4f}")
+                        logger.warning(f"   - Biometrie #{biometrie.id} (Criminel #{biometrie.criminel_id}): {score:.4f}")
                     
         except ImportError:
             logger.warning("Biometrie n'est pas disponible, recherche ignorée")
@@ -594,11 +653,10 @@ def search_by_photo(
             
             criminal_photos = BiometriePhoto.objects.filter(
                 est_active=True,
-                embedding_512__isnull=False
-            ).select_related('criminel').exclude(embedding_512=None).only(
-                'id', 'embedding_512', 'image', 'criminel__id', 'criminel__nom', 
-                'criminel__prenom', 'criminel__numero_fiche', 'criminel__surnom',
-                'criminel__date_naissance', 'criminel__lieu_naissance'
+                embedding_512__isnull=False,
+                embedding_version__in=search_versions,
+            ).exclude(embedding_512=None).only(
+                'id', 'embedding_512', 'embedding_version', 'image', 'criminel'
             )
             
             logger.info(f"[search_by_photo] Recherche dans {criminal_photos.count()} photos biométriques actives avec embedding")
@@ -635,11 +693,10 @@ def search_by_photo(
                 norms = np.linalg.norm(embeddings_array, axis=1, keepdims=True) + 1e-12
                 embeddings_norm = embeddings_array / norms
                 
-                # Normaliser l'embedding de requête
-                query_norm = query_embedding_norm
-                
-                # Calculer toutes les similarités en une seule opération vectorielle
-                similarities = np.dot(embeddings_norm, query_norm)
+                # Calculer toutes les similarités (chaque ligne avec la requête de sa version)
+                similarities = versioned_query.similarities(
+                    embeddings_norm, [item['photo'].embedding_version for item in photo_data]
+                )
                 logger.info(f"[search_by_photo] Similarités calculées: min={float(np.min(similarities)):.4f}, max={float(np.max(similarities)):.4f}, mean={float(np.mean(similarities)):.4f}")
                 logger.info(f"[search_by_photo] Seuil utilisé: {threshold}")
                 
@@ -654,48 +711,20 @@ def search_by_photo(
                     # Log pour les meilleures correspondances même si sous le seuil
                     if i < 5:  # Log les 5 premières pour diagnostic
                         photo = item['photo']
-                        logger.debug(f"[search_by_photo] Photo #{photo.id} (Criminel #{photo.criminel.id}): similarity={similarity_score:.4f}, threshold={threshold}")
+                        logger.debug(f"[search_by_photo] Photo #{photo.id} (Criminel #{photo.criminel_id}): similarity={similarity_score:.4f}, threshold={threshold}")
                     
                     if similarity_score >= threshold:
                         matches_found += 1
                         photo = item['photo']
-                        criminel_id = photo.criminel.id
+                        criminel_id = photo.criminel_id
                         
                         # Garder seulement la meilleure correspondance par fiche
                         if criminel_id not in best_matches_by_criminel or \
                            similarity_score > best_matches_by_criminel[criminel_id]['similarity_score']:
-                            
-                            photo_url = None
-                            if photo.image and photo.image.name:
-                                try:
-                                    if photo.image.name.startswith('biometrie/'):
-                                        photo_url = f"/media/{photo.image.name}"
-                                    else:
-                                        photo_url = f"/media/biometrie/photos/{photo.image.name.split('/')[-1]}"
-                                except Exception:
-                                    pass
-                            
-                            # Construire le nom complet pour compatibilité
-                            nom_complet = f"{photo.criminel.nom or ''} {photo.criminel.prenom or ''}".strip()
-                            if not nom_complet:
-                                nom_complet = f"Fiche #{photo.criminel.numero_fiche}"
-                            
-                            best_matches_by_criminel[criminel_id] = {
-                                'type': 'CRIMINEL',
-                                'id': photo.criminel.id,
-                                'numero_fiche': photo.criminel.numero_fiche or '',
-                                'nom': photo.criminel.nom or '',
-                                'prenom': photo.criminel.prenom or '',
-                                'nom_complet': nom_complet,
-                                'surnom': photo.criminel.surnom or '',
-                                'date_naissance': photo.criminel.date_naissance.isoformat() if photo.criminel.date_naissance else None,
-                                'lieu_naissance': photo.criminel.lieu_naissance or '',
-                                'similarity_score': similarity_score,
-                                'photo_url': photo_url,
-                                'photo_profil': photo_url,
-                                'photo': photo_url,
-                                'photo_id': photo.id
-                            }
+                            photo_url = _biometrie_photo_url(photo.image.name if photo.image else None)
+                            best_matches_by_criminel[criminel_id] = _criminal_match(
+                                criminel_id, similarity_score, photo_url, photo_id=photo.id
+                            )
                 
                 # Mettre à jour les meilleures correspondances (garder la meilleure par criminel)
                 # Fusionner avec les résultats de Biometrie
@@ -720,7 +749,7 @@ def search_by_photo(
                     for idx in top_5_indices:
                         photo = photo_data[idx]['photo']
                         score = float(similarities[idx])
-                        logger.warning(f"   - Photo #{photo.id} (Criminel #{photo.criminel.id}): {score:.4f}")
+                        logger.warning(f"   - Photo #{photo.id} (Criminel #{photo.criminel_id}): {score:.4f}")
                     
         except ImportError:
             logger.warning("BiometriePhoto n'est pas disponible, recherche dans les criminels ignorée")
@@ -733,11 +762,10 @@ def search_by_photo(
             
             ia_embeddings = IAFaceEmbedding.objects.filter(
                 actif=True,
-                embedding_vector__isnull=False
-            ).select_related('criminel').exclude(embedding_vector=None).only(
-                'id', 'embedding_vector', 'image_capture', 'criminel__id', 'criminel__nom',
-                'criminel__prenom', 'criminel__numero_fiche', 'criminel__surnom',
-                'criminel__date_naissance', 'criminel__lieu_naissance'
+                embedding_vector__isnull=False,
+                embedding_version__in=search_versions,
+            ).exclude(embedding_vector=None).only(
+                'id', 'embedding_vector', 'embedding_version', 'image_capture', 'criminel'
             )
             
             logger.info(f"Recherche dans {ia_embeddings.count()} embeddings IA actifs")
@@ -771,11 +799,14 @@ def search_by_photo(
                 norms = np.linalg.norm(embeddings_array, axis=1, keepdims=True) + 1e-12
                 embeddings_norm = embeddings_array / norms
                 
-                # Calculer toutes les similarités en une seule opération vectorielle
-                similarities = np.dot(embeddings_norm, query_embedding_norm)
+                # Calculer toutes les similarités (chaque ligne avec la requête de sa version)
+                similarities = versioned_query.similarities(
+                    embeddings_norm, [item['ia_embedding'].embedding_version for item in ia_data]
+                )
                 
                 # Créer un dictionnaire des meilleures correspondances par fiche (mise à jour de criminal_matches)
                 best_matches_by_criminel = {m['id']: m for m in criminal_matches}
+                sans_photo = set()
                 
                 # Filtrer et créer/mettre à jour les résultats
                 for i, item in enumerate(ia_data):
@@ -783,7 +814,7 @@ def search_by_photo(
                     
                     if similarity_score >= threshold:
                         ia_embedding = item['ia_embedding']
-                        criminel_id = ia_embedding.criminel.id
+                        criminel_id = ia_embedding.criminel_id
                         
                         # Garder seulement la meilleure correspondance par fiche
                         if criminel_id not in best_matches_by_criminel or \
@@ -800,42 +831,27 @@ def search_by_photo(
                                 except Exception:
                                     pass
                             
-                            # Si pas de photo dans IAFaceEmbedding, essayer de trouver une photo dans BiometriePhoto
-                            if not photo_url:
-                                try:
-                                    from biometrie.models import BiometriePhoto
-                                    biometrie_photo = BiometriePhoto.objects.filter(
-                                        criminel=ia_embedding.criminel,
-                                        est_active=True
-                                    ).only('image').first()
-                                    if biometrie_photo and biometrie_photo.image:
-                                        if biometrie_photo.image.name.startswith('biometrie/'):
-                                            photo_url = f"/media/{biometrie_photo.image.name}"
-                                        else:
-                                            photo_url = f"/media/biometrie/photos/{biometrie_photo.image.name.split('/')[-1]}"
-                                except Exception:
-                                    pass
+                            if photo_url:
+                                sans_photo.discard(criminel_id)
+                            else:
+                                sans_photo.add(criminel_id)
                             
-                            nom_complet = f"{ia_embedding.criminel.nom or ''} {ia_embedding.criminel.prenom or ''}".strip()
-                            if not nom_complet:
-                                nom_complet = f"Fiche #{ia_embedding.criminel.numero_fiche}"
-                            
-                            best_matches_by_criminel[criminel_id] = {
-                                'type': 'CRIMINEL',
-                                'id': ia_embedding.criminel.id,
-                                'numero_fiche': ia_embedding.criminel.numero_fiche or '',
-                                'nom': ia_embedding.criminel.nom or '',
-                                'prenom': ia_embedding.criminel.prenom or '',
-                                'nom_complet': nom_complet,
-                                'surnom': ia_embedding.criminel.surnom or '',
-                                'date_naissance': ia_embedding.criminel.date_naissance.isoformat() if ia_embedding.criminel.date_naissance else None,
-                                'lieu_naissance': ia_embedding.criminel.lieu_naissance or '',
-                                'similarity_score': similarity_score,
-                                'photo_url': photo_url,
-                                'photo_profil': photo_url,
-                                'photo': photo_url,
-                                'photo_id': None  # Pas de photo_id pour IAFaceEmbedding
-                            }
+                            best_matches_by_criminel[criminel_id] = _criminal_match(
+                                criminel_id, similarity_score, photo_url,
+                                photo_id=None  # Pas de photo_id pour IAFaceEmbedding
+                            )
+                
+                # Pas de photo dans IAFaceEmbedding : photo BiometriePhoto active, en une requête
+                if sans_photo:
+                    try:
+                        photo_names = active_photo_names(sans_photo)
+                    except Exception:
+                        photo_names = {}
+                    for criminel_id, name in photo_names.items():
+                        photo_url = _biometrie_photo_url(name)
+                        best_matches_by_criminel[criminel_id].update(
+                            photo_url=photo_url, photo_profil=photo_url, photo=photo_url
+                        )
                 
                 # Mettre à jour les meilleures correspondances (garder la meilleure par criminel)
                 # Fusionner avec les résultats existants
@@ -861,9 +877,9 @@ def search_by_photo(
         upr_matches.sort(key=lambda x: x['similarity_score'], reverse=True)
         criminal_matches.sort(key=lambda x: x['similarity_score'], reverse=True)
         
-        # Limiter aux top_k meilleurs résultats
+        # Limiter aux top_k meilleurs résultats (fiches chargées pour ceux-ci seulement)
         upr_matches = upr_matches[:top_k]
-        criminal_matches = criminal_matches[:top_k]
+        criminal_matches = _hydrate_criminal_matches(criminal_matches, top_k)
         
         logger.info(
             f"Recherche terminée: {len(upr_matches)} UPR et {len(criminal_matches)} fiches criminelles "
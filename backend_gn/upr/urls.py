@@ -5,7 +5,11 @@ from .views_cameras import (
     CameraViewSet,
     UPRLogViewSet,
     AlertDetectionView,
+    AlertDetectionBatchView,
+    AlertClipView,
+    CameraMetricsView,
     CompareEmbeddingView,
+    GallerySnapshotView,
     CameraCaptureViewSet,
     CaptureUSBCameraView,
     health_check_cameras
@@ -18,12 +22,17 @@ router.register(r'upr/logs', UPRLogViewSet, basename='uprlog')
 router.register(r'upr/captures', CameraCaptureViewSet, basename='camera-capture')
 
 urlpatterns = [
+    # Avant le routeur : « cameras » ne doit pas être pris pour un identifiant d'UPR
+    path('upr/cameras/metrics/', CameraMetricsView.as_view(), name='camera-metrics'),
     path('', include(router.urls)),
     # Scan UPR depuis caméra USB (face_recognition)
     path('upr/scan/', ScanUPRView.as_view(), name='upr-scan'),
     # Alertes et détection
     path('upr/alert-detection/', AlertDetectionView.as_view(), name='alert-detection'),
+    path('upr/alert-detection/batch/', AlertDetectionBatchView.as_view(), name='alert-detection-batch'),
+    path('upr/alert-detection/clip/', AlertClipView.as_view(), name='alert-detection-clip'),
     path('upr/compare-embedding/', CompareEmbeddingView.as_view(), name='compare-embedding'),
+    path('upr/gallery-snapshot/', GallerySnapshotView.as_view(), name='gallery-snapshot'),
     # Capture USB automatique
     path('upr/captures/usb/', CaptureUSBCameraView.as_view(), name='usb-camera-capture'),
     # Health check
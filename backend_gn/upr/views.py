@@ -25,6 +25,7 @@ from .serializers import (
 from .services.face_processing import extract_face_data
 from .services.face_matching import find_matches_for_upr
 from .services.photo_verification import check_existing_upr_photo, search_by_photo
+from biometrie.response_shaping import shape_biometric_payload
 from .services.face_recognition_service import (
     capture_face_from_camera,
     extract_face_encoding,
@@ -340,6 +341,7 @@ class UnidentifiedPersonViewSet(viewsets.ModelViewSet):
                 if extraction_result.get("success"):
                     serializer.validated_data['landmarks_106'] = extraction_result.get("landmarks")
                     serializer.validated_data['face_embedding'] = extraction_result.get("embedding")
+                    serializer.validated_data['embedding_version'] = extraction_result.get("embedding_version")
             
             serializer.save()
             logger.info(f"UPR {upr.code_upr} mis à jour par utilisateur {request.user.id}")
@@ -377,6 +379,7 @@ class UnidentifiedPersonViewSet(viewsets.ModelViewSet):
                 if extraction_result.get("success"):
                     serializer.validated_data['landmarks_106'] = extraction_result.get("landmarks")
                     serializer.validated_data['face_embedding'] = extraction_result.get("embedding")
+                    serializer.validated_data['embedding_version'] = extraction_result.get("embedding_version")
             
             serializer.save()
             logger.info(f"UPR {upr.code_upr} partiellement mis à jour par utilisateur {request.user.id}")
@@ -566,6 +569,7 @@ class UnidentifiedPersonViewSet(viewsets.ModelViewSet):
         - photo: fichier image (obligatoire)
         - threshold: seuil de similarité (optionnel, défaut: 0.35)
         - top_k: nombre maximum de résultats (optionnel, défaut: 10)
+        - ?include=landmarks,embedding: champs lourds à renvoyer (optionnel)
         """
         photo_file = request.FILES.get('photo') or request.FILES.get('image')
         if not photo_file:
@@ -587,8 +591,8 @@ class UnidentifiedPersonViewSet(viewsets.ModelViewSet):
                 threshold=threshold,
                 top_k=top_k
             )
-            
-            return Response(results, status=status.HTTP_200_OK)
+
+            return Response(shape_biometric_payload(results, request), status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Erreur lors de la recherche par photo: {e}", exc_info=True)
@@ -731,7 +735,8 @@ class UnidentifiedPersonViewSet(viewsets.ModelViewSet):
                         # Sérialiser l'embedding
                         embedding_serialized = arcface_service.serialize_embedding(upr.face_embedding)
                         biometrie.encodage_facial = embedding_serialized
-                        biometrie.save(update_fields=['encodage_facial'])
+                        biometrie.embedding_version = upr.embedding_version
+                        biometrie.save(update_fields=['encodage_facial', 'embedding_version'])
                 
                 # Transférer les photos vers BiometriePhoto
                 if upr.profil_face:
@@ -739,7 +744,8 @@ class UnidentifiedPersonViewSet(viewsets.ModelViewSet):
                         criminel=criminel,
                         image=upr.profil_face,
                         type_photo='face',
-                        encodage_facial=biometrie.encodage_facial if biometrie.encodage_facial else None
+                        encodage_facial=biometrie.encodage_facial if biometrie.encodage_facial else None,
+                        embedding_version=biometrie.embedding_version,
                     )
                 
                 if upr.profil_left:
@@ -3,18 +3,15 @@ Vues pour la gestion des caméras et alertes multi-caméras.
 """
 
 import logging
-import base64
-import os
-from datetime import datetime
 
 from rest_framework import viewsets, status
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from django.conf import settings
-from django.core.files.base import ContentFile
-from django.core.files.storage import default_storage
+from django.http import HttpResponse
 from django.utils import timezone as django_timezone
 
 from .models import Camera, UPRLog, CameraCapture
@@ -22,16 +19,19 @@ from .serializers import (
     CameraSerializer,
     UPRLogSerializer,
     AlertDetectionSerializer,
+    AlertDetectionBatchSerializer,
+    AlertClipSerializer,
     CompareEmbeddingSerializer,
     CameraCaptureSerializer,
     CameraCaptureCreateSerializer
 )
 from .permissions_cameras import APIKeyPermission
+from .services.alert_ingestion import attach_alert_clip, ingest_detections
+from .services.camera_metrics import prometheus_text, store_camera_metrics
 from criminel.models import CriminalFicheCriminelle
-from utilisateur.models import UtilisateurModel
-from notifications.models import Notification
 from audit.utils import log_action_detailed
 from audit.narrative_audit_service import ajouter_action_narrative
+from services.camera_discovery import get_camera_inventory
 from services.camera_service import CameraService, CameraUnavailableError, CameraCaptureError
 
 logger = logging.getLogger(__name__)
@@ -45,6 +45,7 @@ class CameraViewSet(viewsets.ModelViewSet):
     - GET /api/cameras/ : Liste toutes les caméras
     - GET /api/cameras/<id>/ : Détails d'une caméra
     - POST /api/cameras/scan/ : Scanner les caméras disponibles
+    - GET /api/cameras/inventory/ : Inventaire des caméras découvertes (en cache)
     """
     
     queryset = Camera.objects.all()
@@ -65,63 +66,66 @@ class CameraViewSet(viewsets.ModelViewSet):
         """
         Scanne les caméras USB et IP disponibles.
         
+        Les caméras sont testées en parallèle en arrière-plan (voir
+        services/camera_discovery.py). Par défaut la réponse est immédiate et
+        contient l'inventaire courant ; ``?wait=true`` attend la fin du scan
+        (environ CAMERA_PROBE_TIMEOUT secondes, quel que soit le nombre de caméras).
+        
         Retourne la liste des caméras détectées.
         """
+        inventory = get_camera_inventory()
+        wait_for_result = request.query_params.get('wait', '').lower() in ('1', 'true', 'yes')
+        inventory.refresh(wait_for_result=wait_for_result or inventory.snapshot()['scanned_at'] is None)
+        return self._inventory_response(inventory.snapshot())
+    
+    @action(detail=False, methods=['get'], url_path='inventory')
+    def inventory(self, request):
+        """
+        Inventaire des caméras découvertes (lecture instantanée).
+        
+        GET /api/cameras/inventory/ — un inventaire périmé (CAMERA_DISCOVERY_TTL)
+        est rafraîchi en arrière-plan.
+        """
+        return self._inventory_response(get_camera_inventory().get())
+    
+    def _inventory_response(self, snapshot):
+        """Enregistre les caméras découvertes et construit la réponse."""
         try:
-            import cv2
-            
             cameras_found = []
-            
-            # Scanner USB (0-5 par défaut)
-            usb_max = int(os.getenv('CAMERAS_USB_MAX', '6'))
-            logger.info(f"Scan des caméras USB (0 à {usb_max-1})...")
-            
-            for idx in range(usb_max):
-                cap = cv2.VideoCapture(idx)
-                if cap.isOpened():
-                    ret, _ = cap.read()
-                    if ret:
-                        camera_id = f"usb_{idx}"
-                        camera, created = Camera.objects.get_or_create(
-                            camera_id=camera_id,
-                            defaults={
-                                'name': f'Caméra USB {idx}',
-                                'source': str(idx),
-                                'camera_type': 'usb',
-                                'active': False
-                            }
-                        )
-                        cameras_found.append(CameraSerializer(camera).data)
-                        logger.info(f"  [OK] Camera USB {idx} detectee")
-                    cap.release()
-            
-            # Caméras IP depuis config
-            cameras_ips = os.getenv('CAMERAS_IPS', '')
-            if cameras_ips:
-                urls = [url.strip() for url in cameras_ips.split(',') if url.strip()]
-                for idx, url in enumerate(urls):
-                    camera_id = f"ip_{idx}"
-                    camera, created = Camera.objects.get_or_create(
-                        camera_id=camera_id,
-                        defaults={
-                            'name': f'Caméra IP {idx}',
-                            'source': url,
-                            'camera_type': 'ip',
-                            'active': False
-                        }
-                    )
-                    cameras_found.append(CameraSerializer(camera).data)
+            for device in snapshot['cameras']:
+                # USB : seulement si une frame a pu être lue ; IP : toujours (configurée)
+                if device['camera_type'] == 'usb' and not device['available']:
+                    continue
+                index = device['camera_id'].split('_', 1)[1]
+                camera, created = Camera.objects.get_or_create(
+                    camera_id=device['camera_id'],
+                    defaults={
+                        'name': f"Caméra {'USB' if device['camera_type'] == 'usb' else 'IP'} {index}",
+                        'source': device['source'],
+                        'camera_type': device['camera_type'],
+                        'active': False
+                    }
+                )
+                data = CameraSerializer(camera).data
+                data['probe'] = {
+                    'available': device['available'],
+                    'resolution': device['resolution'],
+                    'error': device['error'],
+                    'probe_ms': device['probe_ms'],
+                }
+                cameras_found.append(data)
             
             return Response({
                 'success': True,
                 'cameras': cameras_found,
-                'count': len(cameras_found)
+                'count': len(cameras_found),
+                'scanned_at': snapshot['scanned_at'],
+                'age_seconds': snapshot['age_seconds'],
+                'scan_ms': snapshot['scan_ms'],
+                'stale': snapshot['stale'],
+                'refreshing': snapshot['refreshing'],
             }, status=status.HTTP_200_OK)
             
-        except ImportError:
-            return Response({
-                'error': 'OpenCV non disponible. Installation requise: pip install opencv-python'
-            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
         except Exception as e:
             logger.error(f"Erreur scan caméras: {e}", exc_info=True)
             return Response({
@@ -158,84 +162,12 @@ class AlertDetectionView(APIView):
                 'details': serializer.errors
             }, status=status.HTTP_400_BAD_REQUEST)
         
-        data = serializer.validated_data
-        camera_id = data['camera_id']
-        matches = data.get('matches', [])
-        best_match = data.get('best_match')
-        frame_base64 = data.get('frame_base64', '')
-        detection_info = data.get('detection_info', {})
-        
         try:
-            # Récupérer ou créer la caméra
-            camera, _ = Camera.objects.get_or_create(
-                camera_id=camera_id,
-                defaults={
-                    'name': f'Caméra {camera_id}',
-                    'source': camera_id,
-                    'camera_type': 'usb' if camera_id.startswith('usb_') else 'ip'
-                }
-            )
-            
-            # Mettre à jour les stats de la caméra
-            camera.detection_count += 1
-            camera.last_seen = django_timezone.now()
-            camera.active = True
-            camera.save()
-            
-            # Déterminer l'action
-            match_type = detection_info.get('match_type', 'detection')
-            if match_type == 'certain':
-                action = 'match_certain'
-            elif match_type == 'probable':
-                action = 'match_probable'
-            else:
-                action = 'detection'
-            
-            # Extraire les IDs si correspondance
-            criminal_id = None
-            upr_id = None
-            match_score = None
-            
-            if best_match:
-                match_score = best_match.get('score', 0.0)
-                criminal_id = best_match.get('criminal_id')
-                upr_id = best_match.get('upr_id')
-            
-            # Stocker la frame si fournie
-            frame_url = None
-            if frame_base64 and settings.DEBUG:  # En production, utiliser S3
-                try:
-                    frame_data = base64.b64decode(frame_base64)
-                    frame_file = ContentFile(frame_data, name=f'detection_{camera_id}_{datetime.now().strftime("%Y%m%d_%H%M%S")}.jpg')
-                    frame_path = default_storage.save(f'upr/detections/{frame_file.name}', frame_file)
-                    frame_url = default_storage.url(frame_path)
-                except Exception as e:
-                    logger.warning(f"Impossible de sauvegarder la frame: {e}")
-            
-            # Créer le log
-            log_entry = UPRLog.objects.create(
-                user=None,  # Auto-détection
-                camera=camera,
-                action=action,
-                details={
-                    'matches': matches,
-                    'best_match': best_match,
-                    'detection_info': detection_info,
-                    'timestamp': data['timestamp']
-                },
-                criminal_id=criminal_id,
-                upr_id=upr_id,
-                match_score=match_score,
-                frame_url=frame_url
-            )
-            
-            # Générer une notification si correspondance certaine
-            if action == 'match_certain' and criminal_id:
-                self._create_notification(criminal_id, camera, match_score, log_entry.id)
+            log_ids = ingest_detections([serializer.validated_data])
             
             return Response({
                 'success': True,
-                'log_id': log_entry.id,
+                'log_id': log_ids[0],
                 'message': 'Alerte enregistrée avec succès'
             }, status=status.HTTP_200_OK)
             
@@ -245,25 +177,104 @@ class AlertDetectionView(APIView):
                 'error': 'Erreur lors du traitement de l\'alerte',
                 'details': str(e) if settings.DEBUG else None
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AlertDetectionBatchView(APIView):
+    """
+    Réception groupée des alertes de détection (N détections par requête).
     
-    def _create_notification(self, criminal_id, camera, score, log_id):
-        """Crée une notification pour les utilisateurs autorisés."""
+    POST /api/upr/alert-detection/batch/
+    
+    Payload:
+    {
+        "detections": [{<payload de /upr/alert-detection/>}, ...],
+        "camera_frames": {"usb_0": 250, "ip_1": 180}  # frames analysées depuis le lot précédent
+    }
+    """
+    
+    permission_classes = [APIKeyPermission]  # Authentification via API key
+    
+    def post(self, request):
+        """Enregistre un lot de détections en une transaction."""
+        serializer = AlertDetectionBatchSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Données invalides',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
         try:
-            # Créer notification pour les admins et enquêteurs
-            users = UtilisateurModel.objects.filter(
-                role__in=['administrateur', 'admin', 'Enquêteur Principal', 'Enquêteur']
-            ).filter(statut='actif')
-            
-            for user in users:
-                Notification.objects.create(
-                    utilisateur=user,
-                    type='error',  # Utiliser 'error' pour les alertes critiques
-                    titre=f'🚨 Détection faciale - Caméra {camera.name}',
-                    message=f'Correspondance détectée (score: {score:.2f}). Criminel ID: {criminal_id}',
-                    lien=f'/criminels/{criminal_id}'
-                )
+            log_ids = ingest_detections(data.get('detections', []), data.get('camera_frames') or {})
+            
+            return Response({
+                'success': True,
+                'log_ids': log_ids,
+                'count': len(log_ids)
+            }, status=status.HTTP_200_OK)
+            
         except Exception as e:
-            logger.warning(f"Impossible de créer notification: {e}")
+            logger.error(f"Erreur traitement lot d'alertes: {e}", exc_info=True)
+            return Response({
+                'error': 'Erreur lors du traitement des alertes',
+                'details': str(e) if settings.DEBUG else None
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class AlertClipView(APIView):
+    """
+    Clip vidéo d'une alerte (secondes avant / après), envoyé par multi_camera_service
+    une fois les secondes « après » capturées.
+    
+    POST /api/upr/alert-detection/clip/  (multipart)
+    
+    Champs: alert_id, clip (vidéo), frame (image de l'instant de l'alerte, optionnelle),
+    event_at, started_at, ended_at, frames, fps
+    
+    404 tant que l'alerte correspondante n'est pas enregistrée : le service
+    caméra renvoie le clip plus tard.
+    """
+    
+    permission_classes = [APIKeyPermission]  # Authentification via API key
+    parser_classes = [MultiPartParser, FormParser]
+    
+    def post(self, request):
+        """Range le clip dans le stockage média et le rattache à l'UPRLog de l'alerte."""
+        serializer = AlertClipSerializer(data=request.data)
+        
+        if not serializer.is_valid():
+            return Response({
+                'error': 'Données invalides',
+                'details': serializer.errors
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        data = serializer.validated_data
+        clip_info = {
+            key: data[key]
+            for key in ('event_at', 'started_at', 'ended_at', 'frames', 'fps')
+            if key in data
+        }
+        try:
+            log = attach_alert_clip(data['alert_id'], data['clip'], data.get('frame'), clip_info)
+        except Exception as e:
+            logger.error(f"Erreur enregistrement clip d'alerte: {e}", exc_info=True)
+            return Response({
+                'error': 'Erreur lors de l\'enregistrement du clip',
+                'details': str(e) if settings.DEBUG else None
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        if log is None:
+            return Response({
+                'error': 'Alerte inconnue',
+                'alert_id': data['alert_id']
+            }, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({
+            'success': True,
+            'log_id': log.id,
+            'clip_url': log.clip.url if log.clip else None
+        }, status=status.HTTP_200_OK)
 
 
 class CompareEmbeddingView(APIView):
@@ -390,6 +401,124 @@ class CompareEmbeddingView(APIView):
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class GallerySnapshotView(APIView):
+    """
+    Instantané de la galerie pour la comparaison locale des services caméra.
+    
+    GET /api/upr/gallery-snapshot/?version=buffalo_l:insightface-v1&since=<watermark>&format=int8
+    
+    - version : version d'embedding du modèle local (défaut: version active)
+    - since   : watermark de la synchronisation précédente (absent = complet)
+    - format  : float32 (défaut) ou int8
+    
+    Voir upr/services/gallery_snapshot.py pour le format de réponse.
+    """
+    
+    permission_classes = [APIKeyPermission]  # Authentification via API key
+    
+    def get(self, request):
+        """Retourne l'instantané complet ou le delta depuis ``since``."""
+        from django.utils.dateparse import parse_datetime
+        from biometrie.embedding_versions import get_version_state
+        from .services.gallery_snapshot import SNAPSHOT_FORMATS, build_gallery_snapshot
+        
+        active_version, target_version = get_version_state()
+        version = request.query_params.get('version') or active_version
+        fmt = request.query_params.get('format', 'float32')
+        if fmt not in SNAPSHOT_FORMATS:
+            return Response({
+                'error': f"Format invalide: {fmt}",
+                'formats': list(SNAPSHOT_FORMATS)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        since = None
+        since_raw = request.query_params.get('since')
+        if since_raw:
+            since = parse_datetime(since_raw)
+            if since is None:
+                return Response({
+                    'error': f"Watermark invalide: {since_raw}"
+                }, status=status.HTTP_400_BAD_REQUEST)
+            if django_timezone.is_naive(since):
+                since = django_timezone.make_aware(since)
+        
+        try:
+            snapshot = build_gallery_snapshot(version=version, since=since, fmt=fmt)
+        except Exception as e:
+            logger.error(f"Erreur instantané galerie: {e}", exc_info=True)
+            return Response({
+                'error': 'Erreur lors de la construction de l\'instantané',
+                'details': str(e) if settings.DEBUG else None
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        
+        # Le client compare ces versions à son modèle local pour savoir s'il doit changer
+        snapshot['active_version'] = active_version
+        snapshot['target_version'] = target_version
+        return Response(snapshot, status=status.HTTP_200_OK)
+
+
+class CameraMetricsView(APIView):
+    """
+    Métriques de performance par caméra (latences par étape, compteurs, pipeline).
+    
+    GET  /api/upr/cameras/metrics/                    JSON (dernier instantané par caméra)
+    GET  /api/upr/cameras/metrics/?format=prometheus  texte Prometheus
+    POST /api/upr/cameras/metrics/                    envoi périodique du service caméra (API key)
+    
+    Payload POST:
+    {
+        "reported_at": 1760781600.0,
+        "cameras": {"usb_0": {"latency": {...}, "counters": {...}, "pipeline": {...}}}
+    }
+    """
+    
+    def get_permissions(self):
+        if self.request.method == 'POST':
+            return [APIKeyPermission()]
+        return [(IsAuthenticated | APIKeyPermission)()]
+    
+    def get(self, request):
+        """Dernières métriques persistées."""
+        cameras = Camera.objects.only('camera_id', 'name', 'active', 'metrics', 'metrics_updated_at')
+        camera_id = request.query_params.get('camera_id')
+        if camera_id:
+            cameras = cameras.filter(camera_id=camera_id)
+        
+        if request.query_params.get('format') == 'prometheus':
+            return HttpResponse(prometheus_text(cameras), content_type='text/plain; version=0.0.4; charset=utf-8')
+        
+        return Response({
+            'cameras': {
+                camera.camera_id: {
+                    'name': camera.name,
+                    'active': camera.active,
+                    'metrics_updated_at': camera.metrics_updated_at,
+                    **(camera.metrics or {}),
+                }
+                for camera in cameras
+            }
+        }, status=status.HTTP_200_OK)
+    
+    def post(self, request):
+        """Persiste l'instantané envoyé par le service multi-caméras."""
+        cameras = request.data.get('cameras')
+        if not isinstance(cameras, dict):
+            return Response({
+                'error': 'Données invalides',
+                'details': {'cameras': 'Objet {camera_id: métriques} attendu'}
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            updated = store_camera_metrics(cameras, request.data.get('reported_at'))
+        except (TypeError, ValueError, OverflowError) as e:
+            return Response({
+                'error': 'Données invalides',
+                'details': str(e)
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({'success': True, 'updated': updated}, status=status.HTTP_200_OK)
+
+
 class UPRLogViewSet(viewsets.ModelViewSet):
     """
     ViewSet pour la gestion des logs UPR.
@@ -4,11 +4,16 @@
  */
 
 import { post } from '../../../services/api'
+import { API_BASE_URL } from '../../../config/api'
+import { getAuthToken } from '../../../utils/sessionStorage'
 
 const ARCFACE_ANALYSE_ENDPOINT = '/ai-analysis/real/recherche_photo/'
 const PHOTO_SEARCH_ENDPOINT = '/ia/recherche-photo/'
 const PHOTO_SEARCH_STREAM_ENDPOINT = '/ia/recherche-photo-stream/'
-const REALTIME_CAPTURE_ENDPOINT = '/ia/realtime-recognition/'
+// Les landmarks sont des champs lourds : le backend ne les renvoie que sur demande explicite.
+const REALTIME_CAPTURE_ENDPOINT = '/ia/realtime-recognition/?include=landmarks'
+// Canal WebSocket (serveur ASGI) : authentification unique puis frames binaires.
+const REALTIME_WS_PATH = '/ws/ia/recognition/'
 const DEFAULT_TIMEOUT = 60000
 
 const construireFormData = ({ file, mode, threshold, topK, lineupIds, includeEmbedding }) => {
@@ -162,28 +167,85 @@ const normaliserCaptureTempsReel = (payload = {}) => ({
 })
 
 /**
- * Analyse une capture unique (base64) pour la reconnaissance temps réel.
+ * Analyse une capture unique (Blob ou data URL) pour la reconnaissance temps réel.
+ * La frame est envoyée en corps binaire image/jpeg (pas de surcoût base64).
  */
-export const envoyerCaptureTempsReel = async (imageBase64, options = {}) => {
-  if (!imageBase64) {
-    throw new Error('Image base64 manquante pour la reconnaissance temps réel.')
+export const envoyerCaptureTempsReel = async (image, options = {}) => {
+  if (!image) {
+    throw new Error('Image manquante pour la reconnaissance temps réel.')
   }
 
-  const payload = {
-    image: imageBase64,
-  }
+  const blob = image instanceof Blob ? image : await (await fetch(image)).blob()
 
+  const params = new URLSearchParams()
   if (options.threshold !== undefined) {
-    payload.threshold = options.threshold
+    params.set('threshold', String(options.threshold))
   }
+  const query = params.toString()
+  const endpoint = query ? `${REALTIME_CAPTURE_ENDPOINT}&${query}` : REALTIME_CAPTURE_ENDPOINT
 
-  const response = await post(REALTIME_CAPTURE_ENDPOINT, payload, {
+  const response = await post(endpoint, blob, {
+    headers: {
+      'Content-Type': blob.type || 'image/jpeg',
+    },
     timeout: options.timeout ?? DEFAULT_TIMEOUT,
   })
 
   return normaliserCaptureTempsReel(response.data || {})
 }
 
+/**
+ * Ouvre le canal WebSocket de reconnaissance temps réel.
+ * Chaque Blob envoyé est analysé comme par envoyerCaptureTempsReel ; si le serveur
+ * est occupé, seule la frame la plus récente est traitée.
+ */
+export const ouvrirCanalReconnaissance = ({ threshold, onOpen, onResult, onError, onClose } = {}) => {
+  const url = new URL(API_BASE_URL, window.location.origin)
+  url.protocol = url.protocol === 'https:' ? 'wss:' : 'ws:'
+  url.pathname = REALTIME_WS_PATH
+  url.search = ''
+  url.searchParams.set('include', 'landmarks')
+  if (threshold !== undefined) {
+    url.searchParams.set('threshold', String(threshold))
+  }
+
+  const socket = new WebSocket(url.toString())
+  socket.binaryType = 'arraybuffer'
+
+  socket.onopen = () => {
+    // Jeton envoyé dans le premier message plutôt que dans l'URL (journaux serveur)
+    socket.send(JSON.stringify({ type: 'auth', token: getAuthToken() }))
+  }
+  socket.onmessage = (event) => {
+    let message
+    try {
+      message = JSON.parse(event.data)
+    } catch {
+      return
+    }
+    if (message.type === 'ready') {
+      onOpen?.(message)
+    } else if (message.type === 'result') {
+      onResult?.(normaliserCaptureTempsReel(message.data || {}), message)
+    } else if (message.type === 'error') {
+      onError?.(new Error(message.message || 'Erreur du canal de reconnaissance.'))
+    }
+  }
+  socket.onerror = () => onError?.(new Error('Connexion au canal de reconnaissance impossible.'))
+  socket.onclose = (event) => onClose?.(event)
+
+  return {
+    envoyer: (blob) => {
+      if (socket.readyState === WebSocket.OPEN && blob) {
+        socket.send(blob)
+        return true
+      }
+      return false
+    },
+    fermer: () => socket.close(),
+  }
+}
+
 /**
  * Normalise la réponse du nouvel endpoint /ia/recherche-photo/.
  */
@@ -370,6 +432,7 @@ export const rechercherCorrespondancesMultiples = async (files, options = {}) =>
 export default {
   analyserVisageTempsReel,
   envoyerCaptureTempsReel,
+  ouvrirCanalReconnaissance,
   rechercherCorrespondance,
   rechercherCorrespondanceStream,
   rechercherCorrespondancesMultiples,
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Test de charge de la recherche faciale par photo.
+
+Envoie des requêtes concurrentes sur /api/upr/search-by-photo/ et affiche la
+latence (p50/p95/p99), le débit et les erreurs. À lancer avant/après un
+changement du budget de threads ONNX (ONNX_CPU_BUDGET, ONNX_ROLE_SHARES,
+WEB_CONCURRENCY) pour comparer la latence de queue.
+
+Exemple :
+    python scripts/load_test_face_search.py --image visage.jpg \\
+        --token <jwt> --concurrency 8 --requests 200
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+try:
+    import requests
+except ImportError:
+    print("ERREUR: requests n'est pas installe.")
+    print("Installez-le avec: pip install requests")
+    sys.exit(1)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def send_search(session, url, headers, image_bytes, field, timeout):
+    started = time.perf_counter()
+    try:
+        response = session.post(
+            url,
+            headers=headers,
+            files={field: ('query.jpg', image_bytes, 'image/jpeg')},
+            timeout=timeout,
+        )
+        ok = response.status_code < 500
+        status = response.status_code
+    except requests.RequestException as exc:
+        ok = False
+        status = type(exc).__name__
+    return time.perf_counter() - started, ok, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test de charge de la recherche faciale")
+    parser.add_argument('--url', default='http://localhost:8000/api/upr/search-by-photo/')
+    parser.add_argument('--image', required=True, help="Photo de visage envoyée à chaque requête")
+    parser.add_argument('--token', default=None, help="Jeton JWT (en-tête Authorization: Bearer)")
+    parser.add_argument('--field', default='photo', help="Nom du champ fichier (défaut: photo)")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--warmup', type=int, default=3, help="Requêtes ignorées en début de test")
+    parser.add_argument('--timeout', type=float, default=60.0)
+    args = parser.parse_args()
+
+    with open(args.image, 'rb') as handle:
+        image_bytes = handle.read()
+
+    headers = {'Authorization': f'Bearer {args.token}'} if args.token else {}
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    for _ in range(args.warmup):
+        send_search(session, args.url, headers, image_bytes, args.field, args.timeout)
+
+    latencies = []
+    errors = {}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(send_search, session, args.url, headers, image_bytes, args.field, args.timeout)
+            for _ in range(args.requests)
+        ]
+        for future in as_completed(futures):
+            elapsed, ok, status = future.result()
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors[status] = errors.get(status, 0) + 1
+    duration = time.perf_counter() - started
+
+    print(f"Requêtes: {args.requests} (concurrence {args.concurrency}) en {duration:.1f}s")
+    print(f"Débit: {len(latencies) / duration:.2f} req/s")
+    if latencies:
+        print(
+            "Latence (ms): moyenne={:.0f} p50={:.0f} p95={:.0f} p99={:.0f} max={:.0f}".format(
+                statistics.mean(latencies) * 1000,
+                percentile(latencies, 50) * 1000,
+                percentile(latencies, 95) * 1000,
+                percentile(latencies, 99) * 1000,
+                max(latencies) * 1000,
+            )
+        )
+    if errors:
+        print(f"Erreurs: {sum(errors.values())} {errors}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,348 @@
+"""
+Envoi durable des alertes vers le backend
+-----------------------------------------
+
+Les alertes sont d'abord écrites dans un spool SQLite local (``AlertSpool``,
+mode WAL : une insertion coûte une fraction de milliseconde et ne dépend pas
+du réseau). Un thread indépendant (``AlertSender``) vide le spool par lots
+vers ``POST /upr/alert-detection/batch/`` :
+
+ - ordre d'émission respecté : un lot n'est retiré du spool qu'après
+   acceptation par le backend, le suivant repart de la plus ancienne alerte ;
+ - backend lent ou arrêté : nouvel essai avec backoff exponentiel (plafonné,
+   avec jitter), rien n'est perdu tant que le spool n'atteint pas sa taille
+   maximale (les plus anciennes alertes sont alors évincées) ;
+ - lot rejeté par le backend (4xx hors 401/403/404/408/429) : le backend
+   valide le lot en bloc, le lot est donc coupé en deux jusqu'à isoler
+   l'alerte fautive, seule mise en quarantaine (table ``rejected`` du
+   spool) pour ne pas bloquer les suivantes ni perdre les alertes valides.
+
+Livraison « au moins une fois » : chaque alerte porte un ``alert_id`` stable
+(dans ``detection_info``) pour repérer les doublons après un timeout.
+
+Métriques : profondeur du spool et âge de la plus ancienne alerte en attente.
+"""
+
+import json
+import logging
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from multi_camera_service.metrics import METRICS
+
+logger = logging.getLogger("MultiCameraService.alerts")
+
+RETRYABLE_STATUS = {401, 403, 404, 408, 429}
+
+
+def api_headers(api_key: Optional[str]) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {api_key}"} if api_key else {}
+
+
+class AlertSpool:
+    """File FIFO persistante (SQLite) partagée entre producteurs et expéditeur."""
+
+    def __init__(self, path: str, max_rows: int = 100000):
+        self.path = path
+        self.max_rows = max(1, max_rows)
+        self.evicted = 0
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS alerts ("
+            " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " payload TEXT NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rejected ("
+            " id INTEGER PRIMARY KEY,"
+            " created_at REAL NOT NULL,"
+            " rejected_at REAL NOT NULL,"
+            " reason TEXT,"
+            " payload TEXT NOT NULL)"
+        )
+        self._depth = self._conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0]
+        if self._depth:
+            logger.info("Spool d'alertes %s: %d alerte(s) en attente reprises", path, self._depth)
+
+    def put(self, payload: Dict[str, Any]) -> None:
+        data = json.dumps(payload, separators=(",", ":"))
+        with self._lock:
+            self._conn.execute("INSERT INTO alerts (created_at, payload) VALUES (?, ?)", (time.time(), data))
+            self._depth += 1
+            if self._depth > self.max_rows:
+                overflow = self._depth - self.max_rows
+                self._conn.execute(
+                    "DELETE FROM alerts WHERE id IN (SELECT id FROM alerts ORDER BY id LIMIT ?)", (overflow,)
+                )
+                self._depth -= overflow
+                self.evicted += overflow
+                logger.warning("Spool d'alertes plein (%d): %d alerte(s) la plus ancienne évincée(s)", self.max_rows, overflow)
+
+    def peek(self, limit: int) -> List[Tuple[int, float, Dict[str, Any]]]:
+        """Les ``limit`` plus anciennes alertes ``(id, created_at, payload)``, sans les retirer."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, created_at, payload FROM alerts ORDER BY id LIMIT ?", (limit,)
+            ).fetchall()
+        return [(row_id, created_at, json.loads(payload)) for row_id, created_at, payload in rows]
+
+    def ack(self, ids: List[int]) -> None:
+        """Retire les alertes livrées (ou rejetées définitivement)."""
+        if not ids:
+            return
+        with self._lock:
+            cursor = self._conn.execute(
+                f"DELETE FROM alerts WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+            self._depth = max(0, self._depth - cursor.rowcount)
+
+    def quarantine(self, ids: List[int], reason: str = "") -> None:
+        """Déplace des alertes rejetées définitivement vers la table ``rejected``."""
+        if not ids:
+            return
+        placeholders = ','.join('?' * len(ids))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO rejected (id, created_at, rejected_at, reason, payload)"
+                    f" SELECT id, created_at, ?, ?, payload FROM alerts WHERE id IN ({placeholders})",
+                    [time.time(), reason, *ids],
+                )
+                cursor = self._conn.execute(f"DELETE FROM alerts WHERE id IN ({placeholders})", ids)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._depth = max(0, self._depth - cursor.rowcount)
+
+    def mark_attempt(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute(
+                f"UPDATE alerts SET attempts = attempts + 1 WHERE id IN ({','.join('?' * len(ids))})", ids
+            )
+
+    def depth(self) -> int:
+        return self._depth
+
+    def oldest_age(self) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT MIN(created_at) FROM alerts").fetchone()
+        return time.time() - row[0] if row and row[0] is not None else None
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class AlertSender:
+    """Vide le spool d'alertes vers le backend par lots, sans bloquer l'inférence.
+
+    Un lot part dès ``batch_size`` alertes en attente ou ``batch_interval``
+    secondes après la précédente vidange. Le nombre de frames analysées par
+    caméra est joint au lot.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str] = None,
+        *,
+        spool: Optional[AlertSpool] = None,
+        timeout: float = 10.0,
+        batch_size: int = 50,
+        batch_interval: float = 1.0,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.spool = spool or AlertSpool(":memory:")
+        self.timeout = timeout
+        self.batch_size = max(1, batch_size)
+        self.batch_interval = batch_interval
+        self.backoff_initial = backoff_initial
+        self.backoff_max = backoff_max
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._send_loop, name="alert-sender", daemon=True)
+        self._frames: Dict[str, int] = {}
+        self._frames_lock = threading.Lock()
+        self.sent = 0
+        self.batches = 0
+        self.failures = 0
+        self.rejected = 0
+        self.last_error: Optional[str] = None
+        self.last_success_at: Optional[float] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["AlertSender"]:
+        api_url = os.environ.get("UPR_API_URL", "").strip()
+        if not api_url:
+            return None
+        spool = AlertSpool(
+            os.environ.get("ALERT_SPOOL_PATH", "./storage/alert_spool.db"),
+            max_rows=int(os.environ.get("ALERT_SPOOL_MAX", "100000")),
+        )
+        return cls(
+            api_url,
+            os.environ.get("UPR_API_KEY") or None,
+            spool=spool,
+            timeout=float(os.environ.get("CONNECTION_TIMEOUT", "10")),
+            batch_size=int(os.environ.get("ALERT_BATCH_SIZE", "50")),
+            batch_interval=float(os.environ.get("ALERT_BATCH_INTERVAL", "1.0")),
+            backoff_initial=float(os.environ.get("ALERT_RETRY_BACKOFF", "1")),
+            backoff_max=float(os.environ.get("ALERT_RETRY_BACKOFF_MAX", "60")),
+        )
+
+    def start(self) -> "AlertSender":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Arrête l'expéditeur ; les alertes non livrées restent dans le spool."""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=self.timeout + 2.0)
+        self.spool.close()
+
+    def record_frames(self, camera_id: str, count: int = 1) -> None:
+        """Comptabilise les frames analysées (envoyées avec le prochain lot)."""
+        with self._frames_lock:
+            self._frames[camera_id] = self._frames.get(camera_id, 0) + count
+
+    def send(self, camera_id: str, matches: List[Dict[str, Any]], detection_info: Dict[str, Any]) -> Optional[str]:
+        """Écrit l'alerte dans le spool local (aucun accès réseau).
+
+        Returns:
+            ``alert_id`` de l'alerte (clé du clip associé), None si le spool est inaccessible.
+        """
+        alert_id = uuid.uuid4().hex
+        payload = {
+            "camera_id": camera_id,
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "matches": matches,
+            "best_match": matches[0] if matches else None,
+            "detection_info": {"alert_id": alert_id, **detection_info},
+        }
+        try:
+            self.spool.put(payload)
+        except sqlite3.Error as e:
+            logger.error("Écriture dans le spool d'alertes impossible (caméra %s): %s", camera_id, e)
+            return None
+        if self.spool.depth() >= self.batch_size:
+            self._wakeup.set()
+        return alert_id
+
+    def _take_frames(self) -> Dict[str, int]:
+        with self._frames_lock:
+            frames, self._frames = self._frames, {}
+        return frames
+
+    def _restore_frames(self, frames: Dict[str, int]) -> None:
+        for camera_id, count in frames.items():
+            self.record_frames(camera_id, count)
+
+    def _post(self, session, batch: List[Dict[str, Any]], frames: Dict[str, int]):
+        return session.post(
+            f"{self.api_url}/upr/alert-detection/batch/",
+            json={"detections": batch, "camera_frames": frames},
+            headers=api_headers(self.api_key),
+            timeout=self.timeout,
+        )
+
+    def _drain(self, session) -> bool:
+        """Envoie les lots en attente ; False si le backend est indisponible."""
+        limit = self.batch_size
+        while not self._stop_event.is_set():
+            rows = self.spool.peek(limit)
+            if not rows:
+                return True
+            ids = [row_id for row_id, _, _ in rows]
+            frames = self._take_frames()
+            try:
+                response = self._post(session, [payload for _, _, payload in rows], frames)
+            except Exception as e:
+                self._restore_frames(frames)
+                self.spool.mark_attempt(ids)
+                self.last_error = str(e)
+                return False
+
+            if response.status_code < 300:
+                self.spool.ack(ids)
+                now = time.time()
+                for _, created_at, payload in rows:
+                    METRICS.observe(payload["camera_id"], "alert", (now - created_at) * 1000)
+                    METRICS.inc(payload["camera_id"], "alerts_sent")
+                self.sent += len(ids)
+                self.batches += 1
+                self.last_success_at = time.time()
+                continue
+            if 400 <= response.status_code < 500 and response.status_code not in RETRYABLE_STATUS:
+                self._restore_frames(frames)
+                if len(ids) > 1:
+                    # Validation en bloc côté backend : couper le lot pour isoler l'alerte fautive
+                    limit = len(ids) // 2
+                    continue
+                # Alerte invalide : la renvoyer ne changera rien, elle bloquerait les suivantes
+                logger.error("Alerte %s rejetée par le backend (%d), mise en quarantaine: %s",
+                             ids[0], response.status_code, response.text[:500])
+                self.spool.quarantine(ids, f"HTTP {response.status_code}: {response.text[:500]}")
+                self.rejected += 1
+                limit = self.batch_size
+                continue
+            self._restore_frames(frames)
+            self.spool.mark_attempt(ids)
+            self.last_error = f"HTTP {response.status_code}"
+            return False
+        return True
+
+    def _send_loop(self) -> None:
+        import requests
+
+        session = requests.Session()
+        backoff = self.backoff_initial
+        while not self._stop_event.is_set():
+            if self._drain(session):
+                backoff = self.backoff_initial
+                self._wakeup.wait(self.batch_interval)
+                self._wakeup.clear()
+                continue
+            self.failures += 1
+            delay = min(backoff, self.backoff_max) * random.uniform(0.8, 1.2)
+            logger.warning(
+                "Backend indisponible (%s): %d alerte(s) en attente, nouvel essai dans %.1fs",
+                self.last_error, self.spool.depth(), delay,
+            )
+            self._stop_event.wait(delay)
+            backoff = min(backoff * 2, self.backoff_max)
+
+    def stats(self) -> Dict[str, Any]:
+        oldest = self.spool.oldest_age()
+        return {
+            "spool_depth": self.spool.depth(),
+            "spool_oldest_age_s": round(oldest, 1) if oldest is not None else None,
+            "spool_evicted": self.spool.evicted,
+            "sent": self.sent,
+            "batches": self.batches,
+            "rejected": self.rejected,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "last_success_age_s": round(time.time() - self.last_success_at, 1) if self.last_success_at else None,
+        }
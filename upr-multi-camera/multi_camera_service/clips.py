@@ -0,0 +1,356 @@
+"""
+Clips vidéo avant / après alerte
+--------------------------------
+
+Chaque caméra garde en mémoire un anneau des dernières secondes de frames
+compressées en JPEG (``CLIP_FPS`` images/s, largeur ``CLIP_MAX_WIDTH``) :
+quelques Mo par caméra, aucune écriture disque en continu.
+
+Sur une alerte confirmée, ``ClipRecorder.trigger`` réserve un clip couvrant
+``CLIP_PRE_SECONDS`` avant et ``CLIP_POST_SECONDS`` après l'événement. Dès
+que les secondes « après » sont capturées, le clip est écrit dans
+``CLIP_DIR`` (vidéo + image de l'instant de l'alerte + métadonnées JSON).
+
+``ClipUploader`` envoie ensuite les clips au backend
+(``POST /upr/alert-detection/clip/``) qui les range dans le stockage média et
+les rattache à l'``UPRLog`` de l'alerte (même ``alert_id``). Les fichiers
+restent sur disque jusqu'à acceptation : un clip dont l'alerte n'est pas
+encore ingérée (404) est renvoyé plus tard.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from multi_camera_service.metrics import METRICS
+
+logger = logging.getLogger("MultiCameraService.clips")
+
+
+class FrameRing:
+    """Dernières ``seconds`` secondes de frames JPEG d'une caméra."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.frames: Deque[Tuple[float, bytes]] = deque()
+        self.last_added = 0.0
+
+    def append(self, captured_at: float, data: bytes) -> None:
+        self.frames.append((captured_at, data))
+        self.last_added = captured_at
+        while self.frames and self.frames[0][0] < captured_at - self.seconds:
+            self.frames.popleft()
+
+    def window(self, start: float, end: float) -> List[Tuple[float, bytes]]:
+        return [(ts, data) for ts, data in self.frames if start <= ts <= end]
+
+    def newest(self) -> Optional[float]:
+        return self.frames[-1][0] if self.frames else None
+
+    def size_bytes(self) -> int:
+        return sum(len(data) for _, data in self.frames)
+
+
+class ClipRecorder:
+    """Anneaux de frames par caméra et écriture des clips d'alerte."""
+
+    def __init__(
+        self,
+        clip_dir: str,
+        *,
+        pre_seconds: float = 5.0,
+        post_seconds: float = 5.0,
+        fps: float = 5.0,
+        max_width: int = 640,
+        jpeg_quality: int = 75,
+        fourcc: str = "mp4v",
+        slack_seconds: float = 10.0,
+    ):
+        self.clip_dir = clip_dir
+        self.pre_seconds = pre_seconds
+        self.post_seconds = post_seconds
+        self.fps = max(0.5, fps)
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.fourcc = fourcc
+        # Marge : un clip en attente ne doit pas perdre ses premières frames
+        self.ring_seconds = pre_seconds + post_seconds + slack_seconds
+        os.makedirs(clip_dir, exist_ok=True)
+        self._rings: Dict[str, FrameRing] = {}
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._write_loop, name="clip-writer", daemon=True)
+        self.written = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls) -> Optional["ClipRecorder"]:
+        if os.environ.get("ALERT_CLIPS", "true").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            os.environ.get("CLIP_DIR", "./storage/clips"),
+            pre_seconds=float(os.environ.get("CLIP_PRE_SECONDS", "5")),
+            post_seconds=float(os.environ.get("CLIP_POST_SECONDS", "5")),
+            fps=float(os.environ.get("CLIP_FPS", "5")),
+            max_width=int(os.environ.get("CLIP_MAX_WIDTH", "640")),
+            jpeg_quality=int(os.environ.get("CLIP_JPEG_QUALITY", "75")),
+            fourcc=os.environ.get("CLIP_FOURCC", "mp4v"),
+        )
+
+    def start(self) -> "ClipRecorder":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Arrête l'écriture ; les clips déjà réservés sont écrits avec les frames disponibles."""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5.0)
+        self._write_due(force=True)
+
+    def add_frame(self, camera_id: str, frame, captured_at: float) -> None:
+        """Ajoute une frame capturée (sous-échantillonnée à ``fps``, compressée en JPEG)."""
+        with self._lock:
+            ring = self._rings.get(camera_id)
+            if ring is None:
+                ring = self._rings[camera_id] = FrameRing(self.ring_seconds)
+            if captured_at - ring.last_added < 0.9 / self.fps:
+                return
+            ring.last_added = captured_at
+
+        height, width = frame.shape[:2]
+        if width > self.max_width:
+            frame = cv2.resize(frame, (self.max_width, int(height * self.max_width / width)),
+                               interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, self.jpeg_quality])
+        if not ok:
+            return
+        with self._lock:
+            ring.append(captured_at, encoded.tobytes())
+
+    def trigger(self, camera_id: str, alert_id: str, event_at: float, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Réserve le clip [event_at - pre, event_at + post] de l'alerte ``alert_id``."""
+        with self._lock:
+            self._pending.append({
+                "alert_id": alert_id,
+                "camera_id": camera_id,
+                "event_at": event_at,
+                "start": event_at - self.pre_seconds,
+                "end": event_at + self.post_seconds,
+                "metadata": metadata or {},
+            })
+
+    def _write_loop(self) -> None:
+        while not self._stop_event.wait(0.5):
+            self._write_due()
+
+    def _write_due(self, force: bool = False) -> None:
+        now = time.time()
+        with self._lock:
+            due, waiting = [], []
+            for clip in self._pending:
+                ring = self._rings.get(clip["camera_id"])
+                newest = ring.newest() if ring else None
+                # Prêt quand les secondes « après » sont capturées (ou caméra muette depuis)
+                ready = force or (newest is not None and newest >= clip["end"]) or now > clip["end"] + 2.0
+                (due if ready else waiting).append(clip)
+            self._pending = waiting
+            for clip in due:
+                ring = self._rings.get(clip["camera_id"])
+                clip["frames"] = ring.window(clip["start"], clip["end"]) if ring else []
+
+        for clip in due:
+            started = time.perf_counter()
+            try:
+                if self._write_clip(clip):
+                    self.written += 1
+                    METRICS.observe(clip["camera_id"], "clip", (time.perf_counter() - started) * 1000)
+                    METRICS.inc(clip["camera_id"], "clips_written")
+            except Exception as e:
+                self.failed += 1
+                logger.error("Écriture du clip %s impossible: %s", clip["alert_id"], e)
+
+    def _write_clip(self, clip: Dict[str, Any]) -> bool:
+        frames = clip.pop("frames")
+        if not frames:
+            logger.warning("Clip %s (caméra %s): aucune frame en mémoire", clip["alert_id"], clip["camera_id"])
+            return False
+
+        base = os.path.join(self.clip_dir, clip["alert_id"])
+        images = [cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR) for _, data in frames]
+        height, width = images[0].shape[:2]
+        video_path = f"{base}.tmp.mp4"
+        writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+        if not writer.isOpened():
+            raise RuntimeError(f"VideoWriter indisponible (fourcc {self.fourcc})")
+        try:
+            for image in images:
+                if image is None:
+                    continue
+                if image.shape[:2] != (height, width):
+                    image = cv2.resize(image, (width, height))
+                writer.write(image)
+        finally:
+            writer.release()
+        os.replace(video_path, f"{base}.mp4")
+
+        # Image la plus proche de l'instant de l'alerte (remplace la frame base64)
+        _, key_frame = min(frames, key=lambda item: abs(item[0] - clip["event_at"]))
+        with open(f"{base}.jpg", "wb") as handle:
+            handle.write(key_frame)
+
+        meta = {
+            "alert_id": clip["alert_id"],
+            "camera_id": clip["camera_id"],
+            "event_at": clip["event_at"],
+            "started_at": frames[0][0],
+            "ended_at": frames[-1][0],
+            "frames": len(frames),
+            "fps": self.fps,
+            **clip["metadata"],
+        }
+        # Métadonnées en dernier : leur présence signale un clip complet à l'expéditeur
+        with open(f"{base}.json.tmp", "w", encoding="utf-8") as handle:
+            json.dump(meta, handle)
+        os.replace(f"{base}.json.tmp", f"{base}.json")
+        logger.info("Clip %s écrit (caméra %s, %d frames, %.1fs)", clip["alert_id"], clip["camera_id"],
+                    len(frames), frames[-1][0] - frames[0][0])
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "cameras": len(self._rings),
+                "ring_bytes": sum(ring.size_bytes() for ring in self._rings.values()),
+                "pending": len(self._pending),
+                "written": self.written,
+                "failed": self.failed,
+            }
+
+
+class ClipUploader(threading.Thread):
+    """Envoie les clips écrits dans ``clip_dir`` au backend, avec nouvel essai."""
+
+    def __init__(
+        self,
+        api_url: str,
+        clip_dir: str,
+        api_key: Optional[str] = None,
+        *,
+        timeout: float = 30.0,
+        interval: float = 2.0,
+        backoff_max: float = 60.0,
+        max_pending_age: float = 86400.0,
+    ):
+        super().__init__(name="clip-uploader", daemon=True)
+        self.api_url = api_url.rstrip("/")
+        self.clip_dir = clip_dir
+        self.api_key = api_key
+        self.timeout = timeout
+        self.interval = interval
+        self.backoff_max = backoff_max
+        self.max_pending_age = max_pending_age
+        self._stop_event = threading.Event()
+        self._retry_at: Dict[str, float] = {}
+        self.uploaded = 0
+        self.discarded = 0
+
+    @classmethod
+    def from_env(cls, recorder: Optional[ClipRecorder]) -> Optional["ClipUploader"]:
+        api_url = os.environ.get("UPR_API_URL", "").strip()
+        if recorder is None or not api_url:
+            return None
+        return cls(
+            api_url,
+            recorder.clip_dir,
+            os.environ.get("UPR_API_KEY") or None,
+            timeout=float(os.environ.get("CLIP_UPLOAD_TIMEOUT", "30")),
+            max_pending_age=float(os.environ.get("CLIP_MAX_PENDING_AGE", "86400")),
+        )
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def _discard(self, base: str) -> None:
+        for suffix in (".json", ".mp4", ".jpg"):
+            try:
+                os.remove(base + suffix)
+            except FileNotFoundError:
+                pass
+
+    def _upload(self, session, base: str) -> bool:
+        """Envoie un clip ; False si le backend est indisponible (nouvel essai plus tard)."""
+        from multi_camera_service.alerts import api_headers
+
+        with open(f"{base}.json", encoding="utf-8") as handle:
+            meta = json.load(handle)
+        files = {"clip": (os.path.basename(base) + ".mp4", open(f"{base}.mp4", "rb"), "video/mp4")}
+        if os.path.exists(f"{base}.jpg"):
+            files["frame"] = (os.path.basename(base) + ".jpg", open(f"{base}.jpg", "rb"), "image/jpeg")
+        try:
+            response = session.post(
+                f"{self.api_url}/upr/alert-detection/clip/",
+                data={key: value for key, value in meta.items() if value is not None},
+                files=files,
+                headers=api_headers(self.api_key),
+                timeout=self.timeout,
+            )
+        finally:
+            for _, handle, _ in files.values():
+                handle.close()
+
+        if response.status_code < 300:
+            self._discard(base)
+            self._retry_at.pop(base, None)
+            self.uploaded += 1
+            return True
+        age = time.time() - os.path.getmtime(f"{base}.json")
+        if response.status_code == 404 and age < self.max_pending_age:
+            # Alerte pas encore ingérée (spool d'alertes en retard) : réessayer plus tard
+            self._retry_at[base] = time.time() + min(max(age, 5.0), self.backoff_max)
+            return True
+        if 400 <= response.status_code < 500 and response.status_code not in (401, 403, 408, 429):
+            logger.error("Clip %s rejeté par le backend (%d): %s", meta.get("alert_id"),
+                         response.status_code, response.text[:300])
+            self._discard(base)
+            self._retry_at.pop(base, None)
+            self.discarded += 1
+            return True
+        return False
+
+    def run(self) -> None:
+        import requests
+
+        session = requests.Session()
+        backoff = self.interval
+        while not self._stop_event.wait(backoff):
+            try:
+                names = sorted(name for name in os.listdir(self.clip_dir) if name.endswith(".json"))
+                healthy = True
+                now = time.time()
+                for name in names:
+                    if self._stop_event.is_set():
+                        break
+                    base = os.path.join(self.clip_dir, name[:-len(".json")])
+                    if self._retry_at.get(base, 0.0) > now:
+                        continue
+                    if not self._upload(session, base):
+                        healthy = False
+                        break
+            except Exception as e:
+                logger.debug("Envoi des clips impossible: %s", e)
+                healthy = False
+            backoff = self.interval if healthy else min(max(backoff, self.interval) * 2, self.backoff_max)
+            backoff *= random.uniform(0.9, 1.1)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"uploaded": self.uploaded, "discarded": self.discarded, "waiting_alert": len(self._retry_at)}
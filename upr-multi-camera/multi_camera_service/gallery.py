@@ -0,0 +1,278 @@
+"""
+Galerie locale (edge) synchronisée depuis le backend
+----------------------------------------------------
+
+Plutôt qu'un aller-retour vers le backend par visage, le service télécharge
+un instantané compact de la galerie (UPR actifs + photos criminelles) via
+``GET {UPR_API_URL}/upr/gallery-snapshot/`` et compare localement (produit
+scalaire sur vecteurs normalisés). La synchronisation est incrémentale :
+
+ - le ``watermark`` renvoyé par le serveur est repassé en ``since`` ;
+ - les entrées reçues remplacent celles de même clé, ``removed`` les retire ;
+ - si le nombre d'entrées local diffère du ``total`` serveur (suppressions
+   physiques) ou si la version d'embedding change, on repart d'un instantané
+   complet (également forcé toutes les ``full_sync_interval`` secondes).
+
+Seules les correspondances confirmées (score >= SIMILARITY_THRESHOLD) sont
+envoyées au backend, via le spool d'alertes (voir alerts.py).
+
+Format ``int8`` : vecteurs quantifiés par ligne (4x moins de mémoire et de
+transfert), score = (q · requête) * scale.
+"""
+
+import base64
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from multi_camera_service.alerts import api_headers
+
+logger = logging.getLogger("MultiCameraService.gallery")
+
+DEFAULT_PREPROCESSING = "insightface-v1"
+
+
+def local_embedding_version() -> str:
+    """Version d'embedding produite par le modèle local (même étiquette que le backend)."""
+    return os.environ.get("EMBEDDING_VERSION") or f"{os.environ.get('INSIGHTFACE_MODEL', 'buffalo_l')}:{DEFAULT_PREPROCESSING}"
+
+
+class _GalleryData:
+    """Contenu immuable de la galerie (remplacé en bloc à chaque synchronisation)."""
+
+    __slots__ = ("keys", "entries", "matrix", "scales")
+
+    def __init__(self, keys: List[str], entries: List[Dict[str, Any]], matrix: np.ndarray, scales: Optional[np.ndarray]):
+        self.keys = keys
+        self.entries = entries
+        self.matrix = matrix
+        self.scales = scales
+
+    @classmethod
+    def empty(cls, dim: int, fmt: str) -> "_GalleryData":
+        dtype = np.int8 if fmt == "int8" else np.float32
+        scales = np.zeros(0, dtype=np.float32) if fmt == "int8" else None
+        return cls([], [], np.zeros((0, dim), dtype=dtype), scales)
+
+
+class EdgeGallery:
+    """Galerie en mémoire + synchronisation périodique avec le backend."""
+
+    def __init__(
+        self,
+        api_url: str,
+        api_key: Optional[str] = None,
+        *,
+        version: Optional[str] = None,
+        fmt: str = "float32",
+        sync_interval: float = 60.0,
+        full_sync_interval: float = 3600.0,
+        timeout: float = 10.0,
+    ):
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.version = version or local_embedding_version()
+        self.fmt = fmt if fmt in ("float32", "int8") else "float32"
+        self.sync_interval = sync_interval
+        self.full_sync_interval = full_sync_interval
+        self.timeout = timeout
+
+        self._data = _GalleryData.empty(512, self.fmt)
+        self._watermark: Optional[str] = None
+        self._last_full_sync = 0.0
+        self._sync_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._session = None
+        self.last_sync_at: Optional[float] = None
+        self.last_sync_ms: Optional[float] = None
+        self.sync_errors = 0
+        self.full_syncs = 0
+        self.delta_syncs = 0
+        self.server_version: Optional[str] = None
+
+    @classmethod
+    def from_env(cls) -> Optional["EdgeGallery"]:
+        api_url = os.environ.get("UPR_API_URL", "").strip()
+        if not api_url or os.environ.get("EDGE_GALLERY", "true").lower() not in ("1", "true", "yes"):
+            return None
+        return cls(
+            api_url,
+            os.environ.get("UPR_API_KEY") or None,
+            fmt=os.environ.get("GALLERY_FORMAT", "float32"),
+            sync_interval=float(os.environ.get("GALLERY_SYNC_INTERVAL", "60")),
+            full_sync_interval=float(os.environ.get("GALLERY_FULL_SYNC_INTERVAL", "3600")),
+            timeout=float(os.environ.get("CONNECTION_TIMEOUT", "10")),
+        )
+
+    def __len__(self) -> int:
+        return len(self._data.keys)
+
+    # --- Synchronisation -----------------------------------------------------
+
+    def _get(self, params: Dict[str, str]) -> Dict[str, Any]:
+        import requests
+
+        if self._session is None:
+            self._session = requests.Session()
+        response = self._session.get(
+            f"{self.api_url}/upr/gallery-snapshot/",
+            params=params,
+            headers=api_headers(self.api_key),
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def sync(self, full: bool = False) -> bool:
+        """Synchronise la galerie ; retourne False en cas d'échec (galerie conservée)."""
+        with self._sync_lock:
+            full = full or self._watermark is None or time.time() - self._last_full_sync >= self.full_sync_interval
+            params = {"version": self.version, "format": self.fmt}
+            if not full:
+                params["since"] = self._watermark
+            started = time.perf_counter()
+            try:
+                snapshot = self._get(params)
+                consistent = self._apply(snapshot)
+                if not consistent and not full:
+                    logger.info("Galerie: %d entrée(s) locale(s) != %s côté serveur, resynchronisation complète",
+                                len(self), snapshot.get("total"))
+                    snapshot = self._get({"version": self.version, "format": self.fmt})
+                    self._apply(snapshot)
+                    full = True
+            except Exception as e:
+                self.sync_errors += 1
+                logger.warning("Synchronisation galerie impossible (%d entrée(s) conservée(s)): %s", len(self), e)
+                return False
+
+            self.last_sync_at = time.time()
+            self.last_sync_ms = round((time.perf_counter() - started) * 1000, 1)
+            if full:
+                self.full_syncs += 1
+                self._last_full_sync = self.last_sync_at
+            else:
+                self.delta_syncs += 1
+            self._check_version(snapshot)
+            return True
+
+    def _check_version(self, snapshot: Dict[str, Any]) -> None:
+        active = snapshot.get("active_version")
+        target = snapshot.get("target_version")
+        if active and active != self.server_version:
+            self.server_version = active
+            if self.version not in (active, target):
+                logger.warning(
+                    "Galerie: modèle local %s différent de la version active du backend %s "
+                    "(les embeddings ne sont pas comparables, mettre à jour INSIGHTFACE_MODEL/EMBEDDING_VERSION)",
+                    self.version,
+                    active,
+                )
+
+    def _decode(self, snapshot: Dict[str, Any]):
+        count, dim = int(snapshot.get("count", 0)), int(snapshot.get("dim", 512))
+        raw = base64.b64decode(snapshot.get("vectors", ""))
+        if snapshot.get("format") == "int8":
+            matrix = np.frombuffer(raw, dtype=np.int8).reshape(count, dim)
+            scales = np.frombuffer(base64.b64decode(snapshot.get("scales", "")), dtype="<f4").astype(np.float32)
+        else:
+            matrix = np.frombuffer(raw, dtype="<f4").astype(np.float32).reshape(count, dim)
+            scales = None
+        if snapshot.get("format", "float32") != self.fmt:
+            raise ValueError(f"Format reçu {snapshot.get('format')} != {self.fmt}")
+        return matrix, scales
+
+    def _apply(self, snapshot: Dict[str, Any]) -> bool:
+        """Applique un instantané complet ou un delta ; False si le compte diverge du serveur."""
+        if snapshot.get("version") != self.version:
+            raise ValueError(f"Version reçue {snapshot.get('version')} != {self.version}")
+        matrix, scales = self._decode(snapshot)
+        entries = snapshot.get("entries", [])
+        keys = [entry["key"] for entry in entries]
+
+        current = self._data
+        if not snapshot.get("full") and len(current.keys):
+            replaced = set(keys) | set(snapshot.get("removed", []))
+            keep = [index for index, key in enumerate(current.keys) if key not in replaced]
+            if current.matrix.shape[1] == matrix.shape[1]:
+                matrix = np.concatenate([current.matrix[keep], matrix])
+                if scales is not None:
+                    scales = np.concatenate([current.scales[keep], scales])
+                keys = [current.keys[index] for index in keep] + keys
+                entries = [current.entries[index] for index in keep] + entries
+
+        # Remplacement atomique : les comparaisons en cours gardent l'ancienne référence
+        self._data = _GalleryData(keys, entries, np.ascontiguousarray(matrix), scales)
+        self._watermark = snapshot.get("watermark")
+        total = snapshot.get("total")
+        return total is None or int(total) == len(keys)
+
+    def start(self) -> "EdgeGallery":
+        """Synchronisation initiale (bloquante) puis thread périodique."""
+        self.sync(full=True)
+        if self.sync_interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._sync_loop, name="gallery-sync", daemon=True)
+            self._thread.start()
+        logger.info("Galerie locale: %d entrée(s), version %s, format %s", len(self), self.version, self.fmt)
+        return self
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+
+    def _sync_loop(self) -> None:
+        while not self._stop_event.wait(self.sync_interval):
+            self.sync()
+
+    # --- Comparaison ---------------------------------------------------------
+
+    def match(self, embedding, top_k: int = 3) -> List[Dict[str, Any]]:
+        """Meilleures correspondances (score cosinus décroissant) pour un embedding."""
+        data = self._data
+        if not data.keys or embedding is None:
+            return []
+        query = np.asarray(embedding, dtype=np.float32).ravel()
+        if query.shape[0] != data.matrix.shape[1]:
+            return []
+        norm = float(np.linalg.norm(query))
+        if norm <= 0:
+            return []
+        query = query / norm
+
+        if data.scales is not None:
+            scores = (data.matrix @ query) * data.scales
+        else:
+            scores = data.matrix @ query
+        top_k = min(top_k, len(scores))
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        best = best[np.argsort(-scores[best])]
+
+        matches = []
+        for index in best:
+            score = float(scores[index])
+            match = dict(data.entries[index])
+            match["score"] = score
+            match["distance"] = 1.0 - score
+            matches.append(match)
+        return matches
+
+    def stats(self) -> Dict[str, Any]:
+        data = self._data
+        return {
+            "entries": len(data.keys),
+            "version": self.version,
+            "server_version": self.server_version,
+            "format": self.fmt,
+            "memory_kb": round((data.matrix.nbytes + (data.scales.nbytes if data.scales is not None else 0)) / 1024, 1),
+            "last_sync_age_s": round(time.time() - self.last_sync_at, 1) if self.last_sync_at else None,
+            "last_sync_ms": self.last_sync_ms,
+            "full_syncs": self.full_syncs,
+            "delta_syncs": self.delta_syncs,
+            "sync_errors": self.sync_errors,
+        }
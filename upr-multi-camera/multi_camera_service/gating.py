@@ -0,0 +1,183 @@
+"""
+Pré-filtre mouvement / zones d'intérêt avant la détection faciale
+-----------------------------------------------------------------
+
+La plupart des frames d'une caméra fixe sont identiques à la précédente. Le
+filtre compare une version réduite en niveaux de gris de la frame (différence
+avec la frame précédente, ou soustraction de fond MOG2) et ne laisse passer
+la détection que si la zone en mouvement, restreinte aux polygones d'intérêt
+de la caméra, dépasse un seuil.
+
+Pour ne pas perdre une personne immobile, la détection continue tant que des
+pistes sont actives et pendant ``hold_seconds`` après le dernier mouvement.
+
+Configuration (variables d'environnement, JSON par caméra) :
+    CAMERAS_ROI='{"ip_0": [[[0.1, 0.2], [0.9, 0.2], [0.9, 1.0], [0.1, 1.0]]]}'
+    CAMERAS_MOTION='{"ip_0": {"method": "mog2", "min_area_ratio": 0.01}}'
+Coordonnées des polygones normalisées (0-1), indépendantes de la résolution.
+"""
+
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("MultiCameraService.gating")
+
+METHOD_DIFF = "diff"
+METHOD_MOG2 = "mog2"
+
+
+class MotionGate:
+    """Décide, frame par frame, si la détection doit tourner pour une caméra."""
+
+    def __init__(
+        self,
+        *,
+        method: str = METHOD_DIFF,
+        width: int = 160,
+        pixel_threshold: int = 25,
+        min_area_ratio: float = 0.002,
+        hold_seconds: float = 2.0,
+        refresh_seconds: float = 0.0,
+        roi: Optional[Sequence[Sequence[Sequence[float]]]] = None,
+    ):
+        self.method = method if method in (METHOD_DIFF, METHOD_MOG2) else METHOD_DIFF
+        self.width = max(32, int(width))
+        self.pixel_threshold = pixel_threshold
+        self.min_area_ratio = min_area_ratio
+        self.hold_seconds = hold_seconds
+        self.refresh_seconds = refresh_seconds
+        self.roi = [np.array(polygon, dtype=np.float32) for polygon in (roi or []) if len(polygon) >= 3]
+
+        self._previous = None
+        self._mask = None
+        self._mask_area = 0
+        self._size = None
+        self._subtractor = None
+        self._last_motion = 0.0
+        self._last_pass = 0.0
+        self.last_ratio = 0.0
+        self.checked = 0
+        self.passed = 0
+
+    def _prepare(self, frame):
+        height, width = frame.shape[:2]
+        if self._size is None:
+            scaled_height = max(1, int(round(height * self.width / float(width))))
+            self._size = (self.width, scaled_height)
+            if self.roi:
+                mask = np.zeros((scaled_height, self.width), dtype=np.uint8)
+                scale = np.array([self.width, scaled_height], dtype=np.float32)
+                cv2.fillPoly(mask, [(polygon * scale).astype(np.int32) for polygon in self.roi], 255)
+                self._mask = mask
+                self._mask_area = max(1, int(cv2.countNonZero(mask)))
+            if self.method == METHOD_MOG2:
+                self._subtractor = cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=16, detectShadows=True)
+        small = cv2.resize(frame, self._size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def motion_ratio(self, frame) -> float:
+        """Part (0-1) de la zone d'intérêt en mouvement."""
+        gray = self._prepare(frame)
+        if self._subtractor is not None:
+            foreground = self._subtractor.apply(gray)
+            # 127 = ombres détectées par MOG2 : ignorées
+            _, foreground = cv2.threshold(foreground, 200, 255, cv2.THRESH_BINARY)
+        else:
+            if self._previous is None:
+                self._previous = gray
+                return 1.0
+            diff = cv2.absdiff(gray, self._previous)
+            self._previous = gray
+            _, foreground = cv2.threshold(diff, self.pixel_threshold, 255, cv2.THRESH_BINARY)
+
+        if self._mask is not None:
+            foreground = cv2.bitwise_and(foreground, self._mask)
+            area = self._mask_area
+        else:
+            area = foreground.shape[0] * foreground.shape[1]
+        return cv2.countNonZero(foreground) / float(max(area, 1))
+
+    def should_detect(self, frame, now: float, active_tracks: int = 0) -> bool:
+        self.checked += 1
+        self.last_ratio = self.motion_ratio(frame)
+        if self.last_ratio >= self.min_area_ratio:
+            self._last_motion = now
+
+        run = (
+            active_tracks > 0
+            or now - self._last_motion <= self.hold_seconds
+            or (self.refresh_seconds and now - self._last_pass >= self.refresh_seconds)
+        )
+        if run:
+            self._last_pass = now
+            self.passed += 1
+        return bool(run)
+
+    def in_roi(self, bbox: Sequence[float], frame_shape) -> bool:
+        """Le centre de la boîte est-il dans une zone d'intérêt ?"""
+        if not self.roi:
+            return True
+        height, width = frame_shape[:2]
+        center = ((bbox[0] + bbox[2]) / 2.0 / width, (bbox[1] + bbox[3]) / 2.0 / height)
+        return any(cv2.pointPolygonTest(polygon, center, False) >= 0 for polygon in self.roi)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "roi_polygons": len(self.roi),
+            "frames_checked": self.checked,
+            "detection_ratio": round(self.passed / self.checked, 3) if self.checked else None,
+            "last_motion_ratio": round(self.last_ratio, 4),
+        }
+
+
+def _json_env(name: str) -> Dict[str, Any]:
+    raw = os.environ.get(name, "").strip()
+    if not raw:
+        return {}
+    try:
+        value = json.loads(raw)
+        return value if isinstance(value, dict) else {}
+    except ValueError as e:
+        logger.warning("%s: JSON invalide ignoré (%s)", name, e)
+        return {}
+
+
+class MotionGateFactory:
+    """Crée le filtre de chaque caméra depuis l'environnement."""
+
+    def __init__(self, defaults: Optional[Dict[str, Any]] = None, per_camera: Optional[Dict[str, Dict[str, Any]]] = None,
+                 rois: Optional[Dict[str, List]] = None):
+        self.defaults = defaults or {}
+        self.per_camera = per_camera or {}
+        self.rois = rois or {}
+
+    @classmethod
+    def from_env(cls) -> Optional["MotionGateFactory"]:
+        if os.environ.get("MOTION_GATING", "true").lower() not in ("1", "true", "yes"):
+            return None
+        defaults = {
+            "method": os.environ.get("MOTION_METHOD", METHOD_DIFF),
+            "width": int(os.environ.get("MOTION_WIDTH", "160")),
+            "pixel_threshold": int(os.environ.get("MOTION_PIXEL_THRESHOLD", "25")),
+            "min_area_ratio": float(os.environ.get("MOTION_MIN_AREA", "0.002")),
+            "hold_seconds": float(os.environ.get("MOTION_HOLD_SECONDS", "2.0")),
+            "refresh_seconds": float(os.environ.get("MOTION_REFRESH_SECONDS", "0")),
+        }
+        return cls(defaults, _json_env("CAMERAS_MOTION"), _json_env("CAMERAS_ROI"))
+
+    def __call__(self, camera_id: str) -> MotionGate:
+        overrides = self.per_camera.get(camera_id, {})
+        unknown = set(overrides) - set(self.defaults)
+        if unknown:
+            logger.warning("CAMERAS_MOTION[%s]: options inconnues ignorées %s", camera_id, sorted(unknown))
+        options = {**self.defaults, **{k: v for k, v in overrides.items() if k in self.defaults}}
+        if camera_id in self.rois:
+            options["roi"] = self.rois[camera_id]
+        return MotionGate(**options)
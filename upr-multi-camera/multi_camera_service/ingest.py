@@ -0,0 +1,240 @@
+"""
+Ingestion « dernière frame » pour flux RTSP / USB / fichiers vidéo
+-----------------------------------------------------------------
+
+``cv2.VideoCapture.read()`` renvoie les frames dans l'ordre du tampon : si
+l'inférence est plus lente que le flux, le retard s'accumule sans limite.
+``LatestFrameReader`` lit en continu sur son propre thread avec ``grab()``
+(démultiplexage/décodage sans conversion) et ne fait ``retrieve()`` que
+lorsque une frame est due : seule la plus récente est conservée, son âge
+est donc borné par l'intervalle de lecture.
+
+Perte de flux : reconnexion avec backoff exponentiel (RETRY_BACKOFF,
+plafonné à ``backoff_max``) ; MAX_RETRIES échecs consécutifs arrêtent le
+lecteur (0 = réessayer indéfiniment).
+
+Test local : ``scripts/simulate_rtsp.sh`` ou un fichier vidéo, lu au rythme
+de son FPS natif et rebouclé en fin de fichier.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple, Union
+
+import cv2
+
+from multi_camera_service.metrics import METRICS
+
+logger = logging.getLogger("MultiCameraService.ingest")
+
+
+def _is_live(uri: Union[int, str]) -> bool:
+    if isinstance(uri, int):
+        return True
+    return uri.isdigit() or "://" in uri
+
+
+class LatestFrameReader:
+    """Lit une source en continu et expose uniquement la frame la plus récente."""
+
+    def __init__(
+        self,
+        uri: Union[int, str],
+        camera_id: Optional[str] = None,
+        *,
+        target_fps: float = 0.0,
+        capture: Optional[cv2.VideoCapture] = None,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        max_retries: int = 0,
+        max_read_errors: int = 25,
+    ):
+        self.uri = int(uri) if isinstance(uri, str) and uri.isdigit() else uri
+        self.camera_id = camera_id or str(uri)
+        self.min_interval = 1.0 / target_fps if target_fps > 0 else 0.0
+        self.backoff_initial = max(0.1, backoff_initial)
+        self.backoff_max = max(self.backoff_initial, backoff_max)
+        self.max_retries = max_retries
+        self.max_read_errors = max_read_errors
+
+        self._cap = capture
+        self._live = _is_live(self.uri)
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_ts: Optional[float] = None
+        self._seq = 0
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.connected = capture is not None and capture.isOpened()
+        self.failed = False
+        self.grabbed = 0
+        self.retrieved = 0
+        self.reconnects = 0
+        self.last_error: Optional[str] = None
+
+    # Cycle de vie
+
+    def start(self) -> "LatestFrameReader":
+        if self._thread is None or not self._thread.is_alive():
+            self._stop_event.clear()
+            self._thread = threading.Thread(target=self._run, name=f"ingest-{self.camera_id}", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 2.0) -> None:
+        self._stop_event.set()
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            if self._thread.is_alive():
+                # Encore bloqué dans grab()/retrieve() : libérer la capture depuis ce
+                # thread peut planter le code natif, le thread la libère en sortant
+                logger.warning("Ingestion %s: arrêt en cours, capture libérée par le thread de lecture", self.camera_id)
+                return
+        self._release()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    # Consommation
+
+    def read(self, timeout: float = 1.0, last_seq: int = 0) -> Tuple[Any, Optional[float], int]:
+        """Attend une frame plus récente que ``last_seq``.
+
+        Retourne (frame, horodatage de capture, seq), ou (None, None, last_seq)
+        au timeout / à l'arrêt.
+        """
+        deadline = time.time() + timeout
+        with self._cond:
+            while self._seq <= last_seq and not self._stop_event.is_set() and not self.failed:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None, None, last_seq
+                self._cond.wait(remaining)
+            if self._seq <= last_seq:
+                return None, None, last_seq
+            return self._frame, self._frame_ts, self._seq
+
+    def frame_age(self) -> Optional[float]:
+        return time.time() - self._frame_ts if self._frame_ts else None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "connected": self.connected,
+            "failed": self.failed,
+            "grabbed": self.grabbed,
+            "retrieved": self.retrieved,
+            "reconnects": self.reconnects,
+            "frame_age_s": round(self.frame_age(), 3) if self._frame_ts else None,
+            "last_error": self.last_error,
+        }
+
+    # Thread de lecture
+
+    def _open(self) -> bool:
+        cap = cv2.VideoCapture(self.uri)
+        if not cap.isOpened():
+            cap.release()
+            self.last_error = "ouverture impossible"
+            return False
+        try:
+            # Tampon minimal côté pilote/FFmpeg quand le backend le permet
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        except Exception:
+            pass
+        self._cap = cap
+        if not self._live:
+            fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+            self._file_interval = 1.0 / fps if fps > 0 else 0.04
+        return True
+
+    def _release(self) -> None:
+        if self._cap is not None:
+            try:
+                self._cap.release()
+            except Exception:
+                pass
+        self._cap = None
+        self.connected = False
+
+    def _reconnect(self) -> bool:
+        """Rouvre la source avec backoff exponentiel. False si abandon."""
+        self._release()
+        attempt = 0
+        delay = self.backoff_initial
+        while not self._stop_event.is_set():
+            if self._open():
+                if attempt or self.reconnects:
+                    logger.info("Caméra %s reconnectée après %d tentative(s)", self.camera_id, attempt + 1)
+                self.connected = True
+                return True
+            attempt += 1
+            if self.max_retries and attempt >= self.max_retries:
+                logger.error("Caméra %s: abandon après %d tentative(s) de reconnexion", self.camera_id, attempt)
+                self.failed = True
+                with self._cond:
+                    self._cond.notify_all()
+                return False
+            wait = min(delay, self.backoff_max) * random.uniform(0.8, 1.2)
+            logger.warning(
+                "Caméra %s indisponible (%s), nouvelle tentative dans %.1fs",
+                self.camera_id,
+                self.last_error,
+                wait,
+            )
+            self._stop_event.wait(wait)
+            delay = min(delay * 2, self.backoff_max)
+        return False
+
+    def _run(self) -> None:
+        self._file_interval = 0.0
+        if self._cap is None or not self._cap.isOpened():
+            if not self._reconnect():
+                return
+        else:
+            self.connected = True
+
+        next_retrieve = 0.0
+        read_errors = 0
+        while not self._stop_event.is_set():
+            if not self._cap.grab():
+                read_errors += 1
+                if not self._live or read_errors >= self.max_read_errors:
+                    # Fin de fichier (rebouclage) ou flux perdu
+                    self.last_error = "fin de flux" if not self._live else "lecture impossible"
+                    self.reconnects += 1
+                    if not self._reconnect():
+                        break
+                    read_errors = 0
+                else:
+                    self._stop_event.wait(0.02)
+                continue
+
+            read_errors = 0
+            grabbed_at = time.time()
+            self.grabbed += 1
+
+            if grabbed_at >= next_retrieve:
+                started = time.perf_counter()
+                ok, frame = self._cap.retrieve()
+                METRICS.observe(self.camera_id, "decode", (time.perf_counter() - started) * 1000)
+                if ok and frame is not None:
+                    self.retrieved += 1
+                    next_retrieve = grabbed_at + self.min_interval
+                    with self._cond:
+                        self._frame = frame
+                        self._frame_ts = grabbed_at
+                        self._seq += 1
+                        self._cond.notify_all()
+
+            if self._file_interval:
+                # Fichier : simuler le temps réel, sinon il serait lu d'un trait
+                self._stop_event.wait(self._file_interval)
+
+        self._release()
+        logger.info("Ingestion %s arrêtée", self.camera_id)
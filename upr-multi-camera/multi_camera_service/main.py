@@ -15,18 +15,50 @@ Fonctionnalités :
 
 Notes :
  - Utilise OpenCV pour l'acquisition vidéo.
+ - Mode service (--headless ou CAMERAS_IPS défini) : toutes les caméras
+   configurées sont capturées en parallèle et analysées par un pool partagé
+   (voir multi_camera_service/pipeline.py).
+ - Les visages sont suivis (multi_camera_service/tracking.py) : détection à
+   chaque frame, reconnaissance ArcFace à la naissance de la piste et aux pics
+   de qualité seulement.
  - Si insightface est installé, essaie d'utiliser FaceAnalysis d'insightface (optionnel).
  - Si insightface absent, utilise un détecteur Haar cascade pour démo.
+ - Un filtre mouvement / zones d'intérêt (multi_camera_service/gating.py)
+   saute la détection sur les frames sans changement (MOTION_GATING).
+ - Identification locale sur un instantané de la galerie synchronisé depuis
+   le backend (multi_camera_service/gallery.py) ; seules les correspondances
+   confirmées sont envoyées au backend.
+ - Chaque alerte est accompagnée d'un court clip (secondes avant / après)
+   tiré d'un anneau de frames JPEG en mémoire (multi_camera_service/clips.py).
 
 Usage :
     python -m multi_camera_service.main
 """
 
+import math
+import os
+import sys
+
 import cv2
 import logging
+import numpy as np
 import threading
 import time
-from typing import List, Dict, Optional, Callable
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, List, Dict, Optional, Callable, Tuple
+
+if __package__ in (None, ""):
+    # Lancement direct (python multi_camera_service/main.py) : rendre le paquet importable
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from multi_camera_service.alerts import AlertSender
+from multi_camera_service.clips import ClipRecorder, ClipUploader
+from multi_camera_service.gallery import EdgeGallery
+from multi_camera_service.gating import MotionGateFactory
+from multi_camera_service.ingest import LatestFrameReader
+from multi_camera_service.metrics import METRICS, MetricsReporter, start_metrics_server
+from multi_camera_service.pipeline import CameraSource, MultiCameraPipeline
+from multi_camera_service.tracking import RecognitionPolicy, TrackingAnalyzer
 
 # Logging professionnel
 logger = logging.getLogger("MultiCameraService")
@@ -38,16 +70,90 @@ logger.addHandler(ch)
 
 # Try to import insightface if available
 FaceAnalysis = None
+Face = None
 INSIGHTFACE_AVAILABLE = False
 
 try:
-    from insightface import FaceAnalysis as _FaceAnalysis
+    # FaceAnalysis est exposé par insightface.app (pas au niveau du paquet)
+    from insightface.app import FaceAnalysis as _FaceAnalysis
+    from insightface.app.common import Face
     FaceAnalysis = _FaceAnalysis
     INSIGHTFACE_AVAILABLE = True
     logger.info("InsightFace détecté — mode reconnaissance activé")
 except Exception:
     logger.info("InsightFace non installé — mode fallback activé")
 
+try:
+    import onnxruntime as ort
+except Exception:
+    ort = None
+
+
+_haar_local = threading.local()
+
+
+def _get_haar_cascade():
+    """Cascade Haar chargée une fois par thread (detectMultiScale n'est pas thread-safe)."""
+    cascade = getattr(_haar_local, "cascade", None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+        _haar_local.cascade = cascade
+    return cascade
+
+
+def _session_options(intra: int):
+    """SessionOptions du service : `intra` threads par session, exécution séquentielle."""
+    options = ort.SessionOptions()
+    options.intra_op_num_threads = intra
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.add_session_config_entry("session.intra_op.allow_spinning", "0")
+    return options
+
+
+def _onnx_thread_budget() -> Tuple[int, int]:
+    """Retourne (threads intra-op par session, cœurs alloués au service).
+
+    Même découpage que le backend (biometrie/onnx_threads.py) : le service
+    dispose de ONNX_CAMERA_SHARE (0.25) des ONNX_CPU_BUDGET cœurs (défaut :
+    cœurs disponibles). ONNX_INTRA_OP_THREADS (0 = dérivé : la moitié des
+    cœurs du service) fixe les threads par session ; les workers d'inférence
+    se partagent le reste, si bien que workers × threads ≈ cœurs du service.
+    """
+    budget = int(os.environ.get("ONNX_CPU_BUDGET", "0") or 0)
+    if budget <= 0:
+        try:
+            budget = len(os.sched_getaffinity(0))
+        except (AttributeError, OSError):  # non Linux
+            budget = os.cpu_count() or 1
+    cores = max(1, math.floor(budget * float(os.environ.get("ONNX_CAMERA_SHARE", "0.25"))))
+    intra = int(os.environ.get("ONNX_INTRA_OP_THREADS", "0") or 0)
+    if intra <= 0:
+        intra = max(1, cores // 2)
+    return intra, cores
+
+
+def _apply_onnx_thread_budget(face_analyzer) -> None:
+    """Rouvre les sessions ONNX avec le nombre de threads alloué au service.
+
+    insightface ne transmet pas de SessionOptions : sans cela chaque modèle
+    prend un thread par cœur et concurrence le backend sur le même hôte.
+    Réglages : voir _onnx_thread_budget.
+    """
+    if ort is None:
+        return
+
+    intra, _ = _onnx_thread_budget()
+
+    options = _session_options(intra)
+    for model in getattr(face_analyzer, "models", {}).values():
+        model_file = getattr(model, "model_file", None)
+        if model_file and hasattr(model, "session"):
+            model.session = ort.InferenceSession(
+                model_file, sess_options=options, providers=['CPUExecutionProvider']
+            )
+    logger.info("Sessions ONNX limitées à %d thread(s) intra-op", intra)
+
 
 class MultiCameraService:
     def __init__(self, max_test_devices: int = 10):
@@ -64,14 +170,24 @@ class MultiCameraService:
         self._running = False
         self._thread: Optional[threading.Thread] = None
         self._face_analyzer = None
+        self._pipeline: Optional[MultiCameraPipeline] = None
+        self._tracking: Optional[TrackingAnalyzer] = None
+        self._gallery: Optional[EdgeGallery] = None
+        self._alerts: Optional[AlertSender] = None
+        self._clips: Optional[ClipRecorder] = None
+        self._clip_uploader: Optional[ClipUploader] = None
+        self._gallery_started = False
+        self._similarity_threshold = float(os.environ.get("SIMILARITY_THRESHOLD", "0.55"))
+        self._warn_threshold = float(os.environ.get("WARN_THRESHOLD", "0.45"))
+        self._top_k = int(os.environ.get("TOP_K_MATCHES", "3"))
 
         # Initialize face analyzer lazily
         if INSIGHTFACE_AVAILABLE and FaceAnalysis is not None:
             try:
-                import os
                 os.environ["ORT_LOG_SEVERITY_LEVEL"] = "4"
                 # Force CPU uniquement pour éviter les avertissements CUDA
                 self._face_analyzer = FaceAnalysis(name="buffalo_l", providers=['CPUExecutionProvider'])
+                _apply_onnx_thread_budget(self._face_analyzer)
                 # configure minimal settings, CPU by default
                 self._face_analyzer.prepare(ctx_id=-1, det_size=(640, 640))
                 logger.info("FaceAnalysis (insightface) initialisé")
@@ -79,128 +195,69 @@ class MultiCameraService:
                 logger.exception("Impossible d'initialiser FaceAnalysis: %s", e)
                 self._face_analyzer = None
 
+        if self._face_analyzer is not None:
+            self._gallery = EdgeGallery.from_env()
+            try:
+                self._alerts = AlertSender.from_env() if self._gallery is not None else None
+            except Exception as e:
+                logger.error("Spool d'alertes indisponible, alertes désactivées: %s", e)
+            if self._alerts is not None:
+                try:
+                    self._clips = ClipRecorder.from_env()
+                    self._clip_uploader = ClipUploader.from_env(self._clips)
+                except OSError as e:
+                    logger.error("Répertoire des clips indisponible, clips désactivés: %s", e)
+
+        self._tracking = TrackingAnalyzer(
+            self.detect_faces,
+            self.embed_face if self._face_analyzer else None,
+            self.identify_track if self._gallery is not None else None,
+            policy=RecognitionPolicy(
+                peak_margin=float(os.environ.get("TRACK_PEAK_MARGIN", "0.15")),
+                min_interval=float(os.environ.get("TRACK_MIN_RECOGNITION_INTERVAL", "0.5")),
+                max_per_track=int(os.environ.get("TRACK_MAX_RECOGNITIONS", "5")),
+            ),
+            tracker_options={
+                "iou_threshold": float(os.environ.get("TRACK_IOU_THRESHOLD", "0.3")),
+                "max_age": float(os.environ.get("TRACK_MAX_AGE", "1.5")),
+            },
+            gate_factory=MotionGateFactory.from_env(),
+        )
+
     def list_cameras(self) -> List[Dict]:
-        """Scanne les devices de 0..max_test_devices et retourne la liste des devices ouverts"""
-        devices = []
-        import platform
-        
+        """Scanne les devices de 0..max_test_devices et retourne la liste des devices ouverts.
+
+        Les devices sont testés en parallèle (SCAN_WORKERS threads) : un scan
+        dure environ le temps du test le plus lent, borné par SCAN_TIMEOUT
+        secondes ; un device qui ne répond pas dans ce délai est ignoré.
+        """
         logger.info("Scan des caméras (0 à %d)...", self.max_test_devices - 1)
-        
-        for i in range(self.max_test_devices):
-            cap = None
-            device_info = {
-                "id": i,
-                "name": f"VideoDevice_{i}",
-                "width": None,
-                "height": None,
-                "status": "unavailable",
-                "backend": None,
-                "error": None
-            }
-            
-            # Essayer différents backends selon l'OS
-            backends_to_try = []
-            if platform.system() == 'Windows':
-                # Sur Windows, essayer DirectShow en premier (meilleur pour caméras externes)
-                backends_to_try = [
-                    (cv2.CAP_DSHOW, 'DirectShow'),
-                    (cv2.CAP_MSMF, 'Media Foundation'),
-                    (cv2.CAP_ANY, 'Any'),
-                ]
+        timeout = float(os.environ.get("SCAN_TIMEOUT", "5"))
+        workers = max(1, min(self.max_test_devices, int(os.environ.get("SCAN_WORKERS", "8"))))
+
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="camera-scan")
+        futures = {executor.submit(self._probe_device, i): i for i in range(self.max_test_devices)}
+        done, pending = wait(futures, timeout=timeout)
+        # Les tests bloqués se terminent en arrière-plan, leur résultat est ignoré ;
+        # ceux encore en file sont annulés (ils ouvriraient les devices après le scan)
+        executor.shutdown(wait=False, cancel_futures=True)
+        for future in pending:
+            if future.cancelled():
+                logger.warning("Caméra %d: non testée avant la fin du scan (%.1fs), ignorée", futures[future], timeout)
             else:
-                # Sur Linux/Mac
-                backends_to_try = [
-                    (cv2.CAP_V4L2, 'V4L2'),
-                    (cv2.CAP_ANY, 'Any'),
-                ]
-            
-            camera_found = False
-            for backend_id, backend_name in backends_to_try:
-                try:
-                    logger.debug("  Test caméra %d avec backend %s...", i, backend_name)
-                    
-                    if hasattr(cv2, 'CAP_DSHOW') and backend_id == cv2.CAP_DSHOW:
-                        cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
-                    elif hasattr(cv2, 'CAP_MSMF') and backend_id == cv2.CAP_MSMF:
-                        cap = cv2.VideoCapture(i, cv2.CAP_MSMF)
-                    else:
-                        cap = cv2.VideoCapture(i, backend_id)
-                    
-                    if cap is None:
-                        logger.debug("    VideoCapture retourne None")
-                        continue
-                    
-                    if not cap.isOpened():
-                        logger.debug("    Caméra %d non ouverte avec %s", i, backend_name)
-                        if cap:
-                            cap.release()
-                        cap = None
-                        continue
-                    
-                    # Attendre un peu pour que la caméra s'initialise (important pour USB)
-                    time.sleep(0.3)
-                    
-                    # Tester la lecture d'une frame (plusieurs tentatives)
-                    ret = False
-                    frame = None
-                    for attempt in range(5):  # Augmenté à 5 tentatives
-                        ret, frame = cap.read()
-                        if ret and frame is not None and frame.size > 0:
-                            break
-                        time.sleep(0.2)  # Délai plus long entre les tentatives
-                    
-                    if ret and frame is not None and frame.size > 0:
-                        height, width = frame.shape[0], frame.shape[1]
-                        
-                        # Tester une deuxième frame pour confirmer
-                        ret2, frame2 = cap.read()
-                        if ret2 and frame2 is not None:
-                            device_info.update({
-                                "name": f"Caméra {i} ({backend_name})",
-                                "width": width,
-                                "height": height,
-                                "status": "available",
-                                "backend": backend_name
-                            })
-                            devices.append(device_info)
-                            logger.info("[OK] Caméra %d détectée: %s (%dx%d) via %s", 
-                                      i, device_info['name'], width, height, backend_name)
-                            camera_found = True
-                            break  # Succès, ne pas essayer d'autres backends
-                        else:
-                            logger.debug("    Caméra %d: première frame OK mais deuxième échoue", i)
-                    else:
-                        logger.debug("    Caméra %d: impossible de lire une frame valide", i)
-                    
-                    if cap:
-                        cap.release()
-                    cap = None
-                    
-                except cv2.error as e:
-                    logger.debug("    Erreur OpenCV caméra %d avec backend %s: %s", i, backend_name, e)
-                    if cap:
-                        try:
-                            cap.release()
-                        except Exception:
-                            pass
-                    cap = None
-                    device_info['error'] = str(e)
-                except Exception as e:
-                    logger.debug("    Erreur test caméra %d avec backend %s: %s", i, backend_name, e)
-                    if cap:
-                        try:
-                            cap.release()
-                        except Exception:
-                            pass
-                    cap = None
-                    device_info['error'] = str(e)
-            
-            if not camera_found:
-                logger.debug("  Caméra %d non détectée", i)
-            
-            # Délai plus long entre les tests pour éviter les conflits (important pour USB)
-            time.sleep(0.3)
-        
+                logger.warning("Caméra %d: pas de réponse en %.1fs, ignorée", futures[future], timeout)
+
+        devices = []
+        for future in done:
+            try:
+                device_info = future.result()
+            except Exception as e:
+                logger.debug("  Caméra %d: erreur de test: %s", futures[future], e)
+                continue
+            if device_info is not None:
+                devices.append(device_info)
+        devices.sort(key=lambda device: device["id"])
+
         logger.info("Scan terminé: %d caméra(s) détectée(s) sur %d testées", len(devices), self.max_test_devices)
         if devices:
             logger.info("   Caméras trouvées: %s", [f"ID {d['id']} ({d['name']})" for d in devices])
@@ -213,6 +270,120 @@ class MultiCameraService:
         
         return devices
 
+    def _probe_device(self, i: int) -> Optional[Dict]:
+        """Teste le device ``i`` avec les backends de l'OS ; None s'il est indisponible."""
+        import platform
+
+        cap = None
+        device_info = {
+            "id": i,
+            "name": f"VideoDevice_{i}",
+            "width": None,
+            "height": None,
+            "status": "unavailable",
+            "backend": None,
+            "error": None
+        }
+        
+        # Essayer différents backends selon l'OS
+        backends_to_try = []
+        if platform.system() == 'Windows':
+            # Sur Windows, essayer DirectShow en premier (meilleur pour caméras externes)
+            backends_to_try = [
+                (cv2.CAP_DSHOW, 'DirectShow'),
+                (cv2.CAP_MSMF, 'Media Foundation'),
+                (cv2.CAP_ANY, 'Any'),
+            ]
+        else:
+            # Sur Linux/Mac
+            backends_to_try = [
+                (cv2.CAP_V4L2, 'V4L2'),
+                (cv2.CAP_ANY, 'Any'),
+            ]
+        
+        for backend_id, backend_name in backends_to_try:
+            try:
+                logger.debug("  Test caméra %d avec backend %s...", i, backend_name)
+                
+                if hasattr(cv2, 'CAP_DSHOW') and backend_id == cv2.CAP_DSHOW:
+                    cap = cv2.VideoCapture(i, cv2.CAP_DSHOW)
+                elif hasattr(cv2, 'CAP_MSMF') and backend_id == cv2.CAP_MSMF:
+                    cap = cv2.VideoCapture(i, cv2.CAP_MSMF)
+                else:
+                    cap = cv2.VideoCapture(i, backend_id)
+                
+                if cap is None:
+                    logger.debug("    VideoCapture retourne None")
+                    continue
+                
+                if not cap.isOpened():
+                    logger.debug("    Caméra %d non ouverte avec %s", i, backend_name)
+                    if cap:
+                        cap.release()
+                    cap = None
+                    continue
+                
+                # Attendre un peu pour que la caméra s'initialise (important pour USB)
+                time.sleep(0.3)
+                
+                # Tester la lecture d'une frame (plusieurs tentatives)
+                ret = False
+                frame = None
+                for attempt in range(5):  # Augmenté à 5 tentatives
+                    ret, frame = cap.read()
+                    if ret and frame is not None and frame.size > 0:
+                        break
+                    time.sleep(0.2)  # Délai plus long entre les tentatives
+                
+                if ret and frame is not None and frame.size > 0:
+                    height, width = frame.shape[0], frame.shape[1]
+                    
+                    # Tester une deuxième frame pour confirmer
+                    ret2, frame2 = cap.read()
+                    if ret2 and frame2 is not None:
+                        device_info.update({
+                            "name": f"Caméra {i} ({backend_name})",
+                            "width": width,
+                            "height": height,
+                            "status": "available",
+                            "backend": backend_name
+                        })
+                        logger.info("[OK] Caméra %d détectée: %s (%dx%d) via %s", 
+                                  i, device_info['name'], width, height, backend_name)
+                        # Libérée pour que select_camera / le pipeline puissent la rouvrir
+                        cap.release()
+                        return device_info  # Succès, ne pas essayer d'autres backends
+                    else:
+                        logger.debug("    Caméra %d: première frame OK mais deuxième échoue", i)
+                else:
+                    logger.debug("    Caméra %d: impossible de lire une frame valide", i)
+                
+                if cap:
+                    cap.release()
+                cap = None
+                
+            except cv2.error as e:
+                logger.debug("    Erreur OpenCV caméra %d avec backend %s: %s", i, backend_name, e)
+                if cap:
+                    try:
+                        cap.release()
+                    except Exception:
+                        pass
+                cap = None
+                device_info['error'] = str(e)
+            except Exception as e:
+                logger.debug("    Erreur test caméra %d avec backend %s: %s", i, backend_name, e)
+                if cap:
+                    try:
+                        cap.release()
+                    except Exception:
+                        pass
+                cap = None
+                device_info['error'] = str(e)
+        
+        logger.debug("  Caméra %d non détectée", i)
+        return None
+
     def select_camera(self, camera_id: int) -> bool:
         """Ouvre et réserve une caméra. Si une caméra est déjà ouverte, la libère d'abord."""
         if self._cap is not None:
@@ -331,73 +502,145 @@ class MultiCameraService:
         logger.info("   6. Exécuter: python scripts/test_camera_a03.py pour diagnostiquer")
         return False
 
+    def detect_faces(self, frame) -> List[Dict[str, Any]]:
+        """Détection seule (sans reconnaissance) : [ {bbox, score, kps} ]."""
+        faces = []
+        try:
+            if self._face_analyzer:
+                bboxes, kpss = self._face_analyzer.det_model.detect(frame, max_num=0, metric='default')
+                for index in range(bboxes.shape[0]):
+                    faces.append({
+                        'bbox': [int(x) for x in bboxes[index, 0:4].tolist()],
+                        'score': float(bboxes[index, 4]),
+                        'kps': kpss[index] if kpss is not None else None,
+                    })
+            else:
+                gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+                rects = _get_haar_cascade().detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
+                for (x, y, w, h) in rects:
+                    faces.append({
+                        'bbox': [int(x), int(y), int(x + w), int(y + h)],
+                        'score': 1.0,
+                        'kps': None,
+                    })
+        except Exception as e:
+            logger.exception("Erreur dans la détection faciale: %s", e)
+        return faces
+
+    def embed_face(self, frame, face: Dict[str, Any]) -> Optional[List[float]]:
+        """Embedding ArcFace d'un visage détecté (alignement sur ses 5 points)."""
+        recognition = self._face_analyzer.models.get('recognition') if self._face_analyzer else None
+        if recognition is None or face.get('kps') is None:
+            return None
+        try:
+            insight_face = Face(bbox=np.array(face['bbox'], dtype=np.float32), kps=face['kps'], det_score=face['score'])
+            recognition.get(frame, insight_face)
+            return insight_face.normed_embedding.tolist()
+        except Exception as e:
+            logger.exception("Erreur dans la reconnaissance faciale: %s", e)
+            return None
+
+    def analyze_tracked(self, camera_id: str, frame, captured_at: Optional[float] = None) -> Dict[str, Any]:
+        """Détection + suivi ; l'embedding n'est présent que pour les visages reconnus sur cette frame."""
+        if self._alerts is not None:
+            self._alerts.record_frames(camera_id)
+        return self._tracking.analyze(camera_id, frame, captured_at)
+
+    def identify_track(self, track) -> Optional[Dict[str, Any]]:
+        """Compare l'embedding de la piste à la galerie locale.
+
+        Correspondance confirmée : décision définitive pour la piste et alerte
+        envoyée au backend. Sinon None : nouvel essai au prochain pic de qualité.
+        """
+        matches = self._gallery.match(track.embedding, self._top_k)
+        if not matches:
+            return None
+        best = matches[0]
+        if best['score'] < self._similarity_threshold:
+            if best['score'] >= self._warn_threshold:
+                track.metadata['probable'] = best
+                logger.debug("Caméra %s piste #%s: correspondance probable %s (%.2f)",
+                             track.camera_id, track.track_id, best.get('key'), best['score'])
+            return None
+
+        logger.info("Caméra %s piste #%s: correspondance confirmée %s (%.2f)",
+                    track.camera_id, track.track_id, best.get('key'), best['score'])
+        if self._alerts is not None:
+            alert_id = self._alerts.send(track.camera_id, matches, {
+                'match_type': 'certain',
+                'track_id': track.track_id,
+                'quality': track.recognized_quality,
+                'recognitions': track.recognitions,
+                'source': 'edge_gallery',
+                'embedding_version': self._gallery.version,
+            })
+            if alert_id and self._clips is not None:
+                self._clips.trigger(track.camera_id, alert_id, track.last_seen, {'track_id': track.track_id})
+        return {'match_type': 'certain', **best}
+
+    def _start_gallery(self) -> None:
+        if self._gallery is not None and not self._gallery_started:
+            self._gallery_started = True
+            self._gallery.start()
+            if self._alerts is not None:
+                self._alerts.start()
+            if self._clips is not None:
+                self._clips.start()
+            if self._clip_uploader is not None:
+                self._clip_uploader.start()
+
+    def gallery_stats(self) -> Dict[str, Any]:
+        return self._gallery.stats() if self._gallery else {}
+
+    def alert_stats(self) -> Dict[str, Any]:
+        """Profondeur du spool d'alertes, âge de la plus ancienne, envois / échecs."""
+        stats = self._alerts.stats() if self._alerts else {}
+        if stats and self._clips is not None:
+            stats["clips"] = {
+                **self._clips.stats(),
+                **(self._clip_uploader.stats() if self._clip_uploader else {}),
+            }
+        return stats
+
+    def tracking_stats(self, camera_id: str) -> Dict[str, Any]:
+        return {"tracking": self._tracking.stats(camera_id)} if self._tracking else {}
+
     def _frame_loop(self, callback: Optional[Callable] = None, face_threshold: float = 0.7):
         """Boucle interne pour lire des frames et exécuter la reconnaissance faciale.
 
         callback(frame, result) -> appelé à chaque face reconnue (ou chaque frame si callback attend)
-        result: dictionnaire avec clés (faces: [ {bbox, score, embedding(optional), label(optional)} ])
+        result: dictionnaire avec clés (faces: [ {bbox, score, embedding(optional), label(optional)} ],
+                frame_age_s: âge de la frame au moment de l'analyse)
+
+        La lecture passe par LatestFrameReader : l'analyse porte toujours sur la
+        frame la plus récente, le retard ne s'accumule pas si elle est plus lente
+        que le flux, et la caméra est reconnectée avec backoff en cas de perte.
         """
         logger.info("Démarrage de la boucle frame (camera id=%s)", self._cap_id)
         last_time = time.time()
         consecutive_errors = 0
         max_consecutive_errors = 10
+        reader = LatestFrameReader(
+            self._cap_id,
+            f"camera-{self._cap_id}",
+            capture=self._cap,
+            backoff_initial=float(os.environ.get("RETRY_BACKOFF", "1")),
+            max_retries=int(os.environ.get("MAX_RETRIES", "0")),
+        ).start()
+        seq = 0
         
         while self._running:
             try:
-                # Vérifier que la caméra est toujours disponible
-                if self._cap is None:
-                    logger.error("[ERREUR] Caméra %s n'est plus disponible — arrêt de la boucle", self._cap_id)
-                    break
-                
-                if not self._cap.isOpened():
-                    logger.error("[ERREUR] Caméra %s n'est plus ouverte — arrêt de la boucle", self._cap_id)
-                    logger.info("La caméra peut avoir été déconnectée ou utilisée par une autre application")
-                    break
-                
-                ret, frame = self._cap.read()
-                if not ret or frame is None:
-                    consecutive_errors += 1
-                    if consecutive_errors >= max_consecutive_errors:
-                        logger.error("[ERREUR] Trop d'erreurs consécutives (%d) — arrêt de la boucle", consecutive_errors)
+                frame, captured_at, seq = reader.read(timeout=1.0, last_seq=seq)
+                if frame is None:
+                    if reader.failed:
+                        logger.error("[ERREUR] Caméra %s perdue définitivement — arrêt de la boucle", self._cap_id)
                         logger.info("La caméra peut avoir été déconnectée ou utilisée par une autre application")
                         break
-                    logger.warning("Frame non lue correctement (erreur %d/%d) — tentative de récupération", 
-                                  consecutive_errors, max_consecutive_errors)
-                    time.sleep(0.1)
                     continue
-                
-                # Réinitialiser le compteur d'erreurs si succès
-                consecutive_errors = 0
 
-                result = {"faces": []}
-
-                try:
-                    if self._face_analyzer:
-                        # InsightFace path
-                        faces = self._face_analyzer.get(frame)
-                        for f in faces:
-                            bbox = [int(x) for x in f.bbox.tolist()]
-                            score = float(f.det_score) if hasattr(f, 'det_score') else 0.0
-                            emb = f.embedding.tolist() if hasattr(f, 'embedding') else None
-                            result['faces'].append({
-                                'bbox': bbox,
-                                'score': score,
-                                'embedding': emb,
-                            })
-                    else:
-                        # Fallback: Haar cascade face detector (démo uniquement)
-                        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-                        cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-                        rects = cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(30, 30))
-                        for (x, y, w, h) in rects:
-                            result['faces'].append({
-                                'bbox': [int(x), int(y), int(x + w), int(y + h)],
-                                'score': 1.0,
-                                'embedding': None,
-                            })
-                except Exception as e:
-                    logger.exception("Erreur dans l'analyse faciale: %s", e)
-                    result = {"faces": []}  # Retourner un résultat vide en cas d'erreur
+                result = self.analyze_tracked(f"camera_{self._cap_id}", frame, captured_at)
+                result['frame_age_s'] = round(time.time() - captured_at, 3)
 
                 # Appel du callback si fourni
                 if callback:
@@ -420,6 +663,9 @@ class MultiCameraService:
                     break
                 time.sleep(0.5)
 
+        # Le lecteur possède la capture (éventuellement rouverte) : il la libère
+        reader.stop()
+        self._cap = None
         logger.info("Boucle frame terminée (camera id=%s)", self._cap_id)
 
     def start_recognition(self, callback: Optional[Callable] = None, face_threshold: float = 0.7) -> bool:
@@ -445,6 +691,7 @@ class MultiCameraService:
             return False
 
         try:
+            self._start_gallery()
             self._running = True
             self._thread = threading.Thread(target=self._frame_loop, args=(callback, face_threshold), daemon=True)
             self._thread.start()
@@ -461,13 +708,70 @@ class MultiCameraService:
             self._running = False
             return False
 
+    def start_multi_recognition(
+        self,
+        sources: List[CameraSource],
+        callback: Optional[Callable] = None,
+        inference_workers: Optional[int] = None,
+    ) -> MultiCameraPipeline:
+        """Démarre la capture concurrente de plusieurs caméras.
+
+        Un thread de capture par source, un pool de workers d'inférence partagé.
+        callback(camera_id, frame, result) est appelé pour chaque frame analysée.
+        """
+        if self._pipeline is not None:
+            logger.warning("[ATTENTION] Le pipeline multi-caméras est déjà démarré")
+            return self._pipeline
+
+        if inference_workers is None:
+            intra, cores = _onnx_thread_budget()
+            inference_workers = max(1, cores // intra)
+            inference_workers = int(os.environ.get("INFERENCE_WORKERS", inference_workers))
+
+        self._start_gallery()
+        self._pipeline = MultiCameraPipeline(
+            self.analyze_tracked,
+            callback,
+            inference_workers=inference_workers,
+            queue_size=int(os.environ.get("FRAME_QUEUE_SIZE", "2")),
+            max_frame_age=float(os.environ.get("MAX_FRAME_AGE", "1.0")),
+            stats_interval=float(os.environ.get("STATS_INTERVAL", "30")),
+            backoff_initial=float(os.environ.get("RETRY_BACKOFF", "1")),
+            backoff_max=float(os.environ.get("RETRY_BACKOFF_MAX", "30")),
+            max_retries=int(os.environ.get("MAX_RETRIES", "0")),
+            stats_provider=self.tracking_stats,
+            frame_listener=self._clips.add_frame if self._clips is not None else None,
+        )
+        for source in sources:
+            self._pipeline.add_source(source)
+        METRICS.add_provider(self._pipeline.stats)
+        self._pipeline.start()
+        return self._pipeline
+
+    def pipeline_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Statistiques par caméra du pipeline multi-caméras (fps, abandons, file)."""
+        return self._pipeline.stats() if self._pipeline else {}
+
     def stop(self):
         """Arrête la boucle proprement"""
         logger.info("Demande d'arrêt du service")
+        if self._pipeline is not None:
+            METRICS.remove_provider(self._pipeline.stats)
+            self._pipeline.stop()
+            self._pipeline = None
         self._running = False
         if self._thread:
             self._thread.join(timeout=2.0)
             logger.info("Thread terminé")
+        if self._gallery_started:
+            self._gallery.stop()
+            if self._clip_uploader is not None:
+                self._clip_uploader.stop()
+            if self._clips is not None:
+                self._clips.stop()
+            if self._alerts is not None:
+                self._alerts.stop()
+            self._gallery_started = False
         self.release()
 
     def release(self):
@@ -536,5 +840,97 @@ def run_demo():
         cv2.destroyAllWindows()
 
 
+def _parse_camera_fps(value: str) -> Dict[str, float]:
+    """CAMERAS_FPS="ip_0=5,usb_0=15" -> {camera_id: fps}"""
+    fps = {}
+    for item in value.split(','):
+        if '=' in item:
+            camera_id, rate = item.split('=', 1)
+            try:
+                fps[camera_id.strip()] = float(rate)
+            except ValueError:
+                logger.warning("CAMERAS_FPS: valeur ignorée '%s'", item)
+    return fps
+
+
+def sources_from_env(svc: Optional[MultiCameraService] = None) -> List[CameraSource]:
+    """Construit les sources depuis CAMERAS_IPS / CAMERAS_USB_MAX / CAMERAS_FPS.
+
+    Identifiants identiques à ceux du backend : ip_<n> et usb_<index>.
+    """
+    default_fps = float(os.environ.get("TARGET_FPS", "10"))
+    fps_overrides = _parse_camera_fps(os.environ.get("CAMERAS_FPS", ""))
+    sources = []
+
+    urls = [url.strip() for url in os.environ.get("CAMERAS_IPS", "").split(',') if url.strip()]
+    for idx, url in enumerate(urls):
+        camera_id = f"ip_{idx}"
+        sources.append(CameraSource(camera_id, url, fps_overrides.get(camera_id, default_fps)))
+
+    usb_max = int(os.environ.get("CAMERAS_USB_MAX", "0") or 0)
+    if usb_max and svc is not None:
+        svc.max_test_devices = usb_max
+        for device in svc.list_cameras():
+            camera_id = f"usb_{device['id']}"
+            sources.append(CameraSource(camera_id, device['id'], fps_overrides.get(camera_id, default_fps)))
+
+    return sources
+
+
+def log_callback(camera_id, frame, result):
+    for face in result.get('faces', []):
+        if face.get('new_track'):
+            logger.info("Caméra %s: nouvelle piste #%s", camera_id, face['track_id'])
+    for track in result.get('ended_tracks', []):
+        logger.info(
+            "Caméra %s: piste #%s terminée (%.1fs, %d reconnaissance(s))",
+            camera_id,
+            track['track_id'],
+            track['duration_s'],
+            track['recognitions'],
+        )
+
+
+def run_service():
+    """Mode service (sans interface) : toutes les caméras configurées en parallèle."""
+    svc = MultiCameraService()
+    sources = sources_from_env(svc)
+    if not sources:
+        logger.error("Aucune caméra configurée (CAMERAS_IPS / CAMERAS_USB_MAX)")
+        return
+
+    svc.start_multi_recognition(sources, callback=log_callback)
+    start_metrics_server(int(os.environ.get("METRICS_PORT", "9108")))
+    reporter = MetricsReporter.from_env()
+    if reporter is not None:
+        reporter.start()
+    stats_interval = float(os.environ.get("STATS_INTERVAL", "30"))
+    next_stats = time.time() + stats_interval
+    try:
+        while True:
+            time.sleep(1.0)
+            if stats_interval and time.time() >= next_stats:
+                next_stats = time.time() + stats_interval
+                alerts = svc.alert_stats()
+                if alerts:
+                    logger.info(
+                        "[stats] alertes: spool=%d (plus ancienne %ss) envoyées=%d rejetées=%d évincées=%d",
+                        alerts["spool_depth"],
+                        alerts["spool_oldest_age_s"],
+                        alerts["sent"],
+                        alerts["rejected"],
+                        alerts["spool_evicted"],
+                    )
+    except KeyboardInterrupt:
+        logger.info("Interruption clavier reçue — arrêt propre")
+    finally:
+        if reporter is not None:
+            reporter.stop()
+        svc.stop()
+
+
 if __name__ == '__main__':
-    run_demo()
+    if '--headless' in sys.argv or os.environ.get("CAMERAS_IPS"):
+        run_service()
+    else:
+        run_demo()
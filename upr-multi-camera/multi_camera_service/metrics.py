@@ -0,0 +1,243 @@
+"""
+Métriques de performance par caméra
+-----------------------------------
+
+Compteurs et histogrammes en mémoire, par caméra et par étape :
+
+    decode  : retrieve() OpenCV (décodage de la frame retenue)
+    detect  : détection SCRFD / Haar
+    embed   : embedding ArcFace d'un visage
+    search  : comparaison avec la galerie locale
+    alert   : latence création -> acceptation par le backend
+    clip    : écriture d'un clip d'alerte (décodage JPEG + encodage vidéo)
+
+Le coût d'une observation est un ``bisect`` + trois additions sous verrou.
+Les statistiques du pipeline (fps, abandons, profondeur de file) sont
+fusionnées au moment de l'export.
+
+Export :
+ - ``GET :METRICS_PORT/metrics``      format texte Prometheus
+ - ``GET :METRICS_PORT/metrics.json`` JSON
+ - envoi périodique au backend (``POST /upr/cameras/metrics/``) pour
+   persistance, toutes les ``METRICS_PUSH_INTERVAL`` secondes.
+"""
+
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger("MultiCameraService.metrics")
+
+# Bornes supérieures des buckets (ms), dernier bucket = +Inf
+DEFAULT_BUCKETS_MS = (1, 2, 5, 10, 20, 35, 50, 75, 100, 150, 250, 500, 1000, 2500, 5000, 10000)
+STAGES = ("decode", "detect", "embed", "search", "alert", "clip")
+
+
+class Histogram:
+    """Histogramme cumulable à buckets fixes (millisecondes)."""
+
+    __slots__ = ("bounds", "counts", "count", "total", "max")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS_MS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Quantile approché (borne supérieure du bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return float(self.bounds[index]) if index < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total / self.count, 2) if self.count else None,
+            "p50_ms": self.quantile(0.5),
+            "p95_ms": self.quantile(0.95),
+            "max_ms": round(self.max, 2) if self.count else None,
+        }
+
+
+class CameraMetrics:
+    """Registre des compteurs / histogrammes, indexé par caméra."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Dict[str, Histogram]] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._providers: List[Callable[[], Dict[str, Dict[str, Any]]]] = []
+        self.started_at = time.time()
+
+    def observe(self, camera_id: str, stage: str, value_ms: float) -> None:
+        with self._lock:
+            stages = self._histograms.setdefault(camera_id, {})
+            histogram = stages.get(stage)
+            if histogram is None:
+                histogram = stages[stage] = Histogram()
+            histogram.observe(value_ms)
+
+    def inc(self, camera_id: str, counter: str, value: int = 1) -> None:
+        with self._lock:
+            counters = self._counters.setdefault(camera_id, {})
+            counters[counter] = counters.get(counter, 0) + value
+
+    def add_provider(self, provider: Callable[[], Dict[str, Dict[str, Any]]]) -> None:
+        """Source de valeurs instantanées par caméra (ex: ``pipeline.stats``)."""
+        self._providers.append(provider)
+
+    def remove_provider(self, provider) -> None:
+        if provider in self._providers:
+            self._providers.remove(provider)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            report: Dict[str, Dict[str, Any]] = {}
+            for camera_id, stages in self._histograms.items():
+                report.setdefault(camera_id, {})["latency"] = {
+                    stage: histogram.snapshot() for stage, histogram in stages.items()
+                }
+            for camera_id, counters in self._counters.items():
+                report.setdefault(camera_id, {})["counters"] = dict(counters)
+        for provider in list(self._providers):
+            try:
+                for camera_id, values in provider().items():
+                    report.setdefault(camera_id, {})["pipeline"] = values
+            except Exception as e:
+                logger.debug("Source de métriques en erreur: %s", e)
+        return report
+
+    def prometheus_text(self) -> str:
+        lines = [
+            "# HELP upr_camera_stage_ms Durée par étape et par caméra (ms)",
+            "# TYPE upr_camera_stage_ms histogram",
+        ]
+        with self._lock:
+            for camera_id, stages in sorted(self._histograms.items()):
+                for stage, histogram in sorted(stages.items()):
+                    labels = f'camera="{camera_id}",stage="{stage}"'
+                    cumulative = 0
+                    for bound, count in zip(histogram.bounds, histogram.counts):
+                        cumulative += count
+                        lines.append(f'upr_camera_stage_ms_bucket{{{labels},le="{bound}"}} {cumulative}')
+                    lines.append(f'upr_camera_stage_ms_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f"upr_camera_stage_ms_sum{{{labels}}} {histogram.total:.3f}")
+                    lines.append(f"upr_camera_stage_ms_count{{{labels}}} {histogram.count}")
+            lines.append("# TYPE upr_camera_events_total counter")
+            for camera_id, counters in sorted(self._counters.items()):
+                for name, value in sorted(counters.items()):
+                    lines.append(f'upr_camera_events_total{{camera="{camera_id}",event="{name}"}} {value}')
+
+        lines.append("# TYPE upr_camera_pipeline gauge")
+        for camera_id, values in sorted(self.snapshot().items()):
+            for name, value in sorted((values.get("pipeline") or {}).items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    lines.append(f'upr_camera_pipeline{{camera="{camera_id}",metric="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+METRICS = CameraMetrics()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: CameraMetrics = METRICS
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body = json.dumps(self.registry.snapshot()).encode("utf-8")
+            content_type = "application/json"
+        elif self.path.startswith("/metrics"):
+            body = self.registry.prometheus_text().encode("utf-8")
+            content_type = "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Expose /metrics et /metrics.json (thread démon) ; None si ``port`` vaut 0."""
+    if not port:
+        return None
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        logger.warning("Serveur de métriques indisponible sur le port %s: %s", port, e)
+        return None
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    logger.info("Métriques exposées sur http://%s:%s/metrics", host, port)
+    return server
+
+
+class MetricsReporter(threading.Thread):
+    """Envoie périodiquement l'instantané au backend (persistance par caméra)."""
+
+    def __init__(self, api_url: str, api_key: Optional[str] = None, *, interval: float = 60.0,
+                 timeout: float = 10.0, registry: CameraMetrics = METRICS):
+        super().__init__(name="metrics-reporter", daemon=True)
+        self.api_url = api_url.rstrip("/")
+        self.api_key = api_key
+        self.interval = interval
+        self.timeout = timeout
+        self.registry = registry
+        self._stop_event = threading.Event()
+
+    @classmethod
+    def from_env(cls) -> Optional["MetricsReporter"]:
+        api_url = os.environ.get("UPR_API_URL", "").strip()
+        interval = float(os.environ.get("METRICS_PUSH_INTERVAL", "60"))
+        if not api_url or interval <= 0:
+            return None
+        return cls(api_url, os.environ.get("UPR_API_KEY") or None, interval=interval,
+                   timeout=float(os.environ.get("CONNECTION_TIMEOUT", "10")))
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+    def run(self) -> None:
+        import requests
+
+        from multi_camera_service.alerts import api_headers
+
+        session = requests.Session()
+        while not self._stop_event.wait(self.interval):
+            snapshot = self.registry.snapshot()
+            if not snapshot:
+                continue
+            try:
+                response = session.post(
+                    f"{self.api_url}/upr/cameras/metrics/",
+                    json={"reported_at": time.time(), "cameras": snapshot},
+                    headers=api_headers(self.api_key),
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+            except Exception as e:
+                logger.debug("Envoi des métriques impossible: %s", e)
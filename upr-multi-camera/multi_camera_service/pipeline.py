@@ -0,0 +1,386 @@
+"""
+Pipeline multi-caméras : capture concurrente + pool d'inférence partagé
+----------------------------------------------------------------------
+
+Chaque source (USB ou RTSP) a son thread de capture qui alimente une file
+bornée. Un pool de workers d'inférence partage le même analyseur facial et
+prélève les frames à tour de rôle (round-robin) sur les caméras qui en ont :
+une caméra rapide ne peut pas affamer les autres. Les frames trop anciennes
+sont abandonnées plutôt qu'analysées en retard.
+
+La capture passe par ``LatestFrameReader`` (voir ingest.py) : seule la frame
+la plus récente est décodée, et la source est reconnectée avec backoff.
+Un ``frame_listener`` optionnel reçoit chaque frame capturée, analysée ou
+non (anneau des clips d'alerte).
+
+Statistiques par caméra : fps capturé / analysé (sur les ``RATE_WINDOW``
+dernières secondes, identiques pour tous les lecteurs), frames abandonnées par
+contre-pression (file pleine) ou par ancienneté, temps d'inférence moyen,
+âge des frames au moment de l'inférence.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from multi_camera_service.ingest import LatestFrameReader
+
+logger = logging.getLogger("MultiCameraService.pipeline")
+
+FrameCallback = Callable[[str, Any, Dict[str, Any]], None]
+# listener(camera_id, frame, captured_at) : chaque frame capturée, analysée ou non
+FrameListener = Callable[[str, Any, float], None]
+# analyze(camera_id, frame, captured_at) -> résultat
+FrameAnalyzer = Callable[[str, Any, float], Dict[str, Any]]
+
+# Fenêtre (s) sur laquelle sont calculés les fps rapportés
+RATE_WINDOW = 10
+
+
+@dataclass
+class CameraSource:
+    """Source vidéo configurée (index USB ou URL RTSP/HTTP)."""
+
+    camera_id: str
+    uri: Union[int, str]
+    target_fps: float = 10.0
+
+
+@dataclass
+class CameraStats:
+    """Compteurs cumulés d'une caméra, mis à jour par les threads de capture et d'inférence.
+
+    Les fps sont calculés à partir des totaux, échantillonnés au plus une fois
+    par seconde : lire ``snapshot`` ne modifie pas la fenêtre des autres lecteurs
+    (endpoint de métriques, journal périodique).
+    """
+
+    captured: int = 0
+    enqueued: int = 0
+    dropped_backpressure: int = 0
+    dropped_stale: int = 0
+    processed: int = 0
+    reconnects: int = 0
+    inference_seconds: float = 0.0
+    frame_age_seconds: float = 0.0
+    frame_age_max: float = 0.0
+    last_frame_at: Optional[float] = None
+    started_at: float = field(default_factory=time.time)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    _samples: Deque[Tuple[float, int, int]] = field(
+        default_factory=lambda: deque(maxlen=RATE_WINDOW + 1), repr=False, compare=False
+    )
+
+    def _sample(self, now: float) -> None:
+        if not self._samples or now - self._samples[-1][0] >= 1.0:
+            self._samples.append((now, self.enqueued, self.processed))
+
+    def record_enqueued(self, captured_at: float, dropped: bool) -> None:
+        with self._lock:
+            self.dropped_backpressure += int(dropped)
+            self.enqueued += 1
+            self.last_frame_at = captured_at
+            self._sample(time.time())
+
+    def record_stale(self) -> None:
+        with self._lock:
+            self.dropped_stale += 1
+
+    def record_processed(self, inference_seconds: float, frame_age: float) -> None:
+        with self._lock:
+            self.processed += 1
+            self.inference_seconds += inference_seconds
+            self.frame_age_seconds += frame_age
+            self.frame_age_max = max(self.frame_age_max, frame_age)
+            self._sample(time.time())
+
+    def record_source(self, captured: int, reconnects: int) -> None:
+        with self._lock:
+            self.captured = captured
+            self.reconnects = reconnects
+
+    def snapshot(self, target_fps: float, queue_depth: int) -> Dict[str, Any]:
+        now = time.time()
+        with self._lock:
+            self._sample(now)
+            t0, enq0, proc0 = self._samples[0]
+            if now - t0 <= 0:
+                t0, enq0, proc0 = self.started_at, 0, 0
+            elapsed = max(now - t0, 1e-6)
+            processed = self.processed
+            return {
+                "target_fps": target_fps,
+                "capture_fps": round((self.enqueued - enq0) / elapsed, 2),
+                "processed_fps": round((processed - proc0) / elapsed, 2),
+                "captured": self.captured,
+                "processed": processed,
+                "dropped_backpressure": self.dropped_backpressure,
+                "dropped_stale": self.dropped_stale,
+                "reconnects": self.reconnects,
+                "queue_depth": queue_depth,
+                "avg_inference_ms": round(1000 * self.inference_seconds / processed, 1) if processed else None,
+                "avg_frame_age_ms": round(1000 * self.frame_age_seconds / processed, 1) if processed else None,
+                "max_frame_age_ms": round(1000 * self.frame_age_max, 1) if processed else None,
+                "last_frame_age_s": round(now - self.last_frame_at, 2) if self.last_frame_at else None,
+            }
+
+
+class FairFrameScheduler:
+    """Files bornées par caméra, distribuées en round-robin aux workers."""
+
+    def __init__(self, queue_size: int = 2, max_frame_age: float = 1.0):
+        self.queue_size = max(1, queue_size)
+        self.max_frame_age = max_frame_age
+        self._queues: Dict[str, Deque[Tuple[float, Any]]] = {}
+        self._stats: Dict[str, CameraStats] = {}
+        self._order: List[str] = []
+        self._cursor = 0
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def register(self, camera_id: str) -> CameraStats:
+        with self._cond:
+            if camera_id not in self._queues:
+                self._queues[camera_id] = deque()
+                self._stats[camera_id] = CameraStats()
+                self._order.append(camera_id)
+            return self._stats[camera_id]
+
+    def unregister(self, camera_id: str) -> None:
+        with self._cond:
+            self._queues.pop(camera_id, None)
+            if camera_id in self._order:
+                self._order.remove(camera_id)
+
+    def put(self, camera_id: str, frame: Any, captured_at: Optional[float] = None) -> None:
+        with self._cond:
+            queue = self._queues.get(camera_id)
+            if queue is None:
+                return
+            dropped = len(queue) >= self.queue_size
+            if dropped:
+                # Contre-pression : l'inférence ne suit pas, on garde le plus récent
+                queue.popleft()
+            captured_at = captured_at or time.time()
+            queue.append((captured_at, frame))
+            self._stats[camera_id].record_enqueued(captured_at, dropped)
+            self._cond.notify()
+
+    def get(self, timeout: float = 0.5) -> Optional[Tuple[str, Any, float]]:
+        """Prochaine frame (camera_id, frame, captured_at) en round-robin, ou None au timeout."""
+        deadline = time.time() + timeout
+        with self._cond:
+            while not self._closed:
+                item = self._pop_next()
+                if item is not None:
+                    return item
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+        return None
+
+    def _pop_next(self) -> Optional[Tuple[str, Any, float]]:
+        count = len(self._order)
+        now = time.time()
+        for offset in range(count):
+            camera_id = self._order[(self._cursor + offset) % count]
+            queue = self._queues[camera_id]
+            while queue:
+                captured_at, frame = queue.popleft()
+                if self.max_frame_age and now - captured_at > self.max_frame_age:
+                    self._stats[camera_id].record_stale()
+                    continue
+                self._cursor = (self._cursor + offset + 1) % count
+                return camera_id, frame, captured_at
+        return None
+
+    def depth(self, camera_id: str) -> int:
+        with self._cond:
+            return len(self._queues.get(camera_id, ()))
+
+    def stats(self, camera_id: str) -> Optional[CameraStats]:
+        return self._stats.get(camera_id)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+
+class CaptureWorker(threading.Thread):
+    """Pousse la dernière frame d'une source au rythme ``target_fps``."""
+
+    def __init__(
+        self,
+        source: CameraSource,
+        scheduler: FairFrameScheduler,
+        *,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        max_retries: int = 0,
+        frame_listener: Optional[FrameListener] = None,
+    ):
+        super().__init__(name=f"capture-{source.camera_id}", daemon=True)
+        self.source = source
+        self.scheduler = scheduler
+        self.frame_listener = frame_listener
+        self.stats = scheduler.register(source.camera_id)
+        self.reader = LatestFrameReader(
+            source.uri,
+            source.camera_id,
+            target_fps=source.target_fps,
+            backoff_initial=backoff_initial,
+            backoff_max=backoff_max,
+            max_retries=max_retries,
+        )
+        self._stop_event = threading.Event()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        self.reader.stop()
+
+    def run(self) -> None:
+        self.reader.start()
+        seq = 0
+        while not self._stop_event.is_set() and not self.reader.failed:
+            frame, captured_at, seq = self.reader.read(timeout=1.0, last_seq=seq)
+            if frame is None:
+                continue
+            self.stats.record_source(self.reader.retrieved, self.reader.reconnects)
+            self.scheduler.put(self.source.camera_id, frame, captured_at)
+            if self.frame_listener is not None:
+                try:
+                    self.frame_listener(self.source.camera_id, frame, captured_at)
+                except Exception as e:
+                    logger.debug("Erreur listener de frames (caméra %s): %s", self.source.camera_id, e)
+        logger.info("Capture %s arrêtée", self.source.camera_id)
+
+
+class MultiCameraPipeline:
+    """Orchestre les threads de capture et le pool d'inférence partagé."""
+
+    def __init__(
+        self,
+        analyze: FrameAnalyzer,
+        callback: Optional[FrameCallback] = None,
+        *,
+        inference_workers: int = 2,
+        queue_size: int = 2,
+        max_frame_age: float = 1.0,
+        stats_interval: float = 30.0,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 30.0,
+        max_retries: int = 0,
+        stats_provider: Optional[Callable[[str], Dict[str, Any]]] = None,
+        frame_listener: Optional[FrameListener] = None,
+    ):
+        self.analyze = analyze
+        self.stats_provider = stats_provider
+        self.callback = callback
+        self.inference_workers = max(1, inference_workers)
+        self.stats_interval = stats_interval
+        self._reader_options = {
+            "backoff_initial": backoff_initial,
+            "backoff_max": backoff_max,
+            "max_retries": max_retries,
+            "frame_listener": frame_listener,
+        }
+        self.scheduler = FairFrameScheduler(queue_size=queue_size, max_frame_age=max_frame_age)
+        self._captures: Dict[str, CaptureWorker] = {}
+        self._workers: List[threading.Thread] = []
+        self._running = threading.Event()
+
+    def add_source(self, source: CameraSource) -> None:
+        if source.camera_id in self._captures:
+            raise ValueError(f"Caméra {source.camera_id} déjà configurée")
+        worker = CaptureWorker(source, self.scheduler, **self._reader_options)
+        self._captures[source.camera_id] = worker
+        if self._running.is_set():
+            worker.start()
+
+    def start(self) -> None:
+        if self._running.is_set():
+            return
+        self._running.set()
+        for worker in self._captures.values():
+            worker.start()
+        for index in range(self.inference_workers):
+            thread = threading.Thread(target=self._inference_loop, name=f"inference-{index}", daemon=True)
+            thread.start()
+            self._workers.append(thread)
+        if self.stats_interval:
+            threading.Thread(target=self._stats_loop, name="pipeline-stats", daemon=True).start()
+        logger.info(
+            "Pipeline démarré: %d caméra(s), %d worker(s) d'inférence",
+            len(self._captures),
+            self.inference_workers,
+        )
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._running.clear()
+        for worker in self._captures.values():
+            worker.stop()
+        self.scheduler.close()
+        for thread in list(self._captures.values()) + self._workers:
+            if thread.is_alive():
+                thread.join(timeout=timeout)
+        self._workers.clear()
+        logger.info("Pipeline arrêté")
+
+    def _inference_loop(self) -> None:
+        while self._running.is_set():
+            item = self.scheduler.get(timeout=0.5)
+            if item is None:
+                continue
+            camera_id, frame, captured_at = item
+            stats = self.scheduler.stats(camera_id)
+            frame_age = time.time() - captured_at
+            started = time.perf_counter()
+            try:
+                result = self.analyze(camera_id, frame, captured_at)
+            except Exception as e:
+                logger.exception("Erreur d'analyse (caméra %s): %s", camera_id, e)
+                continue
+            if stats is not None:
+                stats.record_processed(time.perf_counter() - started, frame_age)
+            result["frame_age_s"] = round(frame_age, 3)
+            result["captured_at"] = captured_at
+            if self.callback:
+                try:
+                    self.callback(camera_id, frame, result)
+                except Exception as e:
+                    logger.exception("Erreur dans le callback (caméra %s): %s", camera_id, e)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        report = {}
+        for camera_id, worker in self._captures.items():
+            stats = self.scheduler.stats(camera_id)
+            if stats is not None:
+                snapshot = stats.snapshot(worker.source.target_fps, self.scheduler.depth(camera_id))
+                snapshot["source"] = worker.reader.stats()
+                if self.stats_provider is not None:
+                    snapshot.update(self.stats_provider(camera_id))
+                report[camera_id] = snapshot
+        return report
+
+    def _stats_loop(self) -> None:
+        while self._running.is_set():
+            time.sleep(self.stats_interval)
+            for camera_id, snapshot in self.stats().items():
+                logger.info(
+                    "[stats] %s: capture=%.1f/%s fps analyse=%.1f fps file=%d "
+                    "abandons contre-pression=%d ancienneté=%d inférence=%s ms âge frame=%s ms",
+                    camera_id,
+                    snapshot["capture_fps"],
+                    snapshot["target_fps"],
+                    snapshot["processed_fps"],
+                    snapshot["queue_depth"],
+                    snapshot["dropped_backpressure"],
+                    snapshot["dropped_stale"],
+                    snapshot["avg_inference_ms"],
+                    snapshot["avg_frame_age_ms"],
+                )
@@ -0,0 +1,185 @@
+"""
+Transport de frames par mémoire partagée entre processus
+--------------------------------------------------------
+
+Les frames BGR brutes sont écrites dans un anneau de ``slots`` emplacements
+(``multiprocessing.shared_memory``) ; seul un petit message de métadonnées
+(emplacement, numéro de séquence, forme, caméra, horodatage) transite par
+une ``multiprocessing.Queue``. Le consommateur lit la frame sans copie ni
+désérialisation.
+
+Sécurité de réutilisation des emplacements :
+ - la file de métadonnées est bornée à ``slots - consommateurs - 1`` : un
+   emplacement n'est réécrit qu'après avoir été consommé ;
+ - chaque emplacement porte son numéro de séquence (type seqlock) :
+   ``is_valid(meta)`` détecte une frame réécrite pendant sa lecture.
+
+Usage :
+    ring = SharedFrameRing.create(slots=8, max_frame_bytes=1920 * 1080 * 3)
+    producer = FrameProducer(ring, queue)           # processus de capture
+    consumer = FrameConsumer(ring.spec(), queue)    # processus d'analyse
+    meta, frame = consumer.get()
+    ...
+    if not consumer.is_valid(meta): résultat à ignorer
+
+Comparaison avec les files picklées et le HTTP base64 :
+    python scripts/benchmark_frame_transport.py
+"""
+
+import logging
+import queue as queue_module
+import time
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("MultiCameraService.shm")
+
+HEADER_ALIGN = 64
+FULL_HD_BGR_BYTES = 1920 * 1080 * 3
+
+
+def max_queue_size(slots: int, consumers: int = 1) -> int:
+    """Taille de file garantissant qu'aucun emplacement en cours de lecture n'est réécrit."""
+    return max(1, slots - consumers - 1)
+
+
+class SharedFrameRing:
+    """Anneau de frames en mémoire partagée."""
+
+    def __init__(self, shm: shared_memory.SharedMemory, slots: int, max_frame_bytes: int, owner: bool):
+        self.shm = shm
+        self.slots = slots
+        self.max_frame_bytes = max_frame_bytes
+        self.owner = owner
+        header_bytes = ((slots * 8 + HEADER_ALIGN - 1) // HEADER_ALIGN) * HEADER_ALIGN
+        # Numéro de séquence par emplacement (-1 = écriture en cours)
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf, offset=0)
+        self._data_offset = header_bytes
+        self._next_seq = 1
+
+    @classmethod
+    def create(cls, slots: int = 8, max_frame_bytes: int = FULL_HD_BGR_BYTES, name: Optional[str] = None) -> "SharedFrameRing":
+        header_bytes = ((slots * 8 + HEADER_ALIGN - 1) // HEADER_ALIGN) * HEADER_ALIGN
+        shm = shared_memory.SharedMemory(name=name, create=True, size=header_bytes + slots * max_frame_bytes)
+        ring = cls(shm, slots, max_frame_bytes, owner=True)
+        ring._seqs[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, spec: Dict[str, Any]) -> "SharedFrameRing":
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        return cls(shm, spec["slots"], spec["max_frame_bytes"], owner=False)
+
+    def spec(self) -> Dict[str, Any]:
+        """Description transmissible à un autre processus (``attach``)."""
+        return {"name": self.shm.name, "slots": self.slots, "max_frame_bytes": self.max_frame_bytes}
+
+    def _slot_view(self, slot: int, shape: Tuple[int, ...], dtype: str) -> np.ndarray:
+        offset = self._data_offset + slot * self.max_frame_bytes
+        return np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+
+    def write(self, frame: np.ndarray) -> Dict[str, Any]:
+        """Copie ``frame`` dans le prochain emplacement et retourne ses métadonnées."""
+        if frame.nbytes > self.max_frame_bytes:
+            raise ValueError(f"Frame de {frame.nbytes} octets > emplacement de {self.max_frame_bytes}")
+        seq = self._next_seq
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        np.copyto(self._slot_view(slot, frame.shape, frame.dtype.str), frame)
+        self._seqs[slot] = seq
+        return {"slot": slot, "seq": seq, "shape": frame.shape, "dtype": frame.dtype.str}
+
+    def commit(self) -> None:
+        """Valide le dernier ``write`` (publié) : l'emplacement suivant sera utilisé."""
+        self._next_seq += 1
+
+    def view(self, meta: Dict[str, Any]) -> np.ndarray:
+        """Frame sans copie (valide tant que ``is_valid(meta)``)."""
+        return self._slot_view(meta["slot"], tuple(meta["shape"]), meta["dtype"])
+
+    def is_valid(self, meta: Dict[str, Any]) -> bool:
+        return int(self._seqs[meta["slot"]]) == meta["seq"]
+
+    def close(self) -> None:
+        # Les vues numpy doivent être libérées avant la fermeture du segment
+        self._seqs = None
+        try:
+            self.shm.close()
+        except BufferError:
+            logger.warning("Segment %s encore référencé par des vues", self.shm.name)
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class FrameProducer:
+    """Publie des frames dans l'anneau (côté capture)."""
+
+    def __init__(self, ring: SharedFrameRing, meta_queue):
+        self.ring = ring
+        self.queue = meta_queue
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, camera_id: str, frame: np.ndarray, captured_at: Optional[float] = None) -> bool:
+        meta = self.ring.write(frame)
+        meta["camera_id"] = camera_id
+        meta["captured_at"] = captured_at or time.time()
+        try:
+            self.queue.put_nowait(meta)
+        except queue_module.Full:
+            # Consommateurs en retard : frame abandonnée, l'emplacement sera réécrit
+            self.dropped += 1
+            return False
+        self.ring.commit()
+        self.published += 1
+        return True
+
+
+class FrameConsumer:
+    """Reçoit les frames de l'anneau (côté analyse)."""
+
+    def __init__(self, spec: Dict[str, Any], meta_queue):
+        self.ring = SharedFrameRing.attach(spec)
+        self.queue = meta_queue
+
+    def get(self, timeout: Optional[float] = 1.0, copy: bool = False) -> Optional[Tuple[Dict[str, Any], np.ndarray]]:
+        try:
+            meta = self.queue.get(timeout=timeout)
+        except queue_module.Empty:
+            return None
+        if meta is None:
+            return None
+        frame = self.ring.view(meta)
+        if copy:
+            frame = frame.copy()
+        return meta, frame
+
+    def is_valid(self, meta: Dict[str, Any]) -> bool:
+        return self.ring.is_valid(meta)
+
+    def close(self) -> None:
+        self.ring.close()
+
+
+def run_capture_process(spec: Dict[str, Any], meta_queue, uri, camera_id: str, target_fps: float, stop_event) -> None:
+    """Point d'entrée d'un processus de capture publiant dans l'anneau ``spec``."""
+    from multi_camera_service.ingest import LatestFrameReader
+
+    ring = SharedFrameRing.attach(spec)
+    producer = FrameProducer(ring, meta_queue)
+    reader = LatestFrameReader(uri, camera_id, target_fps=target_fps).start()
+    seq = 0
+    try:
+        while not stop_event.is_set() and not reader.failed:
+            frame, captured_at, seq = reader.read(timeout=1.0, last_seq=seq)
+            if frame is not None:
+                producer.publish(camera_id, frame, captured_at)
+    finally:
+        reader.stop()
+        ring.close()
+        logger.info("Capture %s: %d frame(s) publiée(s), %d abandonnée(s)", camera_id, producer.published, producer.dropped)
@@ -0,0 +1,351 @@
+"""
+Suivi des visages : une reconnaissance par piste, pas par frame
+---------------------------------------------------------------
+
+La détection tourne sur chaque frame ; les visages sont associés à des pistes
+(IoU, puis distance des centres en repli). La reconnaissance ArcFace n'est
+lancée qu'à la naissance d'une piste puis aux pics de qualité (visage plus
+grand, plus net, plus frontal que lors de la dernière reconnaissance), dans
+la limite de ``max_per_track``. Une piste identifiée n'est plus reconnue :
+une seule décision d'identité par piste.
+
+Un filtre de mouvement optionnel par caméra (voir gating.py) évite même la
+détection sur les frames sans changement dans les zones d'intérêt.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+
+from multi_camera_service.metrics import METRICS
+
+logger = logging.getLogger("MultiCameraService.tracking")
+
+# Côté du visage (px) à partir duquel la taille n'améliore plus la qualité (entrée ArcFace)
+REFERENCE_FACE_SIZE = 112.0
+# Variance du laplacien considérée comme « nette »
+REFERENCE_SHARPNESS = 150.0
+
+
+def _iou(a: Sequence[float], b: Sequence[float]) -> float:
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    if inter <= 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / max(area_a + area_b - inter, 1e-6)
+
+
+def _centroid_distance(a: Sequence[float], b: Sequence[float]) -> float:
+    """Distance des centres, relative à la diagonale de la boîte ``a``."""
+    ca = ((a[0] + a[2]) / 2, (a[1] + a[3]) / 2)
+    cb = ((b[0] + b[2]) / 2, (b[1] + b[3]) / 2)
+    diagonal = max(((a[2] - a[0]) ** 2 + (a[3] - a[1]) ** 2) ** 0.5, 1.0)
+    return ((ca[0] - cb[0]) ** 2 + (ca[1] - cb[1]) ** 2) ** 0.5 / diagonal
+
+
+def face_quality(frame, bbox: Sequence[float], kps=None) -> Dict[str, float]:
+    """Qualité d'un visage dans [0, 1] : taille x netteté x frontalité."""
+    height, width = frame.shape[:2]
+    x1, y1 = max(0, int(bbox[0])), max(0, int(bbox[1]))
+    x2, y2 = min(width, int(bbox[2])), min(height, int(bbox[3]))
+    if x2 <= x1 or y2 <= y1:
+        return {"quality": 0.0, "size": 0.0, "sharpness": 0.0, "frontal": 0.0}
+
+    size = min(1.0, ((x2 - x1) * (y2 - y1)) ** 0.5 / REFERENCE_FACE_SIZE)
+
+    crop = frame[y1:y2, x1:x2]
+    gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+    gray = cv2.resize(gray, (64, 64))
+    sharpness = min(1.0, float(cv2.Laplacian(gray, cv2.CV_64F).var()) / REFERENCE_SHARPNESS)
+
+    frontal = 1.0
+    if kps is not None and len(kps) >= 3:
+        # Points InsightFace : oeil gauche, oeil droit, nez, ...
+        left_eye, right_eye, nose = kps[0], kps[1], kps[2]
+        eye_distance = max(abs(float(right_eye[0]) - float(left_eye[0])), 1.0)
+        eye_middle = (float(left_eye[0]) + float(right_eye[0])) / 2
+        yaw = abs(float(nose[0]) - eye_middle) / eye_distance
+        frontal = max(0.0, 1.0 - 2.0 * yaw)
+
+    return {
+        "quality": round(size * sharpness * frontal, 4),
+        "size": round(size, 3),
+        "sharpness": round(sharpness, 3),
+        "frontal": round(frontal, 3),
+    }
+
+
+@dataclass
+class Track:
+    track_id: int
+    camera_id: str
+    bbox: List[float]
+    first_seen: float
+    last_seen: float
+    hits: int = 1
+    best_quality: float = 0.0
+    recognized_quality: float = -1.0
+    last_recognition_at: Optional[float] = None
+    recognitions: int = 0
+    embedding: Optional[List[float]] = None
+    identity: Optional[Dict[str, Any]] = None
+    # Reconnaissance réservée par un worker et pas encore terminée
+    recognizing: bool = False
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def decided(self) -> bool:
+        return self.identity is not None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "track_id": self.track_id,
+            "camera_id": self.camera_id,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "duration_s": round(self.last_seen - self.first_seen, 2),
+            "hits": self.hits,
+            "recognitions": self.recognitions,
+            "best_quality": self.best_quality,
+            "identity": self.identity,
+        }
+
+
+class FaceTracker:
+    """Associe les détections d'une caméra à des pistes persistantes."""
+
+    def __init__(
+        self,
+        camera_id: str,
+        *,
+        iou_threshold: float = 0.3,
+        max_centroid_distance: float = 0.6,
+        max_age: float = 1.5,
+    ):
+        self.camera_id = camera_id
+        self.iou_threshold = iou_threshold
+        self.max_centroid_distance = max_centroid_distance
+        self.max_age = max_age
+        self.tracks: Dict[int, Track] = {}
+        self._next_id = 1
+
+    def update(self, bboxes: Sequence[Sequence[float]], now: float) -> Tuple[List[Tuple[Track, bool]], List[Track]]:
+        """Associe les boîtes aux pistes.
+
+        Retourne ([(piste, nouvelle?) pour chaque boîte, dans l'ordre], pistes terminées).
+        """
+        pairs = []
+        for det_index, bbox in enumerate(bboxes):
+            for track_id, track in self.tracks.items():
+                score = _iou(track.bbox, bbox)
+                if score >= self.iou_threshold:
+                    pairs.append((score, det_index, track_id))
+                else:
+                    distance = _centroid_distance(track.bbox, bbox)
+                    if distance <= self.max_centroid_distance:
+                        # Repli centroïde (mouvement rapide) : toujours moins prioritaire que l'IoU
+                        pairs.append((-distance, det_index, track_id))
+        pairs.sort(reverse=True)
+
+        assigned: Dict[int, Track] = {}
+        used_tracks = set()
+        for _, det_index, track_id in pairs:
+            if det_index in assigned or track_id in used_tracks:
+                continue
+            track = self.tracks[track_id]
+            track.bbox = list(bboxes[det_index])
+            track.last_seen = now
+            track.hits += 1
+            assigned[det_index] = track
+            used_tracks.add(track_id)
+
+        results = []
+        for det_index, bbox in enumerate(bboxes):
+            track = assigned.get(det_index)
+            is_new = track is None
+            if is_new:
+                track = Track(self._next_id, self.camera_id, list(bbox), now, now)
+                self.tracks[track.track_id] = track
+                self._next_id += 1
+            results.append((track, is_new))
+
+        ended = [t for t in self.tracks.values() if now - t.last_seen > self.max_age]
+        for track in ended:
+            del self.tracks[track.track_id]
+        return results, ended
+
+
+@dataclass
+class RecognitionPolicy:
+    """Quand relancer la reconnaissance d'une piste."""
+
+    peak_margin: float = 0.15
+    min_interval: float = 0.5
+    max_per_track: int = 5
+    min_quality: float = 0.0
+
+    def should_recognize(self, track: Track, quality: float, now: float) -> bool:
+        if track.decided or track.recognizing or track.recognitions >= self.max_per_track:
+            return False
+        if track.recognitions == 0:
+            return quality >= self.min_quality
+        if track.last_recognition_at and now - track.last_recognition_at < self.min_interval:
+            return False
+        return quality > track.recognized_quality * (1.0 + self.peak_margin)
+
+
+class TrackingAnalyzer:
+    """Détection par frame, reconnaissance par piste, pour toutes les caméras.
+
+    ``detect(frame)`` -> [{bbox, score, kps}] ; ``embed(frame, face)`` -> embedding ;
+    ``identify(track)`` -> décision d'identité (dict) ou None pour réessayer
+    au prochain pic de qualité.
+    """
+
+    def __init__(
+        self,
+        detect: Callable[[Any], List[Dict[str, Any]]],
+        embed: Optional[Callable[[Any, Dict[str, Any]], Optional[List[float]]]] = None,
+        identify: Optional[Callable[[Track], Optional[Dict[str, Any]]]] = None,
+        on_track_end: Optional[Callable[[Track], None]] = None,
+        *,
+        policy: Optional[RecognitionPolicy] = None,
+        tracker_options: Optional[Dict[str, Any]] = None,
+        gate_factory: Optional[Callable[[str], Any]] = None,
+    ):
+        self.detect = detect
+        self.embed = embed
+        self.identify = identify
+        self.on_track_end = on_track_end
+        self.policy = policy or RecognitionPolicy()
+        self.tracker_options = tracker_options or {}
+        self.gate_factory = gate_factory
+        self._gates: Dict[str, Any] = {}
+        self._trackers: Dict[str, FaceTracker] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._last_frame_at: Dict[str, float] = {}
+        self._last_tracked_at: Dict[str, float] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._started_at = time.time()
+        self._registry_lock = threading.Lock()
+
+    def _camera_state(self, camera_id: str):
+        with self._registry_lock:
+            if camera_id not in self._trackers:
+                self._trackers[camera_id] = FaceTracker(camera_id, **self.tracker_options)
+                self._locks[camera_id] = threading.Lock()
+                self._counters[camera_id] = {"frames": 0, "gated": 0, "detections": 0, "recognitions": 0, "tracks": 0}
+                if self.gate_factory is not None:
+                    self._gates[camera_id] = self.gate_factory(camera_id)
+            return self._trackers[camera_id], self._locks[camera_id], self._counters[camera_id]
+
+    def analyze(self, camera_id: str, frame, captured_at: Optional[float] = None) -> Dict[str, Any]:
+        now = captured_at or time.time()
+        tracker, lock, counters = self._camera_state(camera_id)
+        gate = self._gates.get(camera_id)
+        with lock:
+            if now < self._last_frame_at.get(camera_id, 0.0):
+                # Frame plus ancienne qu'une frame déjà prise en charge (workers concurrents) :
+                # écartée avant de payer la détection
+                return {"faces": [], "skipped": True}
+            self._last_frame_at[camera_id] = now
+            run_detection = gate is None or gate.should_detect(frame, now, active_tracks=len(tracker.tracks))
+        if not run_detection:
+            counters["gated"] += 1
+            METRICS.inc(camera_id, "frames_gated")
+            return {"faces": [], "gated": True, "ended_tracks": []}
+
+        started = time.perf_counter()
+        faces = self.detect(frame)
+        METRICS.observe(camera_id, "detect", (time.perf_counter() - started) * 1000)
+        if gate is not None:
+            faces = [face for face in faces if gate.in_roi(face["bbox"], frame.shape)]
+
+        to_recognize = []
+        with lock:
+            if now < self._last_tracked_at.get(camera_id, 0.0):
+                # Une frame plus récente a été suivie pendant la détection
+                return {"faces": [], "skipped": True}
+            self._last_tracked_at[camera_id] = now
+            counters["frames"] += 1
+            counters["detections"] += len(faces)
+
+            matches, ended = tracker.update([face["bbox"] for face in faces], now)
+            for face, (track, is_new) in zip(faces, matches):
+                quality = face_quality(frame, face["bbox"], face.get("kps"))
+                face.update(quality)
+                face["track_id"] = track.track_id
+                face["new_track"] = is_new
+                track.best_quality = max(track.best_quality, quality["quality"])
+                counters["tracks"] += int(is_new)
+                if self.embed is not None and self.policy.should_recognize(track, quality["quality"], now):
+                    # Réservée sous verrou : un autre worker ne relancera pas la même piste
+                    # tant que celle-ci n'est pas terminée
+                    track.recognizing = True
+                    track.recognitions += 1
+                    track.last_recognition_at = now
+                    track.recognized_quality = quality["quality"]
+                    to_recognize.append((face, track))
+
+        # Reconnaissance hors verrou : les autres caméras/frames continuent
+        try:
+            for face, track in to_recognize:
+                started = time.perf_counter()
+                embedding = self.embed(frame, face)
+                METRICS.observe(camera_id, "embed", (time.perf_counter() - started) * 1000)
+                counters["recognitions"] += 1
+                if embedding is None:
+                    continue
+                face["embedding"] = embedding
+                track.embedding = embedding
+                if self.identify is not None and not track.decided:
+                    started = time.perf_counter()
+                    decision = self.identify(track)
+                    METRICS.observe(camera_id, "search", (time.perf_counter() - started) * 1000)
+                    if decision is not None:
+                        with lock:
+                            track.identity = decision
+                        face["identity"] = decision
+        finally:
+            with lock:
+                for _, track in to_recognize:
+                    track.recognizing = False
+
+        for face in faces:
+            face.pop("kps", None)
+            face.setdefault("embedding", None)
+
+        ended_tracks = []
+        for track in ended:
+            ended_tracks.append(track.to_dict())
+            if self.on_track_end is not None:
+                try:
+                    self.on_track_end(track)
+                except Exception as e:
+                    logger.exception("Erreur fin de piste %s/%s: %s", camera_id, track.track_id, e)
+
+        return {"faces": faces, "ended_tracks": ended_tracks}
+
+    def stats(self, camera_id: str) -> Dict[str, Any]:
+        counters = self._counters.get(camera_id)
+        if not counters:
+            return {}
+        minutes = max((time.time() - self._started_at) / 60.0, 1e-6)
+        tracker = self._trackers.get(camera_id)
+        gate = self._gates.get(camera_id)
+        return {
+            "motion": gate.stats() if gate is not None else None,
+            "frames_gated": counters["gated"],
+            "active_tracks": len(tracker.tracks) if tracker else 0,
+            "tracks_total": counters["tracks"],
+            "detections_per_min": round(counters["detections"] / minutes, 1),
+            "recognitions_per_min": round(counters["recognitions"] / minutes, 1),
+            "recognitions_per_track": round(counters["recognitions"] / counters["tracks"], 2) if counters["tracks"] else None,
+        }
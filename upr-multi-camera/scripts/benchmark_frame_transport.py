@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Benchmark du transport de frames entre processus.
+
+Compare, pour des frames BGR (1080p par défaut) envoyées au rythme demandé :
+  - shm    : anneau multiprocessing.shared_memory + métadonnées en file
+  - pickle : multiprocessing.Queue transportant le ndarray (pickle)
+  - http   : JPEG base64 en POST HTTP local (comme les endpoints de flux Django)
+
+Mesures : débit obtenu, latence producteur -> consommateur (p50/p95/max),
+temps CPU consommé par le producteur et le consommateur, frames perdues.
+
+Exemple :
+    python scripts/benchmark_frame_transport.py --fps 15 --seconds 10
+"""
+
+import argparse
+import base64
+import http.client
+import json
+import multiprocessing as mp
+import os
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+
+from multi_camera_service.shm_transport import (  # noqa: E402
+    FrameConsumer,
+    FrameProducer,
+    SharedFrameRing,
+    max_queue_size,
+)
+
+
+def make_frames(width, height, count=8):
+    rng = np.random.default_rng(0)
+    base = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    # Quelques frames différentes, contenu réaliste pour le JPEG (gradients + bruit)
+    frames = []
+    for index in range(count):
+        frame = base.copy()
+        frame[:, :, index % 3] = np.linspace(0, 255, width, dtype=np.uint8)[None, :]
+        frames.append(frame)
+    return frames
+
+
+def paced(total, fps):
+    interval = 1.0 / fps if fps > 0 else 0.0
+    start = time.perf_counter()
+    for index in range(total):
+        if interval:
+            delay = start + index * interval - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        yield index
+
+
+def summarize(name, latencies, received, sent, elapsed, cpu_producer, cpu_consumer):
+    latencies = sorted(latencies)
+
+    def pct(p):
+        return latencies[min(len(latencies) - 1, int(p / 100.0 * len(latencies)))] * 1000 if latencies else float('nan')
+
+    return {
+        'transport': name,
+        'sent': sent,
+        'received': received,
+        'fps': round(received / elapsed, 1) if elapsed else 0.0,
+        'latency_p50_ms': round(pct(50), 2),
+        'latency_p95_ms': round(pct(95), 2),
+        'latency_max_ms': round(latencies[-1] * 1000, 2) if latencies else None,
+        'latency_mean_ms': round(statistics.mean(latencies) * 1000, 2) if latencies else None,
+        'cpu_producer_s': round(cpu_producer, 2),
+        'cpu_consumer_s': round(cpu_consumer, 2),
+    }
+
+
+# --- shm ---------------------------------------------------------------------
+
+def _shm_consumer(spec, meta_queue, result_queue, total):
+    consumer = FrameConsumer(spec, meta_queue)
+    latencies = []
+    torn = 0
+    cpu = time.process_time()
+    received = 0
+    frame = None
+    while received < total:
+        item = consumer.get(timeout=5.0)
+        if item is None:
+            break
+        meta, frame = item
+        # Lecture effective des pixels (comme le ferait la détection)
+        _ = int(frame[::64, ::64].sum())
+        if not consumer.is_valid(meta):
+            torn += 1
+        latencies.append(time.time() - meta['captured_at'])
+        received += 1
+    del frame
+    consumer.close()
+    result_queue.put((latencies, time.process_time() - cpu, torn))
+
+
+def bench_shm(frames, total, fps, slots=8):
+    ring = SharedFrameRing.create(slots=slots, max_frame_bytes=frames[0].nbytes)
+    meta_queue = mp.Queue(maxsize=max_queue_size(slots))
+    result_queue = mp.Queue()
+    process = mp.Process(target=_shm_consumer, args=(ring.spec(), meta_queue, result_queue, total))
+    process.start()
+
+    producer = FrameProducer(ring, meta_queue)
+    cpu = time.process_time()
+    start = time.time()
+    for index in paced(total, fps):
+        while not producer.publish('bench', frames[index % len(frames)], time.time()):
+            time.sleep(0.001)
+    latencies, cpu_consumer, torn = result_queue.get()
+    elapsed = time.time() - start
+    cpu_producer = time.process_time() - cpu
+    process.join()
+    ring.close()
+    report = summarize('shm', latencies, len(latencies), total, elapsed, cpu_producer, cpu_consumer)
+    report['torn_frames'] = torn
+    return report
+
+
+# --- pickle ------------------------------------------------------------------
+
+def _pickle_consumer(frame_queue, result_queue, total):
+    latencies = []
+    cpu = time.process_time()
+    for _ in range(total):
+        try:
+            captured_at, frame = frame_queue.get(timeout=5.0)
+        except Exception:
+            break
+        _ = int(frame[::64, ::64].sum())
+        latencies.append(time.time() - captured_at)
+    result_queue.put((latencies, time.process_time() - cpu))
+
+
+def bench_pickle(frames, total, fps):
+    frame_queue = mp.Queue(maxsize=6)
+    result_queue = mp.Queue()
+    process = mp.Process(target=_pickle_consumer, args=(frame_queue, result_queue, total))
+    process.start()
+    cpu = time.process_time()
+    start = time.time()
+    for index in paced(total, fps):
+        frame_queue.put((time.time(), frames[index % len(frames)]))
+    latencies, cpu_consumer = result_queue.get()
+    elapsed = time.time() - start
+    cpu_producer = time.process_time() - cpu
+    process.join()
+    return summarize('pickle', latencies, len(latencies), total, elapsed, cpu_producer, cpu_consumer)
+
+
+# --- http base64 -------------------------------------------------------------
+
+def _http_server(port_queue, result_queue, total):
+    import cv2
+
+    latencies = []
+    done = threading.Event()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            length = int(self.headers['Content-Length'])
+            payload = json.loads(self.rfile.read(length))
+            data = base64.b64decode(payload['frame_base64'])
+            frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            _ = int(frame[::64, ::64].sum())
+            latencies.append(time.time() - payload['captured_at'])
+            body = b'{"ok": true}'
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            if len(latencies) >= total:
+                done.set()
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    port_queue.put(server.server_address[1])
+    cpu = time.process_time()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    done.wait(timeout=max(30.0, total))
+    server.shutdown()
+    result_queue.put((latencies, time.process_time() - cpu))
+
+
+def bench_http(frames, total, fps, quality=85):
+    import cv2
+
+    port_queue = mp.Queue()
+    result_queue = mp.Queue()
+    process = mp.Process(target=_http_server, args=(port_queue, result_queue, total))
+    process.start()
+    port = port_queue.get()
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+
+    cpu = time.process_time()
+    start = time.time()
+    for index in paced(total, fps):
+        captured_at = time.time()
+        ok, encoded = cv2.imencode('.jpg', frames[index % len(frames)], [cv2.IMWRITE_JPEG_QUALITY, quality])
+        body = json.dumps({
+            'camera_id': 'bench',
+            'captured_at': captured_at,
+            'frame_base64': base64.b64encode(encoded.tobytes()).decode('ascii'),
+        })
+        connection.request('POST', '/frame', body=body, headers={'Content-Type': 'application/json'})
+        connection.getresponse().read()
+    latencies, cpu_consumer = result_queue.get()
+    elapsed = time.time() - start
+    cpu_producer = time.process_time() - cpu
+    connection.close()
+    process.join()
+    return summarize('http', latencies, len(latencies), total, elapsed, cpu_producer, cpu_consumer)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark transport de frames inter-processus")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--fps', type=float, default=15.0, help="Rythme d'envoi (0 = maximum)")
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--transports', default='shm,pickle,http')
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args()
+
+    frames = make_frames(args.width, args.height)
+    total = int(args.seconds * args.fps) if args.fps > 0 else 300
+    benches = {'shm': bench_shm, 'pickle': bench_pickle, 'http': bench_http}
+
+    reports = []
+    for name in [t.strip() for t in args.transports.split(',') if t.strip()]:
+        if name not in benches:
+            print(f"Transport inconnu: {name}")
+            continue
+        reports.append(benches[name](frames, total, args.fps))
+
+    if args.json:
+        print(json.dumps(reports, indent=2))
+        return
+
+    print(f"Frames {args.width}x{args.height} BGR ({frames[0].nbytes / 1e6:.1f} Mo), {total} frames à {args.fps} fps")
+    header = f"{'transport':10} {'fps':>7} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8} {'CPU prod s':>11} {'CPU cons s':>11}"
+    print(header)
+    print('-' * len(header))
+    for report in reports:
+        print(
+            f"{report['transport']:10} {report['fps']:>7} {report['latency_p50_ms']:>8} "
+            f"{report['latency_p95_ms']:>8} {report['latency_max_ms']:>8} "
+            f"{report['cpu_producer_s']:>11} {report['cpu_consumer_s']:>11}"
+        )
+
+
+if __name__ == '__main__':
+    main()